@@ -0,0 +1,96 @@
+/// <reference types="@cloudflare/workers" />
+
+// Serves the static catalogue written by nail-app-mobile/scripts/catalog_export.py
+// (plus swatch thumbnails and sprite sheets from swatch_assets.py) from the R2
+// bucket bound as CATALOG_BUCKET.
+
+const CORS_HEADERS = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
+  'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+};
+
+// Indexes change on every sync; shard and image names carry their content hash.
+const MANIFEST_CACHE = 'public, max-age=60, stale-while-revalidate=300';
+const SHARD_CACHE = 'public, max-age=31536000, immutable';
+
+const INDEX_FILES = new Set(['manifest.json', 'swatches.json']);
+const SHARD_PATH = /^shards\/[a-z0-9/-]+\/\d{4}\.[0-9a-f]{16}\.json\.gz$/;
+const IMAGE_PATH = /^(thumbs\/\d+\/v\d+\/[0-9a-f]{16}|sprites\/[a-z0-9-]+\/\d{4}\.[0-9a-f]{16})\.webp$/;
+
+function objectKey(pathname) {
+  let key;
+  try {
+    key = decodeURIComponent(pathname.replace(/^\/+/, ''));
+  } catch {
+    // Malformed escape (e.g. /%E0%A4%A): no object can have that name
+    return null;
+  }
+  if (INDEX_FILES.has(key) || SHARD_PATH.test(key) || IMAGE_PATH.test(key)) {
+    return key;
+  }
+  return null;
+}
+
+async function serveObject(request, env, key) {
+  const object = await env.CATALOG_BUCKET.get(key, { onlyIf: request.headers });
+  if (object === null) {
+    return new Response('Not Found', { status: 404, headers: CORS_HEADERS });
+  }
+
+  const isShard = key.endsWith('.json.gz');
+  const headers = {
+    ...CORS_HEADERS,
+    'Content-Type': key.endsWith('.webp') ? 'image/webp' : 'application/json; charset=utf-8',
+    'Cache-Control': INDEX_FILES.has(key) ? MANIFEST_CACHE : SHARD_CACHE,
+    ETag: object.httpEtag,
+  };
+  if (isShard) {
+    headers['Content-Encoding'] = 'gzip';
+  }
+  // A conditional request that matched returns metadata only
+  if (!('body' in object) || request.method === 'HEAD') {
+    return new Response(null, { status: 'body' in object ? 200 : 304, headers });
+  }
+  // Shards are already gzipped; stop the runtime from compressing them again
+  return new Response(object.body, { status: 200, headers, encodeBody: isShard ? 'manual' : 'automatic' });
+}
+
+export default {
+  async fetch(request, env, ctx) {
+    if (request.method === 'OPTIONS') {
+      return new Response(null, { headers: CORS_HEADERS });
+    }
+    if (request.method !== 'GET' && request.method !== 'HEAD') {
+      return new Response('Method Not Allowed', { status: 405, headers: CORS_HEADERS });
+    }
+    if (!env.CATALOG_BUCKET) {
+      return new Response(JSON.stringify({ error: 'CATALOG_BUCKET binding is not configured' }), {
+        status: 500,
+        headers: { ...CORS_HEADERS, 'Content-Type': 'application/json' },
+      });
+    }
+
+    const url = new URL(request.url);
+    const key = objectKey(url.pathname);
+    if (!key) {
+      return new Response('Not Found', { status: 404, headers: CORS_HEADERS });
+    }
+
+    // Serve repeat requests from the colo cache without touching R2
+    const cache = caches.default;
+    const cacheKey = new Request(url.toString(), { method: 'GET' });
+    if (request.method === 'GET' && !request.headers.has('If-None-Match')) {
+      const cached = await cache.match(cacheKey);
+      if (cached) {
+        return cached;
+      }
+    }
+
+    const response = await serveObject(request, env, key);
+    if (request.method === 'GET' && response.status === 200) {
+      ctx.waitUntil(cache.put(cacheKey, response.clone()));
+    }
+    return response;
+  },
+};
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""Adaptive request sizing for the REST catalogue sync.
+
+A fixed `--batch-size 200` is wrong in both directions. Small variant rows
+waste round trips on a fast link. Wide rows, or a slow project, can push one
+request past the gateway's body limit or Postgres' statement timeout. The
+lookups have a different limit: their keys travel in the URL, so their size
+is bounded by URL length, not throughput.
+
+A `BatchTuner` sizes each request of one kind, for example
+`color_variants.upsert` or `colors.lookup`, from what it has seen:
+
+- Bytes: the row count is capped so the estimated body (or URL) stays under
+  the byte budget. The estimate comes from the JSON size of a sample of the
+  last batch.
+- Latency: while a full batch finishes in under half the target latency and
+  its rows-per-second holds within 10% of the best seen so far, the size
+  doubles, up to the row maximum. A batch slower than the target halves it,
+  and the size never grows back to one that was too slow.
+- Errors: a timeout, a Postgres statement timeout (57014), or HTTP 413/414
+  halves the size, and `send_in_batches` retries the same rows. A 413 or 414
+  also lowers the byte budget to half the rejected request, for the rest of
+  the run. Any other error, or one at the minimum size, is raised.
+
+`send_in_batches` drives a sequence of rows through a tuner and a send
+function. Each sync phase has its own tuner in a `TunerSet`, so a size learned
+on colour inserts does not leak into variant upserts. `--batch-tuning off`
+pins every kind to `--batch-size`; byte caps and error halving still apply.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence
+from urllib.parse import quote
+
+try:
+    import httpx
+except ImportError:  # only the sync's HTTP errors need it
+    httpx = None
+
+from run_metrics import record_retry
+
+DEFAULT_MAX_BODY_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_URL_BYTES = 8000  # of filter values; gateways commonly cap the request line near 8-16 KiB
+DEFAULT_TARGET_SECONDS = 2.0
+SAMPLE_ROWS = 16
+TIMEOUT_CODES = {"57014"}  # Postgres statement timeout
+TOO_LARGE_CODES = {"413", "414"}
+
+
+def json_bytes(rows: Sequence) -> int:
+    return len(json.dumps(list(rows), separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def url_bytes(values: Sequence) -> int:
+    # in.(a,b,...) with each value percent-encoded; 3 bytes for the separator and any quoting
+    return sum(len(quote(str(value), safe="")) + 3 for value in values)
+
+
+def size_error(exc: BaseException) -> Optional[str]:
+    """Classify a failure a smaller request could avoid as "time" or "bytes"; None otherwise."""
+    if httpx is not None:
+        if isinstance(exc, httpx.TimeoutException):
+            return "time"
+        if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in (413, 414):
+            return "bytes"
+    if isinstance(exc, TimeoutError):
+        return "time"
+    # postgrest's APIError: the Postgres SQLSTATE, or the HTTP status for a non-JSON (gateway) error body
+    code = str(getattr(exc, "code", ""))
+    if code in TIMEOUT_CODES:
+        return "time"
+    if code in TOO_LARGE_CODES:
+        return "bytes"
+    return None
+
+
+@dataclass
+class TuningSettings:
+    initial: int = 200
+    minimum: int = 1
+    maximum: int = 5000
+    max_body_bytes: int = DEFAULT_MAX_BODY_BYTES
+    max_url_bytes: int = DEFAULT_MAX_URL_BYTES
+    target_seconds: float = DEFAULT_TARGET_SECONDS
+    adaptive: bool = True
+
+
+class BatchTuner:
+    """Rows per request for one kind of request."""
+
+    def __init__(
+        self,
+        name: str,
+        settings: TuningSettings,
+        max_bytes: int,
+        measure: Callable[[Sequence], int] = json_bytes,
+    ) -> None:
+        self.name = name
+        self.settings = settings
+        self.max_bytes = max_bytes
+        self.measure = measure
+        self.size = max(settings.minimum, min(settings.initial, settings.maximum))
+        self.bytes_per_row: Optional[float] = None
+        self.best_rate = 0.0
+        self.requests = 0
+        self.rows = 0
+        self.shrinks = 0
+        self.largest = 0
+        self.ceiling = settings.maximum + 1  # smallest size that has been too slow or too large
+        self._limit = "size"
+
+    def next_size(self, remaining: int) -> int:
+        size, self._limit = self.size, "size"
+        if self.bytes_per_row:
+            by_bytes = max(1, int(self.max_bytes / self.bytes_per_row))
+            if by_bytes < size:
+                size, self._limit = by_bytes, "bytes"
+        if remaining <= size:
+            size, self._limit = remaining, "remaining"
+        return max(1, size)
+
+    def observe(self, batch: Sequence) -> None:
+        sample = batch[:SAMPLE_ROWS]
+        if not sample:
+            return
+        per_row = self.measure(sample) / len(sample)
+        self.bytes_per_row = per_row if self.bytes_per_row is None else 0.7 * self.bytes_per_row + 0.3 * per_row
+
+    def succeeded(self, rows: int, seconds: float) -> None:
+        self.requests += 1
+        self.rows += rows
+        self.largest = max(self.largest, rows)
+        if not self.settings.adaptive or self._limit == "remaining":
+            return  # a short final batch says nothing about the size
+        rate = rows / max(seconds, 1e-6)
+        target = self.settings.target_seconds
+        if seconds > target:
+            self.ceiling = min(self.ceiling, rows)
+            self._resize(max(self.settings.minimum, self.size // 2), f"{seconds:.2f}s > {target:g}s target")
+        elif self._limit == "size" and seconds < target / 2 and rate >= 0.9 * self.best_rate:
+            grown = min(self.settings.maximum, self.size * 2)
+            if grown < self.ceiling:
+                self._resize(grown, f"{rate:,.0f} rows/s at {seconds:.2f}s")
+        self.best_rate = max(self.best_rate, rate)
+
+    def failed(self, exc: BaseException, rows: int) -> bool:
+        """Shrink after a size-related failure; True if the rows should be retried smaller."""
+        kind = size_error(exc)
+        if kind is None or rows <= self.settings.minimum:
+            return False
+        self.shrinks += 1
+        self.ceiling = min(self.ceiling, rows)
+        if kind == "bytes" and self.bytes_per_row:
+            self.max_bytes = min(self.max_bytes, max(1, int(self.bytes_per_row * rows / 2)))
+        self._resize(max(self.settings.minimum, rows // 2), f"{type(exc).__name__}: {exc}")
+        return True
+
+    def _resize(self, size: int, reason: str) -> None:
+        if size != self.size:
+            logging.debug("%s: %d -> %d rows per request (%s)", self.name, self.size, size, reason)
+            self.size = size
+
+    def describe(self) -> str:
+        return (
+            f"{self.name}: {self.rows:,} rows in {self.requests:,} requests "
+            f"(largest {self.largest:,}, now {self.size:,}, {self.shrinks} shrinks)"
+        )
+
+
+class TunerSet:
+    """One tuner per request kind, sharing settings."""
+
+    def __init__(self, settings: Optional[TuningSettings] = None) -> None:
+        self.settings = settings or TuningSettings()
+        self.tuners: Dict[str, BatchTuner] = {}
+        self.post_lookups = True  # cleared once the lookup RPCs turn out to be missing
+
+    def body(self, name: str) -> BatchTuner:
+        if name not in self.tuners:
+            self.tuners[name] = BatchTuner(name, self.settings, self.settings.max_body_bytes)
+        return self.tuners[name]
+
+    def url(self, name: str) -> BatchTuner:
+        if name not in self.tuners:
+            self.tuners[name] = BatchTuner(name, self.settings, self.settings.max_url_bytes, url_bytes)
+        return self.tuners[name]
+
+    def log_summary(self) -> None:
+        for tuner in self.tuners.values():
+            if tuner.requests:
+                logging.info("Batching %s", tuner.describe())
+
+
+def send_in_batches(
+    items: Sequence,
+    tuner: BatchTuner,
+    send: Callable[[Sequence], object],
+    on_sent: Optional[Callable[[int], None]] = None,
+) -> None:
+    """Send `items` in tuner-sized slices, shrinking and retrying after size errors.
+
+    `on_sent(n)` is called after each successful request with the number of
+    items sent so far (for checkpointing).
+    """
+    position = 0
+    while position < len(items):
+        batch = items[position : position + tuner.next_size(len(items) - position)]
+        tuner.observe(batch)
+        start = time.perf_counter()
+        try:
+            send(batch)
+        except Exception as exc:
+            if not tuner.failed(exc, len(batch)):
+                raise
+            record_retry(tuner.name)
+            logging.warning("%s: %d-row request failed (%s); retrying in smaller batches", tuner.name, len(batch), exc)
+            continue
+        tuner.succeeded(len(batch), time.perf_counter() - start)
+        position += len(batch)
+        if on_sent is not None:
+            on_sent(position)
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Typed Arrow/Parquet catalogue files shared by the scrapers and the sync.
+
+Each scraper's CSV has its own headers (`ShadeName`/`Shade Name`,
+`ProductType`/`Product Type`, `SwatchImageURL`/`SwatchURL`) and stores every
+value as text, so the sync re-parses and re-normalises every row.
+`CATALOG_SCHEMA` gives every brand the same typed layout:
+
+- `hex`: uint32 `0xRRGGBB`, validated when the file is written
+- `brand`, `product_line`, `collection`, `finish`: dictionary-encoded strings
+  (`finish` holds the scraper's raw finish/texture label)
+- `shade_name`, `shade_code`, `product_url`, `swatch_url`: trimmed strings,
+  null when blank
+- `scraped_at`: the scrape run's UTC timestamp
+
+A scraper calls `write_catalog(rows, path, columns)` with its CSV rows and a
+mapping from schema field to its own header(s). `.parquet` files are
+zstd-compressed. `.arrow` files are uncompressed Arrow IPC, which the reader
+memory-maps without copying. The sync accepts either in place of the CSV
+(`--opi ../opi_full_uk_catalog.parquet`). `load_arrow_rows` normalises product
+line, collection and finish once per dictionary value, not once per row, and
+yields the same `VariantRecord`s as `load_rows`.
+
+Only this module and pyarrow are needed to write files (no supabase), so the
+scrapers at the repository root can import it.
+
+Run this file directly to convert, export or benchmark:
+
+    python scripts/catalog_arrow.py --from-csv ../opi_full_uk_catalog.csv --source opi
+    python scripts/catalog_arrow.py --to-csv ../opi_full_uk_catalog.parquet
+    python scripts/catalog_arrow.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import json
+import logging
+import string
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit("pyarrow is required for Arrow/Parquet catalogues. Install with `pip install pyarrow`.") from exc
+
+from run_metrics import timed
+
+if TYPE_CHECKING:
+    from catalog_model import CatalogSource, VariantRecord
+
+CATALOG_SCHEMA = pa.schema(
+    [
+        pa.field("hex", pa.uint32(), nullable=False),
+        pa.field("brand", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("product_line", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("collection", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("finish", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("shade_name", pa.string()),
+        pa.field("shade_code", pa.string()),
+        pa.field("product_url", pa.string()),
+        pa.field("swatch_url", pa.string()),
+        pa.field("scraped_at", pa.timestamp("ms", tz="UTC"), nullable=False),
+    ]
+)
+
+CATEGORICAL_FIELDS = ("brand", "product_line", "collection", "finish")
+TEXT_FIELDS = ("shade_name", "shade_code", "product_url", "swatch_url")
+ARROW_SUFFIXES = (".parquet", ".arrow")
+METADATA_PREFIX = "catalog."
+HEX_DIGITS = frozenset(string.hexdigits)
+
+# Schema field -> scraper CSV header, or several headers where the first non-empty wins
+ColumnMap = Mapping[str, Union[str, Sequence[str]]]
+
+
+def parse_hex(value: Optional[str]) -> Optional[int]:
+    """`#RRGGBB` (prefix optional, any case) as an int; None if it is not six hex digits."""
+    if not value:
+        return None
+    candidate = value.strip()
+    if candidate.startswith("#"):
+        candidate = candidate[1:]
+    if len(candidate) != 6 or not HEX_DIGITS.issuperset(candidate):
+        return None
+    return int(candidate, 16)
+
+
+def _headers(columns: ColumnMap, field: str) -> Tuple[str, ...]:
+    headers = columns.get(field, ())
+    return (headers,) if isinstance(headers, str) else tuple(headers)
+
+
+def table_from_rows(
+    rows: Iterable[Mapping[str, Optional[str]]],
+    columns: ColumnMap,
+    *,
+    source_catalog: Optional[str] = None,
+    scraped_at: Optional[datetime] = None,
+) -> pa.Table:
+    """Build a `CATALOG_SCHEMA` table from scraper rows; rows without a valid hex are dropped."""
+    rows = list(rows)
+    scraped_at = scraped_at or datetime.now(timezone.utc)
+    present = set(rows[0]) if rows else set()
+    headers = {
+        field: [header for header in _headers(columns, field) if header in present] for field in CATALOG_SCHEMA.names
+    }
+
+    def first(row: Mapping[str, Optional[str]], field: str) -> Optional[str]:
+        # Mirrors load_rows: the first non-empty column wins
+        return next((row[header] for header in headers[field] if row.get(header)), None)
+
+    hexes: List[int] = []
+    values: Dict[str, List[Optional[str]]] = {field: [] for field in CATEGORICAL_FIELDS + TEXT_FIELDS}
+    skipped = 0
+    for row in rows:
+        hex_value = parse_hex(first(row, "hex"))
+        if hex_value is None:
+            skipped += 1
+            continue
+        hexes.append(hex_value)
+        for field, column in values.items():
+            value = first(row, field)
+            if value is not None:
+                value = value.strip()
+                # Blanks become null, except a whitespace-only shade name: load_rows keeps
+                # that as "" and only substitutes "Unnamed" for a missing one
+                if not value and field != "shade_name":
+                    value = None
+            column.append(value)
+    if skipped:
+        logging.info("Skipped %d rows without a valid hex", skipped)
+
+    arrays = [pa.array(hexes, type=pa.uint32())]
+    for field in CATEGORICAL_FIELDS:
+        arrays.append(pa.array(values[field], type=pa.string()).dictionary_encode())
+    for field in TEXT_FIELDS:
+        arrays.append(pa.array(values[field], type=pa.string()))
+    arrays.append(pa.repeat(pa.scalar(scraped_at, type=pa.timestamp("ms", tz="UTC")), len(hexes)))
+
+    metadata = {
+        "columns": json.dumps({field: names for field, names in headers.items() if names}),
+        "scraped_at": scraped_at.isoformat(),
+    }
+    if source_catalog:
+        metadata["source_catalog"] = source_catalog
+    schema = CATALOG_SCHEMA.with_metadata({f"{METADATA_PREFIX}{key}": value for key, value in metadata.items()})
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_table(table: pa.Table, path: Path) -> None:
+    path = Path(path)
+    if path.suffix == ".arrow":
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif path.suffix == ".parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        raise ValueError(f"Unsupported catalogue format (use {' or '.join(ARROW_SUFFIXES)}): {path}")
+
+
+@timed
+def write_catalog(
+    rows: Iterable[Mapping[str, Optional[str]]],
+    path: Union[str, Path],
+    columns: ColumnMap,
+    *,
+    source_catalog: Optional[str] = None,
+    scraped_at: Optional[datetime] = None,
+) -> int:
+    """Write scraper rows as a typed catalogue file; returns the rows written."""
+    table = table_from_rows(rows, columns, source_catalog=source_catalog, scraped_at=scraped_at)
+    write_table(table, Path(path))
+    return table.num_rows
+
+
+def read_catalog(path: Path, columns: Optional[Sequence[str]] = None) -> pa.Table:
+    """Read a catalogue file; `.arrow` is memory-mapped, so columns are not copied."""
+    path = Path(path)
+    if path.suffix == ".arrow":
+        # The table's buffers point into the mapping, which stays open while they are alive
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        if columns is not None:
+            table = table.select(list(columns))
+    elif path.suffix == ".parquet":
+        table = pq.read_table(path, columns=list(columns) if columns is not None else None, memory_map=True)
+    else:
+        raise ValueError(f"Unsupported catalogue format (use {' or '.join(ARROW_SUFFIXES)}): {path}")
+    for name in table.column_names:
+        expected = CATALOG_SCHEMA.field(name).type
+        if table.schema.field(name).type != expected:
+            raise ValueError(f"{path}: column {name} is {table.schema.field(name).type}, expected {expected}")
+    return table
+
+
+def catalog_metadata(table: pa.Table) -> Dict[str, str]:
+    metadata = table.schema.metadata or {}
+    return {
+        key.decode()[len(METADATA_PREFIX) :]: value.decode()
+        for key, value in metadata.items()
+        if key.decode().startswith(METADATA_PREFIX)
+    }
+
+
+def _dictionary_values(column: pa.ChunkedArray, normalise) -> List:
+    """Normalise each distinct value once, then expand through the dictionary indices."""
+    resolved: List = []
+    for chunk in column.chunks:
+        table = [normalise(value) for value in chunk.dictionary.to_pylist()]
+        missing = normalise(None)
+        resolved.extend(missing if index is None else table[index] for index in chunk.indices.to_pylist())
+    return resolved
+
+
+def load_arrow_rows(path: Path, source: CatalogSource) -> Iterator[VariantRecord]:
+    """Same records as `load_rows` on the equivalent CSV, from a typed catalogue file."""
+    from catalog_model import VariantRecord, clean_collection, normalise_finish, normalise_product_line
+
+    table = read_catalog(path, columns=["hex", *CATEGORICAL_FIELDS, *TEXT_FIELDS])
+    recorded = catalog_metadata(table).get("source_catalog")
+    if recorded and recorded != source.source_catalog:
+        logging.warning("%s was written for %s, loading it as %s", path, recorded, source.source_catalog)
+
+    def finish(raw: Optional[str]) -> str:
+        if source.finish_aliases is not None and raw is not None:
+            raw = source.finish_aliases.get(raw.lower(), raw)
+        return normalise_finish(raw)
+
+    hex_codes = [f"#{value:06X}" for value in table.column("hex").to_pylist()]
+    brand = _dictionary_values(table.column("brand"), lambda value: value or source.brand)
+    product_line = _dictionary_values(
+        table.column("product_line"), lambda value: normalise_product_line(value, source.brand)
+    )
+    collection = _dictionary_values(table.column("collection"), clean_collection)
+    finishes = _dictionary_values(table.column("finish"), finish)
+    shade_name = ["Unnamed" if value is None else value for value in table.column("shade_name").to_pylist()]
+    shade_code, product_url, swatch_url = (table.column(name).to_pylist() for name in TEXT_FIELDS[1:])
+    columns = (hex_codes, brand, product_line, shade_name, shade_code, collection, finishes, product_url, swatch_url)
+    for values in zip(*columns):
+        yield VariantRecord(*values, source_catalog=source.source_catalog)
+
+
+def source_columns(source: CatalogSource) -> Dict[str, Union[str, Tuple[str, ...]]]:
+    """The schema-field -> CSV-header mapping a `CatalogSource` describes."""
+    return {
+        "hex": source.hex_column,
+        "brand": source.brand_column,
+        "product_line": source.product_line_column,
+        "collection": source.collection_column,
+        "finish": source.finish_columns,
+        "shade_name": source.shade_name_column,
+        "shade_code": source.shade_code_column,
+        "product_url": source.product_url_column,
+        "swatch_url": source.swatch_url_column,
+    }
+
+
+def read_csv_rows(path: Path) -> List[Dict[str, str]]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def export_csv(table: pa.Table, path: Path) -> None:
+    """Write a catalogue back out as CSV under the scraper's original headers."""
+    headers = json.loads(catalog_metadata(table).get("columns", "{}"))
+    fields = [field for field in CATALOG_SCHEMA.names if field != "scraped_at" and headers.get(field)]
+    columns = [
+        [f"#{value:06X}" for value in table.column(field).to_pylist()]
+        if field == "hex"
+        else ["" if value is None else value for value in table.column(field).to_pylist()]
+        for field in fields
+    ]
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow([headers[field][0] for field in fields])
+        writer.writerows(zip(*columns))
+
+
+def _timed(load) -> Tuple[float, List]:
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        records = list(load())
+        return time.perf_counter() - start, records
+    finally:
+        gc.enable()
+
+
+def benchmark(rows: int, source_name: str, template: Path) -> None:
+    from catalog_columnar import load_frame, iter_records, write_synthetic_csv
+    from catalog_model import CATALOG_SOURCES, load_rows
+
+    source = CATALOG_SOURCES[source_name]
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / f"synthetic_{source_name}.csv"
+        write_synthetic_csv(csv_path, template, rows)
+        start = time.perf_counter()
+        table = table_from_rows(read_csv_rows(csv_path), source_columns(source), source_catalog=source.source_catalog)
+        convert_seconds = time.perf_counter() - start
+        paths = {suffix: csv_path.with_suffix(suffix) for suffix in ARROW_SUFFIXES}
+        for path in paths.values():
+            write_table(table, path)
+        del table
+
+        csv_seconds, csv_records = _timed(lambda: load_rows(csv_path, source))
+        columnar_seconds, _ = _timed(lambda: iter_records(load_frame(csv_path, source)))
+        start = time.perf_counter()
+        read_catalog(paths[".parquet"])
+        parquet_read_seconds = time.perf_counter() - start
+        parquet_seconds, parquet_records = _timed(lambda: load_arrow_rows(paths[".parquet"], source))
+        arrow_seconds, arrow_records = _timed(lambda: load_arrow_rows(paths[".arrow"], source))
+        sizes = {suffix: path.stat().st_size for suffix, path in [(".csv", csv_path), *paths.items()]}
+
+    mib = 1024 * 1024
+    print(f"rows: {rows:,} ({source_name}); CSV -> table conversion {convert_seconds:.2f}s")
+    print(f"  file size  csv {sizes['.csv'] / mib:7.1f} MiB   parquet {sizes['.parquet'] / mib:7.1f} MiB"
+          f" ({sizes['.csv'] / sizes['.parquet']:4.1f}x smaller)   arrow {sizes['.arrow'] / mib:7.1f} MiB")
+    print(f"  load to VariantRecords:")
+    print(f"    csv (row path)        {csv_seconds:6.2f}s")
+    print(f"    csv (--columnar)      {columnar_seconds:6.2f}s")
+    print(f"    parquet               {parquet_seconds:6.2f}s  ({csv_seconds / parquet_seconds:4.1f}x)"
+          f"  [read_table alone {parquet_read_seconds:.2f}s]")
+    print(f"    arrow (memory-mapped) {arrow_seconds:6.2f}s  ({csv_seconds / arrow_seconds:4.1f}x)")
+    print(f"  identical records: {csv_records == parquet_records == arrow_records}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert, export and benchmark typed catalogue files")
+    repo_root = Path(__file__).resolve().parents[1]
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--from-csv", type=Path, metavar="CSV", help="Convert a scraper CSV to a typed catalogue")
+    action.add_argument("--to-csv", type=Path, metavar="FILE", help="Export a typed catalogue back to CSV")
+    action.add_argument("--bench", type=int, metavar="ROWS", help="Compare CSV and Arrow/Parquet loading")
+    parser.add_argument("--source", default="opi", help="Catalogue source of the CSV (opi, cnd, tgb)")
+    parser.add_argument("--output", type=Path, help="Output path (defaults next to the input)")
+    parser.add_argument("--format", default=".parquet", choices=ARROW_SUFFIXES, help="Format for --from-csv")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    if args.to_csv:
+        output = args.output or args.to_csv.with_suffix(".csv")
+        export_csv(read_catalog(args.to_csv), output)
+        print(f"Exported {args.to_csv} -> {output}")
+        return 0
+
+    from catalog_model import CATALOG_SOURCES
+
+    source = CATALOG_SOURCES[args.source]
+    if args.bench:
+        benchmark(args.bench, args.source, (repo_root / ".." / source.default_csv).resolve())
+        return 0
+    output = args.output or args.from_csv.with_suffix(args.format)
+    table = table_from_rows(
+        read_csv_rows(args.from_csv), source_columns(source), source_catalog=source.source_catalog
+    )
+    write_table(table, output)
+    print(f"Wrote {table.num_rows} rows -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
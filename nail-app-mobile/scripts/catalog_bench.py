@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""Synthetic large catalogues and a per-phase benchmark for sync_color_catalog.
+
+The bundled scraper CSVs hold about 950 rows, which says nothing about how the
+sync scales. `generate_catalogues` writes OPI/CND/TGB files in each scraper's
+own layout, at any size, and keeps the bundled CSVs' shape:
+- Brands are split in the same proportions.
+- Each row starts from a real row of its brand, so product line, finish and
+  collection combinations occur as often as they do in the real data.
+- Hexes are real swatch hexes with a small RGB jitter. A fraction of rows
+  reuse an earlier hex, at the rate the real CSVs share hexes, so colours
+  collect several variants.
+- Shade names, codes and URLs get a unique suffix.
+- `--duplicate-rate` re-emits earlier rows verbatim, so deduplication has
+  work to do.
+
+`run_phases` then drives the sync's own functions over the generated files,
+phase by phase. It reports wall time (untraced run) and tracemalloc peak and
+retained memory (traced run) for each phase:
+
+    load                 load_variant_store(args)
+    deduplicate          store.deduplicate()
+    map_hex_to_variants  map_hex_to_variants(store)
+    upsert_variants      REST payload build, `variant_rows` (every colour treated as existing)
+    rpc_payload          merge_color_catalog() chunks, JSON-encoded
+    postgres             sync_via_postgres(..., dry_run=True), only with --postgres
+
+Nothing leaves the process except the optional `postgres` phase. That phase
+merges into DATABASE_URL inside a transaction that is rolled back, so it can
+run repeatedly against a scratch database.
+
+Usage:
+    python scripts/catalog_bench.py --rows 10000 100000 1000000
+    python scripts/catalog_bench.py --rows 100000 --columnar --json bench.json
+    python scripts/catalog_bench.py --rows 100000 --compare bench.json   # exit 1 on a regression
+    python scripts/catalog_bench.py --generate 1000000 --out /tmp/catalogue [--format parquet]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from catalog_model import CATALOG_SOURCES, CatalogSource, load_rows, map_hex_to_variants, normalise_hex
+from sync_color_catalog import chunk_by_hex, encode_catalog_chunk, load_variant_store, parse_args, variant_rows
+
+DEFAULT_DUPLICATE_RATE = 0.02
+HEX_JITTER = 6.0  # RGB standard deviation around a real swatch hex
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    seconds: float
+    peak_mib: Optional[float] = None
+    retained_mib: Optional[float] = None
+    items: Optional[int] = None
+
+
+def _repo_root() -> Path:
+    return Path(__file__).resolve().parents[2]
+
+
+def _template_rows(source: CatalogSource) -> List[Dict[str, str]]:
+    with (_repo_root() / source.default_csv).open(newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+def _jitter(hex_code: str, rng: random.Random) -> str:
+    value = int(hex_code[1:], 16)
+    channels = ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+    r, g, b = (min(255, max(0, round(rng.gauss(channel, HEX_JITTER)))) for channel in channels)
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+def _unique(value: str, index: int, separator: str) -> str:
+    return f"{value}{separator}{index}" if value else value
+
+
+def generate_catalogues(
+    rows: int,
+    out_dir: Path,
+    *,
+    seed: int = 7,
+    duplicate_rate: float = DEFAULT_DUPLICATE_RATE,
+    file_format: str = "csv",
+) -> Dict[str, Path]:
+    """Write one synthetic file per catalogue source; returns {source name: path}."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    templates = {name: _template_rows(source) for name, source in CATALOG_SOURCES.items()}
+    total_templates = sum(len(rows_) for rows_ in templates.values())
+    hexes = [
+        record.hex_code
+        for name, source in CATALOG_SOURCES.items()
+        for record in load_rows(_repo_root() / source.default_csv, source)
+    ]
+    shared_hex_rate = 1 - len(set(hexes)) / len(hexes)
+
+    paths: Dict[str, Path] = {}
+    issued: List[str] = []
+    offset = 0
+    for position, (name, source) in enumerate(CATALOG_SOURCES.items()):
+        base = templates[name]
+        if position == len(CATALOG_SOURCES) - 1:
+            count = rows - offset
+        else:
+            count = round(rows * len(base) / total_templates)
+        fieldnames = list(base[0].keys())
+        output: List[Dict[str, str]] = []
+        for index in range(offset, offset + count):
+            if output and rng.random() < duplicate_rate:
+                output.append(rng.choice(output))
+                continue
+            row = dict(rng.choice(base))
+            template_hex = normalise_hex(row.get(source.hex_column)) or rng.choice(hexes)
+            if issued and rng.random() < shared_hex_rate:
+                hex_code = rng.choice(issued)
+            else:
+                hex_code = _jitter(template_hex, rng)
+                issued.append(hex_code)
+            row[source.hex_column] = hex_code
+            row[source.shade_name_column] = _unique(row.get(source.shade_name_column, ""), index, " ")
+            if source.shade_code_column in row:
+                row[source.shade_code_column] = _unique(row[source.shade_code_column], index, "-")
+            for column in (source.product_url_column, source.swatch_url_column):
+                if column in row:
+                    row[column] = _unique(row[column], index, "?v=")
+            output.append(row)
+        offset += count
+
+        if file_format == "csv":
+            path = out_dir / source.default_csv
+            with path.open("w", newline="", encoding="utf-8") as handle:
+                writer = csv.DictWriter(handle, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(output)
+        else:
+            from catalog_arrow import source_columns, write_catalog
+
+            path = out_dir / Path(source.default_csv).with_suffix(f".{file_format}").name
+            write_catalog(output, path, source_columns(source), source_catalog=source.source_catalog)
+        paths[name] = path
+    logging.info("Generated %d synthetic rows in %s", rows, out_dir)
+    return paths
+
+
+def _phases(args: argparse.Namespace, postgres_dsn: Optional[str]) -> List[Tuple[str, Callable]]:
+    """(name, step) pairs; each step takes the previous step's state dict and updates it."""
+    def load(state):
+        state["store"] = load_variant_store(args)
+        return len(state["store"])
+
+    def dedupe(state):
+        state["store"].deduplicate()
+        return len(state["store"])
+
+    def group(state):
+        state["variants_by_hex"] = map_hex_to_variants(state["store"])
+        return len(state["variants_by_hex"])
+
+    def upsert(state):
+        variants_by_hex = state["variants_by_hex"]
+        colors_by_hex = {
+            hex_code: {"id": str(uuid.uuid4()), "finish": variants[0].finish}
+            for hex_code, variants in variants_by_hex.items()
+        }
+        _, primaries, _ = variant_rows(colors_by_hex, variants_by_hex, {})
+        return len(primaries)
+
+    def rpc_payload(state):
+        total = 0
+        for chunk in chunk_by_hex(state["variants_by_hex"], args.rpc_chunk_size):
+            total += len(json.dumps(encode_catalog_chunk(chunk)))
+        return total
+
+    phases = [
+        ("load", load),
+        ("deduplicate", dedupe),
+        ("map_hex_to_variants", group),
+        ("upsert_variants", upsert),
+        ("rpc_payload", rpc_payload),
+    ]
+    if postgres_dsn:
+        from catalog_postgres import sync_via_postgres
+
+        def postgres(state):
+            summary = sync_via_postgres(postgres_dsn, state["store"], False, True)
+            return summary.staged
+
+        phases.append(("postgres", postgres))
+    return phases
+
+
+def run_phases(args: argparse.Namespace, postgres_dsn: Optional[str] = None, memory: bool = True) -> List[PhaseResult]:
+    phases = _phases(args, postgres_dsn)
+    results = []
+    state: Dict[str, object] = {}
+    for name, step in phases:
+        gc.collect()
+        start = time.perf_counter()
+        items = step(state)
+        results.append(PhaseResult(name, time.perf_counter() - start, items=items))
+    if not memory:
+        return results
+
+    # Second pass under tracemalloc: peak is phase-local, retained is what the phase leaves behind
+    state = {}
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for result, (_, step) in zip(results, phases):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step(state)
+            current, peak = tracemalloc.get_traced_memory()
+            result.peak_mib = (peak - before) / 2**20
+            result.retained_mib = (current - before) / 2**20
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def benchmark(
+    sizes: Sequence[int],
+    *,
+    sync_options: Sequence[str] = (),
+    file_format: str = "csv",
+    duplicate_rate: float = DEFAULT_DUPLICATE_RATE,
+    postgres_dsn: Optional[str] = None,
+    memory: bool = True,
+) -> Dict[str, object]:
+    report: Dict[str, object] = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "format": file_format,
+        "sync_options": list(sync_options),
+        "runs": [],
+    }
+    logging.getLogger().setLevel(logging.WARNING)
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            paths = generate_catalogues(rows, Path(tmp), duplicate_rate=duplicate_rate, file_format=file_format)
+            generate_seconds = time.perf_counter() - start
+            argv = [part for name, path in paths.items() for part in (f"--{name}", str(path))]
+            args = parse_args([*argv, "--dry-run", *sync_options])
+            results = run_phases(args, postgres_dsn, memory)
+        report["runs"].append({"rows": rows, "generate_seconds": generate_seconds, "phases": [asdict(r) for r in results]})
+        print_run(rows, results)
+    return report
+
+
+def print_run(rows: int, results: Sequence[PhaseResult]) -> None:
+    total = sum(result.seconds for result in results)
+    print(f"rows: {rows:,}")
+    print(f"  {'phase':<21}{'seconds':>9}{'µs/row':>9}{'peak MiB':>10}{'retained':>10}  items")
+    for result in results:
+        peak = "" if result.peak_mib is None else f"{result.peak_mib:10.1f}"
+        retained = "" if result.retained_mib is None else f"{result.retained_mib:10.1f}"
+        print(
+            f"  {result.name:<21}{result.seconds:9.2f}{result.seconds / rows * 1e6:9.2f}"
+            f"{peak:>10}{retained:>10}  {result.items if result.items is not None else ''}"
+        )
+    print(f"  {'total':<21}{total:9.2f}{total / rows * 1e6:9.2f}")
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Phases more than `tolerance` slower (time or peak memory) than the baseline at the same size."""
+    regressions = []
+    previous = {
+        (run["rows"], phase["name"]): phase for run in baseline.get("runs", []) for phase in run["phases"]
+    }
+    for run in report["runs"]:
+        for phase in run["phases"]:
+            old = previous.get((run["rows"], phase["name"]))
+            if not old:
+                continue
+            for field, unit in (("seconds", "s"), ("peak_mib", " MiB")):
+                if phase.get(field) is None or not old.get(field):
+                    continue
+                ratio = phase[field] / old[field]
+                if ratio > 1 + tolerance:
+                    regressions.append(
+                        f"{phase['name']} @ {run['rows']:,} rows: {field} {old[field]:.2f}{unit} -> "
+                        f"{phase[field]:.2f}{unit} ({ratio:.2f}x)"
+                    )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate synthetic catalogues and benchmark the sync phases")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="Catalogue sizes to benchmark")
+    parser.add_argument("--generate", type=int, metavar="ROWS", help="Only write a synthetic catalogue (needs --out)")
+    parser.add_argument("--out", type=Path, help="Directory for --generate")
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet", "arrow"], help="Synthetic file format")
+    parser.add_argument("--duplicate-rate", type=float, default=DEFAULT_DUPLICATE_RATE)
+    parser.add_argument("--columnar", action="store_true", help="Benchmark the pandas ingest path")
+    parser.add_argument("--merge-delta-e", type=float, help="Forwarded to the sync (adds the merge to 'load')")
+    parser.add_argument("--postgres", action="store_true", help="Add a rolled-back merge into DATABASE_URL")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--json", type=Path, help="Write the results as JSON")
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="Fail if slower than a previous --json")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown for --compare")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level), format="[%(levelname)s] %(message)s")
+
+    if args.generate:
+        if not args.out:
+            parser.error("--generate needs --out")
+        for path in generate_catalogues(
+            args.generate, args.out, duplicate_rate=args.duplicate_rate, file_format=args.format
+        ).values():
+            print(path)
+        return 0
+
+    postgres_dsn = None
+    if args.postgres:
+        postgres_dsn = os.getenv("DATABASE_URL")
+        if not postgres_dsn:
+            logging.error("DATABASE_URL must be set for --postgres")
+            return 1
+    sync_options = []
+    if args.columnar:
+        sync_options.append("--columnar")
+    if args.merge_delta_e is not None:
+        sync_options += ["--merge-delta-e", str(args.merge_delta_e)]
+
+    report = benchmark(
+        args.rows,
+        sync_options=sync_options,
+        file_format=args.format,
+        duplicate_rate=args.duplicate_rate,
+        postgres_dsn=postgres_dsn,
+        memory=not args.no_memory,
+    )
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance)
+        for regression in regressions:
+            logging.error("Regression: %s", regression)
+        if regressions:
+            return 1
+        print(f"No phase more than {args.tolerance:.0%} slower than {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
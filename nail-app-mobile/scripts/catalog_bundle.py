@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""Compiled, memory-mapped catalogue bundle for read-heavy consumers.
+
+`write_bundle` compiles the normalised catalogue into one versioned binary file
+so that reports, tooling and the app's data exports can answer catalogue
+queries without re-parsing the CSVs or querying Supabase. Each section is a
+little-endian fixed-width array aligned to 64 bytes; a JSON table of contents
+after the header records each section's offset, dtype and shape:
+
+- colours, one per distinct hex, sorted by hex: `hex` (uint32), `lab` (float32
+  CIELAB), `category` and `display_order` (as `hex_categorization.categorize`
+  computes them for `refresh_hex_categorization()`), and `variants`, a CSR
+  offset into the variant rows (the first variant of a colour is its primary)
+- variant rows grouped by colour in ingest order: the colour index plus a
+  string id per `VariantRecord` field
+- one string table, sorted by UTF-8 bytes so a string's id can be found by
+  binary search
+- lookup indexes by brand, category and shade code, each holding
+  string-id keys, CSR starts and variant rows. The rows are in browse
+  order: `display_order`, then hex, then ingest order, which mirrors
+  the app's `color_catalog_entries` query.
+
+`CatalogBundle` mmaps the file and wraps each section with `np.frombuffer`.
+Opening a bundle parses only the table of contents, so queries can run as
+soon as it is open. `display_order` ranks the bundle's own colours, so the
+numbers can differ from a database that also holds non-catalogue colours.
+The order is the same.
+
+Built by `sync_color_catalog.py --bundle catalog.bundle` or by running this file:
+
+    python scripts/catalog_bundle.py --build catalog.bundle [sync catalogue options]
+    python scripts/catalog_bundle.py --open catalog.bundle --brand OPI --category reds
+    python scripts/catalog_bundle.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import mmap
+import operator
+import struct
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit("numpy is required for catalogue bundles. Install with `pip install numpy`.") from exc
+
+from catalog_model import VariantRecord
+from color_science import hex_to_lab
+from hex_categorization import categorize
+
+MAGIC = b"NAILCATB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, format version, table-of-contents length
+ALIGNMENT = 64
+NULL_STRING = 0xFFFFFFFF
+
+VARIANT_FIELDS = (
+    "brand",
+    "product_line",
+    "shade_name",
+    "shade_code",
+    "collection",
+    "finish",
+    "product_url",
+    "swatch_url",
+    "source_catalog",
+)
+INDEXES = ("brand", "category", "shade_code")
+
+
+def _columns(records: Iterable[VariantRecord]) -> Dict[str, List[Optional[str]]]:
+    names = ("hex_code", *VARIANT_FIELDS)
+    column = getattr(records, "column", None)
+    if column is not None:
+        # VariantStore: decode whole columns instead of materialising row views
+        return {name: column(name) for name in names}
+    rows = list(map(operator.attrgetter(*names), records))
+    return {name: list(values) for name, values in zip(names, zip(*rows))} if rows else {name: [] for name in names}
+
+
+def _csr_index(keys: np.ndarray, browse: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(keys, starts, rows): rows grouped by key, in browse order within each key."""
+    ordered = keys[browse]
+    present = ordered != NULL_STRING
+    rows = browse[present]
+    ordered = ordered[present]
+    order = np.argsort(ordered, kind="stable")
+    unique, starts = np.unique(ordered[order], return_index=True)
+    return (
+        unique.astype("<u4"),
+        np.append(starts, len(order)).astype("<u4"),
+        rows[order].astype("<u4"),
+    )
+
+
+def compile_sections(records: Iterable[VariantRecord]) -> Tuple[Dict[str, np.ndarray], Dict[str, int]]:
+    """All bundle sections for `records` (already deduplicated), plus summary counts."""
+    columns = _columns(records)
+    packed = np.fromiter((int(hex_code[1:], 16) for hex_code in columns["hex_code"]), dtype=np.uint32)
+    hexes, color_of = np.unique(packed, return_inverse=True)
+    hex_codes = [f"#{value:06X}" for value in hexes.tolist()]
+    categorised = categorize(hex_codes)
+    categories = categorised.category.astype(str)
+
+    # Sorted string table: ids compare like the strings' UTF-8 bytes
+    strings = sorted(
+        {value for name in VARIANT_FIELDS for value in columns[name] if value is not None} | set(categories),
+        key=lambda value: value.encode("utf-8"),
+    )
+    string_ids = {value: index for index, value in enumerate(strings)}
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+
+    # Variants grouped by colour, ingest order kept inside each colour
+    order = np.argsort(color_of, kind="stable")
+    variant_color = color_of[order]
+    sections: Dict[str, np.ndarray] = {
+        "strings.offsets": offsets,
+        "strings.data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "colors.hex": hexes.astype("<u4"),
+        "colors.lab": hex_to_lab(hex_codes).astype("<f4"),
+        "colors.category": np.array([string_ids[value] for value in categories], dtype="<u4"),
+        "colors.display_order": categorised.display_order.astype("<u4"),
+        "colors.variants": np.searchsorted(variant_color, np.arange(len(hexes) + 1)).astype("<u4"),
+        "variants.color": variant_color.astype("<u4"),
+    }
+    for name in VARIANT_FIELDS:
+        ids = np.array([NULL_STRING if value is None else string_ids[value] for value in columns[name]], dtype="<u4")
+        sections[f"variants.{name}"] = ids[order]
+
+    display_order = sections["colors.display_order"][variant_color]
+    browse = np.lexsort((np.arange(len(order)), variant_color, display_order)).astype("<u4")
+    sections["index.browse"] = browse
+    keys = {
+        "brand": sections["variants.brand"],
+        "category": sections["colors.category"][variant_color],
+        "shade_code": sections["variants.shade_code"],
+    }
+    for name in INDEXES:
+        sections[f"index.{name}.keys"], sections[f"index.{name}.starts"], sections[f"index.{name}.rows"] = _csr_index(
+            keys[name], browse
+        )
+    counts = {"colors": len(hexes), "variants": len(order), "strings": len(strings)}
+    return sections, counts
+
+
+def write_bundle(records: Iterable[VariantRecord], path: Path, sources: Sequence[str] = ()) -> Dict[str, int]:
+    """Compile `records` into a bundle at `path` (written atomically); returns the counts."""
+    sections, counts = compile_sections(records)
+    toc: Dict[str, object] = {
+        "format_version": FORMAT_VERSION,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "sources": list(sources),
+        **counts,
+    }
+    # Offsets depend on the TOC's own length: lay out again until they stop moving
+    layout: Dict[str, Dict] = {}
+    while True:
+        toc["sections"] = layout
+        position = _align(HEADER.size + len(json.dumps(toc).encode("utf-8")))
+        placed: Dict[str, Dict] = {}
+        for name, array in sections.items():
+            placed[name] = {"offset": position, "dtype": array.dtype.str, "shape": list(array.shape)}
+            position = _align(position + array.nbytes)
+        if placed == layout:
+            break
+        layout = placed
+    toc_bytes = json.dumps(toc).encode("utf-8")
+
+    path = Path(path)
+    partial = path.with_name(path.name + ".partial")
+    with partial.open("wb") as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(toc_bytes)))
+        handle.write(toc_bytes)
+        for name, array in sections.items():
+            handle.write(b"\0" * (layout[name]["offset"] - handle.tell()))
+            handle.write(np.ascontiguousarray(array).tobytes())
+    partial.replace(path)
+    logging.info(
+        "Wrote catalogue bundle %s: %d colours, %d variants, %d strings",
+        path,
+        counts["colors"],
+        counts["variants"],
+        counts["strings"],
+    )
+    return counts
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+class CatalogBundle:
+    """Read-only view of a bundle file; arrays are views into the mapping, not copies."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, toc_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path} is not a catalogue bundle")
+        if version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"{self.path} is bundle format {version}; this reader understands {FORMAT_VERSION}")
+        self.metadata = json.loads(self._map[HEADER.size : HEADER.size + toc_length])
+        self.sections: Dict[str, np.ndarray] = {
+            name: np.frombuffer(
+                self._map, dtype=spec["dtype"], count=int(np.prod(spec["shape"])), offset=spec["offset"]
+            ).reshape(spec["shape"])
+            for name, spec in self.metadata["sections"].items()
+        }
+        self._string_offsets = self.sections["strings.offsets"]
+        self._string_base = self.metadata["sections"]["strings.data"]["offset"]
+
+    def close(self) -> None:
+        self.sections.clear()
+        self._string_offsets = None
+        try:
+            self._map.close()
+        except BufferError:
+            # A caller still holds rows sliced from an index; the mapping is released with them
+            pass
+
+    def __enter__(self) -> "CatalogBundle":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return int(self.metadata["variants"])
+
+    def _raw_string(self, string_id: int) -> bytes:
+        start, end = self._string_offsets[string_id : string_id + 2]
+        return self._map[self._string_base + int(start) : self._string_base + int(end)]
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NULL_STRING:
+            return None
+        return self._raw_string(int(string_id)).decode("utf-8")
+
+    def find_string(self, value: str) -> Optional[int]:
+        """String id of `value`, by binary search over the sorted table."""
+        target = value.encode("utf-8")
+        low, high = 0, len(self._string_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw_string(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._string_offsets) - 1 and self._raw_string(low) == target:
+            return low
+        return None
+
+    def lookup(self, index: str, value: str) -> np.ndarray:
+        """Variant rows whose `index` key (brand, category, shade_code) equals `value`, in browse order."""
+        keys = self.sections[f"index.{index}.keys"]
+        string_id = self.find_string(value)
+        if string_id is not None:
+            # A matching scalar type keeps searchsorted from casting the whole array
+            slot = int(np.searchsorted(keys, keys.dtype.type(string_id)))
+            if slot < len(keys) and keys[slot] == string_id:
+                starts = self.sections[f"index.{index}.starts"]
+                return self.sections[f"index.{index}.rows"][starts[slot] : starts[slot + 1]]
+        return np.empty(0, dtype="<u4")
+
+    def by_brand(self, brand: str) -> np.ndarray:
+        return self.lookup("brand", brand)
+
+    def by_category(self, category: str) -> np.ndarray:
+        return self.lookup("category", category)
+
+    def by_shade_code(self, shade_code: str) -> np.ndarray:
+        return self.lookup("shade_code", shade_code)
+
+    def browse(
+        self, brand: Optional[str] = None, category: Optional[str] = None, offset: int = 0, limit: int = 24
+    ) -> np.ndarray:
+        """One page of variant rows in browse order, optionally filtered by brand and category."""
+        if category is not None:
+            rows = self.by_category(category)
+            if brand is not None:
+                brand_id = self.find_string(brand)
+                rows = rows[self.sections["variants.brand"][rows] == brand_id]
+        elif brand is not None:
+            rows = self.by_brand(brand)
+        else:
+            rows = self.sections["index.browse"]
+        return rows[offset : offset + limit]
+
+    def color_index(self, hex_code: str) -> Optional[int]:
+        hexes = self.sections["colors.hex"]
+        try:
+            packed = int(hex_code.strip().lstrip("#"), 16)
+        except ValueError:
+            return None
+        if not 0 <= packed <= 0xFFFFFF:
+            return None
+        slot = int(np.searchsorted(hexes, hexes.dtype.type(packed)))
+        return slot if slot < len(hexes) and hexes[slot] == packed else None
+
+    def variants_for_hex(self, hex_code: str) -> np.ndarray:
+        """Variant rows of one colour; the first is its primary variant."""
+        color = self.color_index(hex_code)
+        if color is None:
+            return np.empty(0, dtype=np.int64)
+        starts = self.sections["colors.variants"]
+        return np.arange(starts[color], starts[color + 1])
+
+    def entry(self, row: int) -> Dict[str, object]:
+        """One variant shaped like a `color_catalog_entries` row."""
+        color = int(self.sections["variants.color"][row])
+        entry: Dict[str, object] = {
+            "hex_code": f"#{int(self.sections['colors.hex'][color]):06X}",
+            "category": self.string(self.sections["colors.category"][color]),
+            "display_order": int(self.sections["colors.display_order"][color]),
+            "lab": tuple(float(value) for value in self.sections["colors.lab"][color]),
+        }
+        for name in VARIANT_FIELDS:
+            entry[name] = self.string(self.sections[f"variants.{name}"][row])
+        return entry
+
+    def entries(self, rows: Iterable[int]) -> List[Dict[str, object]]:
+        return [self.entry(int(row)) for row in rows]
+
+
+def format_entry(entry: Dict[str, object]) -> str:
+    code = f" [{entry['shade_code']}]" if entry["shade_code"] else ""
+    return (
+        f"  {entry['display_order']:>6}  {entry['hex_code']}  {entry['category']:<10} "
+        f"{entry['brand']} / {entry['product_line']} / {entry['shade_name']}{code} ({entry['finish']})"
+    )
+
+
+def benchmark(rows: int) -> None:
+    from catalog_columnar import write_synthetic_csv
+    from catalog_model import CATALOG_SOURCES, load_rows
+    from variant_store import VariantStore
+
+    repo_root = Path(__file__).resolve().parents[1]
+    source = CATALOG_SOURCES["opi"]
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "synthetic.csv"
+        bundle_path = Path(tmp) / "catalog.bundle"
+        write_synthetic_csv(csv_path, (repo_root / ".." / source.default_csv).resolve(), rows)
+
+        # Baseline: what a reader does today before it can answer anything
+        start = time.perf_counter()
+        store = VariantStore.from_records(load_rows(csv_path, source)).deduplicate()
+        result = categorize(sorted(set(store.column("hex_code"))))
+        categories = dict(zip(result.hex_codes, result.category))
+        hexes = store.column("hex_code")
+        reds = [index for index, hex_code in enumerate(hexes) if categories[hex_code] == "reds"]
+        rebuild_seconds = time.perf_counter() - start
+        shade_codes = store.column("shade_code")
+        expected = sorted((hexes[index], shade_codes[index]) for index in reds)
+
+        start = time.perf_counter()
+        write_bundle(store, bundle_path, [csv_path.name])
+        build_seconds = time.perf_counter() - start
+        size = bundle_path.stat().st_size
+        del store
+
+        start = time.perf_counter()
+        with CatalogBundle(bundle_path) as bundle:
+            first = bundle.by_category("reds")
+            open_seconds = time.perf_counter() - start
+            same = sorted((entry["hex_code"], entry["shade_code"]) for entry in bundle.entries(first)) == expected
+            probes = [bundle.entry(int(row))["shade_code"] for row in first[:: max(1, len(first) // 1000)]]
+            start = time.perf_counter()
+            for code in probes:
+                bundle.by_shade_code(code)
+            lookup_us = (time.perf_counter() - start) / len(probes) * 1e6
+            start = time.perf_counter()
+            for page in range(100):
+                bundle.entries(bundle.browse(brand="OPI", category="reds", offset=page * 24))
+            page_us = (time.perf_counter() - start) / 100 * 1e6
+
+    print(f"rows: {rows:,}  bundle {size / 2**20:.1f} MiB, built in {build_seconds:.2f}s")
+    print(f"  rebuild from CSV + categorise, then filter a category: {rebuild_seconds:8.2f}s")
+    print(f"  open bundle + first category lookup:                  {open_seconds * 1000:8.2f} ms")
+    print(f"  shade-code lookup:                                    {lookup_us:8.1f} µs")
+    print(f"  24-row browse page (brand + category), decoded:       {page_us:8.1f} µs")
+    print(f"  category rows match the rebuild: {same}")
+
+
+def catalogue_sources(args: argparse.Namespace) -> List[str]:
+    from catalog_model import CATALOG_SOURCES
+
+    return [str(getattr(args, name)) for name in CATALOG_SOURCES if getattr(args, name)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build, query or benchmark a compiled catalogue bundle")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--build", type=Path, metavar="BUNDLE", help="Compile the catalogue (sync options apply)")
+    action.add_argument("--open", type=Path, metavar="BUNDLE", help="Query an existing bundle")
+    action.add_argument("--bench", type=int, metavar="ROWS", help="Compare bundle queries with a CSV rebuild")
+    parser.add_argument("--brand")
+    parser.add_argument("--category")
+    parser.add_argument("--shade-code")
+    parser.add_argument("--hex")
+    parser.add_argument("--limit", type=int, default=24)
+    args, rest = parser.parse_known_args(argv)
+
+    if args.bench:
+        benchmark(args.bench)
+        return 0
+    if args.build:
+        from sync_color_catalog import catalogue_records, ensure_catalog_paths, parse_args
+
+        sync_args = parse_args(rest)
+        logging.basicConfig(level=getattr(logging, sync_args.log_level.upper()), format="[%(levelname)s] %(message)s")
+        ensure_catalog_paths(sync_args)
+        sync_args.bundle = None
+        records = catalogue_records(sync_args)
+        write_bundle(records, args.build, catalogue_sources(sync_args))
+        return 0
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    start = time.perf_counter()
+    with CatalogBundle(args.open) as bundle:
+        if args.hex:
+            rows = bundle.variants_for_hex(args.hex)[: args.limit]
+        elif args.shade_code:
+            rows = bundle.by_shade_code(args.shade_code)[: args.limit]
+        else:
+            rows = bundle.browse(brand=args.brand, category=args.category, limit=args.limit)
+        entries = bundle.entries(rows)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"{bundle.path}: {bundle.metadata['colors']} colours, {bundle.metadata['variants']} variants, "
+            f"built {bundle.metadata['built_at']} (open + query {elapsed:.2f} ms)"
+        )
+    for entry in entries:
+        print(format_entry(entry))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Columnar (pandas) ingest path for `sync_color_catalog.py`.
+
+Normalises whole CSV columns at once instead of row by row. Finish, product
+line and collection values are low-cardinality, so each is resolved once per
+distinct value through lookup tables built from `FINISH_SYNONYMS`,
+`CATEGORY_TO_FINISH` and `PRODUCT_LINE_NORMALISERS` (via the row normalisers,
+so both paths share one definition) and then mapped across the column. Hex
+codes go through a vectorised regex with a per-row fallback for the rare
+values the regex rejects, keeping the output identical to `load_rows`.
+
+`extend_store` then fills a `VariantStore` from the frame's columns without a
+`VariantRecord` per row: categoricals go in as their factorized codes and
+Arrow-backed text columns as their UTF-8 buffers, with URL prefixes split off
+over the raw bytes. On this machine the frame is ~10x quicker than the row
+path but filling the store costs as much again, so end to end (CSV ->
+VariantStore) is ~4x, not 10x.
+
+Used by `sync_color_catalog.py --columnar`. Run this file directly to compare
+both paths on a synthetic catalogue:
+
+    python scripts/catalog_columnar.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import random
+import tempfile
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import pandas as pd
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit("pandas is required for --columnar. Install with `pip install pandas`.") from exc
+
+try:
+    # Enables pandas' multithreaded CSV engine and Arrow-backed string columns,
+    # which go into the VariantStore without a Python object per value
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - optional accelerator
+    pa = pc = None
+    CSV_ENGINE = "c"
+else:
+    CSV_ENGINE = "pyarrow"
+
+import numpy as np
+
+from catalog_model import (
+    ARROW_SUFFIXES,
+    CATALOG_SOURCES,
+    HEX_PREFIX,
+    CatalogSource,
+    VariantRecord,
+    clean_collection,
+    load_rows,
+    normalise_finish,
+    normalise_hex,
+    normalise_product_line,
+)
+from variant_store import CATEGORICAL_FIELDS, TEXT_FIELDS, URL_FIELDS, TextBuffer, VariantStore
+
+RECORD_FIELDS = [field.name for field in fields(VariantRecord)]
+
+HEX_PATTERN = r"#[0-9A-F]{6}"
+# ASCII byte -> hex digit value, for packing whole hex columns at once
+HEX_DIGIT_VALUES = np.zeros(256, dtype=np.uint8)
+HEX_DIGIT_VALUES[np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)] = np.arange(16)
+HEX_NIBBLE_SHIFTS = np.arange(20, -1, -4, dtype=np.uint32)
+
+
+def finish_lookup(source: CatalogSource, raw_values: List[str]) -> Dict[str, str]:
+    table: Dict[str, str] = {}
+    for raw in raw_values:
+        value = raw
+        if source.finish_aliases is not None:
+            value = source.finish_aliases.get(raw.strip().lower(), raw)
+        table[raw] = normalise_finish(value)
+    return table
+
+
+def product_line_lookup(source: CatalogSource, raw_values: List[str]) -> Dict[str, str]:
+    return {raw: normalise_product_line(raw, source.brand) for raw in raw_values}
+
+
+def collection_lookup(raw_values: List[str]) -> Dict[str, Optional[str]]:
+    return {raw: clean_collection(raw) for raw in raw_values}
+
+
+def _column(frame: pd.DataFrame, name: str) -> pd.Series:
+    if name in frame.columns:
+        column = frame[name]
+        return column.fillna("") if column.hasnans else column
+    return pd.Series("", index=frame.index, dtype="string")
+
+
+def _map_distinct(series: pd.Series, build_table: Callable[[List[str]], Dict]) -> pd.Series:
+    # Resolve each distinct value once, then broadcast through the factorized codes
+    codes, uniques = pd.factorize(series)
+    table = build_table(list(uniques))
+    resolved = pd.array([table[value] for value in uniques], dtype="string")
+    return pd.Series(resolved.take(codes), index=series.index)
+
+
+def normalise_hex_column(raw: pd.Series) -> pd.Series:
+    candidate = raw.str.strip().str.upper()
+    prefixed = candidate.str.startswith(HEX_PREFIX) | (candidate == "")
+    if not prefixed.all():
+        candidate = candidate.where(prefixed, HEX_PREFIX + candidate)
+    valid = candidate.str.fullmatch(HEX_PATTERN).fillna(False).astype(bool)
+    result = candidate.where(valid)
+    # int(..., 16) also accepts signs and underscores; defer those odd cases to the row normaliser
+    odd = ~valid & (candidate.str.len() == 7)
+    if odd.any():
+        result = result.astype(object)
+        result[odd] = raw[odd].map(normalise_hex)
+    return result
+
+
+def normalise_frame(raw: pd.DataFrame, source: CatalogSource) -> pd.DataFrame:
+    """Return one column per VariantRecord field; missing optionals are NA."""
+    hex_code = normalise_hex_column(_column(raw, source.hex_column))
+    keep = hex_code.notna()
+    dropped = int((~keep).sum())
+    if dropped:
+        logging.debug("Skipping %d %s rows with invalid hex", dropped, source.brand)
+    raw = raw[keep]
+    hex_code = hex_code[keep]
+
+    # First non-empty finish column wins; "" and missing both resolve to DEFAULT_FINISH
+    finish_raw = pd.Series("", index=raw.index, dtype="string")
+    for column in reversed(source.finish_columns):
+        values = _column(raw, column)
+        finish_raw = values.where(values != "", finish_raw)
+    finish = _map_distinct(finish_raw, lambda values: finish_lookup(source, values))
+    product_line = _map_distinct(
+        _column(raw, source.product_line_column), lambda values: product_line_lookup(source, values)
+    )
+    collection = _map_distinct(_column(raw, source.collection_column), collection_lookup)
+
+    brand = _map_distinct(
+        _column(raw, source.brand_column),
+        lambda values: {value: (value or source.brand).strip() or source.brand for value in values},
+    )
+
+    shade_name = _column(raw, source.shade_name_column)
+    shade_name = shade_name.where(shade_name != "", "Unnamed").str.strip()
+
+    def optional(column: str) -> pd.Series:
+        values = _column(raw, column).str.strip()
+        return values.where(values != "")
+
+    return pd.DataFrame(
+        {
+            "hex_code": hex_code,
+            "brand": brand,
+            "product_line": product_line,
+            "shade_name": shade_name,
+            "shade_code": optional(source.shade_code_column),
+            "collection": collection,
+            "finish": finish,
+            "product_url": optional(source.product_url_column),
+            "swatch_url": optional(source.swatch_url_column),
+            "source_catalog": source.source_catalog,
+        },
+        columns=RECORD_FIELDS,
+    )
+
+
+def read_raw_frame(path: Path) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8", engine=CSV_ENGINE)
+
+
+def load_frame(path: Path, source: CatalogSource) -> pd.DataFrame:
+    return normalise_frame(read_raw_frame(path), source)
+
+
+def iter_records(frame: pd.DataFrame) -> Iterator[VariantRecord]:
+    # Column-wise conversion with NA -> None is far cheaper than astype(object) + itertuples
+    columns = [frame[name].to_numpy(dtype=object, na_value=None).tolist() for name in RECORD_FIELDS]
+    for values in zip(*columns):
+        yield VariantRecord(*values)
+
+
+def packed_hexes(hex_codes: pd.Series) -> np.ndarray:
+    """'#RRGGBB' codes (as normalise_frame emits them) -> uint32, without parsing each one."""
+    digits = np.frombuffer("".join(hex_codes.tolist()).encode("ascii"), dtype=np.uint8).reshape(-1, 7)[:, 1:]
+    nibbles = HEX_DIGIT_VALUES[digits].astype(np.uint32)
+    return np.bitwise_or.reduce(nibbles << HEX_NIBBLE_SHIFTS, axis=1).astype(np.uint32)
+
+
+def _factorized(series: pd.Series) -> Tuple[List[Optional[str]], np.ndarray]:
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return [None if pd.isna(value) else value for value in uniques], codes.astype(np.uint32)
+
+
+def _string_buffers(values: "pa.LargeStringArray") -> Tuple[np.ndarray, np.ndarray]:
+    """(UTF-8 bytes, int64 offsets rebased to 0) of an Arrow string column."""
+    offsets = np.frombuffer(values.buffers()[1], dtype=np.int64)[values.offset : values.offset + len(values) + 1]
+    data = values.buffers()[2]
+    data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+    return data[offsets[0] : offsets[-1]], offsets - offsets[0]
+
+
+def _text_buffer(values: "pa.LargeStringArray") -> TextBuffer:
+    """An Arrow string column is already UTF-8 bytes plus offsets; hand those over as they are."""
+    data, offsets = _string_buffers(values)
+    return TextBuffer(data=data.tobytes(), ends=offsets[1:].astype(np.uint64), missing=_missing(values))
+
+
+def _url_buffer(values: "pa.LargeStringArray") -> TextBuffer:
+    """Split each URL as `_Text.append` does: the prefix runs to the last "/" before the final character."""
+    data, offsets = _string_buffers(values)
+    starts, ends = offsets[:-1], offsets[1:]
+    # "/" is one byte and never part of a multi-byte UTF-8 sequence, so search the raw bytes
+    slashes = np.flatnonzero(data == ord("/"))
+    last = np.searchsorted(slashes, ends - 1) - 1
+    slash = slashes[np.maximum(last, 0)] if len(slashes) else np.zeros(len(ends), dtype=np.int64)
+    cuts = np.where((last >= 0) & (slash >= starts), slash + 1, starts)
+    # Each row's bytes are [prefix | rest]; mark the prefix bytes and split the buffer on the mask
+    prefix_lengths = cuts - starts
+    lengths = np.column_stack((prefix_lengths, ends - cuts)).ravel()
+    in_prefix = np.repeat(np.tile(np.array([True, False]), len(ends)), lengths)
+    prefix_offsets = np.concatenate(([0], np.cumsum(prefix_lengths)))
+    prefixes = pa.LargeStringArray.from_buffers(
+        len(values), pa.py_buffer(prefix_offsets), pa.py_buffer(data[in_prefix].tobytes())
+    )
+    encoded = pc.dictionary_encode(prefixes)
+    return TextBuffer(
+        data=data[~in_prefix].tobytes(),
+        ends=(ends - prefix_offsets[1:]).astype(np.uint64),
+        missing=_missing(values),
+        prefixes=(encoded.dictionary.to_pylist(), encoded.indices.to_numpy().astype(np.uint32)),
+    )
+
+
+def _missing(values: "pa.Array") -> bytes:
+    return values.is_null().to_numpy(zero_copy_only=False).astype(np.uint8).tobytes()
+
+
+def _text_column(series: pd.Series, url: bool):
+    if pa is None or not isinstance(series.array, pd.arrays.ArrowStringArray):
+        return series.to_numpy(dtype=object, na_value=None).tolist()
+    values = pa.array(series.array)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    values = values.cast(pa.large_string())
+    return _url_buffer(values) if url else _text_buffer(values)
+
+
+def extend_store(store: VariantStore, frame: pd.DataFrame) -> None:
+    """Append a normalised frame to `store` column by column (no VariantRecord per row)."""
+    store.extend_columns(
+        packed_hexes(frame["hex_code"]),
+        {name: _factorized(frame[name]) for name in CATEGORICAL_FIELDS},
+        {name: _text_column(frame[name], name in URL_FIELDS) for name in TEXT_FIELDS},
+    )
+
+
+def load_store_columnar(args: argparse.Namespace) -> VariantStore:
+    """Every catalogue of `args` in one VariantStore, filled straight from the normalised frames."""
+    store = VariantStore()
+    for name, source in CATALOG_SOURCES.items():
+        path: Optional[Path] = getattr(args, name)
+        if not path:
+            continue
+        if path.suffix in ARROW_SUFFIXES:
+            # Already typed and trimmed; the Arrow loader normalises per dictionary value
+            from catalog_arrow import load_arrow_rows
+
+            store.extend(load_arrow_rows(path, source))
+            continue
+        extend_store(store, load_frame(path, source))
+    logging.info("Loaded %d raw variant rows (columnar)", len(store))
+    return store
+
+
+def write_synthetic_csv(path: Path, template: Path, rows: int, seed: int = 7) -> None:
+    """Scale a real scraper CSV to `rows` lines with fresh hexes and shade codes."""
+    base = pd.read_csv(template, dtype=str, keep_default_na=False)
+    rng = random.Random(seed)
+    picks = [rng.randrange(len(base)) for _ in range(rows)]
+    frame = base.iloc[picks].reset_index(drop=True)
+    frame["ApproxHex"] = [f"#{rng.randrange(1 << 24):06X}" for _ in range(rows)]
+    if "ShadeCode" in frame.columns:
+        frame["ShadeCode"] = frame["ShadeCode"] + "-" + pd.Series(range(rows)).astype(str)
+    frame.to_csv(path, index=False)
+
+
+def benchmark(rows: int, source_name: str, template: Path) -> None:
+    source = CATALOG_SOURCES[source_name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"synthetic_{source_name}.csv"
+        write_synthetic_csv(path, template, rows)
+
+        # Retaining a million records triggers repeated full collections that would
+        # dominate both timings; pause the collector so the phases are comparable.
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            row_store = VariantStore.from_records(load_rows(path, source))
+            row_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            raw = read_raw_frame(path)
+            read_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            frame = normalise_frame(raw, source)
+            normalise_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            columnar_store = VariantStore()
+            extend_store(columnar_store, frame)
+            store_seconds = time.perf_counter() - start
+        finally:
+            gc.enable()
+
+    identical = all(row_store.column(name) == columnar_store.column(name) for name in RECORD_FIELDS)
+    frame_seconds = read_seconds + normalise_seconds
+    total_seconds = frame_seconds + store_seconds
+    print(f"rows: {rows:,} ({source_name}, csv engine: {CSV_ENGINE})")
+    print(f"row path (csv.DictReader + normalisers -> VariantStore): {row_seconds:8.2f}s")
+    print(f"  columnar read_csv:                     {read_seconds:8.2f}s")
+    print(f"  columnar normalise:                    {normalise_seconds:8.2f}s")
+    print(f"  columnar -> VariantStore:              {store_seconds:8.2f}s")
+    print(f"columnar frame (read + normalise):       {frame_seconds:8.2f}s  ({row_seconds / frame_seconds:5.1f}x)")
+    print(f"columnar end to end (-> VariantStore):   {total_seconds:8.2f}s  ({row_seconds / total_seconds:5.1f}x)")
+    print(f"identical rows: {identical}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the columnar catalogue ingest path")
+    repo_root = Path(__file__).resolve().parents[1]
+    parser.add_argument("--bench", type=int, default=1_000_000, help="Synthetic rows to generate")
+    parser.add_argument("--source", default="opi", choices=list(CATALOG_SOURCES))
+    parser.add_argument("--template", type=Path, help="Scraper CSV to scale up (defaults to the source's CSV)")
+    args = parser.parse_args(argv)
+    template = args.template or (repo_root / ".." / CATALOG_SOURCES[args.source].default_csv)
+    benchmark(args.bench, args.source, template.resolve())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
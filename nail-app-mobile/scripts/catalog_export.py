@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""Static, sharded catalogue export for CDN delivery to the mobile app.
+
+The app pages colours out of `color_catalog_entries` on every browse. That data
+changes at most once per sync, so after a sync this module reads the active
+entries once, in the app's order (`display_order`, then `variant_created_at`),
+and writes them as static files:
+
+    <out>/manifest.json
+    <out>/shards/all/0000.<hash>.json.gz
+    <out>/shards/category/<category>/0000.<hash>.json.gz
+    <out>/shards/brand/<brand>/0000.<hash>.json.gz
+
+Each shard holds up to `--page-size` entries as
+`{"fields": [...], "rows": [[...], ...]}`, so field names appear once per
+shard and not once per row. Shards are gzipped deterministically (mtime 0).
+Each file name carries the first 16 hex digits of the SHA-256 of the
+uncompressed JSON. An unchanged shard therefore keeps its URL across syncs
+and can be cached as immutable; only `manifest.json` needs a short TTL.
+
+The manifest is written last, and atomically. It lists each shard's path,
+hash, row count and size for every index. Shards referenced by the previous
+manifest are kept for one more generation, so a client holding the old
+manifest never sees a 404. Anything older is removed.
+
+`cloudflare/catalog-worker.js` serves the directory from an R2 bucket with
+those cache headers.
+
+Run after a sync with `sync_color_catalog.py --export-dir DIR`, or on its own:
+
+    DATABASE_URL=... python scripts/catalog_export.py --out dist/catalog
+    SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=... python scripts/catalog_export.py --out dist/catalog
+    python scripts/catalog_export.py --bench 100000
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from run_metrics import record_cache, timed
+
+MANIFEST_VERSION = 1
+DEFAULT_PAGE_SIZE = 500
+HASH_CHARS = 16
+
+# The columns fetchColorCatalog() selects, plus display_order for client-side merging
+EXPORT_FIELDS = (
+    "color_id",
+    "color_variant_id",
+    "hex_code",
+    "color_name",
+    "shade_name",
+    "brand",
+    "fallback_brand",
+    "product_line",
+    "shade_code",
+    "collection",
+    "resolved_finish",
+    "base_finish",
+    "swatch_url",
+    "product_url",
+    "source_catalog",
+    "category",
+    "canonical_category",
+    "is_trending",
+    "display_order",
+)
+
+ENTRIES_SQL = f"""
+SELECT {", ".join(EXPORT_FIELDS)}
+FROM color_catalog_entries
+WHERE is_active
+ORDER BY display_order ASC NULLS LAST, variant_created_at ASC, color_variant_id
+"""
+
+
+@timed
+def fetch_entries_postgres(dsn: str) -> List[Dict[str, object]]:
+    import psycopg
+
+    with psycopg.connect(dsn) as conn, conn.cursor() as cur:
+        cur.execute(ENTRIES_SQL)
+        return [
+            {field: str(value) if isinstance(value, uuid.UUID) else value for field, value in zip(EXPORT_FIELDS, row)}
+            for row in cur.fetchall()
+        ]
+
+
+@timed
+def fetch_entries_rest(client, page_size: int = 1000) -> List[Dict[str, object]]:
+    entries: List[Dict[str, object]] = []
+    start = 0
+    while True:
+        response = (
+            client.table("color_catalog_entries")
+            .select(", ".join(EXPORT_FIELDS))
+            .eq("is_active", True)
+            .order("display_order", nullsfirst=False)
+            .order("variant_created_at")
+            .order("color_variant_id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        entries.extend(response.data)
+        if len(response.data) < page_size:
+            return entries
+        start += page_size
+
+
+def slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", value.casefold()).strip("-") or "unnamed"
+
+
+def encode_shard(entries: Sequence[Mapping[str, object]]) -> bytes:
+    payload = {"fields": EXPORT_FIELDS, "rows": [[entry.get(field) for field in EXPORT_FIELDS] for entry in entries]}
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _write_shards(
+    out_dir: Path, prefix: str, entries: Sequence[Mapping[str, object]], page_size: int
+) -> Dict[str, object]:
+    shards = []
+    for page, start in enumerate(range(0, len(entries), page_size)):
+        body = encode_shard(entries[start : start + page_size])
+        digest = hashlib.sha256(body).hexdigest()
+        relative = f"shards/{prefix}/{page:04d}.{digest[:HASH_CHARS]}.json.gz"
+        path = out_dir / relative
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(path.name + ".partial")
+            partial.write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+            partial.replace(path)
+        shards.append(
+            {
+                "path": relative,
+                "sha256": digest,
+                "rows": min(page_size, len(entries) - start),
+                "bytes": path.stat().st_size,
+            }
+        )
+    return {"count": len(entries), "shards": shards}
+
+
+def _group(entries: Iterable[Mapping[str, object]], field: str) -> Dict[str, List[Mapping[str, object]]]:
+    groups: Dict[str, List[Mapping[str, object]]] = {}
+    for entry in entries:
+        # Same fallback as the app's mapEntry for brand
+        value = entry.get(field) or (entry.get("fallback_brand") if field == "brand" else None)
+        if value:
+            groups.setdefault(str(value), []).append(entry)
+    return dict(sorted(groups.items()))
+
+
+def _manifest_paths(manifest: Mapping) -> Iterator[str]:
+    yield from (shard["path"] for shard in manifest.get("all", {}).get("shards", ()))
+    for name in ("category", "brand"):
+        for index in manifest.get(name, {}).values():
+            yield from (shard["path"] for shard in index["shards"])
+
+
+@timed
+def export_catalog(
+    entries: Sequence[Mapping[str, object]], out_dir: Path, page_size: int = DEFAULT_PAGE_SIZE
+) -> Dict[str, object]:
+    """Write shards and the manifest for `entries` (already in display order); returns the manifest."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / "manifest.json"
+    previous = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+
+    manifest: Dict[str, object] = {
+        "version": MANIFEST_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "entries": len(entries),
+        "page_size": page_size,
+        "fields": EXPORT_FIELDS,
+        "all": _write_shards(out_dir, "all", entries, page_size),
+    }
+    for field, name in (("category", "category"), ("brand", "brand")):
+        manifest[name] = {
+            value: _write_shards(out_dir, f"{name}/{slug(value)}", group, page_size)
+            for value, group in _group(entries, field).items()
+        }
+
+    partial = manifest_path.with_name("manifest.json.partial")
+    partial.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding="utf-8")
+    partial.replace(manifest_path)
+
+    keep = set(_manifest_paths(manifest)) | set(_manifest_paths(previous))
+    removed = 0
+    for path in (out_dir / "shards").rglob("*.json.gz"):
+        if path.relative_to(out_dir).as_posix() not in keep:
+            path.unlink()
+            removed += 1
+    written = set(_manifest_paths(manifest)) - set(_manifest_paths(previous))
+    record_cache("export_shards", hits=len(set(_manifest_paths(manifest))) - len(written), misses=len(written))
+    logging.info(
+        "Exported %d catalogue entries to %s: %d shards (%d new, %d stale removed)",
+        len(entries),
+        out_dir,
+        len(set(_manifest_paths(manifest))),
+        len(written),
+        removed,
+    )
+    return manifest
+
+
+def synthetic_entries(count: int, seed: int = 7) -> List[Dict[str, object]]:
+    """Entries shaped like `color_catalog_entries` rows, already in display order."""
+    rng = random.Random(seed)
+    brands = {"OPI": ["Nail Lacquer", "Infinite Shine", "GelColor"], "CND": ["Shellac", "Vinylux"],
+              "The GelBottle Inc.": ["GelColor", "BIAB"]}
+    categories = ["reds", "pinks", "nudes", "blues", "greens", "purples", "darks", "pastels", "french", "metallics"]
+    finishes = ["glossy", "cream", "shimmer", "glitter", "matte", "chrome"]
+    entries = []
+    for index in range(count):
+        brand = rng.choice(list(brands))
+        hex_code = f"#{rng.randrange(1 << 24):06X}"
+        entries.append(
+            {
+                "color_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "color_variant_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "hex_code": hex_code,
+                "color_name": f"Shade {index}",
+                "shade_name": f"Shade {index}",
+                "brand": brand,
+                "fallback_brand": brand,
+                "product_line": rng.choice(brands[brand]),
+                "shade_code": f"SC{index:07d}",
+                "collection": rng.choice([None, "Spring", "Autumn Edit", "Downtown Los Angeles"]),
+                "resolved_finish": rng.choice(finishes),
+                "base_finish": "glossy",
+                "swatch_url": f"https://cdn.example.com/swatches/{index}.jpg",
+                "product_url": f"https://shop.example.com/products/shade-{index}",
+                "source_catalog": "synthetic",
+                "category": rng.choice(categories),
+                "canonical_category": None,
+                "is_trending": rng.random() < 0.05,
+                "display_order": index // len(categories) + 1,
+            }
+        )
+    return entries
+
+
+def benchmark(count: int, page_size: int) -> None:
+    entries = synthetic_entries(count)
+    # What PostgREST sends for the same rows: one JSON object per row
+    rest_bytes = len(json.dumps(entries, separators=(",", ":")).encode("utf-8"))
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        start = time.perf_counter()
+        manifest = export_catalog(entries, out_dir, page_size)
+        first_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        entries[0] = {**entries[0], "shade_name": "Renamed"}  # one edited row between runs
+        export_catalog(entries, out_dir, page_size)
+        second_seconds = time.perf_counter() - start
+        second = json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+        changed = set(_manifest_paths(second)) - set(_manifest_paths(manifest))
+        all_bytes = sum(shard["bytes"] for shard in manifest["all"]["shards"])
+
+    reds = manifest["category"].get("reds", {"count": 0, "shards": []})
+    print(f"entries: {count:,}  page size {page_size}")
+    print(f"  export: {first_seconds:.2f}s, re-export after editing one row: {second_seconds:.2f}s "
+          f"({len(changed)} shard URLs changed)")
+    print(f"  full catalogue: PostgREST JSON {rest_bytes / 2**20:.1f} MiB -> gzipped shards {all_bytes / 2**20:.1f} MiB "
+          f"({rest_bytes / all_bytes:.1f}x smaller)")
+    print(f"  browsing all {reds['count']:,} reds: {-(-reds['count'] // 24):,} PostgREST pages of 24 vs "
+          f"{len(reds['shards'])} cacheable shard fetches + manifest, 0 database reads")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the catalogue as static, content-hashed JSON shards")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--out", type=Path, help="Output directory (kept across runs for stale-shard pruning)")
+    action.add_argument("--bench", type=int, metavar="ENTRIES", help="Export synthetic entries and report sizes")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Entries per shard")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level), format="[%(levelname)s] %(message)s")
+
+    if args.bench:
+        benchmark(args.bench, args.page_size)
+        return 0
+    dsn = os.getenv("DATABASE_URL")
+    if dsn:
+        entries = fetch_entries_postgres(dsn)
+    else:
+        from catalog_model import CatalogSyncError
+        from sync_color_catalog import ensure_client
+
+        try:
+            entries = fetch_entries_rest(ensure_client())
+        except CatalogSyncError as exc:
+            logging.error("Set DATABASE_URL, or %s", exc)
+            return 1
+    export_catalog(entries, args.out, args.page_size)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
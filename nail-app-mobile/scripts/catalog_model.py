@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""Catalogue records and the scraper-CSV normalisation shared by the sync and its helpers.
+
+`VariantRecord`, the per-brand `CATALOG_SOURCES` column mappings, the
+finish/product-line/hex normalisers and the CSV loader live here rather than in
+`sync_color_catalog.py`. That script runs as `__main__`, so a helper importing
+from it would load a second copy, with its own `CatalogSyncError` class that the
+script's handlers do not catch. `sync_color_catalog.py` re-exports every name.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from run_metrics import timed
+
+CANONICAL_FINISHES = [
+    "glossy",
+    "cream",
+    "matte",
+    "chrome",
+    "shimmer",
+    "glitter",
+    "metallic",
+    "sheer",
+    "pearl",
+    "magnetic",
+    "reflective",
+]
+
+FINISH_PRIORITY = {
+    "glitter": 100,
+    "reflective": 95,
+    "magnetic": 90,
+    "chrome": 85,
+    "metallic": 80,
+    "shimmer": 70,
+    "pearl": 60,
+    "matte": 50,
+    "cream": 40,
+    "sheer": 35,
+    "glossy": 30,
+}
+
+FINISH_SYNONYMS = {
+    "standard": "glossy",
+    "high shine": "glossy",
+    "shine": "glossy",
+    "creme": "cream",
+    "cream": "cream",
+    "mat": "matte",
+    "matte": "matte",
+    "chrome": "chrome",
+    "mirror": "chrome",
+    "shimmer": "shimmer",
+    "shimmery": "shimmer",
+    "glitter": "glitter",
+    "glittery": "glitter",
+    "reflective": "reflective",
+    "cat-eye": "magnetic",
+    "magnetic": "magnetic",
+    "magnetic, cat-eye": "magnetic",
+    "metallic": "metallic",
+    "foil": "metallic",
+    "sheer": "sheer",
+    "milky": "sheer",
+    "milky, sheer": "sheer",
+    "pearl": "pearl",
+}
+
+DEFAULT_FINISH = "glossy"
+
+PRODUCT_LINE_NORMALISERS = {
+    "OPI": {
+        "nail lacquer": "Nail Lacquer",
+        "infinite shine": "Infinite Shine",
+        "gelcolor": "GelColor",
+    },
+    "CND": {
+        "shellac": "Shellac",
+        "vinylux": "Vinylux",
+    },
+    "The GelBottle Inc.": {
+        "gelcolor": "GelColor",
+        "biab": "BIAB",
+    },
+}
+
+CATEGORY_TO_FINISH = {
+    "standard": "glossy",
+    "standard finish": "glossy",
+    "shimmer": "shimmer",
+    "shimmery": "shimmer",
+    "glitter": "glitter",
+    "glitter, shimmery": "glitter",
+    "glitter, reflective": "reflective",
+    "reflective": "reflective",
+    "chrome": "chrome",
+    "metallic": "metallic",
+    "pearl": "pearl",
+    "sheer": "sheer",
+    "milky": "sheer",
+    "milky, sheer": "sheer",
+    "magnetic": "magnetic",
+    "magnetic, cat-eye": "magnetic",
+    "cat-eye": "magnetic",
+    "matte": "matte",
+    "cream": "cream",
+    "creme": "cream",
+}
+
+HEX_PREFIX = "#"
+# Typed scraper output read through catalog_arrow.py instead of the CSV loader
+ARROW_SUFFIXES = (".parquet", ".arrow")
+
+
+@dataclass
+class VariantRecord:
+    # No per-instance __dict__: the sync can hold millions of these
+    __slots__ = (
+        "hex_code",
+        "brand",
+        "product_line",
+        "shade_name",
+        "shade_code",
+        "collection",
+        "finish",
+        "product_url",
+        "swatch_url",
+        "source_catalog",
+    )
+
+    hex_code: str
+    brand: str
+    product_line: str
+    shade_name: str
+    shade_code: Optional[str]
+    collection: Optional[str]
+    finish: str
+    product_url: Optional[str]
+    swatch_url: Optional[str]
+    source_catalog: str
+
+    def key(self) -> Tuple[str, str, str, Optional[str]]:
+        return (
+            self.brand,
+            self.product_line,
+            self.shade_name,
+            self.shade_code or None,
+        )
+
+
+@dataclass(frozen=True)
+class CatalogSource:
+    """Column mapping for one brand's scraper CSV.
+
+    Adding a brand only needs a new `CATALOG_SOURCES` entry; the CLI grows a
+    matching `--<name>` path option automatically.
+    """
+
+    source_catalog: str
+    brand: str
+    default_csv: str
+    hex_column: str = "ApproxHex"
+    brand_column: str = "Brand"
+    product_line_column: str = "ProductType"
+    shade_name_column: str = "ShadeName"
+    shade_code_column: str = "ShadeCode"
+    collection_column: str = "Collection"
+    product_url_column: str = "ProductURL"
+    swatch_url_column: str = "SwatchImageURL"
+    # First non-empty column wins; aliases (keyed by lower-cased value) run before normalise_finish
+    finish_columns: Tuple[str, ...] = ("Finish", "Texture")
+    finish_aliases: Optional[Dict[str, str]] = None
+
+
+CATALOG_SOURCES = {
+    "opi": CatalogSource(
+        source_catalog="opi_full_uk_catalog",
+        brand="OPI",
+        default_csv="opi_full_uk_catalog.csv",
+    ),
+    "cnd": CatalogSource(
+        source_catalog="cnd_full_uk_catalog",
+        brand="CND",
+        default_csv="cnd_full_uk_catalog.csv",
+    ),
+    "tgb": CatalogSource(
+        source_catalog="tgb_full_catalog",
+        brand="The GelBottle Inc.",
+        default_csv="tgb_full_catalog.csv",
+        product_line_column="Product Type",
+        shade_name_column="Shade Name",
+        shade_code_column="Shade Code",
+        swatch_url_column="SwatchURL",
+        finish_columns=("Category",),
+        finish_aliases=CATEGORY_TO_FINISH,
+    ),
+}
+
+SOURCE_TO_BRAND = {source.source_catalog: source.brand for source in CATALOG_SOURCES.values()}
+
+
+class CatalogSyncError(RuntimeError):
+    pass
+
+
+def normalise_hex(value: str) -> Optional[str]:
+    if not value:
+        return None
+    candidate = value.strip().upper()
+    if not candidate:
+        return None
+    if not candidate.startswith(HEX_PREFIX):
+        candidate = f"{HEX_PREFIX}{candidate}"
+    if len(candidate) != 7:
+        return None
+    try:
+        int(candidate[1:], 16)
+    except ValueError:
+        return None
+    return candidate
+
+
+def normalise_finish(raw: Optional[str]) -> str:
+    if not raw:
+        return DEFAULT_FINISH
+    tokens = [token.strip().lower() for token in raw.replace("/", ",").split(",") if token.strip()]
+    if not tokens:
+        return DEFAULT_FINISH
+    mapped = [FINISH_SYNONYMS.get(token, token) for token in tokens]
+    valid = [token for token in mapped if token in CANONICAL_FINISHES]
+    if not valid:
+        return DEFAULT_FINISH
+    # Choose the most visually distinctive finish using priority table
+    best = max(valid, key=lambda finish: FINISH_PRIORITY.get(finish, 0))
+    return best
+
+
+def normalise_product_line(raw: Optional[str], brand: str) -> str:
+    if not raw:
+        return "Unknown"
+    cleaned = raw.strip().lower()
+    if not cleaned:
+        return "Unknown"
+    mapping = PRODUCT_LINE_NORMALISERS.get(brand, {})
+    return mapping.get(cleaned, raw.strip())
+
+
+def clean_collection(raw: Optional[str]) -> Optional[str]:
+    if not raw:
+        return None
+    cleaned = raw.strip()
+    if not cleaned:
+        return None
+    # Many collection fields include URL fragments joined by underscores
+    if "http" in cleaned and "_" in cleaned:
+        parts = [part for part in cleaned.split("_") if not part.startswith("http")]
+        if parts:
+            return parts[0]
+    return cleaned
+
+
+def record_from_row(row: Mapping[str, Optional[str]], source: CatalogSource) -> Optional[VariantRecord]:
+    """Normalise one scraper row (a CSV line, or a dict streamed by `catalog_stream.py`); None without a valid hex."""
+    hex_code = normalise_hex(row.get(source.hex_column))
+    if not hex_code:
+        logging.debug("Skipping %s row with invalid hex: %s", source.brand, row)
+        return None
+    raw_finish = next((row[column] for column in source.finish_columns if row.get(column)), None)
+    if source.finish_aliases is not None:
+        raw_finish = source.finish_aliases.get((raw_finish or "").strip().lower(), raw_finish)
+    return VariantRecord(
+        hex_code=hex_code,
+        brand=(row.get(source.brand_column) or source.brand).strip() or source.brand,
+        product_line=normalise_product_line(row.get(source.product_line_column), source.brand),
+        shade_name=(row.get(source.shade_name_column) or "Unnamed").strip(),
+        shade_code=(row.get(source.shade_code_column) or "").strip() or None,
+        collection=clean_collection(row.get(source.collection_column)),
+        finish=normalise_finish(raw_finish),
+        product_url=(row.get(source.product_url_column) or "").strip() or None,
+        swatch_url=(row.get(source.swatch_url_column) or "").strip() or None,
+        source_catalog=source.source_catalog,
+    )
+
+
+def load_rows(path: Path, source: CatalogSource) -> Iterator[VariantRecord]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        for row in csv.DictReader(handle):
+            record = record_from_row(row, source)
+            if record is not None:
+                yield record
+
+
+def deduplicate(records: Iterable[VariantRecord]) -> Iterator[VariantRecord]:
+    # incorporate hex into key to avoid collapsing distinct shades that coincidentally share names;
+    # for blank shade codes the first unique combination per brand/product_line/shade_name wins
+    seen: Set[Tuple[str, str, str, Optional[str], str]] = set()
+    for record in records:
+        key = (*record.key(), record.hex_code)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield record
+    logging.info("Deduplicated to %d variant rows", len(seen))
+
+
+@timed
+def map_hex_to_variants(records: Iterable[VariantRecord]) -> Mapping[str, List[VariantRecord]]:
+    group_by_hex = getattr(records, "group_by_hex", None)
+    if group_by_hex is not None:
+        # VariantStore: grouped over its packed hex column, rows materialised on access
+        return group_by_hex()
+    mapping: Dict[str, List[VariantRecord]] = {}
+    for record in records:
+        mapping.setdefault(record.hex_code, []).append(record)
+    return mapping
@@ -0,0 +1,372 @@
+"""Direct Postgres backend for `sync_color_catalog.py`.
+
+Streams the normalised variant records into a temporary staging table with
+`COPY`, then merges them into `colors` and `color_variants` with set-based
+`INSERT ... ON CONFLICT` statements. Active variants of the staged catalogues
+that are no longer staged are deactivated with one anti-join (see
+`variant_deactivation.py`). Everything, including the final
+`refresh_hex_categorization()` call (or the client-side categorisation
+update), runs inside a single transaction so a failed sync leaves the
+catalogue untouched.
+
+Requires `psycopg` 3 (pip install "psycopg[binary]") and a `DATABASE_URL`
+pointing at the Supabase Postgres instance (or a local copy of the schema).
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+try:
+    import psycopg
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit(
+        "psycopg is required for the Postgres backend. Install with `pip install \"psycopg[binary]\"`."
+    ) from exc
+
+from run_metrics import phase, timed
+from variant_deactivation import allowed_sources
+
+STAGE_TABLE = "catalog_variant_stage"
+
+STAGE_COLUMNS = (
+    "ord",
+    "hex_code",
+    "brand",
+    "product_line",
+    "shade_name",
+    "shade_code",
+    "collection",
+    "finish",
+    "product_url",
+    "swatch_url",
+    "source_catalog",
+)
+
+CREATE_STAGE_SQL = f"""
+CREATE TEMP TABLE {STAGE_TABLE} (
+  ord INT NOT NULL,
+  hex_code TEXT NOT NULL,
+  brand TEXT NOT NULL,
+  product_line TEXT NOT NULL,
+  shade_name TEXT NOT NULL,
+  shade_code TEXT,
+  collection TEXT,
+  finish TEXT NOT NULL,
+  product_url TEXT,
+  swatch_url TEXT,
+  source_catalog TEXT NOT NULL
+) ON COMMIT DROP
+"""
+
+# The first staged variant per hex (lowest ord) is the colour's primary, matching
+# `variants_by_hex[hex][0]` on the REST path.
+PRIMARY_STAGE_SQL = f"""
+SELECT DISTINCT ON (hex_code) *
+FROM {STAGE_TABLE}
+ORDER BY hex_code, ord
+"""
+
+INSERT_COLORS_SQL = f"""
+INSERT INTO colors (
+  hex_code, name, brand, category, finish, trending_score, season, mood_tags, source_priority
+)
+SELECT
+  p.hex_code,
+  p.shade_name,
+  p.brand,
+  'trending',  -- recategorised by refresh_hex_categorization below
+  p.finish,
+  0,
+  '{{}}',
+  '{{}}',
+  p.source_catalog
+FROM ({PRIMARY_STAGE_SQL}) p
+ON CONFLICT (hex_code) DO NOTHING
+RETURNING hex_code
+"""
+
+UPDATE_COLORS_SQL = f"""
+UPDATE colors c
+SET brand = COALESCE(NULLIF(c.brand, ''), p.brand),
+    finish = COALESCE(c.finish, p.finish),
+    source_priority = COALESCE(NULLIF(c.source_priority, ''), p.source_catalog)
+FROM ({PRIMARY_STAGE_SQL}) p
+WHERE c.hex_code = p.hex_code
+  AND (
+    c.brand IS NULL OR c.brand = '' OR
+    c.finish IS NULL OR
+    c.source_priority IS NULL OR c.source_priority = ''
+  )
+RETURNING c.hex_code
+"""
+
+UPSERT_VARIANTS_SQL = f"""
+WITH merged AS (
+  INSERT INTO color_variants (
+    color_id, brand, product_line, shade_name, shade_code, collection,
+    finish_override, product_url, swatch_url, source_catalog, is_active
+  )
+  SELECT DISTINCT ON (c.id, s.brand, s.product_line, s.shade_name, s.shade_code)
+    c.id,
+    s.brand,
+    s.product_line,
+    s.shade_name,
+    s.shade_code,
+    s.collection,
+    NULLIF(s.finish, c.finish),
+    s.product_url,
+    s.swatch_url,
+    s.source_catalog,
+    TRUE
+  FROM {STAGE_TABLE} s
+  JOIN colors c ON c.hex_code = s.hex_code
+  ORDER BY c.id, s.brand, s.product_line, s.shade_name, s.shade_code, s.ord
+  ON CONFLICT ON CONSTRAINT color_variants_unique DO UPDATE
+  SET collection = EXCLUDED.collection,
+      finish_override = EXCLUDED.finish_override,
+      product_url = EXCLUDED.product_url,
+      swatch_url = EXCLUDED.swatch_url,
+      source_catalog = EXCLUDED.source_catalog,
+      is_active = TRUE
+  RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*), count(*) FILTER (WHERE inserted) FROM merged
+"""
+
+STALE_TABLE = "catalog_stale_variants"
+
+# Active variants of every staged catalogue whose key was not staged this run
+CREATE_STALE_SQL = f"""
+CREATE TEMP TABLE {STALE_TABLE} ON COMMIT DROP AS
+SELECT v.id, v.source_catalog
+FROM color_variants v
+JOIN colors c ON c.id = v.color_id
+WHERE v.is_active
+  AND v.source_catalog IN (SELECT DISTINCT source_catalog FROM {STAGE_TABLE})
+  AND NOT EXISTS (
+    SELECT 1
+    FROM {STAGE_TABLE} s
+    WHERE s.hex_code = c.hex_code
+      AND s.brand = v.brand
+      AND s.product_line = v.product_line
+      AND s.shade_name = v.shade_name
+      AND s.shade_code IS NOT DISTINCT FROM v.shade_code
+  )
+"""
+
+STALE_COUNTS_SQL = f"""
+SELECT v.source_catalog, count(*), count(st.id)
+FROM color_variants v
+LEFT JOIN {STALE_TABLE} st ON st.id = v.id
+WHERE v.is_active
+  AND v.source_catalog IN (SELECT DISTINCT source_catalog FROM {STAGE_TABLE})
+GROUP BY v.source_catalog
+"""
+
+# Same statement as deactivate_color_variants() in 45_deactivate_missing_variants.sql
+DEACTIVATE_VARIANTS_SQL = f"""
+WITH gone AS (
+  UPDATE color_variants v
+  SET is_active = FALSE
+  FROM {STALE_TABLE} st
+  WHERE v.id = st.id
+    AND st.source_catalog = ANY(%(sources)s)
+  RETURNING v.id
+),
+unpointed AS (
+  UPDATE colors c
+  SET primary_variant_id = NULL
+  FROM gone
+  WHERE c.primary_variant_id = gone.id
+  RETURNING c.id
+)
+SELECT count(*) FROM gone
+"""
+
+UPDATE_PRIMARIES_SQL = f"""
+UPDATE colors c
+SET primary_variant_id = v.variant_id
+FROM (
+  SELECT DISTINCT ON (s.hex_code) s.hex_code, cv.id AS variant_id
+  FROM {STAGE_TABLE} s
+  JOIN colors base ON base.hex_code = s.hex_code
+  JOIN color_variants cv
+    ON cv.color_id = base.id
+   AND cv.brand = s.brand
+   AND cv.product_line = s.product_line
+   AND cv.shade_name = s.shade_name
+   AND cv.shade_code IS NOT DISTINCT FROM s.shade_code
+  ORDER BY s.hex_code, s.ord
+) v
+WHERE c.hex_code = v.hex_code
+  AND (%(overwrite)s OR c.primary_variant_id IS NULL)
+  AND c.primary_variant_id IS DISTINCT FROM v.variant_id
+"""
+
+CATEGORY_STAGE_TABLE = "catalog_category_stage"
+
+CREATE_CATEGORY_STAGE_SQL = f"""
+CREATE TEMP TABLE {CATEGORY_STAGE_TABLE} (
+  hex_code TEXT PRIMARY KEY,
+  hue NUMERIC NOT NULL,
+  saturation NUMERIC NOT NULL,
+  lightness NUMERIC NOT NULL,
+  category TEXT NOT NULL,
+  display_order INT NOT NULL
+) ON COMMIT DROP
+"""
+
+APPLY_CATEGORIES_SQL = f"""
+UPDATE colors c
+SET hue = s.hue,
+    saturation = s.saturation,
+    lightness = s.lightness,
+    category = s.category,
+    display_order = s.display_order
+FROM {CATEGORY_STAGE_TABLE} s
+WHERE c.hex_code = s.hex_code
+"""
+
+
+@dataclass
+class PostgresSyncSummary:
+    staged: int = 0
+    colors_inserted: int = 0
+    colors_updated: int = 0
+    variants_upserted: int = 0
+    variants_inserted: int = 0
+    primaries_updated: int = 0
+    variants_deactivated: int = 0
+    categories_updated: int = 0
+
+
+def _stage_rows(records: Iterable) -> Iterable[tuple]:
+    for ord_, record in enumerate(records):
+        yield (
+            ord_,
+            record.hex_code,
+            record.brand,
+            record.product_line,
+            record.shade_name,
+            record.shade_code,
+            record.collection,
+            record.finish,
+            record.product_url,
+            record.swatch_url,
+            record.source_catalog,
+        )
+
+
+def _deactivate_missing(cur: "psycopg.Cursor", max_fraction: float) -> int:
+    cur.execute(CREATE_STALE_SQL)
+    cur.execute(STALE_COUNTS_SQL)
+    counts = cur.fetchall()
+    sources = allowed_sources(
+        {source: active for source, active, _ in counts}, {source: stale for source, _, stale in counts}, max_fraction
+    )
+    if not sources:
+        return 0
+    cur.execute(DEACTIVATE_VARIANTS_SQL, {"sources": sources})
+    return cur.fetchone()[0]
+
+
+def _apply_client_categories(cur: "psycopg.Cursor") -> int:
+    from hex_categorization import CATEGORY_FIELDS, plan_categorization
+
+    cur.execute(f"SELECT hex_code, {', '.join(CATEGORY_FIELDS)} FROM colors")
+    stored = {row[0]: dict(zip(CATEGORY_FIELDS, row[1:])) for row in cur.fetchall()}
+    changes = plan_categorization(stored, [])
+    cur.execute(CREATE_CATEGORY_STAGE_SQL)
+    with cur.copy(f"COPY {CATEGORY_STAGE_TABLE} (hex_code, {', '.join(CATEGORY_FIELDS)}) FROM STDIN") as copy:
+        for hex_code, values in changes.items():
+            copy.write_row((hex_code, *(values[field] for field in CATEGORY_FIELDS)))
+    cur.execute(APPLY_CATEGORIES_SQL)
+    return cur.rowcount
+
+
+@timed
+def sync_via_postgres(
+    dsn: str,
+    records: Iterable,
+    overwrite_primary: bool,
+    dry_run: bool,
+    client_categorize: bool = False,
+    full_refresh: bool = False,
+    max_deactivate_fraction: Optional[float] = None,
+) -> PostgresSyncSummary:
+    """Merge `records` (deduplicated, in ingest order) in one transaction.
+
+    With `dry_run` the merge still executes so the counts are real, but the
+    transaction is rolled back at the end. With `client_categorize` the
+    categorisation columns are computed by `hex_categorization.py` and only
+    changed rows are written, instead of calling `refresh_hex_categorization()`.
+    Otherwise the refresh is scoped to the inserted/backfilled hexes unless
+    `full_refresh` is set. Unless `max_deactivate_fraction` is None, active
+    variants of the staged catalogues that were not staged are deactivated,
+    per catalogue, when they are at most that share of its active variants.
+    """
+    summary = PostgresSyncSummary()
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            with phase("pg_stage_copy"):
+                cur.execute(CREATE_STAGE_SQL)
+                columns = ", ".join(STAGE_COLUMNS)
+                with cur.copy(f"COPY {STAGE_TABLE} ({columns}) FROM STDIN") as copy:
+                    for row in _stage_rows(records):
+                        copy.write_row(row)
+                        summary.staged += 1
+                cur.execute(f"ANALYZE {STAGE_TABLE}")
+            logging.info("Staged %d variant rows via COPY", summary.staged)
+
+            with phase("pg_merge_colors"):
+                cur.execute(INSERT_COLORS_SQL)
+                touched = [row[0] for row in cur.fetchall()]
+                summary.colors_inserted = len(touched)
+                cur.execute(UPDATE_COLORS_SQL)
+                backfilled = [row[0] for row in cur.fetchall()]
+                summary.colors_updated = len(backfilled)
+                touched.extend(backfilled)
+
+            if max_deactivate_fraction is not None:
+                # Before the upsert, so the limit is a share of the variants active before this run
+                with phase("pg_deactivate_variants"):
+                    summary.variants_deactivated = _deactivate_missing(cur, max_deactivate_fraction)
+
+            with phase("pg_upsert_variants"):
+                cur.execute(UPSERT_VARIANTS_SQL)
+                summary.variants_upserted, summary.variants_inserted = cur.fetchone()
+
+            with phase("pg_update_primaries"):
+                cur.execute(UPDATE_PRIMARIES_SQL, {"overwrite": overwrite_primary})
+                summary.primaries_updated = cur.rowcount
+
+            with phase("pg_categorize"):
+                if client_categorize:
+                    summary.categories_updated = _apply_client_categories(cur)
+                elif full_refresh:
+                    cur.execute("SELECT refresh_hex_categorization()")
+                elif touched:
+                    cur.execute("SELECT refresh_hex_categorization(%s::text[])", (touched,))
+
+        with phase("pg_commit"):
+            if dry_run:
+                conn.rollback()
+                logging.info("Dry-run: rolled back Postgres merge")
+            else:
+                conn.commit()
+
+    logging.info(
+        "Postgres merge: %d new colors, %d colors backfilled, %d variants upserted (new: %d), %d primaries set, "
+        "%d variants deactivated",
+        summary.colors_inserted,
+        summary.colors_updated,
+        summary.variants_upserted,
+        summary.variants_inserted,
+        summary.primaries_updated,
+        summary.variants_deactivated,
+    )
+    if client_categorize:
+        logging.info("Client categorisation updated %d colors", summary.categories_updated)
+    return summary
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Scrape-to-sync streaming for `sync_color_catalog.py --stream`.
+
+Normally the scrapers write a CSV each and the sync starts once the last one
+has finished, so a refresh takes scrape time plus sync time. With `--stream`
+the scrapers (the repo-root `scrape_*.py` modules) run inside the sync process,
+and their rows go to the database while the scraping is still running:
+
+    scrape-opi ─┐
+    scrape-cnd ─┼─> RowChannel (bounded) ─> normalise ─> dedupe ─> batch ─> write
+    scrape-tgb ─┘        (row dicts)       record_from_row          (rest / rpc / postgres)
+
+- Each scraper runs in its own thread and yields a row as soon as its swatch
+  has been averaged (`stream_rows()` in each scraper).
+- The channel holds at most `--stream-buffer` rows. When it is full the
+  scrapers wait, so a slow database applies backpressure instead of growing
+  memory without bound.
+- The main thread normalises rows with the CSV loader's `record_from_row`.
+  Then it drops duplicates on the sync's key (brand, line, shade name, shade
+  code, hex) and cuts a batch at `--stream-batch` rows, or after
+  `--stream-flush` seconds.
+- `--stream-csv-dir DIR` also writes each scraper's usual CSV into DIR. It is
+  written from the scraper thread and renamed into place only when the scraper
+  finishes, so a failed scrape never leaves a truncated CSV behind.
+
+If a scraper fails, the others still run to the end, and the rows already
+produced are still synced. Then `ScraperFailed` is raised, and the sync skips
+the steps that need complete catalogues, such as deactivation.
+"""
+from __future__ import annotations
+
+import csv
+import importlib
+import logging
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from catalog_model import CATALOG_SOURCES, CatalogSyncError, VariantRecord, record_from_row
+from run_metrics import count, phase
+
+# --stream name -> scraper module at the repo root
+SCRAPER_MODULES = {"opi": "scrape_opi_uk", "cnd": "scrape_cnd_uk", "tgb": "scrape_tgb"}
+REPO_ROOT = Path(__file__).resolve().parents[2]
+PUT_POLL_SECONDS = 0.5
+
+_DONE = object()
+
+
+class ScraperFailed(CatalogSyncError):
+    pass
+
+
+def load_scraper(name: str) -> ModuleType:
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    try:
+        return importlib.import_module(SCRAPER_MODULES[name])
+    except ImportError as exc:
+        raise SystemExit(
+            f"{exc.name} is required to run the {name} scraper in-process. "
+            "Install with `pip install requests numpy pillow tenacity pandas`."
+        ) from exc
+
+
+class RowChannel:
+    """Bounded hand-off of scraped rows from one thread per scraper to the sync."""
+
+    def __init__(self, scrapers: Dict[str, ModuleType], capacity: int, csv_dir: Optional[Path] = None) -> None:
+        self.queue: "queue.Queue[Tuple[str, object]]" = queue.Queue(maxsize=max(1, capacity))
+        self.csv_dir = csv_dir
+        self.rows = {name: 0 for name in scrapers}
+        self.errors: Dict[str, BaseException] = {}
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._produce, args=(name, module), name=f"scrape-{name}", daemon=True)
+            for name, module in scrapers.items()
+        ]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def close(self) -> None:
+        """Stop the scrapers at their next row (a scraper blocked on a request finishes that request first)."""
+        self._stop.set()
+
+    def _put(self, item: Tuple[str, object]) -> bool:
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=PUT_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, name: str, module: ModuleType) -> None:
+        partial = None
+        try:
+            if self.csv_dir is None:
+                for row in module.stream_rows():
+                    if not self._put((name, row)):
+                        return
+                    self.rows[name] += 1
+            else:
+                self.csv_dir.mkdir(parents=True, exist_ok=True)
+                partial = self.csv_dir / f"{module.OUT_CSV}.partial"
+                with partial.open("w", newline="", encoding="utf-8") as handle:
+                    writer = csv.DictWriter(handle, fieldnames=module.CSV_FIELDS)
+                    writer.writeheader()
+                    for row in module.stream_rows():
+                        writer.writerow(row)
+                        if not self._put((name, row)):
+                            return
+                        self.rows[name] += 1
+                partial.replace(self.csv_dir / module.OUT_CSV)
+                partial = None
+        except Exception as exc:
+            logging.error("%s scraper failed after %d rows: %s", name, self.rows[name], exc)
+            self.errors[name] = exc
+        finally:
+            if partial is not None:
+                partial.unlink(missing_ok=True)
+            self._put((name, _DONE))
+
+    def items(self, wait_seconds: float) -> Iterator[Optional[Tuple[str, Dict[str, str]]]]:
+        """(scraper, row) pairs until every scraper is done; None after `wait_seconds` without a row."""
+        running = len(self._threads)
+        while running:
+            try:
+                name, row = self.queue.get_nowait()
+            except queue.Empty:
+                # Time the sync spends waiting on the scrapers
+                with phase("stream_wait"):
+                    try:
+                        name, row = self.queue.get(timeout=wait_seconds)
+                    except queue.Empty:
+                        yield None
+                        continue
+            if row is _DONE:
+                running -= 1
+                continue
+            yield name, row  # type: ignore[misc]
+
+
+def stream_records(
+    names: Sequence[str],
+    batch_rows: int,
+    flush_seconds: float,
+    capacity: int,
+    csv_dir: Optional[Path] = None,
+) -> Iterator[List[VariantRecord]]:
+    """Run the named scrapers and yield their normalised, deduplicated records in batches.
+
+    Raises `ScraperFailed` after the last batch if any scraper failed.
+    """
+    # Imported here, not in the scraper threads, so a missing dependency stops the run before any scraping
+    scrapers = {name: load_scraper(name) for name in dict.fromkeys(names)}
+    channel = RowChannel(scrapers, capacity, csv_dir)
+    seen: Set[Tuple[str, str, str, Optional[str], str]] = set()
+    batch: List[VariantRecord] = []
+    started = 0.0
+    logging.info("Streaming %s (batches of %d rows, flushed after %gs)", ", ".join(scrapers), batch_rows, flush_seconds)
+    channel.start()
+    try:
+        for item in channel.items(flush_seconds):
+            if item is not None:
+                name, row = item
+                record = record_from_row(row, CATALOG_SOURCES[name])
+                if record is not None:
+                    key = (*record.key(), record.hex_code)
+                    if key not in seen:
+                        seen.add(key)
+                        if not batch:
+                            started = time.monotonic()
+                        batch.append(record)
+            if batch and (len(batch) >= batch_rows or time.monotonic() - started >= flush_seconds):
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        channel.close()
+    for name, rows in channel.rows.items():
+        logging.info("%s: streamed %d rows", name, rows)
+        count("scraped_rows", rows)
+    logging.info("Deduplicated to %d variant rows", len(seen))
+    if channel.errors:
+        raise ScraperFailed(
+            "Scraper failed: " + "; ".join(f"{name}: {exc}" for name, exc in sorted(channel.errors.items()))
+        )
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Colour conversions shared by the catalogue tools.
+
+Vectorised over NumPy arrays of any length:
+
+    '#RRGGBB' hex ⇄ sRGB (uint8) ⇄ linear RGB ⇄ CIE XYZ (D65) ⇄ CIELAB ⇄ LCh(ab)
+
+plus HSL (as computed by the SQL categorisation), CIE76 and CIEDE2000
+differences. Hex parsing works on the raw ASCII bytes through a digit lookup
+table, and the sRGB gamma curve is a 256-entry table in the decode direction
+and a threshold table (exact 8-bit rounding via `searchsorted`) in the encode
+direction, so no per-element Python or `pow` is involved for 8-bit colours.
+
+Used by the categorisation (`hex_categorization.py`), near-duplicate merging
+(`hex_clustering.py`) and nearest-shade lookup (`shade_index.py`). Run this
+file directly to benchmark the conversions:
+
+    python scripts/color_science.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit("numpy is required for the colour tools. Install with `pip install numpy`.") from exc
+
+# sRGB (D65) → CIE XYZ
+SRGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+XYZ_TO_SRGB = np.linalg.inv(SRGB_TO_XYZ)
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+LAB_EPSILON = (6 / 29) ** 3
+LAB_KAPPA = 3 * (6 / 29) ** 2
+
+
+def _decode_gamma(srgb: np.ndarray) -> np.ndarray:
+    return np.where(srgb <= 0.04045, srgb / 12.92, ((srgb + 0.055) / 1.055) ** 2.4)
+
+
+def _encode_gamma(linear: np.ndarray) -> np.ndarray:
+    linear = np.clip(linear, 0.0, 1.0)
+    return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055)
+
+
+# 8-bit sRGB → linear, and the linear values halfway between neighbouring codes
+SRGB_TO_LINEAR_LUT = _decode_gamma(np.arange(256) / 255.0)
+LINEAR_THRESHOLDS = _decode_gamma((np.arange(255) + 0.5) / 255.0)
+
+# ASCII byte → hex digit value (255 = not a hex digit)
+HEX_DIGITS = np.full(256, 255, dtype=np.uint8)
+for _value, _char in enumerate(b"0123456789ABCDEF"):
+    HEX_DIGITS[_char] = _value
+for _value, _char in enumerate(b"abcdef"):
+    HEX_DIGITS[_char] = 10 + _value
+HEX_BYTES = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+
+def hex_to_rgb(hex_codes: Sequence[str]) -> np.ndarray:
+    """(n, 3) uint8 array from '#RRGGBB' strings (either case)."""
+    count = len(hex_codes)
+    if not count:
+        return np.empty((0, 3), dtype=np.uint8)
+    try:
+        raw = "".join(hex_codes).encode("ascii")
+    except UnicodeEncodeError as exc:
+        raise ValueError("hex codes must be ASCII '#RRGGBB' strings") from exc
+    if len(raw) != 7 * count:
+        raise ValueError("hex codes must be normalised '#RRGGBB' strings")
+    chars = np.frombuffer(raw, dtype=np.uint8).reshape(count, 7)
+    digits = HEX_DIGITS[chars[:, 1:]]
+    bad = (chars[:, 0] != ord("#")) | (digits == 255).any(axis=1)
+    if bad.any():
+        raise ValueError(f"Invalid hex colour: {hex_codes[int(np.argmax(bad))]!r}")
+    return (digits[:, 0::2] << 4) | digits[:, 1::2]
+
+
+def rgb_to_hex(rgb: np.ndarray) -> List[str]:
+    """Upper-case '#RRGGBB' strings from an (n, 3) array of 8-bit values."""
+    rgb = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    chars = np.empty((len(rgb), 7), dtype=np.uint8)
+    chars[:, 0] = ord("#")
+    chars[:, 1::2] = HEX_BYTES[rgb >> 4]
+    chars[:, 2::2] = HEX_BYTES[rgb & 0x0F]
+    text = chars.tobytes().decode("ascii")
+    return [text[start : start + 7] for start in range(0, len(text), 7)]
+
+
+def srgb_to_linear(rgb: np.ndarray) -> np.ndarray:
+    """Linear-light RGB in [0, 1]; 8-bit integer input goes through the LUT."""
+    rgb = np.asarray(rgb)
+    if rgb.dtype.kind in "ui":
+        return SRGB_TO_LINEAR_LUT[rgb]
+    return _decode_gamma(rgb / 255.0)
+
+
+def linear_to_srgb(linear: np.ndarray) -> np.ndarray:
+    """8-bit sRGB (uint8, rounded in gamma space) from linear-light RGB."""
+    return np.searchsorted(LINEAR_THRESHOLDS, np.asarray(linear, dtype=np.float64)).astype(np.uint8)
+
+
+def linear_to_xyz(linear: np.ndarray) -> np.ndarray:
+    return linear @ SRGB_TO_XYZ.T
+
+
+def xyz_to_linear(xyz: np.ndarray) -> np.ndarray:
+    return np.asarray(xyz, dtype=np.float64) @ XYZ_TO_SRGB.T
+
+
+def xyz_to_lab(xyz: np.ndarray) -> np.ndarray:
+    scaled = np.asarray(xyz, dtype=np.float64) / WHITE_D65
+    f = np.where(scaled > LAB_EPSILON, np.cbrt(scaled), scaled / LAB_KAPPA + 4 / 29)
+    return np.stack(
+        [116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+        axis=-1,
+    )
+
+
+def lab_to_xyz(lab: np.ndarray) -> np.ndarray:
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+    return np.where(f > 6 / 29, f**3, LAB_KAPPA * (f - 4 / 29)) * WHITE_D65
+
+
+def lab_to_lch(lab: np.ndarray) -> np.ndarray:
+    """(L*, C*ab, h_ab in degrees [0, 360))."""
+    lab = np.asarray(lab, dtype=np.float64)
+    hue = np.degrees(np.arctan2(lab[..., 2], lab[..., 1])) % 360
+    return np.stack([lab[..., 0], np.hypot(lab[..., 1], lab[..., 2]), hue], axis=-1)
+
+
+def lch_to_lab(lch: np.ndarray) -> np.ndarray:
+    lch = np.asarray(lch, dtype=np.float64)
+    hue = np.radians(lch[..., 2])
+    return np.stack([lch[..., 0], lch[..., 1] * np.cos(hue), lch[..., 1] * np.sin(hue)], axis=-1)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    return xyz_to_lab(linear_to_xyz(srgb_to_linear(rgb)))
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """8-bit sRGB from CIELAB; out-of-gamut colours are clipped per channel."""
+    return linear_to_srgb(xyz_to_linear(lab_to_xyz(lab)))
+
+
+def hex_to_lab(hex_codes: Sequence[str]) -> np.ndarray:
+    return rgb_to_lab(hex_to_rgb(hex_codes))
+
+
+def lab_to_hex(lab: np.ndarray) -> List[str]:
+    return rgb_to_hex(lab_to_rgb(lab))
+
+
+def rgb_to_hsl(rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hue in degrees, saturation and lightness in [0, 1], computed as the SQL does."""
+    r, g, b = (rgb[:, channel] / 255.0 for channel in range(3))
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    lightness = (maxc + minc) / 2.0
+    delta = maxc - minc
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hue = np.select(
+            [delta == 0, maxc == r, maxc == g],
+            [0.0, ((g - b) / delta) * 60.0, ((b - r) / delta) * 60.0 + 120.0],
+            ((r - g) / delta) * 60.0 + 240.0,
+        )
+        saturation = np.where(delta == 0, 0.0, delta / (1.0 - np.abs(2 * lightness - 1)))
+    hue = np.where(hue < 0, hue + 360, hue)
+    return hue, np.clip(saturation, 0, 1), np.clip(lightness, 0, 1)
+
+
+def delta_e_76(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIE76 (Euclidean Lab) between broadcastable (..., 3) Lab arrays."""
+    difference = np.asarray(lab1, dtype=np.float64) - np.asarray(lab2, dtype=np.float64)
+    return np.sqrt((difference**2).sum(axis=-1))
+
+
+def delta_e_2000(lab1: np.ndarray, lab2: np.ndarray) -> np.ndarray:
+    """CIEDE2000 between broadcastable (..., 3) Lab arrays (kL = kC = kH = 1)."""
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    l1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    l2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    c_bar = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    c_bar7 = c_bar**7
+    g = 0.5 * (1 - np.sqrt(c_bar7 / (c_bar7 + 25.0**7)))
+    a1p = a1 * (1 + g)
+    a2p = a2 * (1 + g)
+    c1p = np.hypot(a1p, b1)
+    c2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    delta_lp = l2 - l1
+    delta_cp = c2p - c1p
+    chroma_product = c1p * c2p
+    dh = h2p - h1p
+    dh = np.where(dh > 180, dh - 360, np.where(dh < -180, dh + 360, dh))
+    dh = np.where(chroma_product == 0, 0.0, dh)
+    delta_hp = 2 * np.sqrt(chroma_product) * np.sin(np.radians(dh / 2))
+
+    l_bar = (l1 + l2) / 2
+    c_bar_p = (c1p + c2p) / 2
+    h_sum = h1p + h2p
+    h_bar = np.where(
+        chroma_product == 0,
+        h_sum,
+        np.where(np.abs(h1p - h2p) <= 180, h_sum / 2, np.where(h_sum < 360, (h_sum + 360) / 2, (h_sum - 360) / 2)),
+    )
+    t = (
+        1
+        - 0.17 * np.cos(np.radians(h_bar - 30))
+        + 0.24 * np.cos(np.radians(2 * h_bar))
+        + 0.32 * np.cos(np.radians(3 * h_bar + 6))
+        - 0.20 * np.cos(np.radians(4 * h_bar - 63))
+    )
+    s_l = 1 + 0.015 * (l_bar - 50) ** 2 / np.sqrt(20 + (l_bar - 50) ** 2)
+    s_c = 1 + 0.045 * c_bar_p
+    s_h = 1 + 0.015 * c_bar_p * t
+    c_bar_p7 = c_bar_p**7
+    r_t = (
+        -2
+        * np.sqrt(c_bar_p7 / (c_bar_p7 + 25.0**7))
+        * np.sin(np.radians(60 * np.exp(-(((h_bar - 275) / 25) ** 2))))
+    )
+    term_l = delta_lp / s_l
+    term_c = delta_cp / s_c
+    term_h = delta_hp / s_h
+    return np.sqrt(term_l**2 + term_c**2 + term_h**2 + r_t * term_c * term_h)
+
+
+# CIEDE2000 reference pairs from Sharma, Wu & Dalal (2005)
+SHARMA_PAIRS = (
+    ((50.0, 2.6772, -79.7751), (50.0, 0.0, -82.7485), 2.0425),
+    ((50.0, -1.3802, -84.2814), (50.0, 0.0, -82.7485), 1.0000),
+    ((50.0, 2.49, -0.001), (50.0, -2.49, 0.0011), 7.2195),
+    ((50.0, 0.0, 0.0), (50.0, -1.0, 2.0), 2.3669),
+    ((60.2574, -34.0099, 36.2677), (60.4626, -34.1751, 39.4387), 1.2644),
+    ((22.7233, 20.0904, -46.694), (23.0331, 14.973, -42.5619), 2.0373),
+    ((90.9257, -0.5406, -0.9208), (88.6381, -0.8985, -0.7239), 1.5381),
+    ((2.0776, 0.0795, -1.135), (0.9033, -0.0636, -0.5514), 0.9082),
+)
+
+
+def _reference_lab(hex_codes: Sequence[str]) -> np.ndarray:
+    """Straightforward per-hex parse + pow() conversion, for the benchmark."""
+    packed = np.fromiter((int(hex_code[1:], 16) for hex_code in hex_codes), dtype=np.int64, count=len(hex_codes))
+    rgb = np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=1)
+    return xyz_to_lab(_decode_gamma(rgb / 255.0) @ SRGB_TO_XYZ.T)
+
+
+def benchmark(count: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    hexes = [f"#{rng.randrange(1 << 24):06X}" for _ in range(count)]
+    other = np.roll(np.arange(count), 1)
+
+    def timed(label: str, run):
+        start = time.perf_counter()
+        result = run()
+        print(f"  {label:<28} {(time.perf_counter() - start) * 1000:8.1f} ms")
+        return result
+
+    print(f"hexes: {count:,}")
+    rgb = timed("hex → sRGB", lambda: hex_to_rgb(hexes))
+    lab = timed("sRGB → Lab (LUT)", lambda: rgb_to_lab(rgb))
+    timed("hex → Lab", lambda: hex_to_lab(hexes))
+    reference = timed("hex → Lab (int() + pow)", lambda: _reference_lab(hexes))
+    lch = timed("Lab → LCh", lambda: lab_to_lch(lab))
+    back = timed("Lab → sRGB (threshold LUT)", lambda: lab_to_rgb(lab))
+    timed("sRGB → hex", lambda: rgb_to_hex(rgb))
+    timed("HSL", lambda: rgb_to_hsl(rgb))
+    timed("ΔE76 (n pairs)", lambda: delta_e_76(lab, lab[other]))
+    timed("ΔE2000 (n pairs)", lambda: delta_e_2000(lab, lab[other]))
+
+    sharma = np.array([pair[2] for pair in SHARMA_PAIRS])
+    computed = delta_e_2000([pair[0] for pair in SHARMA_PAIRS], [pair[1] for pair in SHARMA_PAIRS])
+    print(f"  matches per-hex conversion:  {np.allclose(lab, reference)}")
+    print(f"  Lab → sRGB round trip exact: {bool((back == rgb).all())}")
+    print(f"  LCh → Lab round trip:        {np.allclose(lch_to_lab(lch), lab)}")
+    print(f"  rgb_to_hex round trip:       {rgb_to_hex(rgb) == hexes}")
+    print(f"  CIEDE2000 vs Sharma et al.:  {np.allclose(np.round(computed, 4), sharma)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the vectorised colour conversions")
+    parser.add_argument("--bench", type=int, default=1_000_000, help="Random hexes to convert")
+    args = parser.parse_args(argv)
+    benchmark(args.bench)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
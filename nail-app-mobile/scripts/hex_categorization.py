@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""Client-side hex categorisation for `sync_color_catalog.py`.
+
+NumPy port of `categorize_hex()` and the display_order step of
+`refresh_hex_categorization()` in supabase/42_hex_categorization_rules.sql:
+HSL from the hex code (via `color_science.py`), the base rules from 32, the
+chroma refinements from 33, the distance-to-white rule from 34 and
+`display_order` (light → dark per category; hue, then hex, break ties).
+
+With `--categorize client` the sync computes these columns itself, sends them
+with new colours and updates only the existing rows whose values change
+(batched through `apply_hex_categories()`), instead of asking the server to
+recompute the whole table.
+
+Every HSL metric is a ratio of small integers. The server stores them rounded to
+9 decimals and both sides compare and order on those values, which is enough to
+remove float noise without merging distinct colours.
+
+Check parity against a database with 42 installed. It runs `categorize_hex()`
+over a temporary table in a rolled-back transaction, so `colors` is only read:
+
+    DATABASE_URL=... python scripts/hex_categorization.py --verify --sample 200000
+
+tests/test_hex_categorization.py checks it offline against the server's output
+for a fixed corpus, recorded in tests/fixtures/. Regenerate that after changing
+the SQL rules:
+
+    DATABASE_URL=... python scripts/hex_categorization.py --write-fixture
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import os
+import random
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover - import guard
+    raise SystemExit("numpy is required for --categorize client. Install with `pip install numpy`.") from exc
+
+from color_science import hex_to_rgb, rgb_to_hsl
+
+CATEGORY_FIELDS = ("hue", "saturation", "lightness", "category", "display_order")
+
+METALLIC_HEXES = (
+    "#FFD700", "#D4AF37", "#DAA520", "#F0E130", "#B8860B", "#996515",
+    "#C0C0C0", "#A8A9AD", "#B2BEB5", "#E5E4E2",
+    "#B87333", "#CD7F32", "#CC7722",
+)
+
+FRENCH_WHITELIST = (
+    "#FFFFFF", "#FFFAFA", "#F8F8FF", "#FFF8DC", "#FFFAF0", "#FFF5EE", "#FFF5F5",
+    "#FFFDFA", "#FFFDF5", "#F5F5F5", "#FAEBD7", "#F0F8FF", "#FFF0F5",
+)
+
+WHITE_DISTANCE_SCALE = 441.67295593  # as in 34_french_rgb_distance.sql
+
+SNAP_DECIMALS = 9
+
+# refresh_hex_categorization() output for the fixed parity corpus, checked offline by tests/
+PARITY_FIXTURE = Path(__file__).resolve().parent / "tests" / "fixtures" / "hex_categorization_sql42.csv"
+
+
+@dataclass
+class HexCategorization:
+    hex_codes: List[str]
+    hue: np.ndarray
+    saturation: np.ndarray
+    lightness: np.ndarray
+    category: np.ndarray
+    display_order: np.ndarray
+
+    def row(self, index: int) -> Dict[str, object]:
+        return {
+            "hue": as_numeric(self.hue[index]),
+            "saturation": as_numeric(self.saturation[index]),
+            "lightness": as_numeric(self.lightness[index]),
+            "category": str(self.category[index]),
+            "display_order": int(self.display_order[index]),
+        }
+
+
+def as_numeric(value: object) -> Optional[float]:
+    """Round like the stored NUMERIC columns (9 decimals)."""
+    if value is None:
+        return None
+    return round(float(value), SNAP_DECIMALS)
+
+
+def _between(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    return (values >= low) & (values <= high)
+
+
+def categorize_rgb(
+    hex_codes: Sequence[str], rgb: np.ndarray, hue: np.ndarray, saturation: np.ndarray, lightness: np.ndarray
+) -> np.ndarray:
+    h = np.round(hue, SNAP_DECIMALS)
+    s = np.round(saturation, SNAP_DECIMALS)
+    l = np.round(lightness, SNAP_DECIMALS)
+    chroma = np.round((rgb.max(axis=1) - rgb.min(axis=1)) / 255.0, SNAP_DECIMALS)
+    d_white = np.sqrt(((255 - rgb) ** 2).sum(axis=1).astype(np.float64)) / WHITE_DISTANCE_SCALE
+    hexes = np.asarray(hex_codes, dtype=object)
+    metallic = np.isin(hexes, METALLIC_HEXES)
+
+    reddish = (h >= 350) | (h < 20)
+    vivid = (s >= 0.65) & _between(l, 0.35, 0.75)
+    # 32_hex_only_categorization.sql
+    category = np.select(
+        [
+            metallic,
+            l <= 0.25,
+            (l >= 0.90) & (s <= 0.18),
+            (l >= 0.80) & (s <= 0.45),
+            _between(h, 15, 60) & (s <= 0.60) & _between(l, 0.45, 0.88),
+            _between(s, 0.05, 0.25) & _between(l, 0.45, 0.75),
+            _between(h, 185, 255),
+            _between(h, 60, 180),
+            _between(h, 260, 330),
+            ((h >= 330) | (h < 20)) & (s >= 0.45) & (l >= 0.60),
+            reddish & (s >= 0.55) & _between(l, 0.35, 0.65),
+            ((h >= 330) | (h < 20) | _between(h, 320, 340)) & (l < 0.35),
+            vivid & _between(h, 185, 255),
+            vivid & _between(h, 60, 180),
+            vivid & _between(h, 260, 330),
+            vivid & reddish,
+        ],
+        [
+            "metallics", "darks", "french", "pastels", "nudes", "nudes", "blues", "greens", "purples",
+            "pinks", "reds", "burgundy", "blues", "greens", "purples", "reds",
+        ],
+        "nudes",
+    ).astype(object)
+
+    # 33_refine_hex_rules.sql, one refinement after another
+    near_white = ((l >= 0.94) & (chroma <= 0.12)) | ((l >= 0.90) & (chroma <= 0.06))
+    category[np.isin(hexes, FRENCH_WHITELIST) | (near_white & ~metallic)] = "french"
+
+    pastel = (l >= 0.80) & (chroma > 0.06) & (chroma <= 0.40)
+    category[pastel & ~np.isin(category, ["french", "metallics"])] = "pastels"
+
+    nude = (_between(h, 15, 60) & (chroma <= 0.40) & _between(l, 0.45, 0.88)) | (
+        (chroma <= 0.18) & _between(l, 0.45, 0.78)
+    )
+    category[nude & ~np.isin(category, ["french", "pastels", "metallics"])] = "nudes"
+
+    balance = ~np.isin(category, ["french", "pastels", "nudes", "metallics"]) & (chroma > 0.12) & (l < 0.92)
+    category[balance & _between(h, 185, 255)] = "blues"
+    category[balance & ~_between(h, 185, 255) & _between(h, 60, 180)] = "greens"
+    category[balance & ~_between(h, 185, 255) & ~_between(h, 60, 180) & _between(h, 260, 330)] = "purples"
+
+    # 34_french_rgb_distance.sql
+    whitish = (d_white <= 0.065) | ((d_white <= 0.10) & (l >= 0.88))
+    category[whitish & (category != "metallics")] = "french"
+    return category
+
+
+def display_orders(
+    category: np.ndarray, hue: np.ndarray, lightness: np.ndarray, rgb: np.ndarray
+) -> np.ndarray:
+    """row_number() per category ordered by lightness DESC, hue, hex_code."""
+    # '#RRGGBB' sorts under the C collation exactly like its integer value
+    packed = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    category_codes = np.unique(category.astype(str), return_inverse=True)[1]
+    order = np.lexsort(
+        (packed, np.round(hue, SNAP_DECIMALS), -np.round(lightness, SNAP_DECIMALS), category_codes)
+    )
+    sorted_codes = category_codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)])) + 1
+    result = np.empty(len(order), dtype=np.int64)
+    result[order] = ranks
+    return result
+
+
+def categorize(hex_codes: Sequence[str]) -> HexCategorization:
+    """Categorise a whole table's worth of hexes; display_order spans all of them."""
+    hex_codes = list(hex_codes)
+    # int64 so the packing and distance maths below cannot overflow uint8
+    rgb = hex_to_rgb(hex_codes).astype(np.int64)
+    hue, saturation, lightness = rgb_to_hsl(rgb)
+    category = categorize_rgb(hex_codes, rgb, hue, saturation, lightness)
+    return HexCategorization(
+        hex_codes=hex_codes,
+        hue=hue,
+        saturation=saturation,
+        lightness=lightness,
+        category=category,
+        display_order=display_orders(category, hue, lightness, rgb),
+    )
+
+
+def _differs(stored: Mapping[str, object], computed: Mapping[str, object]) -> bool:
+    for field in CATEGORY_FIELDS:
+        value = stored.get(field)
+        if field in ("hue", "saturation", "lightness"):
+            value = as_numeric(value)
+        if value != computed[field]:
+            return True
+    return False
+
+
+def plan_categorization(stored: Mapping[str, Mapping[str, object]], new_hexes: Iterable[str]) -> Dict[str, Dict]:
+    """Return the categorisation columns for every hex whose values would change.
+
+    `stored` maps each hex already in `colors` to its current columns; hexes in
+    `new_hexes` are about to be inserted. New hexes are always included.
+    """
+    hex_codes = list(stored)
+    hex_codes.extend(hex_code for hex_code in dict.fromkeys(new_hexes) if hex_code not in stored)
+    result = categorize(hex_codes)
+    changes: Dict[str, Dict] = {}
+    for index, hex_code in enumerate(result.hex_codes):
+        computed = result.row(index)
+        current = stored.get(hex_code)
+        if current is None or _differs(current, computed):
+            changes[hex_code] = computed
+    logging.info(
+        "Client categorisation: %d of %d colours need new values", len(changes), len(result.hex_codes)
+    )
+    return changes
+
+
+def _parity_sample(size: int, seed: int) -> List[str]:
+    # Greys, a coarse lattice and the override lists hit most rule boundaries
+    hexes = {f"#{value:02X}{value:02X}{value:02X}" for value in range(256)}
+    lattice = range(0, 256, 15)
+    hexes.update(f"#{r:02X}{g:02X}{b:02X}" for r in lattice for g in lattice for b in lattice)
+    hexes.update(METALLIC_HEXES)
+    hexes.update(FRENCH_WHITELIST)
+    rng = random.Random(seed)
+    while len(hexes) < size:
+        hexes.add(f"#{rng.randrange(1 << 24):06X}")
+    return sorted(hexes)
+
+
+def parity_mismatches(stored: Mapping[str, Mapping[str, object]]) -> List[Tuple[str, Mapping[str, object], Dict]]:
+    """(hex, server row, client row) for every row of `stored` that `categorize` disagrees with."""
+    result = categorize(list(stored))
+    mismatches = []
+    for index, hex_code in enumerate(result.hex_codes):
+        computed = result.row(index)
+        if _differs(stored[hex_code], computed):
+            mismatches.append((hex_code, stored[hex_code], computed))
+    return mismatches
+
+
+# refresh_hex_categorization() (42) run over a scratch table instead of `colors`:
+# categorize_hex() for the rules, then the same display_order window as step 2
+SERVER_CATEGORIZATION_SQL = """
+SELECT
+  s.hex_code, k.hue, k.saturation, k.lightness, k.category,
+  row_number() OVER (
+    PARTITION BY k.category
+    ORDER BY k.lightness DESC, k.hue NULLS LAST, s.hex_code COLLATE "C"
+  )
+FROM parity_hexes s
+CROSS JOIN LATERAL categorize_hex(s.hex_code) k
+"""
+
+
+def server_categorization(dsn: str, hexes: Sequence[str], keep_existing: bool = True) -> Dict[str, Dict]:
+    """Categorise `hexes` (plus the stored colours with `keep_existing`) with the
+    server's rules and return every row's columns.
+
+    Only a temporary table is written; `colors` is read with `keep_existing` and
+    otherwise not touched. The transaction is always rolled back.
+    """
+    import psycopg
+
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE TEMP TABLE parity_hexes (hex_code TEXT PRIMARY KEY) ON COMMIT DROP")
+            with cur.copy("COPY parity_hexes (hex_code) FROM STDIN") as copy:
+                for hex_code in dict.fromkeys(hexes):
+                    copy.write_row((hex_code,))
+            if keep_existing:
+                cur.execute("INSERT INTO parity_hexes SELECT hex_code FROM colors ON CONFLICT DO NOTHING")
+            cur.execute(SERVER_CATEGORIZATION_SQL)
+            stored = {row[0]: dict(zip(CATEGORY_FIELDS, row[1:])) for row in cur.fetchall()}
+        conn.rollback()
+    return stored
+
+
+def verify_parity(dsn: str, sample: int, seed: int) -> int:
+    """Compare `categorize` with the server over `colors` plus a synthetic sample."""
+    stored = server_categorization(dsn, _parity_sample(sample, seed))
+    mismatches = parity_mismatches(stored)
+    for hex_code, server, client in mismatches[:20]:
+        logging.error("%s server=%s client=%s", hex_code, server, client)
+    logging.info("Compared %d colours: %d mismatches", len(stored), len(mismatches))
+    return 1 if mismatches else 0
+
+
+def write_parity_fixture(dsn: str, path: Path) -> None:
+    """Record the server's columns for the fixed corpus (`_parity_sample(0, 0)`) alone."""
+    stored = server_categorization(dsn, _parity_sample(0, 0), keep_existing=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(("hex_code", *CATEGORY_FIELDS))
+        for hex_code in sorted(stored):
+            writer.writerow((hex_code, *(_fixture_text(stored[hex_code][field]) for field in CATEGORY_FIELDS)))
+    logging.info("Wrote %d rows to %s", len(stored), path)
+
+
+def _fixture_text(value: object) -> str:
+    if value is None:
+        return ""
+    return format(value, "f") if isinstance(value, Decimal) else str(value)
+
+
+def load_parity_fixture(path: Path = PARITY_FIXTURE) -> Dict[str, Dict]:
+    with path.open(newline="", encoding="utf-8") as handle:
+        return {
+            row["hex_code"]: {
+                "hue": as_numeric(row["hue"] or None),
+                "saturation": as_numeric(row["saturation"] or None),
+                "lightness": as_numeric(row["lightness"] or None),
+                "category": row["category"],
+                "display_order": int(row["display_order"]),
+            }
+            for row in csv.DictReader(handle)
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check client categorisation against refresh_hex_categorization()")
+    parser.add_argument("--verify", action="store_true", help="Compare against the database in DATABASE_URL")
+    parser.add_argument("--sample", type=int, default=100_000, help="Synthetic hexes to add for the comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--write-fixture",
+        type=Path,
+        nargs="?",
+        const=PARITY_FIXTURE,
+        help=f"Regenerate the offline parity fixture from the database (default: {PARITY_FIXTURE.name})",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    if not args.verify and args.write_fixture is None:
+        parser.print_help()
+        return 0
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        logging.error("DATABASE_URL must be set for --verify and --write-fixture")
+        return 1
+    if args.write_fixture is not None:
+        write_parity_fixture(dsn, args.write_fixture)
+        return 0
+    return verify_parity(dsn, args.sample, args.seed)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
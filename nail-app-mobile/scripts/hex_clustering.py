@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Merge near-duplicate swatch hexes before the catalogue sync.
+
+Scraped hexes are swatch averages (`average_hex_from_image`), so one real shade
+scraped twice can land a unit or two apart in RGB and would otherwise become
+two `colors` rows. `merge_near_duplicates` folds every hex within a CIEDE2000
+threshold of a canonical hex into it and rewrites the variants accordingly;
+`plan_merges` returns the same merges for callers that rewrite hexes
+themselves (`VariantStore.remap_hexes`).
+
+Neighbour search uses a CIELAB voxel grid. Each hex gets the ellipsoid that
+bounds its CIEDE2000 neighbourhood (`shade_index.search_extent`, wider for
+saturated colours) and looks up only the cells that ellipsoid overlaps: one
+sort of the cell keys plus a `searchsorted` per neighbour offset, i.e.
+O(n log n) instead of O(n²). Candidates are then checked exactly.
+
+Clusters are formed leader-first rather than by chaining: hexes with the most
+variants (then the lowest hex code) claim their unclaimed neighbours, so every
+merged hex is within the threshold of its canonical hex.
+
+Used by `sync_color_catalog.py --merge-delta-e`. Run this file directly to
+benchmark on a synthetic catalogue with jittered duplicates:
+
+    python scripts/hex_clustering.py --bench 100000
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import logging
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from catalog_model import VariantRecord
+from color_science import delta_e_2000, hex_to_lab
+from shade_index import search_extent
+
+
+@dataclass(frozen=True)
+class HexMerge:
+    hex_code: str
+    canonical: str
+    delta_e: float
+
+
+def _expand(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(row, position) for every position in each [start, start + count) run."""
+    total = int(counts.sum())
+    row = np.repeat(np.arange(len(counts)), counts)
+    return row, starts[row] + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def near_duplicate_pairs(lab: np.ndarray, delta_e: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Index pairs (i < j) with CIEDE2000 <= delta_e, plus their distances."""
+    extent = search_extent(lab, delta_e)
+    if not np.isfinite(extent).all():
+        raise ValueError(f"ΔE threshold too large for near-duplicate merging: {delta_e}")
+    # Cells span the widest L* extent, so L* neighbours are always one cell away;
+    # a*/b* cells use the median extent and wide-extent (saturated) colours reach
+    # further out.
+    cell = np.array([extent[:, 0].max(), np.median(extent[:, 1]), np.median(extent[:, 1])])
+    reach = np.ceil(extent[:, 1] / cell[1]).astype(np.int64)
+    cells = np.floor(lab / cell).astype(np.int64)
+    cells -= cells.min(axis=0) - reach.max()  # keep a free margin so offsets never wrap
+    dims = cells.max(axis=0) + reach.max() + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+
+    order = np.argsort(keys, kind="stable")
+    unique_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    first: List[np.ndarray] = []
+    second: List[np.ndarray] = []
+    distances: List[np.ndarray] = []
+    for radius in np.unique(reach).tolist():
+        group = np.flatnonzero(reach == radius)
+        steps = range(-radius, radius + 1)
+        for dl, da, db in itertools.product((-1, 0, 1), steps, steps):
+            target = keys[group] + (dl * dims[1] + da) * dims[2] + db
+            slot = np.minimum(np.searchsorted(unique_keys, target), len(unique_keys) - 1)
+            hit = unique_keys[slot] == target
+            row, position = _expand(starts[slot[hit]], counts[slot[hit]])
+            i = group[hit][row]
+            j = order[position]
+            # Each pair is found from both ends (either extent bounds it); keep i < j
+            forward = i < j
+            i, j = i[forward], j[forward]
+            inside = (((lab[j] - lab[i]) / extent[i]) ** 2).sum(axis=1) <= 1
+            i, j = i[inside], j[inside]
+            distance = delta_e_2000(lab[i], lab[j])
+            close = distance <= delta_e
+            first.append(i[close])
+            second.append(j[close])
+            distances.append(distance[close])
+    if not first:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(first), np.concatenate(second), np.concatenate(distances)
+
+
+def cluster_hexes(hex_codes: Sequence[str], weights: Sequence[int], delta_e: float) -> List[HexMerge]:
+    """Assign each hex to a canonical hex within `delta_e`; returns only the merged ones."""
+    if not hex_codes:
+        return []
+    lab = hex_to_lab(hex_codes)
+    i, j, _ = near_duplicate_pairs(lab, delta_e)
+    if not len(i):
+        return []
+
+    # CSR adjacency over the (symmetric) near-duplicate edges
+    source = np.concatenate([i, j])
+    target = np.concatenate([j, i])
+    by_source = np.argsort(source, kind="stable")
+    neighbours = target[by_source]
+    indptr = np.searchsorted(source[by_source], np.arange(len(hex_codes) + 1))
+
+    canonical = np.full(len(hex_codes), -1, dtype=np.int64)
+    linked = np.unique(source)
+    priority = sorted(linked.tolist(), key=lambda index: (-weights[index], hex_codes[index]))
+    for leader in priority:
+        if canonical[leader] >= 0:
+            continue
+        canonical[leader] = leader
+        candidates = neighbours[indptr[leader] : indptr[leader + 1]]
+        canonical[candidates[canonical[candidates] < 0]] = leader
+
+    merged = np.flatnonzero((canonical >= 0) & (canonical != np.arange(len(hex_codes))))
+    distance = delta_e_2000(lab[merged], lab[canonical[merged]])
+    return [
+        HexMerge(hex_codes[index], hex_codes[canonical[index]], float(value))
+        for index, value in zip(merged.tolist(), distance.tolist())
+    ]
+
+
+def plan_merges(weights: Mapping[str, int], delta_e: float) -> List[HexMerge]:
+    """Cluster the hexes in `weights` (hex -> variant count) and log the merges planned."""
+    hex_codes = sorted(weights)
+    merges = cluster_hexes(hex_codes, [weights[hex_code] for hex_code in hex_codes], delta_e)
+    if not merges:
+        logging.info("No near-duplicate hexes within ΔE00 %.2f", delta_e)
+        return []
+    for merge in merges:
+        logging.debug("Merging %s into %s (ΔE00 %.2f)", merge.hex_code, merge.canonical, merge.delta_e)
+    logging.info(
+        "Merged %d near-duplicate hexes into %d canonical colours (ΔE00 <= %.2f)",
+        len(merges),
+        len({merge.canonical for merge in merges}),
+        delta_e,
+    )
+    return merges
+
+
+def merge_near_duplicates(
+    records: Iterable[VariantRecord], delta_e: float
+) -> Tuple[List[VariantRecord], List[HexMerge]]:
+    """Rewrite variants onto canonical hexes; returns the records and the merges applied."""
+    records = list(records)
+    merges = plan_merges(Counter(record.hex_code for record in records), delta_e)
+    target = {merge.hex_code: merge.canonical for merge in merges}
+    rewritten = [
+        replace(record, hex_code=target[record.hex_code]) if record.hex_code in target else record
+        for record in records
+    ]
+    return rewritten, merges
+
+
+def write_merge_report(path: Path, merges: Iterable[HexMerge]) -> None:
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["hex_code", "canonical_hex", "delta_e_2000"])
+        for merge in merges:
+            writer.writerow([merge.hex_code, merge.canonical, f"{merge.delta_e:.3f}"])
+
+
+def _brute_force_pairs(lab: np.ndarray, delta_e: float) -> int:
+    pairs = 0
+    for start in range(len(lab)):
+        pairs += int((delta_e_2000(lab[start], lab[start + 1 :]) <= delta_e).sum())
+    return pairs
+
+
+def synthetic_hexes(count: int, duplicate_share: float, seed: int = 7) -> List[str]:
+    """Random hexes where `duplicate_share` of them are ±2 RGB re-scrapes of another."""
+    rng = random.Random(seed)
+    base = [rng.randrange(1 << 24) for _ in range(int(count * (1 - duplicate_share)))]
+    hexes = [f"#{value:06X}" for value in base]
+    while len(hexes) < count:
+        value = rng.choice(base)
+        channels = [min(255, max(0, ((value >> shift) & 0xFF) + rng.randint(-2, 2))) for shift in (16, 8, 0)]
+        hexes.append("#{:02X}{:02X}{:02X}".format(*channels))
+    return sorted(set(hexes))
+
+
+def benchmark(count: int, delta_e: float, check: int) -> None:
+    hexes = synthetic_hexes(count, duplicate_share=0.1)
+    weights = [1] * len(hexes)
+    lab = hex_to_lab(hexes)
+
+    start = time.perf_counter()
+    i, _, _ = near_duplicate_pairs(lab, delta_e)
+    pair_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    merges = cluster_hexes(hexes, weights, delta_e)
+    cluster_seconds = time.perf_counter() - start
+
+    sample = lab[:check]
+    start = time.perf_counter()
+    brute_pairs = _brute_force_pairs(sample, delta_e)
+    brute_seconds = time.perf_counter() - start
+
+    print(f"hexes: {len(hexes):,}  ΔE00 threshold: {delta_e:g}")
+    print(f"  near-duplicate pairs (grid): {len(i):,} in {pair_seconds * 1000:.0f} ms")
+    print(f"  pairwise scan, extrapolated: {brute_seconds * (len(hexes) / len(sample)) ** 2:.0f} s")
+    print(f"  pairs + leader clustering:   {len(merges):,} merged in {cluster_seconds * 1000:.0f} ms")
+    print(f"  max ΔE00 to canonical: {max((merge.delta_e for merge in merges), default=0):.3f}")
+    grid_pairs = len(near_duplicate_pairs(sample, delta_e)[0])
+    print(f"  grid pairs == pairwise scan on first {len(sample):,}: {grid_pairs == brute_pairs}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark near-duplicate hex merging")
+    parser.add_argument("--bench", type=int, default=100_000, help="Synthetic hexes to cluster")
+    parser.add_argument("--delta-e", type=float, default=1.0, help="CIEDE2000 merge threshold")
+    parser.add_argument("--check", type=int, default=5000, help="Hexes to compare against a brute-force scan")
+    args = parser.parse_args(argv)
+    benchmark(args.bench, args.delta_e, args.check)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
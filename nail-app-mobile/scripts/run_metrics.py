@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""Run metrics shared by the scrapers and the catalogue sync.
+
+A run records five things:
+- Wall and CPU time per phase. Phases are named code paths, and time is
+  exclusive: a nested phase's time is not counted again in its parent.
+- HTTP requests by host and status, with bytes out (URL plus body) and in.
+  Both `requests` (the scrapers) and `httpx` (supabase-py in the sync) are
+  counted.
+- Retries by operation.
+- Cache hits and misses by cache.
+- Free-form item counts such as rows written.
+
+At the end of the run it writes a JSON report and a Prometheus textfile, for
+node_exporter's textfile collector. Both are written atomically, and a failed
+run still writes them, with `success` 0:
+
+    with start_run("scrape_opi_uk") as metrics:
+        ...
+        metrics.count("rows", len(rows))
+
+    @timed                          # phase named after the function
+    def build_rows(...): ...
+
+    with phase("write"): ...
+    record_cache("swatch_hex", hit=url in cache)
+    record_retry("opi_graphql")
+
+The helpers report to the active run. Outside one, they update a detached
+run that is never written, so library code can call them unconditionally.
+Phases are tracked on the thread that started the run; calls from other
+threads are ignored.
+
+Output paths come from `start_run(json_path=..., textfile=...)`, or else from
+the environment. A path naming an existing directory (or ending in `/`) gets
+`<job>.json` / `<job>.prom` inside it:
+
+    RUN_METRICS_JSON        e.g. /var/log/nail-catalog/
+    RUN_METRICS_TEXTFILE    e.g. /var/lib/node_exporter/textfile/
+
+With `trace` (or `RUN_TRACE`, or the scripts' `--trace PATH`), every phase
+call and every HTTP request is also kept as a span. They are written as Chrome
+trace-event JSON (`<job>.trace.json` in a directory; gzipped if the name ends
+in `.gz`), which opens in https://ui.perfetto.dev or chrome://tracing. Phases
+nest on the main thread's track, so each request sits inside the stage that
+made it. Requests from worker threads get their own tracks. A generator
+decorated with `@timed` gets one span per resume, e.g. one per page a
+paginating generator fetches. A span costs a few microseconds, so tracing is
+off unless asked for.
+
+With `profile` (or `RUN_PROFILE`, or `--profile PATH`), the run is also
+sampled by `sampling_profiler.py`. Each stack sample is tagged with the phase
+active at the time. The run writes `<job>.collapsed` (flame-graph input) and
+`<job>.hot.txt` (top functions overall and per phase), and adds a summary to
+the JSON report.
+
+Prometheus series use the `nail_catalog_` prefix. They are gauges describing
+the last run of each `job`: `run_success`, `run_last_timestamp_seconds`,
+`run_duration_seconds`, `run_cpu_seconds`, `phase_duration_seconds{phase}`,
+`phase_cpu_seconds{phase}`, `phase_calls{phase}`, `http_requests{host,status}`,
+`http_bytes{host,direction}`, `retries{operation}`,
+`cache_lookups{cache,result}` and `items{item}`.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import gzip
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
+
+METRIC_PREFIX = "nail_catalog_"
+JSON_ENV = "RUN_METRICS_JSON"
+TEXTFILE_ENV = "RUN_METRICS_TEXTFILE"
+TRACE_ENV = "RUN_TRACE"
+PROFILE_ENV = "RUN_PROFILE"
+PROFILE_MODE_ENV = "RUN_PROFILE_MODE"
+PROFILE_INTERVAL_ENV = "RUN_PROFILE_INTERVAL_MS"
+
+F = TypeVar("F", bound=Callable)
+
+
+@dataclass
+class PhaseStats:
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    calls: int = 0
+    requests: int = 0
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    bytes_out: int = 0
+    bytes_in: int = 0
+
+
+class RunMetrics:
+    """Measurements for one run of a job."""
+
+    def __init__(self, job: str, trace: bool = False) -> None:
+        self.job = job
+        self.trace_events: Optional[List[dict]] = [] if trace else None
+        self.profiler = None  # a SamplingProfiler while profiling
+        self.phases: Dict[str, PhaseStats] = {}
+        self.hosts: Dict[str, HostStats] = {}
+        self.statuses: Counter = Counter()  # (host, status) -> requests
+        self.retries: Counter = Counter()
+        self.caches: Dict[str, Counter] = {}
+        self.items: Counter = Counter()
+        self.error = ""
+        self.exit_code = 0
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self._start = (time.perf_counter(), time.process_time())
+        self._end: Optional[Tuple[float, float]] = None
+        self._thread = threading.get_ident()
+        self._stack: list = []
+        self._mark = self._start
+        self._lock = threading.Lock()
+
+    # Phases -----------------------------------------------------------------
+
+    def _charge(self) -> None:
+        now = (time.perf_counter(), time.process_time())
+        if self._stack:
+            stats = self.phases[self._stack[-1]]
+            stats.seconds += now[0] - self._mark[0]
+            stats.cpu_seconds += now[1] - self._mark[1]
+        self._mark = now
+
+    @property
+    def current_phase(self) -> str:
+        """Innermost phase open on the owning thread ("" outside any phase)."""
+        stack = self._stack
+        return stack[-1] if stack else ""
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        if threading.get_ident() != self._thread:
+            # Worker threads are not charged to phases, but still get their own trace track
+            if self.trace_events is None:
+                yield
+                return
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self._span(name, "phase", start, time.perf_counter())
+            return
+        self._charge()
+        start = self._mark[0]
+        self.phases.setdefault(name, PhaseStats()).calls += 1
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._charge()
+            self._stack.pop()
+            if self.trace_events is not None:
+                self._span(name, "phase", start, self._mark[0])
+
+    def _span(self, name: str, category: str, start: float, end: float, args: Optional[dict] = None) -> None:
+        # Complete ("X") events in microseconds since the run started; list.append is atomic
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self._start[0]) * 1e6, 3),
+            "dur": round((end - start) * 1e6, 3),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self.trace_events.append(event)
+
+    # Counters ---------------------------------------------------------------
+
+    def record_request(self, url: str, status: Optional[int], bytes_out: int, bytes_in: int,
+                       method: str = "GET", start: Optional[float] = None) -> None:
+        split = urlsplit(url)
+        host = split.netloc or "unknown"
+        if self.trace_events is not None and start is not None:
+            self._span(
+                f"{method} {host}{split.path}",
+                "http",
+                start,
+                time.perf_counter(),
+                {"status": status, "bytes_out": bytes_out, "bytes_in": bytes_in, "url": url[:500]},
+            )
+        with self._lock:
+            stats = self.hosts.setdefault(host, HostStats())
+            stats.requests += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            self.statuses[(host, "error" if status is None else str(status))] += 1
+            if self._stack and threading.get_ident() == self._thread:
+                self.phases[self._stack[-1]].requests += 1
+
+    def record_retry(self, operation: str) -> None:
+        with self._lock:
+            self.retries[operation] += 1
+
+    def record_cache(self, cache: str, hit: Optional[bool] = None, hits: int = 0, misses: int = 0) -> None:
+        if hit is not None:
+            hits, misses = hits + hit, misses + (not hit)
+        with self._lock:
+            counts = self.caches.setdefault(cache, Counter())
+            counts["hit"] += hits
+            counts["miss"] += misses
+
+    def count(self, item: str, value: int = 1) -> None:
+        with self._lock:
+            self.items[item] += value
+
+    # HTTP -------------------------------------------------------------------
+
+    @contextlib.contextmanager
+    def instrument_http(self) -> Iterator[None]:
+        """Count every `requests` and `httpx` request sent while the block runs."""
+        restore = []
+        try:
+            from requests.adapters import HTTPAdapter
+        except ImportError:
+            HTTPAdapter = None
+        if HTTPAdapter is not None:
+            original_send = HTTPAdapter.send
+
+            def adapter_send(adapter, request, **kwargs):
+                url, body, method = request.url, request.body, request.method
+                sent = len(url) + (len(body.encode("utf-8")) if isinstance(body, str) else len(body or b""))
+                start = time.perf_counter()
+                try:
+                    response = original_send(adapter, request, **kwargs)
+                except Exception:
+                    self.record_request(url, None, sent, 0, method, start)
+                    raise
+                self.record_request(url, response.status_code, sent, len(response.content), method, start)
+                return response
+
+            HTTPAdapter.send = adapter_send
+            restore.append((HTTPAdapter, "send", original_send))
+        try:
+            import httpx
+        except ImportError:
+            httpx = None
+        if httpx is not None:
+            original_client_send = httpx.Client.send
+
+            def client_send(client, request, *args, **kwargs):
+                url = str(request.url)
+                sent = len(url) + len(request.content)
+                start = time.perf_counter()
+                try:
+                    response = original_client_send(client, request, *args, **kwargs)
+                except Exception:
+                    self.record_request(url, None, sent, 0, request.method, start)
+                    raise
+                # Streamed bodies are not read here; supabase-py never streams
+                received = 0 if kwargs.get("stream") else len(response.content)
+                self.record_request(url, response.status_code, sent, received, request.method, start)
+                return response
+
+            httpx.Client.send = client_send
+            restore.append((httpx.Client, "send", original_client_send))
+        try:
+            yield
+        finally:
+            for owner, name, original in reversed(restore):
+                setattr(owner, name, original)
+
+    # Reporting --------------------------------------------------------------
+
+    def finish(self, error: str = "", exit_code: Optional[int] = None) -> None:
+        self._charge()
+        self._end = (time.perf_counter(), time.process_time())
+        self.finished_at = datetime.now(timezone.utc)
+        if error:
+            self.error = error
+        if exit_code is not None:
+            self.exit_code = exit_code
+
+    @property
+    def success(self) -> bool:
+        return not self.error and self.exit_code == 0
+
+    def as_dict(self) -> Dict[str, object]:
+        end = self._end or (time.perf_counter(), time.process_time())
+        return {
+            "job": self.job,
+            "success": self.success,
+            "error": self.error,
+            "exit_code": self.exit_code,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": end[0] - self._start[0],
+            "cpu_seconds": end[1] - self._start[1],
+            "phases": {name: asdict(stats) for name, stats in self.phases.items()},
+            "http": {
+                host: {**asdict(stats), "statuses": {status: n for (h, status), n in sorted(self.statuses.items()) if h == host}}
+                for host, stats in sorted(self.hosts.items())
+            },
+            "retries": dict(self.retries),
+            "caches": {
+                name: {
+                    "hits": counts["hit"],
+                    "misses": counts["miss"],
+                    "hit_rate": counts["hit"] / (counts["hit"] + counts["miss"]) if counts["hit"] + counts["miss"] else None,
+                }
+                for name, counts in self.caches.items()
+            },
+            "items": dict(self.items),
+            **({"profile": self.profiler.summary()} if self.profiler is not None else {}),
+        }
+
+    def prometheus(self) -> str:
+        report = self.as_dict()
+        job = {"job": self.job}
+        families = [
+            ("run_success", "1 if the last run finished without error", [(job, int(self.success))]),
+            ("run_last_timestamp_seconds", "Unix time the last run finished",
+             [(job, (self.finished_at or datetime.now(timezone.utc)).timestamp())]),
+            ("run_duration_seconds", "Wall time of the last run", [(job, report["duration_seconds"])]),
+            ("run_cpu_seconds", "Process CPU time of the last run", [(job, report["cpu_seconds"])]),
+            ("phase_duration_seconds", "Exclusive wall time per phase",
+             [({**job, "phase": name}, stats.seconds) for name, stats in self.phases.items()]),
+            ("phase_cpu_seconds", "Exclusive process CPU time per phase",
+             [({**job, "phase": name}, stats.cpu_seconds) for name, stats in self.phases.items()]),
+            ("phase_calls", "Times each phase was entered",
+             [({**job, "phase": name}, stats.calls) for name, stats in self.phases.items()]),
+            ("http_requests", "HTTP requests by host and status (error = no response)",
+             [({**job, "host": host, "status": status}, n) for (host, status), n in sorted(self.statuses.items())]),
+            ("http_bytes", "HTTP bytes by host and direction",
+             [({**job, "host": host, "direction": direction}, getattr(stats, f"bytes_{direction}"))
+              for host, stats in sorted(self.hosts.items()) for direction in ("out", "in")]),
+            ("retries", "Retried operations",
+             [({**job, "operation": name}, n) for name, n in sorted(self.retries.items())]),
+            ("cache_lookups", "Cache lookups by result",
+             [({**job, "cache": name, "result": result}, counts[result])
+              for name, counts in sorted(self.caches.items()) for result in ("hit", "miss")]),
+            ("items", "Items counted by the job (rows written, ...)",
+             [({**job, "item": name}, n) for name, n in sorted(self.items.items())]),
+        ]
+        lines = []
+        for name, help_text, samples in families:
+            if not samples:
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} gauge")
+            for labels, value in samples:
+                rendered = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+                lines.append(f"{METRIC_PREFIX}{name}{{{rendered}}} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def chrome_trace(self) -> Dict[str, object]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        names[self._thread] = "main"
+        pid = os.getpid()
+        events = self.trace_events or []
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.job}}]
+        for tid in sorted({event["tid"] for event in events}):
+            metadata.append(
+                {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": names.get(tid, f"thread {tid}")}}
+            )
+        return {
+            "traceEvents": metadata + sorted(events, key=lambda event: event["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"job": self.job, "started_at": self.started_at.isoformat(), "success": self.success},
+        }
+
+    def write(
+        self,
+        json_path: Optional[Union[str, Path]] = None,
+        textfile: Optional[Union[str, Path]] = None,
+        trace: Optional[Union[str, Path]] = None,
+        profile: Optional[Union[str, Path]] = None,
+    ) -> None:
+        if json_path is not None:
+            _atomic_write(_resolve(json_path, f"{self.job}.json"), json.dumps(self.as_dict(), indent=2))
+        if textfile is not None:
+            _atomic_write(_resolve(textfile, f"{self.job}.prom"), self.prometheus())
+        if trace is not None and self.trace_events is not None:
+            path = _resolve(trace, f"{self.job}.trace.json")
+            data = json.dumps(self.chrome_trace(), separators=(",", ":"))
+            if path.suffix == ".gz":
+                _atomic_write(path, gzip.compress(data.encode("utf-8"), mtime=0))
+            else:
+                _atomic_write(path, data)
+        if profile is not None and self.profiler is not None:
+            path = _resolve(profile, f"{self.job}.collapsed")
+            _atomic_write(path, self.profiler.collapsed())
+            _atomic_write(path.with_suffix(".hot.txt"), self.profiler.report(self.job))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _resolve(target: Union[str, Path], file_name: str) -> Path:
+    # Checked on the raw string: Path() drops a trailing separator
+    text = os.fspath(target)
+    if text.endswith(("/", os.sep)) or Path(text).is_dir():
+        return Path(text) / file_name
+    return Path(text)
+
+
+def _atomic_write(path: Path, data: Union[str, bytes]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data.encode("utf-8") if isinstance(data, str) else data)
+    tmp.replace(path)
+
+
+_detached = RunMetrics("detached")
+_active: Optional[RunMetrics] = None
+
+
+def current() -> RunMetrics:
+    """The active run, or a detached one that is never written."""
+    return _active or _detached
+
+
+@contextlib.contextmanager
+def start_run(
+    job: str,
+    json_path: Optional[Union[str, Path]] = None,
+    textfile: Optional[Union[str, Path]] = None,
+    trace: Optional[Union[str, Path]] = None,
+    profile: Optional[Union[str, Path]] = None,
+) -> Iterator[RunMetrics]:
+    """Measure the block as one run of `job` and write its reports when it ends, however it ends."""
+    global _active
+    json_path = json_path or os.environ.get(JSON_ENV) or None
+    textfile = textfile or os.environ.get(TEXTFILE_ENV) or None
+    trace = trace or os.environ.get(TRACE_ENV) or None
+    profile = profile or os.environ.get(PROFILE_ENV) or None
+    metrics, previous = RunMetrics(job, trace=trace is not None), _active
+    _active = metrics
+    error = ""
+    try:
+        with metrics.instrument_http(), _profiling(metrics, profile is not None):
+            yield metrics
+    except SystemExit as exc:
+        if exc.code not in (0, None):
+            error = f"SystemExit: {exc.code}"
+        raise
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _active = previous
+        metrics.finish(error)
+        try:
+            metrics.write(json_path, textfile, trace, profile)
+        except OSError as exc:
+            logging.warning("Could not write run metrics: %s", exc)
+
+
+@contextlib.contextmanager
+def _profiling(metrics: RunMetrics, enabled: bool) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+    from sampling_profiler import DEFAULT_INTERVAL, SamplingProfiler
+
+    interval = float(os.environ.get(PROFILE_INTERVAL_ENV) or DEFAULT_INTERVAL * 1000) / 1000
+    mode = os.environ.get(PROFILE_MODE_ENV) or None
+    metrics.profiler = SamplingProfiler(interval, mode, tag=lambda: metrics.current_phase)
+    with metrics.profiler:
+        yield
+
+
+def phase(name: str):
+    """Context manager timing the block as `name` in the active run."""
+    return current().phase(name)
+
+
+def timed(function: F) -> F:
+    """Time every call of `function` as a phase named after it (each resume, for a generator)."""
+    if inspect.isgeneratorfunction(function):
+
+        @functools.wraps(function)
+        def generator(*args, **kwargs):
+            iterator = function(*args, **kwargs)
+            while True:
+                with current().phase(function.__name__):
+                    try:
+                        item = next(iterator)
+                    except StopIteration as stop:
+                        return stop.value
+                yield item
+
+        return generator  # type: ignore[return-value]
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with current().phase(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def record_cache(cache: str, hit: Optional[bool] = None, hits: int = 0, misses: int = 0) -> None:
+    current().record_cache(cache, hit, hits, misses)
+
+
+def record_retry(operation: str) -> None:
+    current().record_retry(operation)
+
+
+def count(item: str, value: int = 1) -> None:
+    current().count(item, value)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Low-overhead sampling profiler for the scrapers and the catalogue sync.
+
+A deterministic profiler (cProfile) hooks every call, which slows the
+per-row code we most want to measure (shade-name regexes, the `average_hex`
+crop loop, the sync normalisers) severalfold and skews the result. This one
+takes a snapshot of the Python stack every few milliseconds instead:
+
+- `cpu` mode (the default on Unix, when started from the main thread) uses
+  `ITIMER_PROF`/`SIGPROF`, so samples follow CPU time and a run waiting on
+  the network collects none.
+- `wall` mode uses a background thread reading `sys._current_frames()` and
+  samples the profiled thread whether it computes or waits. It is the
+  fallback on platforms without `setitimer`.
+
+Every sample is tagged with the run phase active at the time (see
+`run_metrics.py`), so hot paths are reported per `download_bytes`,
+`average_hex`, `catalogue_records`, ... Two files are written:
+
+    <job>.collapsed    collapsed stacks, "phase;outer;...;leaf count" per line,
+                       ready for flamegraph.pl, speedscope or inferno
+    <job>.hot.txt      the top-N functions by self and total samples, then the
+                       hottest functions within each phase
+
+Enable it with `--profile PATH` on the scrapers and the sync, or by setting
+`RUN_PROFILE` (`RUN_PROFILE_MODE`, `RUN_PROFILE_INTERVAL_MS` tune it). A path
+naming a directory (or ending in `/`) gets the job-named files inside it.
+At the default 5 ms interval a sample costs a few microseconds, well under 1%
+of a run.
+"""
+from __future__ import annotations
+
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.005
+MODES = ("cpu", "wall")
+
+# Wrapper frames (phase timers, context managers, this module) only clutter the stacks
+_HIDDEN_FILES = {"run_metrics.py", "contextlib.py", "sampling_profiler.py"}
+
+Stack = Tuple[CodeType, ...]
+
+
+def _label(code: CodeType) -> str:
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})".replace(";", ",")
+
+
+class SamplingProfiler:
+    """Collect stack samples of the thread that creates the profiler, tagged by `tag()`."""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        mode: Optional[str] = None,
+        tag: Optional[Callable[[], str]] = None,
+    ) -> None:
+        on_main = threading.current_thread() is threading.main_thread()
+        if mode is None:
+            mode = "cpu" if hasattr(signal, "setitimer") and on_main else "wall"
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiler mode {mode!r}; expected one of {', '.join(MODES)}")
+        if mode == "cpu" and not (hasattr(signal, "setitimer") and on_main):
+            raise ValueError("cpu mode needs setitimer and must be started from the main thread")
+        self.interval = interval
+        self.mode = mode
+        self.samples: Counter = Counter()
+        self.seconds = 0.0
+        self._tag = tag or (lambda: "")
+        self._thread = threading.get_ident()
+        self._busy = False
+        self._started = 0.0
+        self._previous_handler = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        if self.mode == "cpu":
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        if self.mode == "cpu":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        elif self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        self.seconds = time.perf_counter() - self._started
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _on_signal(self, signum: int, frame: Optional[FrameType]) -> None:
+        self._sample(frame)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample(sys._current_frames().get(self._thread))
+
+    def _sample(self, frame: Optional[FrameType]) -> None:
+        # A signal can land while a previous sample is still being recorded
+        if frame is None or self._busy:
+            return
+        self._busy = True
+        try:
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self.samples[(self._tag(), tuple(codes))] += 1
+        finally:
+            self._busy = False
+
+    @property
+    def total(self) -> int:
+        return sum(self.samples.values())
+
+    def _stacks(self) -> Counter:
+        """Samples per (phase, outermost-first labels), with wrapper frames dropped."""
+        stacks: Counter = Counter()
+        labels: Dict[CodeType, Optional[str]] = {}
+        for (phase, codes), count in self.samples.items():
+            frames = []
+            for code in reversed(codes):
+                if code not in labels:
+                    labels[code] = None if Path(code.co_filename).name in _HIDDEN_FILES else _label(code)
+                if labels[code] is not None:
+                    frames.append(labels[code])
+            stacks[(phase or "-", tuple(frames))] += count
+        return stacks
+
+    def collapsed(self) -> str:
+        lines = [
+            ";".join((f"phase:{phase}",) + frames) + f" {count}"
+            for (phase, frames), count in sorted(self._stacks().items())
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def hot_functions(self, top: int = 25) -> List[Dict[str, object]]:
+        own: Counter = Counter()
+        inclusive: Counter = Counter()
+        for (_, frames), count in self._stacks().items():
+            if frames:
+                own[frames[-1]] += count
+            for label in set(frames):
+                inclusive[label] += count
+        total = self.total or 1
+        return [
+            {
+                "function": label,
+                "self": own[label],
+                "total": inclusive[label],
+                "self_pct": round(100 * own[label] / total, 1),
+                "total_pct": round(100 * inclusive[label] / total, 1),
+            }
+            for label in sorted(inclusive, key=lambda name: (-own[name], -inclusive[name], name))[:top]
+        ]
+
+    def by_phase(self, top: int = 3) -> List[Dict[str, object]]:
+        phases: Dict[str, Counter] = {}
+        for (phase, frames), count in self._stacks().items():
+            leaves = phases.setdefault(phase, Counter())
+            leaves[frames[-1] if frames else "-"] += count
+        total = self.total or 1
+        rows = []
+        for phase, leaves in sorted(phases.items(), key=lambda item: -sum(item[1].values())):
+            samples = sum(leaves.values())
+            rows.append(
+                {
+                    "phase": phase,
+                    "samples": samples,
+                    "pct": round(100 * samples / total, 1),
+                    "hottest": [
+                        {"function": label, "pct": round(100 * count / samples, 1)}
+                        for label, count in leaves.most_common(top)
+                    ],
+                }
+            )
+        return rows
+
+    def summary(self, top: int = 10) -> Dict[str, object]:
+        return {
+            "mode": self.mode,
+            "interval_ms": self.interval * 1000,
+            "samples": self.total,
+            "hot_functions": self.hot_functions(top),
+            "phases": self.by_phase(),
+        }
+
+    def report(self, title: str = "", top: int = 25) -> str:
+        lines = [
+            f"Sampling profile{': ' + title if title else ''} — {self.mode} mode, "
+            f"{self.interval * 1000:g} ms interval, {self.total:,} samples over {self.seconds:.2f}s wall",
+            "",
+            f"{'self%':>6} {'total%':>7} {'self':>7} {'total':>7}  function",
+        ]
+        for row in self.hot_functions(top):
+            lines.append(
+                f"{row['self_pct']:>6.1f} {row['total_pct']:>7.1f} {row['self']:>7} {row['total']:>7}  {row['function']}"
+            )
+        lines += ["", f"{'phase':<28} {'samples':>8} {'%':>6}  hottest (self % of phase)"]
+        for row in self.by_phase():
+            hottest = ", ".join(f"{item['function']} {item['pct']:.0f}%" for item in row["hottest"])
+            lines.append(f"{row['phase']:<28} {row['samples']:>8} {row['pct']:>6.1f}  {hottest}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Perceptual nearest-shade lookup over the variant catalogue.
+
+Shades are indexed by their CIELAB coordinates in a static k-d tree (built once
+with NumPy, leaves stored contiguously). Queries collect candidates by
+Euclidean Lab distance (CIE76) and re-rank them by CIEDE2000, which is what the
+results report: the CIE76 search region is widened by the CIEDE2000 weights
+at the query colour (`search_extent`), so no closer CIEDE2000 match falls
+outside it.
+Brand, product line and finish filters each get their own tree over the
+matching subset, built on first use and cached, so filtered queries cost the
+same as unfiltered ones.
+
+Library use:
+
+    index = ShadeIndex(records)
+    index.nearest("#C8102E", k=5, brand="CND")
+    index.within("#C8102E", 3.0, finish=["cream", "glossy"])
+
+`sync_color_catalog.py --nearest HEX` runs the same lookup against the loaded
+CSVs. Run this file directly to benchmark queries on a synthetic catalogue:
+
+    python scripts/shade_index.py --bench 100000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from catalog_model import CANONICAL_FINISHES, VariantRecord, normalise_hex
+from color_science import delta_e_2000, hex_to_lab, lab_to_lch
+
+Filter = Union[None, str, Collection[str]]
+
+LEAF_SIZE = 128
+# Upper bound of S_L (lightness weight) in CIEDE2000, reached at L = 0 / 100
+MAX_LIGHTNESS_WEIGHT = 1 + 0.015 * 2500 / np.sqrt(2520)
+# Largest chroma gain from the a* rescaling (G * C peaks around C = 15)
+MAX_CHROMA_GAIN = 6.5
+
+
+@dataclass(frozen=True)
+class ShadeMatch:
+    record: VariantRecord
+    delta_e: float
+
+
+class _KDTree:
+    """Median-split k-d tree; nodes are (dim, split, left, right), leaves (-1, 0, start, end)."""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = LEAF_SIZE) -> None:
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        self.nodes: List[Tuple[int, float, int, int]] = []
+        self._points = points
+        self.root = self._build(0, len(points)) if len(points) else -1
+        # Leaf slices become contiguous views into the permuted copy
+        self.points = points[self.order]
+        del self._points
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self.nodes)
+        if end - start <= self.leaf_size:
+            self.nodes.append((-1, 0.0, start, end))
+            return node
+        ids = self.order[start:end]
+        coords = self._points[ids]
+        dim = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+        mid = (end - start) // 2
+        self.order[start:end] = ids[np.argpartition(coords[:, dim], mid)]
+        split = float(self._points[self.order[start + mid], dim])
+        self.nodes.append((dim, split, 0, 0))
+        left = self._build(start, start + mid)
+        right = self._build(start + mid, end)
+        self.nodes[node] = (dim, split, left, right)
+        return node
+
+    def knn(self, query: np.ndarray, count: int) -> np.ndarray:
+        """Positions of the `count` nearest points (Euclidean), unsorted."""
+        best_ids = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0)
+        worst = np.inf
+        nodes, points, order = self.nodes, self.points, self.order
+        stack = [(self.root, 0.0)] if self.root >= 0 else []
+        while stack:
+            node, bound = stack.pop()
+            if bound >= worst:
+                continue
+            dim, split, left, right = nodes[node]
+            if dim >= 0:
+                diff = query[dim] - split
+                near, far = (left, right) if diff < 0 else (right, left)
+                stack.append((far, diff * diff))
+                stack.append((near, 0.0))
+                continue
+            best_dist = np.concatenate([best_dist, ((points[left:right] - query) ** 2).sum(axis=1)])
+            best_ids = np.concatenate([best_ids, order[left:right]])
+            if len(best_ids) > count:
+                top = np.argpartition(best_dist, count - 1)[:count]
+                best_dist, best_ids = best_dist[top], best_ids[top]
+            if len(best_ids) == count:
+                worst = float(best_dist.max())
+        return best_ids
+
+    def ellipsoid(self, query: np.ndarray, extent: np.ndarray) -> np.ndarray:
+        """Positions of every point with sum(((p - query) / extent) ** 2) <= 1."""
+        nodes, points, order = self.nodes, self.points, self.order
+        found: List[np.ndarray] = []
+        stack = [self.root] if self.root >= 0 else []
+        while stack:
+            dim, split, left, right = nodes[stack.pop()]
+            if dim >= 0:
+                diff = query[dim] - split
+                stack.append(left if diff < 0 else right)
+                if abs(diff) <= extent[dim]:
+                    stack.append(right if diff < 0 else left)
+                continue
+            hits = order[left:right][(((points[left:right] - query) / extent) ** 2).sum(axis=1) <= 1]
+            if len(hits):
+                found.append(hits)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def _lightness_weight(lightness: np.ndarray) -> np.ndarray:
+    return 1 + 0.015 * (lightness - 50) ** 2 / np.sqrt(20 + (lightness - 50) ** 2)
+
+
+def search_extent(lab: np.ndarray, delta_e: float) -> np.ndarray:
+    """Per-axis half-widths (L*, a*, b*) of an ellipsoid holding every colour within
+    `delta_e` (CIEDE2000) of each colour in `lab` (shape (..., 3) in and out).
+
+    CIEDE2000 divides the lightness difference by S_L and the chroma/hue
+    differences by S_C >= S_H (the rotation term R_T can shrink the latter by
+    up to 1 / sqrt(1 - |R_T| / 2) more), and a* is only ever scaled up. So
+    |dL| / (S_L * dE) and |dab| / (S_C * stretch * dE) together stay inside
+    the unit ball. The extent is inf where the bound degenerates (very large
+    radii).
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    delta_e = max(delta_e, 1e-9)  # an exact match leaves a zero-width search
+    lightness, chroma, hue = np.moveaxis(lab_to_lch(lab), -1, 0)
+
+    # Lightness: S_L grows away from L = 50 and is evaluated at the pair mean
+    reach = MAX_LIGHTNESS_WEIGHT * delta_e / 2
+    extent_l = delta_e * np.maximum(_lightness_weight(lightness - reach), _lightness_weight(lightness + reach))
+
+    def ab_extent(stretch: np.ndarray) -> np.ndarray:
+        # S_C = 1 + 0.045 * mean chroma, and the mean grows by up to half the extent
+        denominator = 1 - stretch * 0.0225 * delta_e
+        extent = stretch * delta_e * (1 + 0.045 * (chroma + MAX_CHROMA_GAIN)) / np.maximum(denominator, 0.1)
+        return np.where(denominator > 0.1, extent, np.inf)
+
+    extent_ab = ab_extent(np.ones_like(chroma))
+    # R_T peaks at a mean hue of 275°; take the worst hue the pair mean can reach
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.clip(extent_ab / chroma, 0, 1)
+    spread = np.where(extent_ab >= chroma, 180.0, np.degrees(np.arcsin(ratio)))
+    offset = (hue - 275 + 180) % 360 - 180
+    closest = np.maximum(np.abs(offset) - spread / 2, 0.0)
+    mean_chroma = np.minimum(chroma + MAX_CHROMA_GAIN + extent_ab / 2, 1e3)
+    rotation = (
+        2
+        * np.sqrt(mean_chroma**7 / (mean_chroma**7 + 25.0**7))
+        * np.sin(np.radians(60 * np.exp(-((closest / 25) ** 2))))
+    )
+    extent_ab = ab_extent(1 / np.sqrt(np.maximum(1 - rotation / 2, 1e-6)))
+    return np.stack([extent_l, extent_ab, extent_ab], axis=-1)
+
+
+def _as_set(value: Filter) -> Optional[frozenset]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return frozenset([value.casefold()])
+    return frozenset(item.casefold() for item in value)
+
+
+class ShadeIndex:
+    """Static CIELAB index over catalogue variants."""
+
+    def __init__(self, records: Sequence[VariantRecord], leaf_size: int = LEAF_SIZE) -> None:
+        self.records = list(records)
+        self.leaf_size = leaf_size
+        self.lab = hex_to_lab([record.hex_code for record in self.records]).reshape(-1, 3)
+        self._columns: Dict[str, np.ndarray] = {
+            "brand": np.array([record.brand.casefold() for record in self.records], dtype=object),
+            "product_line": np.array([record.product_line.casefold() for record in self.records], dtype=object),
+            "finish": np.array([record.finish.casefold() for record in self.records], dtype=object),
+        }
+        self._trees: Dict[Tuple, Tuple[_KDTree, np.ndarray]] = {}
+        self._tree(None, None, None)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _tree(self, brand: Filter, product_line: Filter, finish: Filter) -> Tuple[_KDTree, np.ndarray]:
+        """k-d tree over the filtered subset plus its record ids, built once per filter."""
+        wanted = (("brand", _as_set(brand)), ("product_line", _as_set(product_line)), ("finish", _as_set(finish)))
+        if wanted not in self._trees:
+            mask = np.ones(len(self.records), dtype=bool)
+            for column, values in wanted:
+                if values is not None:
+                    mask &= np.isin(self._columns[column], list(values))
+            ids = np.flatnonzero(mask)
+            self._trees[wanted] = (_KDTree(self.lab[ids], self.leaf_size), ids)
+        return self._trees[wanted]
+
+    def _query_lab(self, hex_code: str) -> np.ndarray:
+        normalised = normalise_hex(hex_code)
+        if not normalised:
+            raise ValueError(f"Invalid hex colour: {hex_code!r}")
+        return hex_to_lab([normalised])[0]
+
+    def _ranked(self, query: np.ndarray, ids: np.ndarray, limit: float) -> List[ShadeMatch]:
+        delta = delta_e_2000(query, self.lab[ids])
+        keep = delta <= limit
+        ids, delta = ids[keep], delta[keep]
+        ranking = np.lexsort((ids, delta))
+        return [ShadeMatch(self.records[ids[i]], float(delta[i])) for i in ranking]
+
+    def _within(self, query: np.ndarray, delta_e: float, tree: _KDTree, ids: np.ndarray) -> List[ShadeMatch]:
+        extent = search_extent(query, delta_e)
+        positions = tree.ellipsoid(query, extent) if np.isfinite(extent).all() else np.arange(len(ids))
+        return self._ranked(query, ids[positions], delta_e)
+
+    def nearest(
+        self,
+        hex_code: str,
+        k: int = 5,
+        brand: Filter = None,
+        product_line: Filter = None,
+        finish: Filter = None,
+    ) -> List[ShadeMatch]:
+        """The `k` closest shades by CIEDE2000, optionally restricted by brand/line/finish."""
+        tree, ids = self._tree(brand, product_line, finish)
+        if k <= 0 or not len(ids):
+            return []
+        query = self._query_lab(hex_code)
+        # The k CIE76 neighbours bound the k-th CIEDE2000 distance from above;
+        # everything that can beat them lies inside the matching search ellipsoid.
+        seeds = ids[tree.knn(query, min(k, len(ids)))]
+        bound = float(delta_e_2000(query, self.lab[seeds]).max())
+        return self._within(query, bound, tree, ids)[:k]
+
+    def within(
+        self,
+        hex_code: str,
+        delta_e: float,
+        brand: Filter = None,
+        product_line: Filter = None,
+        finish: Filter = None,
+    ) -> List[ShadeMatch]:
+        """Every shade within `delta_e` (CIEDE2000), closest first."""
+        tree, ids = self._tree(brand, product_line, finish)
+        if not len(ids):
+            return []
+        return self._within(self._query_lab(hex_code), delta_e, tree, ids)
+
+
+def format_matches(hex_code: str, matches: List[ShadeMatch]) -> str:
+    lines = [f"{normalise_hex(hex_code) or hex_code}: {len(matches)} match(es)"]
+    for match in matches:
+        record = match.record
+        code = f" [{record.shade_code}]" if record.shade_code else ""
+        lines.append(
+            f"  ΔE00 {match.delta_e:6.2f}  {record.hex_code}  {record.brand} / {record.product_line} / "
+            f"{record.shade_name}{code} ({record.finish})"
+        )
+    return "\n".join(lines)
+
+
+def synthetic_records(count: int, seed: int = 7) -> List[VariantRecord]:
+    rng = random.Random(seed)
+    lines = {"OPI": ["Nail Lacquer", "GelColor"], "CND": ["Shellac", "Vinylux"], "The GelBottle": ["BIAB", "Gel"]}
+    records = []
+    for i in range(count):
+        brand = rng.choice(list(lines))
+        records.append(
+            VariantRecord(
+                hex_code=f"#{rng.randrange(1 << 24):06X}",
+                brand=brand,
+                product_line=rng.choice(lines[brand]),
+                shade_name=f"Shade {i}",
+                shade_code=str(i),
+                collection=None,
+                finish=rng.choice(CANONICAL_FINISHES),
+                product_url=None,
+                swatch_url=None,
+                source_catalog="synthetic",
+            )
+        )
+    return records
+
+
+def benchmark(count: int, queries: int, k: int, radius: float, seed: int = 7) -> None:
+    records = synthetic_records(count, seed)
+    start = time.perf_counter()
+    index = ShadeIndex(records)
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed + 1)
+    probes = [f"#{rng.randrange(1 << 24):06X}" for _ in range(queries)]
+    cases = [
+        ("nearest", lambda hex_code: index.nearest(hex_code, k)),
+        ("nearest brand=CND", lambda hex_code: index.nearest(hex_code, k, brand="CND")),
+        ("nearest CND/cream", lambda hex_code: index.nearest(hex_code, k, brand="CND", finish="cream")),
+        (f"within {radius:g}", lambda hex_code: index.within(hex_code, radius)),
+    ]
+    print(f"shades: {count:,}  build: {build_seconds * 1000:.0f} ms  queries: {queries:,}  k: {k}")
+    for label, run in cases:
+        run(probes[0])  # build the filtered tree outside the timing
+        start = time.perf_counter()
+        for probe in probes:
+            run(probe)
+        per_query = (time.perf_counter() - start) / queries
+        print(f"  {label:<20} {per_query * 1e6:8.1f} µs/query")
+
+    # Exactness against a brute-force CIEDE2000 scan over the full catalogue
+    checks = probes[: min(200, queries)]
+    knn_hits = radius_hits = 0
+    for probe in checks:
+        delta = delta_e_2000(hex_to_lab([probe])[0], index.lab)
+        got = np.array([match.delta_e for match in index.nearest(probe, k)])
+        knn_hits += bool(np.allclose(got, np.sort(delta)[:k]))
+        radius_hits += len(index.within(probe, radius)) == int((delta <= radius).sum())
+    print(f"  identical to brute force: nearest {knn_hits}/{len(checks)}, within {radius_hits}/{len(checks)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the nearest-shade index")
+    parser.add_argument("--bench", type=int, default=100_000, help="Synthetic shades to index")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=3.0, help="CIEDE2000 radius for within()")
+    args = parser.parse_args(argv)
+    benchmark(args.bench, args.queries, args.k, args.radius)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
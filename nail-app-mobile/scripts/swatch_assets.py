@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+"""WebP swatch thumbnails and per-category sprite sheets for the catalogue CDN.
+
+`swatch_url` points at full-size brand CDN images (1500px BigCommerce files for
+TGB, full Shopify originals for OPI/CND). Browsing a category in the app
+therefore means hundreds of large third-party image requests. This stage builds
+from the swatch bytes the scrapers already download:
+
+    <out>/thumbs/<size>/v<RENDER_VERSION>/<source-hash>.webp   one per distinct swatch image
+    <out>/sprites/<category>/0000.<hash>.webp                cells in display order
+    <out>/swatches.json                                      thumbnail + sprite coordinate index
+
+The scrapers store every swatch they fetch in a content-addressed `SwatchCache`
+(`swatch_cache/` at the repo root, next to the scrapers). Thumbnails are named by the SHA-256 of the
+source bytes under a `v<RENDER_VERSION>` directory, and a sprite sheet by the
+hash of its cells, so a rerun only renders images whose source changed. Bumping
+`RENDER_VERSION` moves every thumbnail to new, uncached URLs. Each sprite sheet
+covers the same rows as the category's JSON shard from `catalog_export.py`
+(same page size and order), so one shard plus one sheet renders a whole page of
+the category. Variants without a cached swatch get a solid cell in their hex
+colour.
+
+Thumbnail rendering and sheet composition both run in a process pool across
+all cores. JPEG sources are decoded at reduced scale (`Image.draft`), which
+skips most of the work on large originals.
+
+Usage (after a sync; entries come from DATABASE_URL or the Supabase REST API):
+    python scripts/swatch_assets.py --out dist/catalog
+    python scripts/swatch_assets.py --out dist/catalog --fetch-missing
+    python scripts/swatch_assets.py --bench 2000
+
+or as part of the sync: `sync_color_catalog.py --export-dir dist/catalog --swatch-cache`.
+`--cache DIR` reads a cache somewhere other than the repo root.
+
+Requires Pillow with WebP support (pip install pillow); `--fetch-missing` also
+needs `requests`.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageOps
+except ImportError as exc:  # pragma: no cover - runtime guard
+    raise SystemExit("Pillow is required. Install with `pip install pillow`.") from exc
+
+from catalog_export import DEFAULT_PAGE_SIZE, slug
+from run_metrics import record_cache, timed
+
+INDEX_VERSION = 1
+DEFAULT_THUMB_SIZE = 128
+DEFAULT_CELL_SIZE = 64
+WEBP_QUALITY = 80
+HASH_CHARS = 16
+BLANK_CELL = (229, 229, 229)
+# Bumping this re-renders every thumbnail and sheet (part of the sheet hash and thumb path)
+RENDER_VERSION = 1
+# Where the repo-root scrapers keep their cache, whatever directory they run from
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "swatch_cache"
+
+
+class SwatchCache:
+    """Content-addressed store of downloaded swatch images.
+
+    `objects/ab/<sha256>` holds the bytes, and `urls/cd/<sha256(url)>` holds the
+    content hash for a URL. Swatches shared between URLs are stored once, and
+    looking up a URL's source hash never reads the image.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    @staticmethod
+    def _fanout(base: Path, digest: str) -> Path:
+        return base / digest[:2] / digest
+
+    def object_path(self, source_hash: str) -> Path:
+        return self._fanout(self.root / "objects", source_hash)
+
+    def _ref_path(self, url: str) -> Path:
+        return self._fanout(self.root / "urls", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def put(self, url: str, data: bytes) -> str:
+        source_hash = hashlib.sha256(data).hexdigest()
+        obj = self.object_path(source_hash)
+        stored = obj.exists()
+        record_cache("swatch_store", hit=stored)
+        if not stored:
+            _atomic_write(obj, data)
+        ref = self._ref_path(url)
+        if not ref.exists() or ref.read_text(encoding="ascii") != source_hash:
+            _atomic_write(ref, source_hash.encode("ascii"))
+        return source_hash
+
+    def source_hash(self, url: str) -> Optional[str]:
+        if not url:
+            return None
+        try:
+            source_hash = self._ref_path(url).read_text(encoding="ascii")
+        except FileNotFoundError:
+            return None
+        return source_hash if self.object_path(source_hash).exists() else None
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.partial")
+    partial.write_bytes(data)
+    partial.replace(path)
+
+
+def _save_webp(image: Image.Image, path: Path) -> None:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    _atomic_write(path, buffer.getvalue())
+
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB on white; transparent swatch backgrounds would otherwise turn black in WebP-without-alpha."""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_thumbnail(job: Tuple[str, str, int]) -> bool:
+    source, target, size = job
+    try:
+        with Image.open(source) as image:
+            image.draft("RGB", (size * 2, size * 2))
+            thumb = ImageOps.fit(_flatten(image), (size, size), Image.LANCZOS)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    _save_webp(thumb, Path(target))
+    return True
+
+
+def _hex_rgb(hex_code: Optional[str]) -> Tuple[int, int, int]:
+    try:
+        value = int(str(hex_code).lstrip("#"), 16)
+    except ValueError:
+        return BLANK_CELL
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+
+
+def sheet_grid(count: int) -> Tuple[int, int]:
+    cols = max(1, math.ceil(math.sqrt(count)))
+    return cols, max(1, math.ceil(count / cols))
+
+
+def compose_sheet(job: Tuple[str, int, Sequence[Tuple[Optional[str], Optional[str]]]]) -> None:
+    target, cell, cells = job
+    cols, rows = sheet_grid(len(cells))
+    sheet = Image.new("RGB", (cols * cell, rows * cell), (255, 255, 255))
+    for position, (thumb, hex_code) in enumerate(cells):
+        box = ((position % cols) * cell, (position // cols) * cell)
+        tile = None
+        if thumb:
+            try:
+                with Image.open(thumb) as image:
+                    tile = image.convert("RGB").resize((cell, cell), Image.LANCZOS)
+            except OSError:
+                tile = None
+        sheet.paste(tile if tile is not None else Image.new("RGB", (cell, cell), _hex_rgb(hex_code)), box)
+    _save_webp(sheet, Path(target))
+
+
+def _run(function, jobs: List, workers: int) -> List:
+    if workers <= 1 or len(jobs) <= 1:
+        return [function(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, jobs, chunksize=max(1, len(jobs) // (workers * 8))))
+
+
+def _index_paths(index: Mapping) -> Iterator[str]:
+    template = index.get("thumb_path")
+    if template:
+        yield from (template.format(hash=thumb) for thumb in set(index.get("thumbs", {}).values()))
+    for category in index.get("categories", {}).values():
+        yield from (sheet["path"] for sheet in category["sheets"])
+
+
+@timed
+def build_swatch_assets(
+    entries: Sequence[Mapping[str, object]],
+    cache: SwatchCache,
+    out_dir: Path,
+    *,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    thumb_size: int = DEFAULT_THUMB_SIZE,
+    cell_size: int = DEFAULT_CELL_SIZE,
+    workers: Optional[int] = None,
+) -> Dict[str, object]:
+    """Render thumbnails and category sprite sheets for `entries` (in display order); returns the index."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    index_path = out_dir / "swatches.json"
+    previous = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+    thumb_template = f"thumbs/{thumb_size}/v{RENDER_VERSION}/{{hash}}.webp"
+
+    # Phase 1: one thumbnail per distinct source image not rendered yet
+    source_by_url: Dict[str, Optional[str]] = {}
+    for entry in entries:
+        url = entry.get("swatch_url")
+        if url and url not in source_by_url:
+            source_by_url[url] = cache.source_hash(str(url))
+    sources = {source_hash for source_hash in source_by_url.values() if source_hash}
+    pending = [
+        (str(cache.object_path(source_hash)), str(out_dir / thumb_template.format(hash=source_hash[:HASH_CHARS])),
+         thumb_size)
+        for source_hash in sorted(sources)
+        if not (out_dir / thumb_template.format(hash=source_hash[:HASH_CHARS])).exists()
+    ]
+    rendered = _run(render_thumbnail, pending, workers)
+    failed = {Path(job[0]).name for job, ok in zip(pending, rendered) if not ok}
+    if failed:
+        logging.warning("Could not decode %d cached swatch images; using hex cells for them", len(failed))
+
+    thumbs: Dict[str, str] = {}
+    for entry in entries:
+        source_hash = source_by_url.get(entry.get("swatch_url") or "")
+        if source_hash and source_hash not in failed:
+            thumbs[str(entry["color_variant_id"])] = source_hash[:HASH_CHARS]
+
+    # Phase 2: one sheet per category page, named by the hash of its cells
+    groups: Dict[str, List[Mapping[str, object]]] = {}
+    for entry in entries:
+        if entry.get("category"):
+            groups.setdefault(str(entry["category"]), []).append(entry)
+    categories: Dict[str, Dict[str, object]] = {}
+    compose_jobs = []
+    for category, members in sorted(groups.items()):
+        sheets = []
+        for page, start in enumerate(range(0, len(members), page_size)):
+            rows = members[start : start + page_size]
+            cells = []
+            for entry in rows:
+                thumb = thumbs.get(str(entry["color_variant_id"]))
+                cells.append((str(out_dir / thumb_template.format(hash=thumb)) if thumb else None, entry.get("hex_code")))
+            digest = hashlib.sha256(
+                f"{RENDER_VERSION}|{thumb_size}|{cell_size}|".encode("utf-8")
+                + "|".join(f"{Path(thumb).stem if thumb else ''}:{hex_code}" for thumb, hex_code in cells).encode("utf-8")
+            ).hexdigest()
+            relative = f"sprites/{slug(category)}/{page:04d}.{digest[:HASH_CHARS]}.webp"
+            if not (out_dir / relative).exists():
+                compose_jobs.append((str(out_dir / relative), cell_size, cells))
+            cols, grid_rows = sheet_grid(len(rows))
+            sheets.append(
+                {
+                    "path": relative,
+                    "width": cols * cell_size,
+                    "height": grid_rows * cell_size,
+                    "cells": {
+                        str(entry["color_variant_id"]): [(i % cols) * cell_size, (i // cols) * cell_size]
+                        for i, entry in enumerate(rows)
+                    },
+                }
+            )
+        categories[category] = {"count": len(members), "sheets": sheets}
+    _run(compose_sheet, compose_jobs, workers)
+
+    index: Dict[str, object] = {
+        "version": INDEX_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "thumb_size": thumb_size,
+        "cell_size": cell_size,
+        "page_size": page_size,
+        "thumb_path": thumb_template,
+        "thumbs": thumbs,
+        "categories": categories,
+    }
+    _atomic_write(index_path, json.dumps(index, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+    keep = set(_index_paths(index)) | set(_index_paths(previous))
+    removed = 0
+    for folder in ("thumbs", "sprites"):
+        for path in (out_dir / folder).rglob("*.webp"):
+            if path.relative_to(out_dir).as_posix() not in keep:
+                path.unlink()
+                removed += 1
+    missing = sum(1 for url, source_hash in source_by_url.items() if not source_hash)
+    record_cache("swatch_source", hits=len(source_by_url) - missing, misses=missing)
+    record_cache("swatch_thumbs", hits=len(sources) - len(pending), misses=len(pending))
+    sheets = sum(len(c["sheets"]) for c in categories.values())
+    record_cache("swatch_sprites", hits=sheets - len(compose_jobs), misses=len(compose_jobs))
+    logging.info(
+        "Swatch assets: %d thumbnails rendered (%d cached), %d sprite sheets composed (%d unchanged), "
+        "%d stale files removed, %d swatch URLs not in the cache",
+        len(pending) - len(failed),
+        len(sources) - len(pending),
+        len(compose_jobs),
+        sheets - len(compose_jobs),
+        removed,
+        missing,
+    )
+    return index
+
+
+def fetch_missing(cache: SwatchCache, urls: Iterable[str], workers: int = 4) -> int:
+    """Download swatches the scrapers have not cached yet; returns how many were stored."""
+    import requests
+
+    missing = sorted({url for url in urls if url and cache.source_hash(url) is None})
+    session = requests.Session()
+
+    def fetch(url: str) -> bool:
+        try:
+            response = session.get(url, timeout=60)
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            logging.warning("Swatch download failed for %s: %s", url, exc)
+            return False
+        cache.put(url, response.content)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        stored = sum(pool.map(fetch, missing))
+    logging.info("Fetched %d of %d uncached swatches", stored, len(missing))
+    return stored
+
+
+def _synthetic_swatch(rng: random.Random, size: int, noise: Image.Image) -> bytes:
+    """A bottle-photo-sized JPEG: a coloured disc with noise on white."""
+    color = tuple(rng.randrange(256) for _ in range(3))
+    image = Image.new("RGB", (size, size), (255, 255, 255))
+    mask = Image.new("L", (size, size), 0)
+    ImageDraw.Draw(mask).ellipse((size // 8, size // 8, size * 7 // 8, size * 7 // 8), fill=255)
+    image.paste(color, mask=mask)
+    image = Image.blend(image, noise, 0.08)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def benchmark(count: int, image_size: int = 1500) -> None:
+    from catalog_export import synthetic_entries
+
+    entries = synthetic_entries(count)
+    rng = random.Random(11)
+    noise = Image.effect_noise((image_size, image_size), 24).convert("RGB")
+    workers = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SwatchCache(Path(tmp) / "cache")
+        source_bytes = {}
+        for entry in entries:
+            data = _synthetic_swatch(rng, image_size, noise)
+            cache.put(str(entry["swatch_url"]), data)
+            source_bytes[entry["color_variant_id"]] = len(data)
+
+        timings = {}
+        runs = [("1 process", 1)] + ([(f"{workers} processes", workers)] if workers > 1 else [])
+        for label, jobs in runs:
+            out_dir = Path(tmp) / f"out-{jobs}"
+            start = time.perf_counter()
+            index = build_swatch_assets(entries, cache, out_dir, workers=jobs)
+            timings[label] = time.perf_counter() - start
+        start = time.perf_counter()
+        build_swatch_assets(entries, cache, out_dir, workers=workers)
+        rerun = time.perf_counter() - start
+        entries[0] = {**entries[0], "swatch_url": "https://cdn.example.com/swatches/changed.jpg"}
+        cache.put(entries[0]["swatch_url"], _synthetic_swatch(rng, image_size, noise))
+        start = time.perf_counter()
+        build_swatch_assets(entries, cache, out_dir, workers=workers)
+        one_changed = time.perf_counter() - start
+
+        category, info = max(index["categories"].items(), key=lambda item: item[1]["count"])
+        sheet = info["sheets"][0]
+        sheet_bytes = (out_dir / sheet["path"]).stat().st_size
+        original_bytes = sum(source_bytes[variant] for variant in sheet["cells"])
+        thumb_bytes = sum(
+            (out_dir / index["thumb_path"].format(hash=index["thumbs"][variant])).stat().st_size
+            for variant in sheet["cells"]
+        )
+
+    print(f"entries: {count:,}  ({image_size}px JPEG swatches, cell {DEFAULT_CELL_SIZE}px, thumb {DEFAULT_THUMB_SIZE}px)")
+    for label, seconds in timings.items():
+        print(f"  {'cold build, ' + label:<28}{seconds:7.2f}s")
+    print(f"  {'rerun, nothing changed':<28}{rerun:7.2f}s")
+    print(f"  {'rerun, one swatch changed':<28}{one_changed:7.2f}s")
+    cells = len(sheet["cells"])
+    print(f"  first page of '{category}' ({cells} shades): {cells} swatch requests, {original_bytes / 2**20:.1f} MiB "
+          f"originals / {thumb_bytes / 2**10:.0f} KiB thumbs vs 1 sprite request, {sheet_bytes / 2**10:.0f} KiB")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build WebP swatch thumbnails and category sprite sheets")
+    parser.add_argument(
+        "--cache", type=Path, default=DEFAULT_CACHE_DIR, help="Swatch cache directory written by the scrapers"
+    )
+    parser.add_argument("--out", type=Path, help="Output directory (usually the catalog_export.py directory)")
+    parser.add_argument("--bench", type=int, metavar="ENTRIES", help="Build from synthetic swatches and report")
+    parser.add_argument("--fetch-missing", action="store_true", help="Download swatches missing from the cache first")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="Cells per sprite sheet")
+    parser.add_argument("--thumb-size", type=int, default=DEFAULT_THUMB_SIZE)
+    parser.add_argument("--cell-size", type=int, default=DEFAULT_CELL_SIZE)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level), format="[%(levelname)s] %(message)s")
+
+    if args.bench:
+        benchmark(args.bench)
+        return 0
+    if not args.out:
+        parser.error("--out is required unless --bench is given")
+
+    from catalog_export import fetch_entries_postgres, fetch_entries_rest
+
+    dsn = os.getenv("DATABASE_URL")
+    if dsn:
+        entries = fetch_entries_postgres(dsn)
+    else:
+        from catalog_model import CatalogSyncError
+        from sync_color_catalog import ensure_client
+
+        try:
+            entries = fetch_entries_rest(ensure_client())
+        except CatalogSyncError as exc:
+            logging.error("Set DATABASE_URL, or %s", exc)
+            return 1
+    cache = SwatchCache(args.cache)
+    if args.fetch_missing:
+        fetch_missing(cache, (str(entry.get("swatch_url") or "") for entry in entries))
+    build_swatch_assets(
+        entries,
+        cache,
+        args.out,
+        page_size=args.page_size,
+        thumb_size=args.thumb_size,
+        cell_size=args.cell_size,
+        workers=args.workers,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,25 +12,122 @@ Usage:
         --cnd ../../cnd_full_uk_catalog.csv \
         --tgb ../../tgb_full_catalog.csv
 
-Environment variables:
-    SUPABASE_URL                 (required)
-    SUPABASE_SERVICE_ROLE_KEY    (required)
-    DATABASE_URL                 (optional, unused but reserved for future)
+Pass `--backend postgres` to skip the REST API and merge through a direct
+Postgres connection instead (COPY into a staging table, set-based merges and the
+categorisation refresh in one transaction). See `catalog_postgres.py`.
+
+Pass `--backend rpc` to ship the catalogue in a handful of columnar JSON chunks
+to the `merge_color_catalog()` function (supabase/41_merge_color_catalog.sql),
+which performs the colour/variant/primary merge server-side.
+
+Pass `--categorize client` to compute hue/saturation/lightness/category and
+`display_order` in the sync with NumPy (`hex_categorization.py`, the rules of
+supabase/42_hex_categorization_rules.sql, which should be installed so the
+server agrees) instead of calling `refresh_hex_categorization()`; only rows
+whose values change are written, batched through
+supabase/46_apply_hex_categories.sql when it is installed.
+With server-side categorisation the refresh is scoped to the hexes the sync
+inserted or backfilled (supabase/43_scoped_hex_categorization.sql); pass
+`--full-refresh` to recategorise the whole table.
+
+Pass `--merge-delta-e 1.0` to fold swatch hexes that differ by at most that
+CIEDE2000 distance into one canonical colour (with all their variants) before
+syncing; `--merge-report merges.csv` lists what was merged. See
+`hex_clustering.py`.
+
+Pass `--nearest HEX` (repeatable) to print the closest shades across the loaded
+CSVs by CIEDE2000 instead of syncing, optionally restricted with
+`--nearest-brand`, `--nearest-product-line` and `--nearest-finish`. See
+`shade_index.py`.
+
+Pass `--columnar` to normalise the CSVs with pandas column operations instead of
+row by row (same records, much faster on large catalogues). See
+`catalog_columnar.py`.
+
+Each catalogue path may also be a typed `.parquet`/`.arrow` file written by
+the scrapers (`--opi ../opi_full_uk_catalog.parquet`): hexes arrive as
+integers and brand/line/finish values are normalised once per distinct value.
+Those need `pyarrow`. See `catalog_arrow.py`.
+
+Pass `--bundle catalog.bundle` to also compile the normalised catalogue (with
+Lab, category and display order) into a versioned, memory-mappable bundle for
+read-heavy consumers. See `catalog_bundle.py`.
+
+Pass `--export-dir dist/catalog` to write the synced, active catalogue as
+static, content-hashed JSON shards (all / per category / per brand, in
+`display_order`) plus a manifest for CDN delivery after the sync. See
+`catalog_export.py`. Add `--swatch-cache` (optionally with a directory; the
+default is the repo-root `swatch_cache/` the scrapers store downloaded swatches
+in) to also render WebP thumbnails and per-category sprite sheets into the
+same directory. See `swatch_assets.py`.
+
+Pass `--metrics-json PATH` and/or `--metrics-textfile PATH` (or set
+`RUN_METRICS_JSON` / `RUN_METRICS_TEXTFILE`) to write a run report: time per
+phase, HTTP requests by host and status, bytes, cache hit rates and row counts,
+as JSON and as a Prometheus textfile. The scrapers write the same reports. Add
+`--trace PATH` (or `RUN_TRACE`) for a Chrome trace-event timeline of every
+phase and HTTP request, viewable in Perfetto, and `--profile PATH` (or
+`RUN_PROFILE`) for a phase-tagged sampling profile: flame-graph-ready
+collapsed stacks plus a hot-function table. See `run_metrics.py` and
+`sampling_profiler.py`.
+
+The REST and RPC backends plan before they write. Every insert, upsert and
+update chunk, with ids for the new rows, is saved to `.catalog_sync_plan.json`
+(`--plan-file`). Each chunk is journalled as it commits. If a sync fails
+partway, rerun it with `--resume` to continue from the first unfinished chunk,
+without re-reading the catalogue or Supabase. See `sync_plan.py`.
+
+The REST backend sizes its requests adaptively: each kind (colour inserts,
+variant upserts, primary variants, lookups) starts at `--batch-size` rows,
+grows while requests stay well under `--target-latency` and shrinks on slow,
+timed-out or 413/414 responses, within `--max-request-bytes`. The lookups of
+existing rows are POSTed to the functions in supabase/44_catalog_lookups.sql,
+falling back to URL-bounded GETs when those are not installed; primary
+variants go through supabase/47_set_primary_variants.sql, falling back to one
+PATCH per colour. `--batch-tuning off` keeps `--batch-size` fixed. See
+`batch_tuning.py`.
+
+Every backend deactivates variants that have disappeared from their source
+catalogue: per `source_catalog` in the run, stored active variants that were
+not ingested are set `is_active = FALSE` in bulk, and colours whose primary
+was one of them are repointed. A catalogue missing more than
+`--max-deactivate-fraction` of its variants is left alone as a likely broken
+scrape; `--keep-missing` skips the step. The REST and RPC backends need
+supabase/45_deactivate_missing_variants.sql. See `variant_deactivation.py`.
+
+Pass `--stream opi cnd tgb` to run the scrapers in-process instead of reading
+their CSVs. Rows flow through a bounded channel into normalisation,
+deduplication and batched writes while the scrapers are still running, so a
+refresh takes about as long as the scraping alone. `--stream-csv-dir DIR` also
+writes the scrapers' CSVs. Deactivation and categorisation run once every
+scraper has finished; a streamed sync is rerun, not resumed. See
+`catalog_stream.py`.
+
+Parsed variants are held in a packed `VariantStore` (hex as an integer,
+interned brand/line/finish codes, text in shared buffers) rather than one
+object per row, so million-variant catalogues stay within a few hundred MiB.
+See `variant_store.py`.
 
-Requires `supabase-py` (pip install supabase)
+Environment variables:
+    SUPABASE_URL                 (required for the REST backend)
+    SUPABASE_SERVICE_ROLE_KEY    (required for the REST backend)
+    DATABASE_URL                 (required for `--backend postgres`)
+
+Requires `supabase-py` (pip install supabase); the Postgres backend also needs
+`psycopg` (pip install "psycopg[binary]"), `--columnar` needs `pandas` (pyarrow
+optional, used for multithreaded CSV parsing) and `--categorize client`,
+`--merge-delta-e`, `--nearest` and `--bundle` need `numpy`.
 """
 from __future__ import annotations
 
 import argparse
-import csv
 import itertools
 import logging
 import os
 import sys
 import uuid
-from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
 
 try:
     from supabase import Client, create_client
@@ -40,308 +137,112 @@ except ImportError as exc:  # pragma: no cover - import guard
         "supabase-py is required. Install with `pip install supabase` before running this script."
     ) from exc
 
-CANONICAL_FINISHES = [
-    "glossy",
-    "cream",
-    "matte",
-    "chrome",
-    "shimmer",
-    "glitter",
-    "metallic",
-    "sheer",
-    "pearl",
-    "magnetic",
-    "reflective",
-]
-
-FINISH_PRIORITY = {
-    "glitter": 100,
-    "reflective": 95,
-    "magnetic": 90,
-    "chrome": 85,
-    "metallic": 80,
-    "shimmer": 70,
-    "pearl": 60,
-    "matte": 50,
-    "cream": 40,
-    "sheer": 35,
-    "glossy": 30,
-}
+from catalog_model import (
+    ARROW_SUFFIXES,
+    CATALOG_SOURCES,
+    CatalogSource,
+    CatalogSyncError,
+    VariantRecord,
+    load_rows,
+    map_hex_to_variants,
+)
+
+# Moved to catalog_model; still importable from here for existing callers
+from catalog_model import (  # noqa: F401
+    CANONICAL_FINISHES,
+    CATEGORY_TO_FINISH,
+    DEFAULT_FINISH,
+    FINISH_PRIORITY,
+    FINISH_SYNONYMS,
+    HEX_PREFIX,
+    PRODUCT_LINE_NORMALISERS,
+    SOURCE_TO_BRAND,
+    clean_collection,
+    deduplicate,
+    normalise_finish,
+    normalise_hex,
+    normalise_product_line,
+    record_from_row,
+)
+from batch_tuning import (
+    DEFAULT_MAX_BODY_BYTES,
+    DEFAULT_TARGET_SECONDS,
+    BatchTuner,
+    TunerSet,
+    TuningSettings,
+    send_in_batches,
+)
+from run_metrics import count, start_run, timed
+from sync_plan import DEFAULT_PLAN_PATH, PlanError, SyncPlan, input_digest, unfinished_plan
+from variant_deactivation import DEFAULT_MAX_DEACTIVATE_FRACTION, allowed_sources, ingested_keys, stale_variants
+
+if TYPE_CHECKING:
+    from variant_store import VariantStore
+
+# --stream defaults (see catalog_stream.py)
+DEFAULT_STREAM_BATCH = 500
+DEFAULT_STREAM_FLUSH_SECONDS = 5.0
+DEFAULT_STREAM_BUFFER = 2000
 
-FINISH_SYNONYMS = {
-    "standard": "glossy",
-    "high shine": "glossy",
-    "shine": "glossy",
-    "creme": "cream",
-    "cream": "cream",
-    "mat": "matte",
-    "matte": "matte",
-    "chrome": "chrome",
-    "mirror": "chrome",
-    "shimmer": "shimmer",
-    "shimmery": "shimmer",
-    "glitter": "glitter",
-    "glittery": "glitter",
-    "reflective": "reflective",
-    "cat-eye": "magnetic",
-    "magnetic": "magnetic",
-    "magnetic, cat-eye": "magnetic",
-    "metallic": "metallic",
-    "foil": "metallic",
-    "sheer": "sheer",
-    "milky": "sheer",
-    "milky, sheer": "sheer",
-    "pearl": "pearl",
-}
 
-DEFAULT_FINISH = "glossy"
+def chunked(iterable: Iterable, size: int) -> Iterable[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            break
+        yield chunk
 
-SOURCE_TO_BRAND = {
-    "opi_full_uk_catalog": "OPI",
-    "cnd_full_uk_catalog": "CND",
-    "tgb_full_catalog": "The GelBottle Inc.",
-}
 
-PRODUCT_LINE_NORMALISERS = {
-    "OPI": {
-        "nail lacquer": "Nail Lacquer",
-        "infinite shine": "Infinite Shine",
-        "gelcolor": "GelColor",
-    },
-    "CND": {
-        "shellac": "Shellac",
-        "vinylux": "Vinylux",
-    },
-    "The GelBottle Inc.": {
-        "gelcolor": "GelColor",
-        "biab": "BIAB",
-    },
-}
+def load_source(path: Path, source: CatalogSource) -> Iterator[VariantRecord]:
+    if path.suffix in ARROW_SUFFIXES:
+        from catalog_arrow import load_arrow_rows
 
-CATEGORY_TO_FINISH = {
-    "standard": "glossy",
-    "standard finish": "glossy",
-    "shimmer": "shimmer",
-    "shimmery": "shimmer",
-    "glitter": "glitter",
-    "glitter, shimmery": "glitter",
-    "glitter, reflective": "reflective",
-    "reflective": "reflective",
-    "chrome": "chrome",
-    "metallic": "metallic",
-    "pearl": "pearl",
-    "sheer": "sheer",
-    "milky": "sheer",
-    "milky, sheer": "sheer",
-    "magnetic": "magnetic",
-    "magnetic, cat-eye": "magnetic",
-    "cat-eye": "magnetic",
-    "matte": "matte",
-    "cream": "cream",
-    "creme": "cream",
-}
+        return load_arrow_rows(path, source)
+    return load_rows(path, source)
 
-HEX_PREFIX = "#"
-
-
-@dataclass
-class VariantRecord:
-    hex_code: str
-    brand: str
-    product_line: str
-    shade_name: str
-    shade_code: Optional[str]
-    collection: Optional[str]
-    finish: str
-    product_url: Optional[str]
-    swatch_url: Optional[str]
-    source_catalog: str
-
-    def key(self) -> Tuple[str, str, str, Optional[str]]:
-        return (
-            self.brand,
-            self.product_line,
-            self.shade_name,
-            self.shade_code or None,
-        )
 
+def load_catalogues(args: argparse.Namespace) -> Iterator[VariantRecord]:
+    total = 0
+    for name, source in CATALOG_SOURCES.items():
+        path: Optional[Path] = getattr(args, name)
+        if not path:
+            continue
+        for record in load_source(path, source):
+            total += 1
+            yield record
+    logging.info("Loaded %d raw variant rows", total)
 
-class CatalogSyncError(RuntimeError):
-    pass
 
+def load_variant_store(args: argparse.Namespace) -> VariantStore:
+    """Every catalogue's rows in a VariantStore; `--columnar` fills it straight from pandas columns."""
+    from variant_store import VariantStore
 
-def normalise_hex(value: str) -> Optional[str]:
-    if not value:
-        return None
-    candidate = value.strip().upper()
-    if not candidate:
-        return None
-    if not candidate.startswith(HEX_PREFIX):
-        candidate = f"{HEX_PREFIX}{candidate}"
-    if len(candidate) != 7:
-        return None
-    try:
-        int(candidate[1:], 16)
-    except ValueError:
-        return None
-    return candidate
-
-
-def normalise_finish(raw: Optional[str]) -> str:
-    if not raw:
-        return DEFAULT_FINISH
-    tokens = [token.strip().lower() for token in raw.replace("/", ",").split(",") if token.strip()]
-    if not tokens:
-        return DEFAULT_FINISH
-    mapped = [FINISH_SYNONYMS.get(token, token) for token in tokens]
-    valid = [token for token in mapped if token in CANONICAL_FINISHES]
-    if not valid:
-        return DEFAULT_FINISH
-    # Choose the most visually distinctive finish using priority table
-    best = max(valid, key=lambda finish: FINISH_PRIORITY.get(finish, 0))
-    return best
-
-
-def normalise_product_line(raw: Optional[str], brand: str) -> str:
-    if not raw:
-        return "Unknown"
-    cleaned = raw.strip().lower()
-    if not cleaned:
-        return "Unknown"
-    mapping = PRODUCT_LINE_NORMALISERS.get(brand, {})
-    return mapping.get(cleaned, raw.strip())
-
-
-def clean_collection(raw: Optional[str]) -> Optional[str]:
-    if not raw:
-        return None
-    cleaned = raw.strip()
-    if not cleaned:
-        return None
-    # Many collection fields include URL fragments joined by underscores
-    if "http" in cleaned and "_" in cleaned:
-        parts = [part for part in cleaned.split("_") if not part.startswith("http")]
-        if parts:
-            return parts[0]
-    return cleaned
+    if args.columnar:
+        from catalog_columnar import load_store_columnar
 
-
-def chunked(iterable: Iterable, size: int) -> Iterable[List]:
-    iterator = iter(iterable)
-    while True:
-        chunk = list(itertools.islice(iterator, size))
-        if not chunk:
-            break
-        yield chunk
+        return load_store_columnar(args)
+    return VariantStore.from_records(load_catalogues(args))
 
 
-def load_opi_rows(path: Path) -> List[VariantRecord]:
-    records: List[VariantRecord] = []
-    with path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            hex_code = normalise_hex(row.get("ApproxHex"))
-            if not hex_code:
-                logging.debug("Skipping OPI row with invalid hex: %s", row)
-                continue
-            finish = normalise_finish(row.get("Finish") or row.get("Texture") or DEFAULT_FINISH)
-            records.append(
-                VariantRecord(
-                    hex_code=hex_code,
-                    brand=row.get("Brand", "OPI").strip() or "OPI",
-                    product_line=normalise_product_line(row.get("ProductType"), "OPI"),
-                    shade_name=(row.get("ShadeName") or "Unnamed").strip(),
-                    shade_code=(row.get("ShadeCode") or "").strip() or None,
-                    collection=clean_collection(row.get("Collection")),
-                    finish=finish,
-                    product_url=(row.get("ProductURL") or "").strip() or None,
-                    swatch_url=(row.get("SwatchImageURL") or "").strip() or None,
-                    source_catalog="opi_full_uk_catalog",
-                )
-            )
-    return records
-
-
-def load_cnd_rows(path: Path) -> List[VariantRecord]:
-    records: List[VariantRecord] = []
-    with path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            hex_code = normalise_hex(row.get("ApproxHex"))
-            if not hex_code:
-                logging.debug("Skipping CND row with invalid hex: %s", row)
-                continue
-            finish = normalise_finish(row.get("Finish") or row.get("Texture") or DEFAULT_FINISH)
-            records.append(
-                VariantRecord(
-                    hex_code=hex_code,
-                    brand=row.get("Brand", "CND").strip() or "CND",
-                    product_line=normalise_product_line(row.get("ProductType"), "CND"),
-                    shade_name=(row.get("ShadeName") or "Unnamed").strip(),
-                    shade_code=(row.get("ShadeCode") or "").strip() or None,
-                    collection=clean_collection(row.get("Collection")),
-                    finish=finish,
-                    product_url=(row.get("ProductURL") or "").strip() or None,
-                    swatch_url=(row.get("SwatchImageURL") or "").strip() or None,
-                    source_catalog="cnd_full_uk_catalog",
-                )
-            )
-    return records
-
-
-def load_tgb_rows(path: Path) -> List[VariantRecord]:
-    records: List[VariantRecord] = []
-    with path.open(newline="", encoding="utf-8") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            hex_code = normalise_hex(row.get("ApproxHex"))
-            if not hex_code:
-                logging.debug("Skipping TGB row with invalid hex: %s", row)
-                continue
-            finish = normalise_finish(
-                CATEGORY_TO_FINISH.get((row.get("Category") or "").strip().lower(), row.get("Category"))
-            )
-            records.append(
-                VariantRecord(
-                    hex_code=hex_code,
-                    brand=row.get("Brand", "The GelBottle Inc.").strip() or "The GelBottle Inc.",
-                    product_line=normalise_product_line(row.get("Product Type"), "The GelBottle Inc."),
-                    shade_name=(row.get("Shade Name") or "Unnamed").strip(),
-                    shade_code=(row.get("Shade Code") or "").strip() or None,
-                    collection=clean_collection(row.get("Collection")),
-                    finish=finish,
-                    product_url=(row.get("ProductURL") or "").strip() or None,
-                    swatch_url=(row.get("SwatchURL") or "").strip() or None,
-                    source_catalog="tgb_full_catalog",
-                )
-            )
-    return records
-
-
-def load_catalogues(args: argparse.Namespace) -> List[VariantRecord]:
-    rows: List[VariantRecord] = []
-    if args.opi:
-        rows.extend(load_opi_rows(args.opi))
-    if args.cnd:
-        rows.extend(load_cnd_rows(args.cnd))
-    if args.tgb:
-        rows.extend(load_tgb_rows(args.tgb))
-    logging.info("Loaded %d raw variant rows", len(rows))
-    return rows
+@timed
+def catalogue_records(args: argparse.Namespace) -> VariantStore:
+    """Load, optionally merge near-duplicate hexes, and deduplicate into a VariantStore."""
+    store = load_variant_store(args)
+    if args.merge_delta_e is not None:
+        from hex_clustering import plan_merges, write_merge_report
 
+        merges = plan_merges(store.hex_counts(), args.merge_delta_e)
+        store.remap_hexes({merge.hex_code: merge.canonical for merge in merges})
+        if args.merge_report:
+            write_merge_report(args.merge_report, merges)
+            logging.info("Wrote %d hex merges to %s", len(merges), args.merge_report)
+    store.deduplicate()
+    if args.bundle:
+        from catalog_bundle import catalogue_sources, write_bundle
 
-def deduplicate(records: List[VariantRecord]) -> List[VariantRecord]:
-    seen: Dict[Tuple[str, str, str, Optional[str], str], VariantRecord] = {}
-    for record in records:
-        # incorporate hex into key to avoid collapsing distinct shades that coincidentally share names
-        key = (*record.key(), record.hex_code)
-        if key in seen:
-            continue
-        # For blank shade codes, prefer the first unique combination per brand/product_line/shade_name
-        seen[key] = record
-    deduped = list(seen.values())
-    logging.info("Deduplicated to %d variant rows", len(deduped))
-    return deduped
+        write_bundle(store, args.bundle, catalogue_sources(args))
+    return store
 
 
 def ensure_client() -> Client:
@@ -353,20 +254,222 @@ def ensure_client() -> Client:
 
 
 def ensure_catalog_paths(namespace: argparse.Namespace) -> None:
-    for attr in ("opi", "cnd", "tgb"):
+    for attr in CATALOG_SOURCES:
         path: Optional[Path] = getattr(namespace, attr)
         if path and not path.exists():
-            raise CatalogSyncError(f"CSV not found: {path}")
+            raise CatalogSyncError(f"Catalogue not found: {path}")
 
 
 def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Sync salon colour catalogues into Supabase")
     repo_root = Path(__file__).resolve().parents[1]
-    parser.add_argument("--opi", type=Path, default=(repo_root / ".." / "opi_full_uk_catalog.csv"))
-    parser.add_argument("--cnd", type=Path, default=(repo_root / ".." / "cnd_full_uk_catalog.csv"))
-    parser.add_argument("--tgb", type=Path, default=(repo_root / ".." / "tgb_full_catalog.csv"))
-    parser.add_argument("--batch-size", type=int, default=200, help="Rows per batched upsert")
+    for name, source in CATALOG_SOURCES.items():
+        parser.add_argument(f"--{name}", type=Path, default=(repo_root / ".." / source.default_csv))
+    parser.add_argument(
+        "--batch-size", type=int, default=200, help="Rows in the first REST write request of each kind (see --batch-tuning)"
+    )
+    parser.add_argument(
+        "--batch-tuning",
+        default="auto",
+        choices=["auto", "off"],
+        help=(
+            "auto: grow or shrink REST request sizes from observed latency, payload size and errors; "
+            "off: keep --batch-size (see batch_tuning.py)"
+        ),
+    )
+    parser.add_argument(
+        "--max-request-bytes",
+        type=int,
+        default=DEFAULT_MAX_BODY_BYTES,
+        metavar="BYTES",
+        help="Cap on the JSON body of one REST request (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=DEFAULT_TARGET_SECONDS,
+        metavar="SECONDS",
+        help="Shrink REST requests that take longer than this (default: %(default)s)",
+    )
     parser.add_argument("--dry-run", action="store_true", help="Parse and report without writing to Supabase")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted rest/rpc sync from its saved plan, skipping committed steps (see sync_plan.py)",
+    )
+    parser.add_argument(
+        "--plan-file",
+        type=Path,
+        default=DEFAULT_PLAN_PATH,
+        metavar="PATH",
+        help="Where the rest/rpc sync saves its plan and progress journal (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--backend",
+        default="rest",
+        choices=["rest", "rpc", "postgres"],
+        help=(
+            "Write path: per-table Supabase REST calls, chunked merge_color_catalog() RPC, "
+            "or direct Postgres COPY via DATABASE_URL"
+        ),
+    )
+    parser.add_argument(
+        "--rpc-chunk-size",
+        type=int,
+        default=5000,
+        help="Variants per merge_color_catalog() call when using --backend rpc",
+    )
+    parser.add_argument(
+        "--categorize",
+        default="server",
+        choices=["server", "client"],
+        help=(
+            "Where hue/saturation/lightness/category/display_order come from: "
+            "refresh_hex_categorization() after the sync, or computed here with NumPy "
+            "(hex_categorization.py) and written only for rows that change"
+        ),
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help=(
+            "Recategorise every colour after the sync instead of only the hexes it inserted "
+            "or backfilled (e.g. after changing the categorisation rules)"
+        ),
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Normalise the CSVs column-wise with pandas (see catalog_columnar.py)",
+    )
+    parser.add_argument(
+        "--merge-delta-e",
+        type=float,
+        metavar="DELTA_E",
+        help=(
+            "Fold hexes within this CIEDE2000 distance of each other into one canonical colour "
+            "before syncing (see hex_clustering.py); off by default"
+        ),
+    )
+    parser.add_argument("--merge-report", type=Path, help="Write the hexes merged by --merge-delta-e to this CSV")
+    parser.add_argument(
+        "--nearest",
+        action="append",
+        metavar="HEX",
+        help=(
+            "Print the closest catalogue shades (CIEDE2000) to HEX instead of syncing; "
+            "repeatable. See shade_index.py"
+        ),
+    )
+    parser.add_argument(
+        "--bundle",
+        type=Path,
+        metavar="PATH",
+        help="Also compile the normalised catalogue into a memory-mappable bundle (see catalog_bundle.py)",
+    )
+    parser.add_argument(
+        "--stream",
+        nargs="+",
+        choices=list(CATALOG_SOURCES),
+        metavar="SCRAPER",
+        help=(
+            "Run these scrapers in-process and sync their rows as they are produced, without CSVs "
+            f"({', '.join(CATALOG_SOURCES)}; see catalog_stream.py)"
+        ),
+    )
+    parser.add_argument(
+        "--stream-csv-dir",
+        type=Path,
+        metavar="DIR",
+        help="With --stream, also write each scraper's usual CSV into DIR",
+    )
+    parser.add_argument(
+        "--stream-batch",
+        type=int,
+        default=DEFAULT_STREAM_BATCH,
+        metavar="ROWS",
+        help="With --stream, write once this many new rows have arrived (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stream-flush",
+        type=float,
+        default=DEFAULT_STREAM_FLUSH_SECONDS,
+        metavar="SECONDS",
+        help="With --stream, write a smaller batch after waiting this long for it to fill (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--stream-buffer",
+        type=int,
+        default=DEFAULT_STREAM_BUFFER,
+        metavar="ROWS",
+        help="With --stream, scraped rows held in memory before the scrapers wait for the sync (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--export-dir",
+        type=Path,
+        metavar="DIR",
+        help="After the sync, write static JSON shards and a manifest for the CDN (see catalog_export.py)",
+    )
+    parser.add_argument(
+        "--swatch-cache",
+        type=Path,
+        nargs="?",
+        const=repo_root / ".." / "swatch_cache",
+        metavar="DIR",
+        help=(
+            "With --export-dir, also build swatch thumbnails and sprite sheets from this cache "
+            "(default: the scrapers' swatch_cache/ at the repo root; see swatch_assets.py)"
+        ),
+    )
+    parser.add_argument(
+        "--metrics-json",
+        # str, not Path: a trailing "/" means "directory" (see run_metrics.py)
+        metavar="PATH",
+        help="Write a JSON run report (file, or directory for <job>.json); default $RUN_METRICS_JSON",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        metavar="PATH",
+        help="Write run metrics as a Prometheus textfile (file or directory); default $RUN_METRICS_TEXTFILE",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Write a Chrome trace of every phase and HTTP request (file, .gz, or directory); default $RUN_TRACE",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Sample the run; write <job>.collapsed stacks and a <job>.hot.txt table (file or directory); "
+        "default $RUN_PROFILE",
+    )
+    parser.add_argument("--nearest-k", type=int, default=5, help="Matches per --nearest colour")
+    parser.add_argument(
+        "--nearest-within",
+        type=float,
+        metavar="DELTA_E",
+        help="Return every shade within this CIEDE2000 distance instead of the k closest",
+    )
+    parser.add_argument("--nearest-brand", action="append", help="Restrict --nearest matches to a brand (repeatable)")
+    parser.add_argument(
+        "--nearest-product-line", action="append", help="Restrict --nearest matches to a product line (repeatable)"
+    )
+    parser.add_argument("--nearest-finish", action="append", help="Restrict --nearest matches to a finish (repeatable)")
+    parser.add_argument(
+        "--keep-missing",
+        action="store_true",
+        help="Leave variants that have disappeared from their catalogue active (see variant_deactivation.py)",
+    )
+    parser.add_argument(
+        "--max-deactivate-fraction",
+        type=float,
+        default=DEFAULT_MAX_DEACTIVATE_FRACTION,
+        metavar="FRACTION",
+        help=(
+            "Leave a catalogue's missing variants active when they are more than this share of its active "
+            "variants, which points at a truncated scrape rather than discontinued shades (default: %(default)s)"
+        ),
+    )
     parser.add_argument(
         "--overwrite-primary",
         action="store_true",
@@ -379,45 +482,136 @@ def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
         help="Logging verbosity",
     )
     args = parser.parse_args(argv)
-    args.opi = args.opi.resolve() if args.opi else None
-    args.cnd = args.cnd.resolve() if args.cnd else None
-    args.tgb = args.tgb.resolve() if args.tgb else None
+    for name in CATALOG_SOURCES:
+        path: Optional[Path] = getattr(args, name)
+        setattr(args, name, path.resolve() if path else None)
     return args
 
 
-def map_hex_to_variants(records: List[VariantRecord]) -> Dict[str, List[VariantRecord]]:
-    mapping: Dict[str, List[VariantRecord]] = {}
-    for record in records:
-        mapping.setdefault(record.hex_code, []).append(record)
-    return mapping
+# table -> (function, parameter, at most one row per key) in supabase/44_catalog_lookups.sql
+LOOKUP_FUNCTIONS = {
+    "colors": ("catalog_colors_by_hex", "p_hex_codes", True),
+    "color_variants": ("catalog_variants_by_color", "p_color_ids", False),
+}
+# Rows asked for per page of a read
+PAGE_ROWS = 1000
+
+
+def keyset_rows(fetch_page: Callable[[Optional[str]], Optional[List[Dict]]], most: Optional[int] = None) -> List[Dict]:
+    """Rows from `fetch_page(after)`, called with the last id read so far, in id order.
+
+    PostgREST's max-rows (1000 by default, but set per project) cuts a page
+    short without an error, so only an empty page ends the read. With `most`,
+    the read can hold no more rows than that, and reaching it ends the read
+    without asking for the empty page.
+    """
+    rows: List[Dict] = []
+    after = None
+    while most is None or len(rows) < most:
+        page = fetch_page(after)
+        if not page:
+            break
+        rows.extend(page)
+        after = page[-1]["id"]
+    return rows
 
 
-def fetch_existing_colors(client: Client, hexes: Iterable[str]) -> Dict[str, Dict]:
-    existing: Dict[str, Dict] = {}
-    for chunk in chunked(sorted(set(hexes)), 200):
-        response = client.table("colors").select(
-            "id, hex_code, name, brand, finish, primary_variant_id, source_priority"
-        ).in_("hex_code", chunk).execute()
-        for row in response.data:
-            existing[row["hex_code"]] = row
-    return existing
+def rpc_rows(
+    client: Client, function: str, params: Dict[str, object], most: Optional[int] = None
+) -> List[Dict]:
+    """Every row a keyset-paged function (`p_after` / `p_limit`, in id order) yields."""
+    return keyset_rows(
+        lambda after: client.rpc(function, {**params, "p_after": after, "p_limit": PAGE_ROWS}).execute().data,
+        most,
+    )
 
 
-def insert_new_colors(
-    client: Client,
+def select_rows(build: Callable[[], Any], most: Optional[int] = None) -> List[Dict]:
+    """Every row of the `client.table(...).select(...)` query `build()` returns, keyset-paged on id."""
+
+    def fetch_page(after: Optional[str]) -> List[Dict]:
+        query = build()
+        if after is not None:
+            query = query.gt("id", after)
+        return query.order("id").limit(PAGE_ROWS).execute().data
+
+    return keyset_rows(fetch_page, most)
+
+
+def lookup_rows(
+    client: Client, table: str, columns: str, key: str, values: List[str], tuners: TunerSet
+) -> List[Dict]:
+    """Rows of `table` whose `key` is one of `values`.
+
+    The keys are POSTed to the lookup function from 44_catalog_lookups.sql in
+    tuner-sized batches. Without that function, they go in URL-length-bounded
+    `in_` filters.
+    """
+    rows: List[Dict] = []
+    if tuners.post_lookups:
+        function, parameter, unique = LOOKUP_FUNCTIONS[table]
+        try:
+            send_in_batches(
+                values,
+                tuners.body(f"{table}.lookup"),
+                lambda batch: rows.extend(
+                    rpc_rows(client, function, {parameter: list(batch)}, len(batch) if unique else None)
+                ),
+            )
+            return rows
+        except APIError as exc:
+            if exc.code != "PGRST202" or rows:
+                raise
+            logging.info(
+                "%s(..., p_after, p_limit) is not installed (supabase/44_catalog_lookups.sql); using GET lookups",
+                function,
+            )
+            tuners.post_lookups = False
+    unique = LOOKUP_FUNCTIONS[table][2]
+    send_in_batches(
+        values,
+        tuners.url(f"{table}.lookup_get"),
+        lambda batch: rows.extend(
+            select_rows(
+                lambda: client.table(table).select(columns).in_(key, list(batch)), len(batch) if unique else None
+            )
+        ),
+    )
+    return rows
+
+
+@timed
+def fetch_existing_colors(client: Client, hexes: Iterable[str], tuners: Optional[TunerSet] = None) -> Dict[str, Dict]:
+    rows = lookup_rows(
+        client,
+        "colors",
+        "id, hex_code, name, brand, finish, primary_variant_id, source_priority",
+        "hex_code",
+        sorted(set(hexes)),
+        tuners or TunerSet(),
+    )
+    return {row["hex_code"]: row for row in rows}
+
+
+@timed
+def fetch_color_categories(client: Client) -> Dict[str, Dict]:
+    # display_order spans whole categories, so client-side categorisation needs every row
+    rows = select_rows(
+        lambda: client.table("colors").select("id, hex_code, hue, saturation, lightness, category, display_order")
+    )
+    return {row["hex_code"]: row for row in rows}
+
+
+def new_color_rows(
     missing_hexes: Iterable[str],
-    variants_by_hex: Dict[str, List[VariantRecord]],
-    dry_run: bool,
-    batch_size: int,
-) -> Dict[str, Dict]:
-    if dry_run:
-        logging.info("Dry-run: skipping insertion of %d new colors", len(list(missing_hexes)))
-        return {}
-    payloads = []
+    variants_by_hex: Mapping[str, List[VariantRecord]],
+    categories: Optional[Dict[str, Dict]] = None,
+) -> List[Dict]:
+    rows = []
     for hex_code in missing_hexes:
         variants = variants_by_hex[hex_code]
         primary = variants[0]
-        payloads.append(
+        rows.append(
             {
                 "id": str(uuid.uuid4()),
                 "hex_code": hex_code,
@@ -429,24 +623,15 @@ def insert_new_colors(
                 "season": [],
                 "mood_tags": [],
                 "source_priority": primary.source_catalog,
+                **(categories or {}).get(hex_code, {}),
             }
         )
-    inserted: Dict[str, Dict] = {}
-    for chunk in chunked(payloads, batch_size):
-        response = client.table("colors").insert(chunk, count="exact").execute()
-        for row in response.data or chunk:
-            inserted[row["hex_code"]] = row
-    logging.info("Inserted %d new color rows", len(inserted))
-    return inserted
+    return rows
 
 
-def update_existing_colors(
-    client: Client,
-    existing: Dict[str, Dict],
-    variants_by_hex: Dict[str, List[VariantRecord]],
-    dry_run: bool,
-    overwrite_primary: bool,
-) -> None:
+def color_backfills(existing: Dict[str, Dict], variants_by_hex: Mapping[str, List[VariantRecord]]) -> List[Dict]:
+    """Blank brand/finish/source_priority on stored colours, filled from their primary variant."""
+    backfills = []
     for hex_code, color in existing.items():
         variants = variants_by_hex.get(hex_code)
         if not variants:
@@ -459,35 +644,17 @@ def update_existing_colors(
             updates["finish"] = primary.finish
         if not color.get("source_priority"):
             updates["source_priority"] = primary.source_catalog
-        if overwrite_primary and variants:
-            # primary_variant_id handled after variant upsert when IDs are known
-            pass
-        if updates and not dry_run:
-            response = client.table("colors").update(updates).eq("id", color["id"]).execute()
-
+        if updates:
+            backfills.append({"id": color["id"], "hex_code": hex_code, "values": updates})
+    return backfills
 
-def fetch_existing_variants(client: Client, color_ids: Iterable[str]) -> Dict[str, Dict[str, Dict]]:
-    by_color: Dict[str, Dict[str, Dict]] = {}
-    color_id_list = list(set(color_ids))
-    for chunk in chunked(color_id_list, 200):
-        response = client.table("color_variants").select(
-            "id, color_id, brand, product_line, shade_name, shade_code"
-        ).in_("color_id", chunk).execute()
-        for row in response.data:
-            key = (row["brand"], row["product_line"], row["shade_name"], row.get("shade_code") or None)
-            by_color.setdefault(row["color_id"], {})[str(key)] = row
-    return by_color
 
-
-def upsert_variants(
-    client: Client,
+def variant_rows(
     colors_by_hex: Dict[str, Dict],
-    variants_by_hex: Dict[str, List[VariantRecord]],
-    dry_run: bool,
-    batch_size: int,
-) -> Tuple[Dict[str, str], int]:
-    color_ids = [color["id"] for color in colors_by_hex.values()]
-    existing_variants = fetch_existing_variants(client, color_ids) if not dry_run else {}
+    variants_by_hex: Mapping[str, List[VariantRecord]],
+    existing_variants: Dict[str, Dict[str, Dict]],
+) -> Tuple[List[Dict], Dict[str, str], int]:
+    """color_variants rows to upsert, the primary variant id per colour, and how many rows are new."""
     rows_to_upsert = []
     primary_variants: Dict[str, str] = {}
     total_new = 0
@@ -522,51 +689,407 @@ def upsert_variants(
                     "is_active": True,
                 }
             )
-    if dry_run:
-        logging.info("Dry-run: would upsert %d color_variants (including %d new)", len(rows_to_upsert), total_new)
-        return primary_variants, total_new
-
-    for chunk in chunked(rows_to_upsert, batch_size):
-        response = client.table("color_variants").upsert(
-            chunk,
-            on_conflict=("color_id,brand,product_line,shade_name,shade_code"),
-            returning="minimal",
-        ).execute()
-    logging.info("Upserted %d color_variants (new: %d)", len(rows_to_upsert), total_new)
-    return primary_variants, total_new
+    return rows_to_upsert, primary_variants, total_new
 
 
-def update_primary_variants(
-    client: Client,
+def primary_updates(
     colors_by_hex: Dict[str, Dict],
     primary_map: Dict[str, str],
     overwrite_primary: bool,
-    dry_run: bool,
-) -> None:
+    deactivated: Set[str] = frozenset(),
+    settled: Collection[str] = frozenset(),
+) -> List[Dict]:
+    """Primary variant writes; hexes in `settled` already got theirs earlier in a streamed run."""
     updates = []
     for color in colors_by_hex.values():
         color_id = color["id"]
         new_primary = primary_map.get(color_id)
-        if not new_primary:
+        if not new_primary or color["hex_code"] in settled:
             continue
-        if color.get("primary_variant_id") and not overwrite_primary:
+        current = color.get("primary_variant_id")
+        # A primary that is being deactivated gets cleared, so it is replaced like a missing one
+        if current and current not in deactivated and not overwrite_primary:
             continue
         updates.append({"id": color_id, "primary_variant_id": new_primary})
-    if not updates:
+    return updates
+
+
+def category_updates(stored: Dict[str, Dict], categories: Dict[str, Dict]) -> List[Dict]:
+    return [{"id": stored[hex_code]["id"], **values} for hex_code, values in categories.items() if hex_code in stored]
+
+
+@timed
+def plan_rest_sync(
+    client: Client,
+    variants_by_hex: Mapping[str, List[VariantRecord]],
+    args: argparse.Namespace,
+    digest: str,
+    tuners: Optional[TunerSet] = None,
+    streaming: bool = False,
+    settled: Collection[str] = frozenset(),
+) -> SyncPlan:
+    """Read what the REST sync needs and lay out every write it will make, in order.
+
+    With `streaming` the plan covers one `--stream` batch: deactivation and
+    categorisation are left to the end of the run, and the hexes to recategorise
+    are returned in `meta["touched"]`.
+    """
+    all_hexes = list(variants_by_hex.keys())
+    existing_colors = fetch_existing_colors(client, all_hexes, tuners)
+    missing_hexes = [hex_code for hex_code in all_hexes if hex_code not in existing_colors]
+    logging.info("Existing colors: %d | New colors: %d", len(existing_colors), len(missing_hexes))
+
+    stored_categories: Dict[str, Dict] = {}
+    categories: Optional[Dict[str, Dict]] = None
+    if args.categorize == "client" and not streaming:
+        stored_categories, categories = plan_client_categories(client, missing_hexes)
+
+    new_colors = new_color_rows(missing_hexes, variants_by_hex, categories)
+    backfills = color_backfills(existing_colors, variants_by_hex)
+    colors_by_hex = {**existing_colors, **{row["hex_code"]: row for row in new_colors}}
+    existing_variants = (
+        fetch_existing_variants(client, [color["id"] for color in existing_colors.values()], tuners)
+        if not args.dry_run
+        else {}
+    )
+    rows, primary_map, variants_inserted = variant_rows(colors_by_hex, variants_by_hex, existing_variants)
+
+    plan = SyncPlan(
+        digest,
+        "rest",
+        {
+            "variants": sum(len(v) for v in variants_by_hex.values()),
+            "colors": len(variants_by_hex),
+            "colors_inserted": len(new_colors),
+            "variants_inserted": variants_inserted,
+        },
+    )
+    for chunk in chunked(new_colors, args.batch_size):
+        plan.add("insert_colors", chunk)
+    for backfill in backfills:
+        plan.add("update_color", backfill)
+    for chunk in chunked(rows, args.batch_size):
+        plan.add("upsert_variants", chunk)
+    deactivated = set() if streaming else plan_deactivations(client, variants_by_hex, args, plan)
+    updates = primary_updates(colors_by_hex, primary_map, args.overwrite_primary, deactivated, settled)
+    for chunk in chunked(updates, args.batch_size):
+        plan.add("update_primary", chunk)
+    touched = [row["hex_code"] for row in new_colors] + [backfill["hex_code"] for backfill in backfills]
+    if streaming:
+        plan.meta["touched"] = sorted(touched)
+    elif categories is None:
+        plan.add("refresh_categories", {"hex_codes": None if args.full_refresh else sorted(touched)})
+    else:
+        for chunk in chunked(category_updates(stored_categories, categories), args.batch_size):
+            plan.add("update_category", chunk)
+    return plan
+
+
+@timed
+def insert_new_colors(client: Client, plan: SyncPlan, dry_run: bool, tuners: Optional[TunerSet] = None) -> None:
+    if dry_run:
+        logging.info(
+            "Dry-run: skipping insertion of %d new colors",
+            sum(len(step.payload) for step in plan.pending("insert_colors")),
+        )
+        return
+
+    def send(rows: List[Dict]) -> None:
+        if plan.resumed:
+            # Rows may have committed just before the interruption
+            client.table("colors").upsert(
+                rows, on_conflict="hex_code", ignore_duplicates=True, returning="minimal"
+            ).execute()
+        else:
+            client.table("colors").insert(rows, returning="minimal").execute()
+
+    inserted = send_planned_rows(plan, "insert_colors", (tuners or TunerSet()).body("colors.insert"), send)
+    logging.info("Inserted %d new color rows", inserted)
+
+
+@timed
+def update_existing_colors(client: Client, plan: SyncPlan, dry_run: bool) -> None:
+    steps = list(plan.pending("update_color"))
+    if dry_run:
+        logging.info("Dry-run: would backfill brand/finish/source on %d colors", len(steps))
+        return
+    for step in steps:
+        client.table("colors").update(step.payload["values"]).eq("id", step.payload["id"]).execute()
+        plan.mark_done(step)
+
+
+@timed
+def fetch_existing_variants(
+    client: Client, color_ids: Iterable[str], tuners: Optional[TunerSet] = None
+) -> Dict[str, Dict[str, Dict]]:
+    by_color: Dict[str, Dict[str, Dict]] = {}
+    rows = lookup_rows(
+        client,
+        "color_variants",
+        "id, color_id, brand, product_line, shade_name, shade_code",
+        "color_id",
+        sorted(set(color_ids)),
+        tuners or TunerSet(),
+    )
+    for row in rows:
+        key = (row["brand"], row["product_line"], row["shade_name"], row.get("shade_code") or None)
+        by_color.setdefault(row["color_id"], {})[str(key)] = row
+    return by_color
+
+
+def send_planned_rows(plan: SyncPlan, kind: str, tuner: BatchTuner, send: Callable[[List[Dict]], object]) -> int:
+    """Send the rows of every unfinished `kind` step in tuner-sized requests.
+
+    A request may cover part of a step or several steps. Each step is
+    checkpointed once all of its rows have been sent.
+    """
+    steps = list(plan.pending(kind))
+    rows = [row for step in steps for row in step.payload]
+    ends = list(itertools.accumulate(len(step.payload) for step in steps))
+    done = 0
+
+    def checkpoint(sent: int) -> None:
+        nonlocal done
+        while done < len(steps) and ends[done] <= sent:
+            plan.mark_done(steps[done])
+            done += 1
+
+    checkpoint(0)  # steps with no rows
+    send_in_batches(rows, tuner, lambda batch: send(list(batch)), checkpoint)
+    return len(rows)
+
+
+@timed
+def upsert_variants(client: Client, plan: SyncPlan, dry_run: bool, tuners: Optional[TunerSet] = None) -> None:
+    if dry_run:
+        logging.info(
+            "Dry-run: would upsert %d color_variants (including %d new)",
+            sum(len(step.payload) for step in plan.pending("upsert_variants")),
+            plan.meta["variants_inserted"],
+        )
+        return
+    rows = send_planned_rows(
+        plan,
+        "upsert_variants",
+        (tuners or TunerSet()).body("color_variants.upsert"),
+        lambda chunk: client.table("color_variants").upsert(
+            chunk,
+            on_conflict=("color_id,brand,product_line,shade_name,shade_code"),
+            returning="minimal",
+        ).execute(),
+    )
+    logging.info("Upserted %d color_variants (new: %d)", rows, plan.meta["variants_inserted"])
+
+
+@timed
+def update_primary_variants(client: Client, plan: SyncPlan, dry_run: bool, tuners: Optional[TunerSet] = None) -> None:
+    """Write the planned primary variants through set_primary_variants() in
+    tuner-sized batches, or one PATCH per colour without 47_set_primary_variants.sql."""
+    total = sum(len(step.payload) for step in plan.pending("update_primary"))
+    if not total:
         return
     if dry_run:
-        logging.info("Dry-run: would update %d colors with primary_variant_id", len(updates))
+        logging.info("Dry-run: would update %d colors with primary_variant_id", total)
         return
-    for entry in updates:
-        response = client.table("colors").update({"primary_variant_id": entry["primary_variant_id"]}).eq(
-            "id", entry["id"]
-        ).execute()
+    try:
+        send_planned_rows(
+            plan,
+            "update_primary",
+            (tuners or TunerSet()).body("colors.primaries"),
+            lambda rows: client.rpc("set_primary_variants", {"p_rows": rows}).execute(),
+        )
+    except APIError as exc:
+        if exc.code != "PGRST202":
+            raise
+        logging.info("set_primary_variants() is not installed (supabase/47_set_primary_variants.sql); patching rows")
+        for step in plan.pending("update_primary"):
+            for row in step.payload:
+                client.table("colors").update({"primary_variant_id": row["primary_variant_id"]}).eq(
+                    "id", row["id"]
+                ).execute()
+            plan.mark_done(step)
+
+
+def chunk_by_hex(variants_by_hex: Dict[str, List[VariantRecord]], size: int) -> Iterable[List[VariantRecord]]:
+    # Keep every variant of a hex in the same chunk so the server sees the primary first
+    chunk: List[VariantRecord] = []
+    for variants in variants_by_hex.values():
+        if chunk and len(chunk) + len(variants) > size:
+            yield chunk
+            chunk = []
+        chunk.extend(variants)
+    if chunk:
+        yield chunk
+
+
+def encode_catalog_chunk(records: List[VariantRecord]) -> Dict[str, object]:
+    payload: Dict[str, object] = {
+        "hex_code": [record.hex_code for record in records],
+        "shade_name": [record.shade_name for record in records],
+        "shade_code": [record.shade_code for record in records],
+        "product_url": [record.product_url for record in records],
+        "swatch_url": [record.swatch_url for record in records],
+    }
+    for column in ("brand", "product_line", "finish", "source_catalog", "collection"):
+        values: Dict[Optional[str], int] = {}
+        codes = []
+        for record in records:
+            value = getattr(record, column)
+            codes.append(None if value is None else values.setdefault(value, len(values)))
+        values.pop(None, None)
+        payload[column] = {"values": list(values), "codes": codes}
+    return payload
+
+
+@timed
+def fetch_active_variant_keys(client: Client, sources: List[str]) -> Optional[List[Dict]]:
+    """Every active variant of `sources` with its unique key, or None without 45_deactivate_missing_variants.sql."""
+    try:
+        return keyset_rows(
+            lambda after: client.rpc(
+                "catalog_active_variant_keys",
+                {"p_source_catalogs": sources, "p_after": after, "p_limit": PAGE_ROWS},
+            ).execute().data
+        )
+    except APIError as exc:
+        if exc.code != "PGRST202":
+            raise
+        logging.warning(
+            "catalog_active_variant_keys() is not installed (supabase/45_deactivate_missing_variants.sql); "
+            "variants that left their catalogue stay active"
+        )
+        return None
+
+
+def plan_deactivations(
+    client: Client, variants_by_hex: Mapping[str, List[VariantRecord]], args: argparse.Namespace, plan: SyncPlan
+) -> Set[str]:
+    """Plan `deactivate_variants` steps for stored variants the catalogues no longer list; returns their ids."""
+    plan.meta["variants_deactivated"] = 0
+    if args.keep_missing:
+        return set()
+    keys, sources = ingested_keys(itertools.chain.from_iterable(variants_by_hex.values()))
+    stored = fetch_active_variant_keys(client, sorted(sources))
+    if stored is None:
+        return set()
+    active, stale = stale_variants(stored, keys)
+    missing = {source: len(ids) for source, ids in stale.items()}
+    ids = [
+        variant_id
+        for source in allowed_sources(active, missing, args.max_deactivate_fraction)
+        for variant_id in stale[source]
+    ]
+    plan.meta["variants_deactivated"] = len(ids)
+    for chunk in chunked(ids, args.batch_size):
+        plan.add("deactivate_variants", chunk)
+    return set(ids)
+
+
+@timed
+def deactivate_missing_variants(client: Client, plan: SyncPlan, dry_run: bool, tuners: Optional[TunerSet] = None) -> None:
+    total = plan.meta.get("variants_deactivated", 0)
+    if dry_run:
+        logging.info("Dry-run: would deactivate %d variants no longer in their catalogue", total)
+        return
+    send_planned_rows(
+        plan,
+        "deactivate_variants",
+        (tuners or TunerSet()).body("color_variants.deactivate"),
+        lambda ids: client.rpc("deactivate_color_variants", {"p_ids": ids}).execute(),
+    )
+    if total:
+        logging.info("Deactivated %d variants no longer in their catalogue", total)
+    count("variants_deactivated", total)
+
+
+@timed
+def plan_rpc_sync(
+    client: Client,
+    variants_by_hex: Mapping[str, List[VariantRecord]],
+    args: argparse.Namespace,
+    digest: str,
+    streaming: bool = False,
+    settled: Collection[str] = frozenset(),
+) -> SyncPlan:
+    """Deactivation of vanished variants, then one merge_color_catalog() call per chunk of whole hexes.
+
+    With `streaming` (one `--stream` batch) deactivation is left to the end of
+    the run, and hexes in `settled`, whose primary an earlier batch chose, are
+    merged without `--overwrite-primary`.
+    """
+    plan = SyncPlan(
+        digest,
+        "rpc",
+        {
+            "variants": sum(len(v) for v in variants_by_hex.values()),
+            "colors": len(variants_by_hex),
+            "hex_codes": sorted(variants_by_hex) if args.categorize == "client" else [],
+        },
+    )
+    if not streaming:
+        plan_deactivations(client, variants_by_hex, args, plan)
+    parts: List[Tuple[Mapping[str, List[VariantRecord]], bool]] = [(variants_by_hex, args.overwrite_primary)]
+    if settled:
+        fresh = {hex_code: rows for hex_code, rows in variants_by_hex.items() if hex_code not in settled}
+        seen = {hex_code: rows for hex_code, rows in variants_by_hex.items() if hex_code in settled}
+        parts = [(fresh, args.overwrite_primary), (seen, False)]
+    for part, overwrite in parts:
+        for chunk in chunk_by_hex(part, args.rpc_chunk_size):
+            plan.add("merge_rpc", {"p_payload": encode_catalog_chunk(chunk), "p_overwrite_primary": overwrite})
+    return plan
+
+
+@timed
+def merge_catalog_rpc(client: Client, plan: SyncPlan, dry_run: bool) -> Tuple[Dict[str, int], Set[str]]:
+    """Run the plan's merge chunks; returns counts summed over every chunk (including
+    ones merged before a resume) and the hexes that were inserted or backfilled."""
+    totals: Dict[str, int] = {}
+    touched: Set[str] = set()
+    if dry_run:
+        logging.info(
+            "Dry-run: would call merge_color_catalog() %d times for %d variants",
+            plan.count("merge_rpc"),
+            plan.meta["variants"],
+        )
+        return totals, touched
+    for step in plan.pending("merge_rpc"):
+        response = client.rpc("merge_color_catalog", step.payload).execute()
+        plan.mark_done(step, response.data or {})
+    for result in plan.results("merge_rpc"):
+        result = dict(result)
+        touched.update(result.pop("hex_codes", None) or [])
+        for key, value in result.items():
+            totals[key] = totals.get(key, 0) + int(value)
+    logging.info(
+        "merge_color_catalog(): %d chunks | %d new colors | %d variants upserted (new: %d) | %d primaries set",
+        plan.count("merge_rpc"),
+        totals.get("colors_inserted", 0),
+        totals.get("variants_upserted", 0),
+        totals.get("variants_inserted", 0),
+        totals.get("primaries_updated", 0),
+    )
+    return totals, touched
 
 
-def trigger_hex_refresh(client: Client, dry_run: bool) -> None:
+@timed
+def trigger_hex_refresh(client: Client, dry_run: bool, hex_codes: Optional[Iterable[str]] = None) -> None:
+    """Run refresh_hex_categorization(), scoped to `hex_codes` when given."""
     if dry_run:
         logging.info("Dry-run: skipping refresh_hex_categorization() call")
         return
+    if hex_codes is not None:
+        scoped = sorted(set(hex_codes))
+        if not scoped:
+            logging.info("No colours inserted or changed – skipping hex categorisation refresh")
+            return
+        try:
+            client.rpc("refresh_hex_categorization", {"p_hex_codes": scoped}).execute()
+        except APIError as exc:
+            # Databases without 43_scoped_hex_categorization.sql only have the full refresh
+            logging.warning("Scoped refresh_hex_categorization() failed, falling back to a full refresh: %s", exc)
+        else:
+            logging.info("Hex categorisation refreshed for %d colours", len(scoped))
+            return
     try:
         response = client.rpc("refresh_hex_categorization").execute()
     except APIError as exc:
@@ -578,56 +1101,382 @@ def trigger_hex_refresh(client: Client, dry_run: bool) -> None:
     logging.info("Hex categorisation refreshed successfully")
 
 
-def main(argv: Optional[List[str]] = None) -> int:
-    args = parse_args(argv)
-    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="[%(levelname)s] %(message)s")
-    ensure_catalog_paths(args)
-
+@timed
+def apply_client_categories(
+    client: Client, plan: SyncPlan, dry_run: bool, tuners: Optional[TunerSet] = None
+) -> None:
+    """Write the planned categorisation columns through apply_hex_categories() in
+    tuner-sized batches, or one PATCH per colour without 46_apply_hex_categories.sql."""
+    total = sum(len(step.payload) for step in plan.pending("update_category"))
+    if dry_run:
+        logging.info("Dry-run: would update categorisation on %d existing colors", total)
+        return
     try:
-        client = ensure_client()
-    except CatalogSyncError as exc:
-        logging.error(exc)
+        send_planned_rows(
+            plan,
+            "update_category",
+            (tuners or TunerSet()).body("colors.categories"),
+            lambda rows: client.rpc("apply_hex_categories", {"p_rows": rows}).execute(),
+        )
+    except APIError as exc:
+        if exc.code != "PGRST202":
+            raise
+        logging.info("apply_hex_categories() is not installed (supabase/46_apply_hex_categories.sql); patching rows")
+        for step in plan.pending("update_category"):
+            for row in step.payload:
+                values = {key: value for key, value in row.items() if key != "id"}
+                client.table("colors").update(values).eq("id", row["id"]).execute()
+            plan.mark_done(step)
+    logging.info("Updated categorisation on %d existing colors", total)
+
+
+@timed
+def plan_client_categories(client: Client, new_hexes: Iterable[str]) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    from hex_categorization import plan_categorization
+
+    stored = fetch_color_categories(client)
+    return stored, plan_categorization(stored, new_hexes)
+
+
+def report_nearest(args: argparse.Namespace) -> int:
+    from shade_index import ShadeIndex, format_matches
+
+    index = ShadeIndex(list(catalogue_records(args)))
+    filters = {
+        "brand": args.nearest_brand,
+        "product_line": args.nearest_product_line,
+        "finish": args.nearest_finish,
+    }
+    for hex_code in args.nearest:
+        try:
+            if args.nearest_within is not None:
+                matches = index.within(hex_code, args.nearest_within, **filters)
+            else:
+                matches = index.nearest(hex_code, args.nearest_k, **filters)
+        except ValueError as exc:
+            logging.error(exc)
+            return 1
+        print(format_matches(hex_code, matches))
+    return 0
+
+
+def sync_postgres(args: argparse.Namespace, records: Optional[Iterable[VariantRecord]] = None) -> int:
+    dsn = os.getenv("DATABASE_URL")
+    if not dsn:
+        logging.error("DATABASE_URL must be set for --backend postgres")
         return 1
+    from catalog_postgres import sync_via_postgres
 
-    records = load_catalogues(args)
-    if not records:
+    summary = sync_via_postgres(
+        dsn,
+        catalogue_records(args) if records is None else records,
+        args.overwrite_primary,
+        args.dry_run,
+        client_categorize=args.categorize == "client",
+        full_refresh=args.full_refresh,
+        max_deactivate_fraction=None if args.keep_missing else args.max_deactivate_fraction,
+    )
+    if not summary.staged:
         logging.warning("No records found – nothing to do")
         return 0
+    for item, value in vars(summary).items():
+        count(item, value)
+    logging.info("Catalog sync complete")
+    export_after_sync(args)
+    return 0
 
-    records = deduplicate(records)
-    variants_by_hex = map_hex_to_variants(records)
-    all_hexes = list(variants_by_hex.keys())
 
-    existing_colors = fetch_existing_colors(client, all_hexes)
-    missing_hexes = [hex_code for hex_code in all_hexes if hex_code not in existing_colors]
-    logging.info("Existing colors: %d | New colors: %d", len(existing_colors), len(missing_hexes))
+@timed
+def export_after_sync(args: argparse.Namespace, client: Optional[Client] = None) -> None:
+    if not args.export_dir:
+        return
+    if args.dry_run:
+        logging.info("Dry run – skipping catalogue export to %s", args.export_dir)
+        return
+    from catalog_export import export_catalog, fetch_entries_postgres, fetch_entries_rest
 
-    created_colors = insert_new_colors(client, missing_hexes, variants_by_hex, args.dry_run, args.batch_size)
+    if client is None:
+        entries = fetch_entries_postgres(os.environ["DATABASE_URL"])
+    else:
+        entries = fetch_entries_rest(client)
+    export_catalog(entries, args.export_dir)
+    if args.swatch_cache:
+        from swatch_assets import SwatchCache, build_swatch_assets
 
-    colors_by_hex = {**existing_colors, **created_colors}
+        build_swatch_assets(entries, SwatchCache(args.swatch_cache), args.export_dir)
 
-    update_existing_colors(client, existing_colors, variants_by_hex, args.dry_run, args.overwrite_primary)
 
-    primary_map, inserted_count = upsert_variants(
-        client,
-        colors_by_hex,
-        variants_by_hex,
-        args.dry_run,
-        args.batch_size,
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()), format="[%(levelname)s] %(message)s")
+    if args.stream:
+        # These need the whole catalogue up front, or read the CSVs --stream replaces
+        conflicts = [
+            option
+            for option, value in (
+                ("--resume", args.resume),
+                ("--merge-delta-e", args.merge_delta_e is not None),
+                ("--columnar", args.columnar),
+                ("--bundle", args.bundle),
+                ("--nearest", args.nearest),
+            )
+            if value
+        ]
+        if conflicts:
+            logging.error("--stream cannot be combined with %s", ", ".join(conflicts))
+            return 1
+    else:
+        ensure_catalog_paths(args)
+
+    if args.nearest:
+        return report_nearest(args)
+
+    with start_run("sync_color_catalog", args.metrics_json, args.metrics_textfile, args.trace, args.profile) as metrics:
+        metrics.exit_code = sync(args)
+    return metrics.exit_code
+
+
+def sync_input_digest(args: argparse.Namespace) -> str:
+    return input_digest(
+        [getattr(args, name) for name in CATALOG_SOURCES if getattr(args, name)],
+        {
+            "backend": args.backend,
+            "overwrite_primary": args.overwrite_primary,
+            "categorize": args.categorize,
+            "full_refresh": args.full_refresh,
+            "merge_delta_e": args.merge_delta_e,
+            "keep_missing": args.keep_missing,
+            "max_deactivate_fraction": args.max_deactivate_fraction,
+        },
+    )
+
+
+def tuners_from_args(args: argparse.Namespace) -> TunerSet:
+    return TunerSet(
+        TuningSettings(
+            initial=args.batch_size,
+            max_body_bytes=args.max_request_bytes,
+            target_seconds=args.target_latency,
+            adaptive=args.batch_tuning == "auto",
+        )
     )
 
-    update_primary_variants(client, colors_by_hex, primary_map, args.overwrite_primary, args.dry_run)
 
+def prepare_plan(client: Client, args: argparse.Namespace, tuners: TunerSet) -> Optional[SyncPlan]:
+    """Load the plan to resume, or build (and, unless dry-running, save) a new one; None if there is nothing to sync."""
+    digest = sync_input_digest(args)
+    if args.resume:
+        plan = SyncPlan.load(args.plan_file)
+        if plan.backend != args.backend or plan.input != digest:
+            raise PlanError(
+                f"{args.plan_file} was planned for other catalogues or options; rerun without --resume to start over"
+            )
+        logging.info("Resuming the sync planned at %s: %s", plan.created_at, plan.describe())
+        return plan
+    leftover = None if args.dry_run else unfinished_plan(args.plan_file)
+    if leftover:
+        logging.warning("Replacing the unfinished sync plan at %s (%s); --resume continues it", args.plan_file, leftover)
+
+    variants_by_hex = map_hex_to_variants(catalogue_records(args))
+    if not variants_by_hex:
+        return None
+    if args.backend == "rpc":
+        plan = plan_rpc_sync(client, variants_by_hex, args, digest)
+    else:
+        plan = plan_rest_sync(client, variants_by_hex, args, digest, tuners)
+    if not args.dry_run:
+        plan.save(args.plan_file)
+        logging.info("Saved the sync plan (%d steps) to %s", len(plan.steps), args.plan_file)
+    return plan
+
+
+def sync(args: argparse.Namespace) -> int:
+    if args.backend == "postgres":
+        if args.resume:
+            logging.error("--resume applies to the rest and rpc backends; the postgres merge is a single transaction")
+            return 1
+        if args.stream:
+            # COPY consumes the rows as the scrapers produce them; a failed scraper rolls the merge back
+            try:
+                return sync_postgres(args, itertools.chain.from_iterable(stream_from_args(args)))
+            except CatalogSyncError as exc:
+                logging.error(exc)
+                return 1
+        return sync_postgres(args)
+    if args.stream:
+        return sync_stream(args)
+
+    tuners = tuners_from_args(args)
+    try:
+        client = ensure_client()
+        plan = prepare_plan(client, args, tuners)
+    except (CatalogSyncError, PlanError) as exc:
+        logging.error(exc)
+        return 1
+    if plan is None:
+        logging.warning("No records found – nothing to do")
+        return 0
+
+    try:
+        if args.backend == "rpc":
+            sync_rpc(client, plan, args, tuners)
+        else:
+            sync_rest(client, plan, args, tuners)
+    except Exception:
+        if plan.path is not None:
+            logging.error(
+                "Sync stopped with %s; rerun with --resume to continue from the first unfinished step", plan.describe()
+            )
+        raise
+    plan.discard()
+    logging.info("Catalog sync complete")
+    export_after_sync(args, client)
+    return 0
+
+
+def categorize_after_merge(
+    client: Client, args: argparse.Namespace, hex_codes: Iterable[str], touched: Iterable[str], tuners: TunerSet
+) -> None:
+    """Recategorise after the rows are written: every colour client-side, or `touched` via the server refresh."""
+    if args.categorize == "client":
+        # Categorisation spans the whole table, so it is recomputed after the merge rather than planned
+        stored, categories = plan_client_categories(client, hex_codes)
+        category_plan = SyncPlan("", args.backend)
+        for chunk in chunked(category_updates(stored, categories), args.batch_size):
+            category_plan.add("update_category", chunk)
+        apply_client_categories(client, category_plan, args.dry_run, tuners)
+    else:
+        trigger_hex_refresh(client, args.dry_run, None if args.full_refresh else touched)
+
+
+def sync_rpc(client: Client, plan: SyncPlan, args: argparse.Namespace, tuners: TunerSet) -> None:
+    # First, so the merge repoints colours whose primary variant was deactivated
+    deactivate_missing_variants(client, plan, args.dry_run, tuners)
+    totals, touched_hexes = merge_catalog_rpc(client, plan, args.dry_run)
+    for item, value in totals.items():
+        count(item, value)
+    categorize_after_merge(client, args, plan.meta["hex_codes"], touched_hexes, tuners)
+
+
+def write_rest_plan(client: Client, plan: SyncPlan, args: argparse.Namespace, tuners: TunerSet) -> None:
+    insert_new_colors(client, plan, args.dry_run, tuners)
+    update_existing_colors(client, plan, args.dry_run)
+    upsert_variants(client, plan, args.dry_run, tuners)
+    deactivate_missing_variants(client, plan, args.dry_run, tuners)
+    update_primary_variants(client, plan, args.dry_run, tuners)
+
+
+def sync_rest(client: Client, plan: SyncPlan, args: argparse.Namespace, tuners: TunerSet) -> None:
+    write_rest_plan(client, plan, args, tuners)
+
+    meta = plan.meta
     logging.info(
-        "Variant ingest summary: %d total variants processed (%d unique colours)",
-        sum(len(v) for v in variants_by_hex.values()),
-        len(variants_by_hex),
+        "Variant ingest summary: %d total variants processed (%d unique colours)", meta["variants"], meta["colors"]
     )
-    logging.info("New variants inserted: %d", inserted_count)
+    logging.info("New variants inserted: %d", meta["variants_inserted"])
+    for item in ("variants", "colors", "colors_inserted", "variants_inserted"):
+        count(item, meta[item])
+
+    apply_client_categories(client, plan, args.dry_run, tuners)
+    for step in plan.pending("refresh_categories"):
+        trigger_hex_refresh(client, args.dry_run, step.payload["hex_codes"])
+        plan.mark_done(step)
+    tuners.log_summary()
+
+
+def stream_from_args(args: argparse.Namespace) -> Iterator[List[VariantRecord]]:
+    from catalog_stream import stream_records
+
+    return stream_records(
+        args.stream,
+        batch_rows=args.stream_batch,
+        flush_seconds=args.stream_flush,
+        capacity=args.stream_buffer,
+        csv_dir=args.stream_csv_dir,
+    )
+
 
-    trigger_hex_refresh(client, args.dry_run)
+def write_stream_batch(
+    client: Client,
+    variants_by_hex: Mapping[str, List[VariantRecord]],
+    args: argparse.Namespace,
+    tuners: TunerSet,
+    settled: Collection[str] = frozenset(),
+) -> Set[str]:
+    """Write one `--stream` batch; returns the hexes it inserted or backfilled."""
+    if args.backend == "rpc":
+        plan = plan_rpc_sync(client, variants_by_hex, args, "stream", streaming=True, settled=settled)
+        totals, touched = merge_catalog_rpc(client, plan, args.dry_run)
+        for item, value in totals.items():
+            count(item, value)
+        return touched
+    plan = plan_rest_sync(client, variants_by_hex, args, "stream", tuners, streaming=True, settled=settled)
+    write_rest_plan(client, plan, args, tuners)
+    for item in ("colors_inserted", "variants_inserted"):
+        count(item, plan.meta[item])
+    return set(plan.meta["touched"])
+
+
+def deactivate_after_stream(
+    client: Client, streamed: Mapping[str, List[VariantRecord]], args: argparse.Namespace, tuners: TunerSet
+) -> List[str]:
+    """Deactivate the variants no scraper produced; returns the streamed hexes left without a primary."""
+    plan = SyncPlan("stream", args.backend)
+    deactivated = plan_deactivations(client, streamed, args, plan)
+    deactivate_missing_variants(client, plan, args.dry_run, tuners)
+    if not deactivated or args.dry_run:
+        return []
+    colors = fetch_existing_colors(client, streamed, tuners)
+    return sorted(hex_code for hex_code, color in colors.items() if not color.get("primary_variant_id"))
+
+
+def sync_stream(args: argparse.Namespace) -> int:
+    """REST/RPC sync of the rows the `--stream` scrapers produce, batch by batch as they arrive.
+
+    Each batch is planned and written like a small sync against what is stored,
+    including the rows of earlier batches. A colour's primary is its first
+    variant to arrive. Deactivation needs every scraper's full output, so it
+    runs once the stream ends, and only if every scraper finished; colours whose
+    primary it deactivated are then repointed. Categorisation runs last. There
+    is no saved plan, so an interrupted stream is rerun rather than resumed:
+    every write is an upsert, so the rows already written are matched again.
+    """
+    from catalog_stream import ScraperFailed
+
+    tuners = tuners_from_args(args)
+    try:
+        client = ensure_client()
+    except CatalogSyncError as exc:
+        logging.error(exc)
+        return 1
+    streamed: Dict[str, List[VariantRecord]] = {}
+    touched: Set[str] = set()
+    try:
+        for batch in stream_from_args(args):
+            variants_by_hex = map_hex_to_variants(batch)
+            touched |= write_stream_batch(client, variants_by_hex, args, tuners, settled=streamed.keys())
+            for hex_code, variants in variants_by_hex.items():
+                streamed.setdefault(hex_code, []).extend(variants)
+    except ScraperFailed as exc:
+        logging.error("%s; the %d colours already streamed were written, nothing was deactivated", exc, len(streamed))
+        return 1
+    if not streamed:
+        logging.warning("No records found – nothing to do")
+        return 0
 
+    repoint = deactivate_after_stream(client, streamed, args, tuners)
+    if repoint:
+        logging.info("Repointing %d colours whose primary variant was deactivated", len(repoint))
+        touched |= write_stream_batch(client, {hex_code: streamed[hex_code] for hex_code in repoint}, args, tuners)
+
+    variants = sum(len(v) for v in streamed.values())
+    logging.info("Variant ingest summary: %d total variants processed (%d unique colours)", variants, len(streamed))
+    count("variants", variants)
+    count("colors", len(streamed))
+    categorize_after_merge(client, args, sorted(streamed), touched, tuners)
+    tuners.log_summary()
     logging.info("Catalog sync complete")
+    export_after_sync(args, client)
     return 0
 
 
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Persisted, checkpointed execution plans for the REST and RPC syncs.
+
+Before writing anything, `sync_color_catalog.py` turns the catalogue and
+what it read from Supabase into an ordered list of write steps. Each step is
+one request body, for example:
+- a chunk of colours to insert;
+- one colour backfill;
+- a chunk of variants to upsert;
+- a chunk of primary variant pointers;
+- one `merge_color_catalog()` call.
+
+Ids for new rows are assigned when the plan is built, so every step is fixed
+and identified by the SHA-256 of its kind and payload. The plan is saved
+before the first write. After each step commits, its index, digest and server
+result are appended to a journal next to it:
+
+    .catalog_sync_plan.json          {"version": 2, "input": <digest>, "backend": ..., "meta": {...}}
+                                     then one {"kind", "digest", "payload"} line per step
+    .catalog_sync_plan.json.done     "<index> <digest> <result JSON>" per committed step
+
+If a run dies partway (say a PostgREST timeout halfway through the variant
+upserts), `--resume` loads both files and carries on from the first
+unfinished step. It skips the catalogue parse and every read. The plan
+records a digest of the catalogue files and the options that shape it, so a
+resume against changed inputs is refused rather than applied. A successful
+run deletes both files.
+
+A step that committed just before the process died but was not journalled
+runs again on resume, so every step kind is safe to replay:
+- updates and upserts are idempotent;
+- colour inserts are sent as ignore-duplicates upserts on a resumed run.
+
+The journal is flushed after each step. It is not fsynced, because the
+failures it guards against are process and network failures, not power loss.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, List, Mapping, Optional
+
+PLAN_VERSION = 2  # 2: update_primary steps carry a chunk of rows
+DEFAULT_PLAN_PATH = Path(".catalog_sync_plan.json")
+
+
+class PlanError(RuntimeError):
+    pass
+
+
+def _canonical(value: object) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def step_digest(kind: str, payload: object) -> str:
+    return hashlib.sha256(_canonical([kind, payload])).hexdigest()
+
+
+def input_digest(paths: Iterable[Path], options: Mapping[str, object]) -> str:
+    """Digest of the catalogue files' bytes plus the options that change the plan."""
+    digest = hashlib.sha256(_canonical(dict(options)))
+    for path in paths:
+        digest.update(path.name.encode("utf-8") + b"\0")
+        with path.open("rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class PlanStep:
+    index: int
+    kind: str
+    payload: object
+    digest: str
+    done: bool = False
+    result: Optional[object] = None
+
+
+@dataclass
+class SyncPlan:
+    """Ordered write steps for one sync, with the ones already committed."""
+
+    input: str
+    backend: str
+    meta: Dict[str, object] = field(default_factory=dict)
+    steps: List[PlanStep] = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    resumed: bool = False
+    path: Optional[Path] = None
+    _journal: Optional[IO[str]] = field(default=None, repr=False)
+
+    def add(self, kind: str, payload: object) -> PlanStep:
+        step = PlanStep(len(self.steps), kind, payload, step_digest(kind, payload))
+        self.steps.append(step)
+        return step
+
+    def pending(self, kind: str) -> Iterator[PlanStep]:
+        return (step for step in self.steps if step.kind == kind and not step.done)
+
+    def count(self, kind: str) -> int:
+        return sum(1 for step in self.steps if step.kind == kind)
+
+    def results(self, kind: str) -> List[object]:
+        return [step.result for step in self.steps if step.kind == kind and step.done]
+
+    @property
+    def remaining(self) -> int:
+        return sum(1 for step in self.steps if not step.done)
+
+    def mark_done(self, step: PlanStep, result: Optional[object] = None) -> None:
+        step.done, step.result = True, result
+        if self.path is None:
+            return
+        if self._journal is None:
+            self._journal = _journal_path(self.path).open("a", encoding="utf-8")
+        self._journal.write(f"{step.index} {step.digest} {json.dumps(result, separators=(',', ':'), default=str)}\n")
+        self._journal.flush()
+
+    def save(self, path: Path) -> None:
+        """Write the plan (atomically) and start a fresh journal beside it."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        header = {
+            "version": PLAN_VERSION,
+            "input": self.input,
+            "backend": self.backend,
+            "created_at": self.created_at,
+            "steps": len(self.steps),
+            "meta": self.meta,
+        }
+        with tmp.open("w", encoding="utf-8") as fh:
+            fh.write(json.dumps(header, default=str) + "\n")
+            for step in self.steps:
+                fh.write(json.dumps({"kind": step.kind, "digest": step.digest, "payload": step.payload}, default=str))
+                fh.write("\n")
+        _journal_path(path).unlink(missing_ok=True)
+        tmp.replace(path)
+        self.path = path
+
+    @classmethod
+    def load(cls, path: Path) -> "SyncPlan":
+        if not path.exists():
+            raise PlanError(f"No sync plan at {path} to resume")
+        with path.open(encoding="utf-8") as fh:
+            header = json.loads(fh.readline())
+            if header.get("version") != PLAN_VERSION:
+                raise PlanError(f"{path} is a version {header.get('version')} plan; expected {PLAN_VERSION}")
+            plan = cls(header["input"], header["backend"], header.get("meta") or {}, created_at=header["created_at"])
+            for index, line in enumerate(fh):
+                entry = json.loads(line)
+                plan.steps.append(PlanStep(index, entry["kind"], entry["payload"], entry["digest"]))
+        if len(plan.steps) != header.get("steps"):
+            raise PlanError(f"{path} is truncated: {len(plan.steps)} of {header.get('steps')} steps")
+        journal = _journal_path(path)
+        if journal.exists():
+            for line in journal.read_text(encoding="utf-8").splitlines():
+                parts = line.split(" ", 2)
+                if len(parts) < 3:
+                    continue  # a line cut short by the crash; that step simply runs again
+                index, digest = int(parts[0]), parts[1]
+                if index >= len(plan.steps) or plan.steps[index].digest != digest:
+                    raise PlanError(f"{journal} does not match {path} (step {index})")
+                plan.steps[index].done, plan.steps[index].result = True, json.loads(parts[2])
+        plan.resumed, plan.path = True, path
+        return plan
+
+    def discard(self) -> None:
+        """Delete the plan and its journal (after the sync completed)."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self.path is not None:
+            _journal_path(self.path).unlink(missing_ok=True)
+            self.path.unlink(missing_ok=True)
+            self.path = None
+
+    def describe(self) -> str:
+        kinds: Dict[str, List[int]] = {}
+        for step in self.steps:
+            done_total = kinds.setdefault(step.kind, [0, 0])
+            done_total[0] += step.done
+            done_total[1] += 1
+        parts = ", ".join(f"{kind} {done}/{total}" for kind, (done, total) in kinds.items())
+        return f"{len(self.steps) - self.remaining}/{len(self.steps)} steps done ({parts or 'empty'})"
+
+
+def _journal_path(path: Path) -> Path:
+    return path.with_name(path.name + ".done")
+
+
+def unfinished_plan(path: Path) -> Optional[str]:
+    """Describe a plan left at `path` by an interrupted run, if there is one."""
+    try:
+        return SyncPlan.load(path).describe()
+    except (PlanError, OSError, ValueError, KeyError) as exc:
+        if path.exists():
+            logging.debug("Unreadable sync plan at %s: %s", path, exc)
+            return "unreadable"
+        return None
@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+# The scripts import each other as top-level modules, as they do when run from scripts/;
+# the scrapers and their benchmark harnesses live at the repository root
+SCRIPTS_DIR = Path(__file__).resolve().parents[1]
+REPO_ROOT = Path(__file__).resolve().parents[3]
+for path in (REPO_ROOT, SCRIPTS_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from catalog_arrow import (  # noqa: E402
+    catalog_metadata,
+    export_csv,
+    load_arrow_rows,
+    parse_hex,
+    read_catalog,
+    read_csv_rows,
+    source_columns,
+    write_catalog,
+    write_table,
+)
+from catalog_model import CATALOG_SOURCES, load_rows  # noqa: E402
+
+# The scrapers' CSVs at the repository root
+CATALOGUE_DIR = Path(__file__).resolve().parents[3]
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+@pytest.mark.parametrize("name", sorted(CATALOG_SOURCES))
+def test_typed_file_loads_the_same_records_as_the_csv(tmp_path, name, suffix):
+    source = CATALOG_SOURCES[name]
+    csv_path = CATALOGUE_DIR / source.default_csv
+    rows = read_csv_rows(csv_path)
+    path = tmp_path / f"{name}{suffix}"
+
+    written = write_catalog(rows, path, source_columns(source), source_catalog=source.source_catalog)
+    records = list(load_rows(csv_path, source))
+    assert written == len(records) > 0
+    assert list(load_arrow_rows(path, source)) == records
+    assert catalog_metadata(read_catalog(path))["source_catalog"] == source.source_catalog
+
+    # And back out under the scraper's own headers
+    exported = tmp_path / f"{name}.csv"
+    export_csv(read_catalog(path), exported)
+    assert list(load_rows(exported, source)) == records
+
+
+def test_rows_are_validated_and_blanks_become_null(tmp_path):
+    columns = {"hex": "ApproxHex", "shade_name": "Name", "collection": "Collection"}
+    rows = [
+        {"ApproxHex": " c8102e", "Name": "  Red  ", "Collection": " "},
+        {"ApproxHex": "#12345", "Name": "Too short", "Collection": "x"},
+        {"ApproxHex": "#0000GG", "Name": "Not hex", "Collection": "x"},
+        {"ApproxHex": "#00ff00", "Name": " ", "Collection": "Greens"},
+    ]
+    path = tmp_path / "catalog.parquet"
+    assert write_catalog(rows, path, columns) == 2
+    table = read_catalog(path)
+    assert table.column("hex").to_pylist() == [0xC8102E, 0x00FF00]
+    assert table.column("shade_name").to_pylist() == ["Red", ""]
+    assert table.column("collection").to_pylist() == [None, "Greens"]
+    assert table.column("brand").null_count == 2
+    assert read_catalog(path, columns=["hex"]).column_names == ["hex"]
+    assert [parse_hex(value) for value in ("#abcdef", "ABCDEF", "", None, "#ABCDE")] == [0xABCDEF] * 2 + [None] * 3
+
+
+def test_unsupported_or_mistyped_files_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported"):
+        write_catalog([{"Hex": "#000000"}], tmp_path / "catalog.csv", {"hex": "Hex"})
+    write_table(pa.table({"hex": pa.array(["#000000"])}), tmp_path / "catalog.arrow")
+    with pytest.raises(ValueError, match="column hex is string"):
+        read_catalog(tmp_path / "catalog.arrow")
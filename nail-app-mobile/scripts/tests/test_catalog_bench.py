@@ -0,0 +1,76 @@
+import csv
+
+import pytest
+
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+from catalog_bench import _template_rows, compare, generate_catalogues, run_phases  # noqa: E402
+from catalog_model import CATALOG_SOURCES, deduplicate, load_rows  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+ROWS = 3000
+
+
+def read(path):
+    with path.open(newline="", encoding="utf-8") as handle:
+        return list(csv.DictReader(handle))
+
+
+@pytest.fixture(scope="module")
+def generated(tmp_path_factory):
+    return generate_catalogues(ROWS, tmp_path_factory.mktemp("bench"), duplicate_rate=0.05)
+
+
+def test_catalogues_keep_the_bundled_shape(generated):
+    templates = {name: _template_rows(source) for name, source in CATALOG_SOURCES.items()}
+    total = sum(map(len, templates.values()))
+    rows = {name: read(path) for name, path in generated.items()}
+    assert sum(map(len, rows.values())) == ROWS
+    for name, source in CATALOG_SOURCES.items():
+        assert list(rows[name][0]) == list(templates[name][0])  # the scraper's own header order
+        assert abs(len(rows[name]) - ROWS * len(templates[name]) / total) <= 1
+        records = list(load_rows(generated[name], source))
+        assert len(records) == len(rows[name])  # every hex is valid
+        # Verbatim repeats at about the requested rate, and colours that collect several variants
+        repeats = len(records) - len(list(deduplicate(records)))
+        assert 0.02 * len(records) < repeats < 0.1 * len(records)
+    hexes = [row[CATALOG_SOURCES[name].hex_column] for name in rows for row in rows[name]]
+    assert len(set(hexes)) < 0.9 * len(hexes)
+
+
+def test_same_seed_same_files(generated, tmp_path):
+    again = generate_catalogues(ROWS, tmp_path, duplicate_rate=0.05)
+    assert {name: path.read_bytes() for name, path in again.items()} == {
+        name: path.read_bytes() for name, path in generated.items()
+    }
+
+
+def test_parquet_output_loads_the_same_records(generated, tmp_path):
+    pytest.importorskip("pyarrow")
+    parquet = generate_catalogues(ROWS, tmp_path, duplicate_rate=0.05, file_format="parquet")
+    for name, source in CATALOG_SOURCES.items():
+        assert parquet[name].suffix == ".parquet"
+        assert list(sync.load_source(parquet[name], source)) == list(load_rows(generated[name], source))
+
+
+def test_phases_report_consistent_counts(generated):
+    argv = [part for name, path in generated.items() for part in (f"--{name}", str(path))]
+    results = {result.name: result for result in run_phases(sync.parse_args([*argv, "--dry-run"]), memory=False)}
+    assert list(results) == ["load", "deduplicate", "map_hex_to_variants", "upsert_variants", "rpc_payload"]
+    assert results["load"].items == ROWS
+    assert results["deduplicate"].items < ROWS
+    assert results["upsert_variants"].items == results["map_hex_to_variants"].items
+    assert all(result.seconds >= 0 and result.peak_mib is None for result in results.values())
+
+
+def test_compare_flags_only_regressions_past_the_tolerance():
+    def report(seconds, peak):
+        return {"runs": [{"rows": 100, "phases": [{"name": "load", "seconds": seconds, "peak_mib": peak}]}]}
+
+    baseline = report(1.0, 10.0)
+    assert compare(report(1.2, 12.0), baseline, 0.25) == []
+    regressions = compare(report(2.0, 10.0), baseline, 0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("load @ 100 rows: seconds")
+    assert compare(report(2.0, None), {"runs": []}, 0.25) == []
@@ -0,0 +1,110 @@
+import random
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from catalog_bundle import HEADER, VARIANT_FIELDS, CatalogBundle, write_bundle  # noqa: E402
+from catalog_model import VariantRecord  # noqa: E402
+from hex_categorization import categorize  # noqa: E402
+
+BRANDS = ["OPI", "CND", "The Gel Bottle", "Ünïcode Lacquer"]
+
+
+@pytest.fixture(scope="module")
+def records():
+    rng = random.Random(4)
+    hexes = [f"#{rng.randrange(1 << 24):06X}" for _ in range(300)]
+    return [
+        VariantRecord(
+            hex_code=rng.choice(hexes),
+            brand=rng.choice(BRANDS),
+            product_line=rng.choice(["Nail Lacquer", "Gel"]),
+            shade_name=f"Shade {index}",
+            shade_code=rng.choice([None, f"N{index % 40}"]),
+            collection=rng.choice([None, "Fall"]),
+            finish=rng.choice(["cream", "shimmer"]),
+            product_url=None,
+            swatch_url=f"https://cdn.example.com/{index}.png",
+            source_catalog="opi",
+        )
+        for index in range(1000)
+    ]
+
+
+@pytest.fixture(scope="module")
+def bundle(records, tmp_path_factory):
+    path = tmp_path_factory.mktemp("bundle") / "catalog.bundle"
+    counts = write_bundle(records, path, sources=["opi"])
+    assert (counts["colors"], counts["variants"]) == (len({record.hex_code for record in records}), len(records))
+    assert not path.with_name("catalog.bundle.partial").exists()
+    with CatalogBundle(path) as opened:
+        yield opened
+
+
+def browse_order(records):
+    """Ingest indexes sorted like the app's query: display_order, hex, ingest order."""
+    categorised = categorize(sorted({record.hex_code for record in records}))
+    rank = dict(zip(categorised.hex_codes, categorised.display_order.tolist()))
+    category = dict(zip(categorised.hex_codes, categorised.category.astype(str).tolist()))
+    order = sorted(range(len(records)), key=lambda index: (rank[records[index].hex_code], records[index].hex_code, index))
+    return order, category
+
+
+def as_record(entry):
+    return VariantRecord(entry["hex_code"], *(entry[name] for name in VARIANT_FIELDS))
+
+
+def test_sections_are_views_into_the_mapping(bundle):
+    assert bundle.metadata["sources"] == ["opi"]
+    for name, array in bundle.sections.items():
+        assert not array.flags.writeable and not array.flags.owndata, name
+        assert bundle.metadata["sections"][name]["offset"] % 64 == 0
+
+
+def test_queries_match_the_records(bundle, records):
+    order, category = browse_order(records)
+    assert len(bundle) == len(records)
+    assert [as_record(entry) for entry in bundle.entries(bundle.sections["index.browse"])] == [
+        records[index] for index in order
+    ]
+    for brand in BRANDS:
+        assert [as_record(entry) for entry in bundle.entries(bundle.by_brand(brand))] == [
+            records[index] for index in order if records[index].brand == brand
+        ]
+    for name in set(category.values()):
+        rows = bundle.by_category(name)
+        assert {entry["category"] for entry in bundle.entries(rows)} == {name}
+        assert len(rows) == sum(category[record.hex_code] == name for record in records)
+    assert [entry["shade_name"] for entry in bundle.entries(bundle.by_shade_code("N7"))] == [
+        records[index].shade_name for index in order if records[index].shade_code == "N7"
+    ]
+    assert len(bundle.by_brand("Nobody")) == len(bundle.by_shade_code("N999")) == 0
+
+
+def test_colour_rows_keep_ingest_order_and_pages_tile(bundle, records):
+    hex_code = records[0].hex_code
+    rows = bundle.variants_for_hex(hex_code.lower())
+    assert [as_record(entry) for entry in bundle.entries(rows)] == [r for r in records if r.hex_code == hex_code]
+    assert bundle.entry(int(rows[0]))["shade_name"] == "Shade 0"  # the primary variant
+    assert bundle.color_index("#GGGGGG") is None and len(bundle.variants_for_hex("#000001")) == 0
+
+    brand = "OPI"
+    pages = [bundle.browse(brand=brand, offset=offset, limit=24) for offset in range(0, len(records), 24)]
+    assert np.concatenate(pages).tolist() == bundle.by_brand(brand).tolist()
+    filtered = bundle.browse(brand=brand, category="reds", limit=len(records))
+    assert len(filtered) and all(entry["brand"] == brand and entry["category"] == "reds" for entry in bundle.entries(filtered))
+
+
+def test_foreign_or_newer_files_are_rejected(tmp_path, bundle):
+    junk = tmp_path / "junk.bundle"
+    junk.write_bytes(b"not a bundle at all")
+    with pytest.raises(ValueError, match="not a catalogue bundle"):
+        CatalogBundle(junk)
+    newer = tmp_path / "newer.bundle"
+    data = bytearray(bundle.path.read_bytes())
+    struct.pack_into("<I", data, HEADER.size - 8, 99)  # the format version follows the magic
+    newer.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="bundle format 99"):
+        CatalogBundle(newer)
@@ -0,0 +1,67 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+import sync_color_catalog as sync  # noqa: E402
+from catalog_columnar import extend_store  # noqa: E402
+from catalog_model import VariantRecord  # noqa: E402
+from variant_store import RECORD_FIELDS, VariantStore  # noqa: E402
+
+URLS = [
+    "https://www.opi.com/products/big-apple-red",
+    "https://www.opi.com/products/",  # trailing slash stays with the name
+    "no-slash-at-all",
+    "/",
+    "",
+    None,
+    "https://cdn.example.com/swatches/crème-brûlée.png",
+    "https://cdn.example.com/swatches/sub/dir/shade.jpg",
+]
+
+
+def records(offset=0):
+    return [
+        VariantRecord(
+            hex_code=f"#{(offset + index) * 4099 & 0xFFFFFF:06X}",
+            brand="OPI" if index % 2 else "CND",
+            product_line="Nail Lacquer",
+            shade_name=f"Shade ñ {offset + index}",
+            shade_code=None if index % 3 == 0 else f"NL{offset + index:03d}",
+            collection=None if index % 4 == 0 else "Fall",
+            finish="cream",
+            product_url=URLS[index % len(URLS)],
+            swatch_url=URLS[(index + 3) % len(URLS)],
+            source_catalog="opi",
+        )
+        for index in range(24)
+    ]
+
+
+def frame(rows, dtype):
+    return pd.DataFrame({name: [getattr(row, name) for row in rows] for name in RECORD_FIELDS}, dtype=dtype)
+
+
+def same_layout(left, right):
+    for name in RECORD_FIELDS:
+        assert left.column(name) == right.column(name), name
+    for name in ("shade_name", "product_url", "swatch_url"):
+        a, b = left.columns[name], right.columns[name]
+        assert (a.data, a.ends, a.missing, a.prefix_codes) == (b.data, b.ends, b.missing, b.prefix_codes), name
+
+
+@pytest.mark.parametrize("dtype", ["str", object])
+def test_columnar_fill_matches_the_row_store(dtype):
+    first, second = records(), records(offset=100)
+    columnar = VariantStore()
+    extend_store(columnar, frame(first, dtype))
+    # The second frame lands after existing data, so its offsets have to be shifted
+    extend_store(columnar, frame(second, dtype))
+    same_layout(columnar, VariantStore.from_records(first + second))
+
+
+def test_columnar_load_matches_the_row_load():
+    same_layout(
+        sync.load_variant_store(sync.parse_args(["--columnar"])),
+        sync.load_variant_store(sync.parse_args([])),
+    )
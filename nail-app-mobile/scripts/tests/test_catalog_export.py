@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import json
+
+import pytest
+
+from catalog_export import EXPORT_FIELDS, _manifest_paths, export_catalog, slug, synthetic_entries
+
+PAGE_SIZE = 40
+
+
+def read_index(out_dir, index):
+    """Rows of one manifest index, checking each shard against its recorded hash and size."""
+    rows = []
+    for shard in index["shards"]:
+        path = out_dir / shard["path"]
+        body = gzip.decompress(path.read_bytes())
+        digest = hashlib.sha256(body).hexdigest()
+        assert shard["sha256"] == digest and digest.startswith(path.name.split(".")[1])
+        assert shard["bytes"] == path.stat().st_size
+        payload = json.loads(body)
+        assert payload["fields"] == list(EXPORT_FIELDS) and len(payload["rows"]) == shard["rows"] <= PAGE_SIZE
+        rows.extend(dict(zip(payload["fields"], row)) for row in payload["rows"])
+    assert len(rows) == index["count"]
+    return rows
+
+
+def shard_files(out_dir):
+    return {path.relative_to(out_dir).as_posix() for path in (out_dir / "shards").rglob("*.json.gz")}
+
+
+@pytest.fixture
+def entries():
+    entries = synthetic_entries(500)
+    entries[0]["brand"] = None  # the app falls back to fallback_brand
+    entries[1]["category"] = None
+    return entries
+
+
+def test_shards_hold_every_entry_in_order(tmp_path, entries):
+    manifest = export_catalog(entries, tmp_path, page_size=PAGE_SIZE)
+    assert json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8")) == json.loads(json.dumps(manifest))
+    assert not list(tmp_path.rglob("*.partial"))
+
+    assert read_index(tmp_path, manifest["all"]) == entries
+    for category, index in manifest["category"].items():
+        assert read_index(tmp_path, index) == [entry for entry in entries if entry["category"] == category]
+        assert all(f"/category/{slug(category)}/" in shard["path"] for shard in index["shards"])
+    for brand, index in manifest["brand"].items():
+        assert read_index(tmp_path, index) == [
+            entry for entry in entries if (entry["brand"] or entry["fallback_brand"]) == brand
+        ]
+    assert sum(index["count"] for index in manifest["category"].values()) == len(entries) - 1
+    assert slug("The GelBottle Inc.") == "the-gelbottle-inc" and slug("!!") == "unnamed"
+
+
+def test_unchanged_shards_keep_their_names_and_stale_ones_go_after_a_generation(tmp_path, entries):
+    first = export_catalog(entries, tmp_path, page_size=PAGE_SIZE)
+    first_files = shard_files(tmp_path)
+    first_bytes = {path: (tmp_path / path).read_bytes() for path in first_files}
+
+    # Byte-identical output for the same entries: gzip mtime is fixed
+    assert export_catalog(entries, tmp_path, page_size=PAGE_SIZE)["all"] == first["all"]
+    assert {path: (tmp_path / path).read_bytes() for path in shard_files(tmp_path)} == first_bytes
+
+    # One entry late in the order changes: only the shards holding it get new names
+    entries[-1] = {**entries[-1], "shade_name": "Renamed"}
+    second = export_catalog(entries, tmp_path, page_size=PAGE_SIZE)
+    changed = [
+        (old["path"], new["path"]) for old, new in zip(first["all"]["shards"], second["all"]["shards"]) if old != new
+    ]
+    assert len(changed) == 1 and changed[0][0].split(".")[1] != changed[0][1].split(".")[1]
+    # A client still on the first manifest can fetch all of its shards
+    assert first_files <= shard_files(tmp_path)
+
+    # A generation later only the current manifest's shards are left
+    third = export_catalog(entries, tmp_path, page_size=PAGE_SIZE)
+    assert shard_files(tmp_path) == set(_manifest_paths(third)) == set(_manifest_paths(second))
+    assert changed[0][0] not in shard_files(tmp_path)
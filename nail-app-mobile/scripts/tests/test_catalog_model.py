@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import catalog_model  # noqa: E402
+import sync_color_catalog as sync  # noqa: E402
+
+MOVED = [
+    "CANONICAL_FINISHES",
+    "FINISH_PRIORITY",
+    "FINISH_SYNONYMS",
+    "DEFAULT_FINISH",
+    "PRODUCT_LINE_NORMALISERS",
+    "CATEGORY_TO_FINISH",
+    "HEX_PREFIX",
+    "ARROW_SUFFIXES",
+    "VariantRecord",
+    "CatalogSource",
+    "CATALOG_SOURCES",
+    "SOURCE_TO_BRAND",
+    "CatalogSyncError",
+    "normalise_hex",
+    "normalise_finish",
+    "normalise_product_line",
+    "clean_collection",
+    "record_from_row",
+    "load_rows",
+    "deduplicate",
+    "map_hex_to_variants",
+]
+
+
+def test_sync_script_re_exports_the_moved_names():
+    for name in MOVED:
+        assert getattr(sync, name) is getattr(catalog_model, name), name
+
+
+def test_missing_catalogue_raises_the_class_helpers_use(tmp_path):
+    # catalog_export and swatch_assets catch catalog_model's class around the script's checks
+    args = sync.parse_args(["--opi", str(tmp_path / "missing.csv")])
+    with pytest.raises(catalog_model.CatalogSyncError, match="Catalogue not found"):
+        sync.ensure_catalog_paths(args)
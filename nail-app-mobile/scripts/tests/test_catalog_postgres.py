@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+from psycopg.rows import dict_row  # noqa: E402
+from catalog_model import VariantRecord  # noqa: E402
+from catalog_postgres import sync_via_postgres  # noqa: E402
+from fake_postgrest import thin_catalogues  # noqa: E402
+from variant_deactivation import allowed_sources, ingested_keys, stale_variants  # noqa: E402
+
+DSN = os.environ.get("DATABASE_URL")
+
+# Every sync here is a dry run, so the database is never changed
+pytestmark = [
+    pytest.mark.skipif(not DSN, reason="needs DATABASE_URL with the catalogue schema (supabase/40-46)"),
+    pytest.mark.filterwarnings("ignore::DeprecationWarning"),
+]
+
+ACTIVE_KEYS_SQL = """
+SELECT v.id, v.source_catalog, c.hex_code, v.brand, v.product_line, v.shade_name, v.shade_code
+FROM color_variants v JOIN colors c ON c.id = v.color_id
+WHERE v.is_active AND v.source_catalog = ANY(%s)
+"""
+
+
+def fingerprint():
+    with psycopg.connect(DSN) as conn:
+        return [
+            conn.execute(f"SELECT count(*), md5(string_agg(t::text, '' ORDER BY t.id)) FROM {table} t").fetchone()
+            for table in ("colors", "color_variants")
+        ]
+
+
+def dry_run(records, max_deactivate_fraction=None):
+    return sync_via_postgres(DSN, records, False, True, max_deactivate_fraction=max_deactivate_fraction)
+
+
+def expected_deactivations(records, max_fraction):
+    """What the REST path's Python anti-join would deactivate against the stored rows."""
+    keys, sources = ingested_keys(records)
+    with psycopg.connect(DSN) as conn:
+        cur = conn.cursor(row_factory=dict_row)
+        stored = cur.execute(ACTIVE_KEYS_SQL, (sorted(sources),)).fetchall()
+    active, stale = stale_variants([{**row, "id": str(row["id"])} for row in stored], keys)
+    missing = {source: len(ids) for source, ids in stale.items()}
+    return sum(missing[source] for source in allowed_sources(active, missing, max_fraction))
+
+
+@pytest.fixture(scope="module")
+def catalogue():
+    return list(sync.catalogue_records(sync.parse_args([])))
+
+
+def test_dry_run_merges_then_rolls_back(catalogue):
+    before = fingerprint()
+    base = dry_run(catalogue)
+    with psycopg.connect(DSN) as conn:
+        stored = {row[0] for row in conn.execute("SELECT hex_code FROM colors")}
+    fresh = next(f"#{value:06X}" for value in range(1 << 24) if f"#{value:06X}" not in stored)
+    extra = VariantRecord(fresh, "OPI", "Nail Lacquer", "Test Shade", None, None, "cream", None, None, "opi")
+    with_extra = dry_run(catalogue + [extra])
+
+    assert base.staged == len(catalogue)
+    assert with_extra.colors_inserted == base.colors_inserted + 1
+    assert with_extra.variants_inserted == base.variants_inserted + 1
+    assert with_extra.primaries_updated == base.primaries_updated + 1
+    assert fingerprint() == before
+
+
+@pytest.mark.parametrize("drop_every", [20, 2])
+def test_deactivation_matches_the_rest_anti_join(tmp_path, drop_every):
+    thinned, dropped = thin_catalogues([], tmp_path, drop_every)
+    args = sync.parse_args(thinned)
+    records = list(sync.catalogue_records(args))
+    expected = expected_deactivations(records, args.max_deactivate_fraction)
+    before = fingerprint()
+
+    summary = dry_run(records, args.max_deactivate_fraction)
+    assert summary.variants_deactivated == expected
+    # Halving a catalogue is past --max-deactivate-fraction, so nothing goes
+    assert (expected > 0) == (drop_every == 20)
+    assert dry_run(records).variants_deactivated == 0  # --keep-missing
+    assert fingerprint() == before
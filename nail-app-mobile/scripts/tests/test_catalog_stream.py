@@ -0,0 +1,100 @@
+import csv
+import threading
+import time
+from types import ModuleType
+
+import pytest
+
+import catalog_stream
+from catalog_stream import ScraperFailed, stream_records
+
+CAPACITY = 2
+
+
+def scraper(name, rows, fail_after=None, gate=None):
+    """A stand-in for a scrape_*.py module: `stream_rows()` and the CSV it would write."""
+    module = ModuleType(f"scrape_{name}")
+    module.OUT_CSV = f"{name}_full_catalog.csv"
+    module.CSV_FIELDS = sorted({field for row in rows for field in row})
+    module.produced = 0
+
+    def stream_rows():
+        for index, row in enumerate(rows):
+            if gate is not None:
+                gate.wait()
+            if index == fail_after:
+                raise RuntimeError("HTTP 503 on page 2")
+            module.produced += 1
+            yield row
+
+    module.stream_rows = stream_rows
+    return module
+
+
+def opi(index, hex_code=None):
+    return {"ShadeName": f"Shade {index}", "ShadeCode": f"NL {index:03d}", "ApproxHex": hex_code or f"#0000{index:02X}"}
+
+
+def tgb(index):
+    return {"Brand": "The Gel Bottle", "Shade Name": f"Shade {index}", "ApproxHex": f"#00{index:02X}00"}
+
+
+@pytest.fixture
+def scrapers(monkeypatch):
+    modules = {}
+    monkeypatch.setattr(catalog_stream, "load_scraper", lambda name: modules[name])
+    return modules
+
+
+def test_rows_are_normalised_deduplicated_and_batched(scrapers):
+    scrapers["opi"] = scraper("opi", [opi(1), opi(2), opi(1), opi(3, "not a hex"), opi(4)])
+    scrapers["tgb"] = scraper("tgb", [tgb(index) for index in range(5)])
+    batches = list(stream_records(["opi", "tgb", "opi"], batch_rows=3, flush_seconds=5, capacity=CAPACITY))
+    records = [record for batch in batches for record in batch]
+
+    assert all(len(batch) <= 3 for batch in batches) and all(batches)
+    assert sorted(record.shade_name for record in records if record.brand == "OPI") == [
+        "Shade 1", "Shade 2", "Shade 4"
+    ]
+    assert sum(record.brand == "The Gel Bottle" for record in records) == 5
+    assert len({(*record.key(), record.hex_code) for record in records}) == len(records) == 8
+
+
+def test_a_full_channel_holds_the_scrapers_back(scrapers):
+    scrapers["opi"] = scraper("opi", [opi(index) for index in range(50)])
+    stream = stream_records(["opi"], batch_rows=1, flush_seconds=5, capacity=CAPACITY)
+    assert len(next(stream)) == 1
+    time.sleep(0.2)
+    # One row taken, the channel full, and one row waiting to be put
+    assert scrapers["opi"].produced <= 1 + CAPACITY + 1
+    assert len(list(stream)) == 49 and scrapers["opi"].produced == 50
+
+
+def test_a_failed_scraper_is_raised_after_the_rows_it_produced(scrapers, tmp_path):
+    scrapers["opi"] = scraper("opi", [opi(index) for index in range(5)], fail_after=2)
+    scrapers["tgb"] = scraper("tgb", [tgb(index) for index in range(4)])
+    records = []
+    with pytest.raises(ScraperFailed, match="opi: HTTP 503 on page 2"):
+        for batch in stream_records(
+            ["opi", "tgb"], batch_rows=2, flush_seconds=0.05, capacity=CAPACITY, csv_dir=tmp_path
+        ):
+            records.extend(batch)
+
+    # The other scraper still ran to the end, and everything scraped was synced
+    assert sorted(record.shade_name for record in records if record.brand == "OPI") == ["Shade 0", "Shade 1"]
+    assert sum(record.brand == "The Gel Bottle" for record in records) == 4
+    # Only the finished scraper's CSV is in place; the failed one leaves no partial file
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["tgb_full_catalog.csv"]
+    with (tmp_path / "tgb_full_catalog.csv").open(newline="", encoding="utf-8") as handle:
+        assert [row["Shade Name"] for row in csv.DictReader(handle)] == [f"Shade {index}" for index in range(4)]
+
+
+def test_a_slow_scraper_gets_partial_batches_flushed(scrapers):
+    gate = threading.Event()
+    scrapers["opi"] = scraper("opi", [opi(index) for index in range(1, 4)])
+    scrapers["tgb"] = scraper("tgb", [tgb(1)], gate=gate)
+    stream = stream_records(["opi", "tgb"], batch_rows=100, flush_seconds=0.05, capacity=CAPACITY)
+    # tgb is stuck, so opi's rows go out once the flush interval passes instead of waiting for a full batch
+    assert [record.shade_name for record in next(stream)] == ["Shade 1", "Shade 2", "Shade 3"]
+    gate.set()
+    assert [[record.brand for record in batch] for batch in stream] == [["The Gel Bottle"]]
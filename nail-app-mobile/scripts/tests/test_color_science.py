@@ -0,0 +1,92 @@
+import colorsys
+import math
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from color_science import (  # noqa: E402
+    SHARMA_PAIRS,
+    delta_e_2000,
+    hex_to_lab,
+    hex_to_rgb,
+    lab_to_hex,
+    lab_to_lch,
+    lab_to_rgb,
+    lch_to_lab,
+    linear_to_srgb,
+    rgb_to_hex,
+    rgb_to_hsl,
+)
+
+RNG = random.Random(5)
+HEXES = [f"#{RNG.randrange(1 << 24):06X}" for _ in range(2000)] + ["#000000", "#FFFFFF", "#FF0000", "#0A0B0C"]
+# Every 97th 24-bit colour: all channel values, without the full 16.7M
+STRIDED = np.arange(0, 1 << 24, 97)
+
+
+def reference_lab(hex_code):
+    """Per-channel pow() sRGB → XYZ (D65) → Lab, straight from the formulas."""
+    channels = [int(hex_code[i : i + 2], 16) / 255 for i in (1, 3, 5)]
+    r, g, b = (c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4 for c in channels)
+    xyz = (
+        0.4124564 * r + 0.3575761 * g + 0.1804375 * b,
+        0.2126729 * r + 0.7151522 * g + 0.0721750 * b,
+        0.0193339 * r + 0.1191920 * g + 0.9503041 * b,
+    )
+    white = (0.95047, 1.0, 1.08883)
+    fx, fy, fz = (
+        t ** (1 / 3) if t > (6 / 29) ** 3 else t / (3 * (6 / 29) ** 2) + 4 / 29
+        for t in (value / reference for value, reference in zip(xyz, white))
+    )
+    return (116 * fy - 16, 500 * (fx - fy), 200 * (fy - fz))
+
+
+def test_hex_to_lab_matches_the_formulas():
+    assert np.allclose(hex_to_lab(HEXES), [reference_lab(hex_code) for hex_code in HEXES], atol=1e-3)
+
+
+def test_hex_parsing_round_trips_and_rejects_bad_input():
+    assert rgb_to_hex(hex_to_rgb(HEXES)) == HEXES
+    assert rgb_to_hex(hex_to_rgb([hex_code.lower() for hex_code in HEXES])) == HEXES
+    assert hex_to_rgb([]).shape == (0, 3)
+    for bad in (["#GG0000"], ["FF00000"], ["#FFF"], ["#FF00ÄA"]):
+        with pytest.raises(ValueError):
+            hex_to_rgb(bad)
+
+
+def test_threshold_lut_rounds_like_the_gamma_formula():
+    linear = np.concatenate([np.random.default_rng(3).random(20000), [0.0, 1.0, 0.0031308]])
+
+    def encode(value):
+        srgb = 12.92 * value if value <= 0.0031308 else 1.055 * value ** (1 / 2.4) - 0.055
+        return math.floor(srgb * 255 + 0.5)
+
+    assert linear_to_srgb(linear).tolist() == [encode(value) for value in linear.tolist()]
+
+
+def test_lab_round_trips_every_sampled_8bit_colour():
+    rgb = np.stack([(STRIDED >> 16) & 0xFF, (STRIDED >> 8) & 0xFF, STRIDED & 0xFF], axis=1).astype(np.uint8)
+    hexes = rgb_to_hex(rgb)
+    lab = hex_to_lab(hexes)
+    assert (lab_to_rgb(lab) == rgb).all()
+    assert lab_to_hex(lab) == hexes
+    assert np.allclose(lch_to_lab(lab_to_lch(lab)), lab)
+
+
+def test_ciede2000_matches_sharma_reference_pairs():
+    first, second, expected = zip(*SHARMA_PAIRS)
+    assert np.allclose(np.round(delta_e_2000(first, second), 4), expected)
+    # Symmetric, and zero against itself
+    assert np.allclose(delta_e_2000(second, first), delta_e_2000(first, second))
+    assert not delta_e_2000(hex_to_lab(HEXES), hex_to_lab(HEXES)).any()
+
+
+def test_hsl_matches_colorsys():
+    hue, saturation, lightness = rgb_to_hsl(hex_to_rgb(HEXES))
+    for index, hex_code in enumerate(HEXES):
+        h, l, s = colorsys.rgb_to_hls(*(channel / 255 for channel in hex_to_rgb([hex_code])[0]))
+        assert hue[index] == pytest.approx(h * 360, abs=1e-9)
+        assert lightness[index] == pytest.approx(l)
+        assert saturation[index] == pytest.approx(s)
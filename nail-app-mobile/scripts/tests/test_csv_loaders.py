@@ -0,0 +1,128 @@
+import csv
+
+import pytest
+
+pytest.importorskip("supabase")
+
+import catalog_model  # noqa: E402
+import sync_color_catalog as sync  # noqa: E402
+from catalog_model import CATALOG_SOURCES, CatalogSource, load_rows  # noqa: E402
+
+# Each scraper's own header order and names, as in the bundled CSVs
+HEADERS = {
+    "opi": ["Brand", "ProductType", "ShadeCode", "ShadeName", "Collection", "ProductURL", "SwatchImageURL", "ApproxHex"],
+    "cnd": ["Brand", "ProductType", "Collection", "ShadeName", "ShadeCode", "ProductURL", "SwatchImageURL", "ApproxHex"],
+    "tgb": ["Brand", "Product Type", "Collection", "Category", "Shade Name", "ApproxHex", "ProductURL", "SwatchURL"],
+}
+
+
+def write_csv(path, header, rows):
+    with path.open("w", newline="", encoding="utf-8") as handle:
+        writer = csv.DictWriter(handle, header)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def row(name, source, **values):
+    """A scraper row in `name`'s layout; keys are CatalogSource field names."""
+    columns = {
+        getattr(source, field): value
+        for field, value in values.items()
+        if field != "finish" and getattr(source, field) in HEADERS[name]
+    }
+    if "finish" in values and source.finish_columns[0] in HEADERS[name]:
+        columns[source.finish_columns[0]] = values["finish"]
+    return columns
+
+
+@pytest.mark.parametrize("name", sorted(HEADERS))
+def test_each_layout_normalises_to_the_same_record(tmp_path, name):
+    source = CATALOG_SOURCES[name]
+    rows = [
+        row(
+            name,
+            source,
+            hex_column="  c8102e ",
+            brand_column="",
+            product_line_column=" gelcolor ",
+            shade_name_column="  Big Apple Red ",
+            shade_code_column=" NL N25 ",
+            collection_column="  Reds ",
+            product_url_column=" https://example.com/p ",
+            swatch_url_column="",
+        ),
+        row(name, source, hex_column="not-a-hex", shade_name_column="Skipped"),
+        row(name, source, hex_column="#12345", shade_name_column="Too short"),
+        row(name, source, hex_column="#00ff00", shade_name_column=""),
+    ]
+    records = list(load_rows(write_csv(tmp_path / f"{name}.csv", HEADERS[name], rows), source))
+
+    assert [record.hex_code for record in records] == ["#C8102E", "#00FF00"]
+    first, second = records
+    assert first.brand == source.brand
+    assert first.shade_name == "Big Apple Red"
+    assert first.collection == "Reds"
+    assert first.product_url == "https://example.com/p"
+    assert first.swatch_url is None
+    assert first.source_catalog == source.source_catalog
+    assert first.product_line == catalog_model.PRODUCT_LINE_NORMALISERS[source.brand].get("gelcolor", "gelcolor")
+    if source.shade_code_column in HEADERS[name]:
+        assert first.shade_code == "NL N25"
+    else:
+        assert first.shade_code is None
+    assert second.shade_name == "Unnamed"
+    assert second.product_line == "Unknown"
+    assert second.finish == catalog_model.DEFAULT_FINISH
+
+
+@pytest.mark.parametrize(
+    "category, finish",
+    [("Glitter, Reflective", "reflective"), ("Standard", "glossy"), ("Shimmery", "shimmer"), ("", "glossy")],
+)
+def test_tgb_categories_map_to_finishes(tmp_path, category, finish):
+    source = CATALOG_SOURCES["tgb"]
+    path = write_csv(
+        tmp_path / "tgb.csv", HEADERS["tgb"], [row("tgb", source, hex_column="#741E20", finish=category)]
+    )
+    assert [record.finish for record in load_rows(path, source)] == [finish]
+
+
+def test_rows_stream_without_reading_the_whole_file(tmp_path):
+    source = CATALOG_SOURCES["opi"]
+    path = write_csv(
+        tmp_path / "opi.csv",
+        HEADERS["opi"],
+        [row("opi", source, hex_column=f"#{index:06X}", shade_name_column=f"Shade {index}") for index in range(5000)],
+    )
+    with path.open("ab") as handle:
+        handle.write(b"OPI,Nail Lacquer,X,\xff\xfe broken,,,,#000000\n")
+    rows = load_rows(path, source)
+    assert next(rows).shade_name == "Shade 0"  # the undecodable tail has not been read yet
+    with pytest.raises(UnicodeDecodeError):
+        list(rows)
+
+
+def test_a_new_source_entry_adds_a_cli_option(tmp_path, monkeypatch):
+    source = CatalogSource(
+        source_catalog="acme_catalog",
+        brand="Acme",
+        default_csv="acme_catalog.csv",
+        shade_name_column="Name",
+        finish_columns=("Look", "Finish"),
+    )
+    header = ["ApproxHex", "Name", "Look", "Finish"]
+    path = write_csv(
+        tmp_path / "acme.csv",
+        header,
+        [{"ApproxHex": "#ABCDEF", "Name": "Acme Blue", "Look": "", "Finish": "Mirror"}],
+    )
+    monkeypatch.setitem(CATALOG_SOURCES, "acme", source)
+    args = sync.parse_args(["--acme", str(path)])
+    assert args.acme == path
+    for name in HEADERS:
+        setattr(args, name, None)
+    records = list(sync.load_catalogues(args))
+    assert [(record.brand, record.shade_name, record.finish, record.source_catalog) for record in records] == [
+        ("Acme", "Acme Blue", "chrome", "acme_catalog")
+    ]
@@ -0,0 +1,109 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+from postgrest.exceptions import APIError  # noqa: E402
+
+from fake_postgrest import FakeSupabase, check_budget  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+MAX_ROWS = 5
+
+
+@pytest.fixture
+def fake():
+    with FakeSupabase() as fake:
+        yield fake
+
+
+def color(hex_code, **values):
+    return {"hex_code": hex_code, "name": hex_code, "category": "reds", **values}
+
+
+def variant(color_id, shade_name="Red", **values):
+    return {
+        "color_id": color_id, "brand": "OPI", "product_line": "Nail Lacquer", "shade_name": shade_name,
+        "source_catalog": "opi", **values,
+    }
+
+
+def error_code(request):
+    with pytest.raises(APIError) as raised:
+        request.execute()
+    return raised.value.code
+
+
+def test_constraint_violations_come_back_as_postgrest_errors(fake):
+    client = fake.client()
+    stored = client.table("colors").insert(color("#C8102E")).execute().data[0]
+    client.table("color_variants").insert(variant(stored["id"])).execute()
+
+    assert error_code(client.table("colors").insert(color("#C8102E"))) == "23505"
+    assert error_code(client.table("colors").insert({"hex_code": "#000000", "name": "x"})) == "23502"
+    assert error_code(client.table("colors").insert(color("red"))) == "23514"
+    assert error_code(client.table("colors").insert(color("#000000", finish="sparkly"))) == "23514"
+    assert error_code(client.table("colors").insert(color("#000000", primary_variant_id=stored["id"]))) == "23503"
+    assert error_code(client.table("colors").insert(color("#000000", colour="red"))) == "PGRST204"
+    assert error_code(client.table("swatches").select("*")) == "PGRST205"
+    assert error_code(client.rpc("drop_everything", {})) == "PGRST202"
+    # color_variants_unique is NULLS NOT DISTINCT: a second NULL shade code still collides
+    assert error_code(client.table("color_variants").insert(variant(stored["id"]))) == "23505"
+    client.table("color_variants").insert(variant(stored["id"], shade_code="NL N25")).execute()
+    # A failed request leaves nothing behind
+    assert len(fake.database.tables["colors"]) == 1 and len(fake.database.tables["color_variants"]) == 2
+
+
+def test_upserts_merge_or_skip_on_the_conflict_key(fake):
+    client = fake.client()
+    first = client.table("colors").insert(color("#C8102E")).execute().data[0]
+    merged = client.table("colors").upsert(color("#C8102E", name="Big Apple Red"), on_conflict="hex_code").execute()
+    assert merged.data[0]["id"] == first["id"] and merged.data[0]["name"] == "Big Apple Red"
+    skipped = (
+        client.table("colors")
+        .upsert([color("#C8102E", name="Ignored"), color("#00FF00")], on_conflict="hex_code", ignore_duplicates=True)
+        .execute()
+    )
+    assert [row["hex_code"] for row in skipped.data] == ["#00FF00"]
+    assert fake.database.tables["colors"][first["id"]]["name"] == "Big Apple Red"
+    assert error_code(client.table("colors").upsert(color("#C8102E"), on_conflict="name")) == "42P10"
+
+
+def test_filters_ordering_paging_and_max_rows(fake):
+    client = fake.client()
+    client.table("colors").insert(
+        [color(f"#0000{index:02X}", finish=None if index % 2 else "cream") for index in range(12)]
+    ).execute()
+    rows = (
+        client.table("colors")
+        .select("hex_code", count="exact")
+        .is_("finish", "null")
+        .order("hex_code", desc=True)
+        .range(1, 3)
+        .execute()
+    )
+    assert [row["hex_code"] for row in rows.data] == ["#000009", "#000007", "#000005"]
+    assert rows.count == 6
+    wanted = ["#000001", "#000002", "#FFFFFF"]
+    found = client.table("colors").select("hex_code").in_("hex_code", wanted).execute()
+    assert sorted(row["hex_code"] for row in found.data) == wanted[:2]
+
+    fake.max_rows = MAX_ROWS
+    capped = client.table("colors").select("id", count="exact").execute()
+    assert len(capped.data) == MAX_ROWS and capped.count == 12
+    keys = client.rpc("catalog_colors_by_hex", {"p_hex_codes": [f"#0000{index:02X}" for index in range(12)]}).execute()
+    assert len(keys.data) == MAX_ROWS
+
+
+def test_requests_are_counted_per_phase(fake):
+    client = fake.client()
+    with fake.phase("insert_new_colors"):
+        client.table("colors").insert([color("#000001"), color("#000002")]).execute()
+    client.table("colors").select("*").execute()
+    stats = fake.reset_stats()
+    phase = stats.phases["insert_new_colors"]
+    assert (phase.requests, phase.rows_sent, phase.operations) == (1, 2, {"POST colors": 1})
+    assert stats.phases["other"].rows_returned == 2
+    assert check_budget(stats, {"insert_new_colors": 1, "total": 2}) == []
+    assert check_budget(stats, {"total": 1}) == ["total: 2 requests (budget 1)"]
+    assert fake.stats.total().requests == 0
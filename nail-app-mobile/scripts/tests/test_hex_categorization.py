@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from hex_categorization import (  # noqa: E402
+    CATEGORY_FIELDS,
+    PARITY_FIXTURE,
+    _parity_sample,
+    categorize,
+    load_parity_fixture,
+    parity_mismatches,
+    plan_categorization,
+)
+
+
+def test_fixture_covers_the_parity_corpus():
+    assert sorted(load_parity_fixture()) == _parity_sample(0, 0)
+
+
+def test_matches_refresh_hex_categorization_offline():
+    mismatches = parity_mismatches(load_parity_fixture(PARITY_FIXTURE))
+    assert not mismatches, mismatches[:5]
+
+
+def test_plan_skips_unchanged_rows():
+    stored = load_parity_fixture()
+    assert plan_categorization(stored, []) == {}
+
+
+def test_plan_includes_new_hexes_and_shifted_orders():
+    stored = load_parity_fixture()
+    changes = plan_categorization(stored, ["#FE0102"])
+    assert "#FE0102" in changes
+    result = categorize([*stored, "#FE0102"])
+    expected = {
+        hex_code
+        for index, hex_code in enumerate(result.hex_codes)
+        if hex_code in stored and any(stored[hex_code][field] != result.row(index)[field] for field in CATEGORY_FIELDS)
+    }
+    # Inserting one red pushes the darker reds down one place
+    assert expected
+    assert set(changes) - {"#FE0102"} == expected
@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from color_science import delta_e_2000, hex_to_lab  # noqa: E402
+from hex_clustering import cluster_hexes, merge_near_duplicates, near_duplicate_pairs, synthetic_hexes  # noqa: E402
+from shade_index import synthetic_records  # noqa: E402
+
+HEXES = synthetic_hexes(2500, duplicate_share=0.3, seed=3)
+LAB = hex_to_lab(HEXES)
+
+
+def pairwise_scan(lab, delta_e):
+    """{(i, j): ΔE00} for every pair i < j within `delta_e`, by comparing each hex with all later ones."""
+    pairs = {}
+    for i in range(len(lab)):
+        distance = delta_e_2000(lab[i], lab[i + 1 :])
+        for offset in np.flatnonzero(distance <= delta_e).tolist():
+            pairs[(i, i + 1 + offset)] = float(distance[offset])
+    return pairs
+
+
+def leader_clusters(hex_codes, weights, pairs):
+    """Reference for `cluster_hexes`: heaviest hex first claims its unclaimed neighbours."""
+    neighbours = {}
+    for i, j in pairs:
+        neighbours.setdefault(i, []).append(j)
+        neighbours.setdefault(j, []).append(i)
+    canonical = {}
+    for leader in sorted(neighbours, key=lambda index: (-weights[index], hex_codes[index])):
+        if leader in canonical:
+            continue
+        canonical[leader] = leader
+        for other in neighbours[leader]:
+            canonical.setdefault(other, leader)
+    return {hex_codes[index]: hex_codes[leader] for index, leader in canonical.items() if index != leader}
+
+
+@pytest.mark.parametrize("delta_e", [0.5, 1.0, 2.5])
+def test_grid_pairs_match_pairwise_scan(delta_e):
+    i, j, distance = near_duplicate_pairs(LAB, delta_e)
+    expected = pairwise_scan(LAB, delta_e)
+    assert expected
+    found = dict(zip(zip(i.tolist(), j.tolist()), distance.tolist()))
+    assert len(found) == len(i)  # no pair reported twice
+    assert found.keys() == expected.keys()
+    assert np.allclose([found[pair] for pair in expected], list(expected.values()))
+
+
+@pytest.mark.parametrize("delta_e", [1.0, 2.5])
+def test_clusters_match_leader_clustering_over_pairwise_scan(delta_e):
+    weights = [1 + (index * 7) % 5 for index in range(len(HEXES))]
+    merges = cluster_hexes(HEXES, weights, delta_e)
+    expected = leader_clusters(HEXES, weights, pairwise_scan(LAB, delta_e))
+    assert {merge.hex_code: merge.canonical for merge in merges} == expected
+    assert all(merge.delta_e <= delta_e for merge in merges)
+    # Canonical hexes are never merged away themselves
+    assert not {merge.canonical for merge in merges} & set(expected)
+
+
+def test_merge_near_duplicates_rewrites_variants():
+    records = synthetic_records(3000, seed=5)
+    rewritten, merges = merge_near_duplicates(records, 2.0)
+    assert merges
+    target = {merge.hex_code: merge.canonical for merge in merges}
+    assert [record.hex_code for record in rewritten] == [
+        target.get(record.hex_code, record.hex_code) for record in records
+    ]
+    assert [record.shade_name for record in rewritten] == [record.shade_name for record in records]
+
+
+def test_empty_and_oversized_thresholds():
+    assert cluster_hexes([], [], 1.0) == []
+    assert cluster_hexes(["#000000", "#FFFFFF"], [1, 1], 1.0) == []
+    with pytest.raises(ValueError):
+        near_duplicate_pairs(LAB, 1000.0)
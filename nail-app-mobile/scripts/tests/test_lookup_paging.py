@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+from batch_tuning import TunerSet  # noqa: E402
+from fake_postgrest import FakeSupabase  # noqa: E402
+
+# supabase-py warns about its own client options on every create_client
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+MAX_ROWS = 7  # far below RPC_PAGE_ROWS, like a project with a low db-max-rows
+COLORS = 40
+VARIANTS_PER_COLOR = 3
+
+
+@pytest.fixture(scope="module")
+def fake():
+    with FakeSupabase(max_rows=MAX_ROWS) as fake:
+        database = fake.database
+        colors = database.insert(
+            "colors",
+            [{"hex_code": f"#0000{index:02X}", "name": f"Shade {index}", "category": "blues"} for index in range(COLORS)],
+            None,
+        )
+        database.insert(
+            "color_variants",
+            [
+                {
+                    "color_id": color["id"],
+                    "brand": "OPI",
+                    "product_line": "Nail Lacquer",
+                    "shade_name": f"{color['name']} {variant}",
+                    "source_catalog": "opi_full_uk_catalog",
+                }
+                for color in colors
+                for variant in range(VARIANTS_PER_COLOR)
+            ],
+            None,
+        )
+        yield fake
+
+
+@pytest.fixture
+def client(fake):
+    fake.reset_stats()
+    return fake.client()
+
+
+def test_colour_lookup_reads_past_max_rows(fake, client):
+    hexes = [f"#0000{index:02X}" for index in range(COLORS)] + ["#FFFFFF"]
+    found = sync.fetch_existing_colors(client, hexes, TunerSet())
+    assert sorted(found) == hexes[:-1]
+
+
+def test_colour_lookup_stops_once_every_key_is_found(fake, client):
+    hexes = [f"#0000{index:02X}" for index in range(COLORS)]
+    sync.fetch_existing_colors(client, hexes, TunerSet())
+    # One request per max-rows page and no trailing empty page
+    assert fake.stats.total().requests == -(-COLORS // MAX_ROWS)
+
+
+def test_variant_lookup_reads_past_max_rows(fake, client):
+    color_ids = list(fake.database.tables["colors"])
+    found = sync.fetch_existing_variants(client, color_ids, TunerSet())
+    assert sum(len(variants) for variants in found.values()) == COLORS * VARIANTS_PER_COLOR
+
+
+def test_active_variant_keys_read_past_max_rows(client):
+    rows = sync.fetch_active_variant_keys(client, ["opi_full_uk_catalog"])
+    assert len({row["id"] for row in rows}) == COLORS * VARIANTS_PER_COLOR
+
+
+def test_color_categories_read_past_max_rows(client):
+    stored = sync.fetch_color_categories(client)
+    assert len(stored) == COLORS
+
+
+def test_get_fallback_reads_every_row(fake, client):
+    fake.lookup_rpcs = False
+    try:
+        color_ids = list(fake.database.tables["colors"])
+        found = sync.fetch_existing_variants(client, color_ids, TunerSet())
+    finally:
+        fake.lookup_rpcs = True
+    assert sum(len(variants) for variants in found.values()) == COLORS * VARIANTS_PER_COLOR
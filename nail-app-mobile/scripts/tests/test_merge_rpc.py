@@ -0,0 +1,131 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+from catalog_model import VariantRecord  # noqa: E402
+from fake_postgrest import FakeSupabase, _environment, thin_catalogues  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def stored_state(fake):
+    """Both tables keyed by natural keys, without the generated ids and timestamps."""
+    colors = fake.database.tables["colors"]
+    variants = fake.database.tables["color_variants"]
+
+    def variant_key(variant):
+        return (colors[variant["color_id"]]["hex_code"],) + tuple(
+            variant[column] for column in ("brand", "product_line", "shade_name", "shade_code")
+        )
+
+    generated = {"id", "color_id", "primary_variant_id", "created_at", "updated_at"}
+    return (
+        {
+            color["hex_code"]: {
+                **{key: value for key, value in color.items() if key not in generated},
+                "primary": variant_key(variants[color["primary_variant_id"]]) if color["primary_variant_id"] else None,
+            }
+            for color in colors.values()
+        },
+        {
+            variant_key(variant): {key: value for key, value in variant.items() if key not in generated}
+            for variant in variants.values()
+        },
+    )
+
+
+def synced_state(backend, *runs):
+    with FakeSupabase() as fake, _environment(fake.env()):
+        for argv in runs:
+            assert sync.main(list(argv) + ["--backend", backend]) == 0
+        return stored_state(fake)
+
+
+@pytest.mark.parametrize("argv", [[], ["--categorize", "client"], ["--rpc-chunk-size", "7"]])
+def test_rpc_sync_leaves_the_same_state_as_rest(argv):
+    rpc = synced_state("rpc", argv)
+    assert rpc[0] and rpc[1]
+    assert rpc == synced_state("rest", argv)
+
+
+def test_rpc_churn_resync_leaves_the_same_state_as_rest(tmp_path):
+    thinned, dropped = thin_catalogues([], tmp_path, drop_every=20)
+    assert dropped
+    # Full catalogue, thinned (deactivations), then full again with the primaries rewritten
+    runs = ([], thinned, ["--overwrite-primary"])
+    assert synced_state("rpc", *runs) == synced_state("rest", *runs)
+
+
+def record(hex_code, shade_name, shade_code=None, finish="cream", brand="OPI"):
+    return VariantRecord(
+        hex_code=hex_code,
+        brand=brand,
+        product_line="Nail Lacquer",
+        shade_name=shade_name,
+        shade_code=shade_code,
+        collection=None,
+        finish=finish,
+        product_url=None,
+        swatch_url=None,
+        source_catalog="opi",
+    )
+
+
+def merge(client, records, overwrite=False):
+    payload = sync.encode_catalog_chunk(records)
+    return client.rpc("merge_color_catalog", {"p_payload": payload, "p_overwrite_primary": overwrite}).execute().data
+
+
+def test_merge_counts_and_touched_hexes():
+    with FakeSupabase() as fake:
+        client = fake.client()
+        first = [record("#aa0000", "Red", "R1"), record("#AA0000", "Red Two", finish="glitter"), record("#00AA00", "Green")]
+        result = merge(client, first)
+        assert result == {
+            "staged": 3,
+            "colors_inserted": 2,
+            "colors_updated": 0,
+            "variants_upserted": 3,
+            "variants_inserted": 3,
+            "primaries_updated": 2,
+            "hex_codes": ["#00AA00", "#AA0000"],
+        }
+        colors = {color["hex_code"]: color for color in fake.database.tables["colors"].values()}
+        variants = fake.database.tables["color_variants"]
+        # The first variant of a hex, in payload order, names the colour and becomes its primary
+        assert colors["#AA0000"]["name"] == "Red"
+        assert variants[colors["#AA0000"]["primary_variant_id"]]["shade_code"] == "R1"
+        assert {variant["shade_name"]: variant["finish_override"] for variant in variants.values()} == {
+            "Red": None,
+            "Red Two": "glitter",
+            "Green": None,
+        }
+
+        # A blank brand is backfilled; the same rows again insert nothing and keep the primaries
+        fake.database._set("colors", colors["#00AA00"], {"brand": ""})
+        again = merge(client, list(reversed(first)))
+        assert again["colors_inserted"] == again["variants_inserted"] == again["primaries_updated"] == 0
+        assert again["colors_updated"] == 1 and again["hex_codes"] == ["#00AA00"]
+        assert merge(client, list(reversed(first)), overwrite=True)["primaries_updated"] == 1
+
+
+def test_payload_decodes_like_unnest_with_ordinality():
+    with FakeSupabase() as fake:
+        client = fake.client()
+        payload = sync.encode_catalog_chunk([record("#123456", "Short", "S1"), record("#123456", "Long", "")])
+        payload["swatch_url"] = ["https://example.com/s.png"]  # shorter array: NULL-padded
+        payload["collection"] = {"values": ["Fall"], "codes": [0, None]}
+        result = client.rpc("merge_color_catalog", {"p_payload": payload}).execute().data
+        assert result["staged"] == 2
+        rows = sorted(fake.database.tables["color_variants"].values(), key=lambda row: row["shade_name"])
+        assert [(row["shade_name"], row["shade_code"], row["collection"], row["swatch_url"]) for row in rows] == [
+            ("Long", None, None, None),
+            ("Short", "S1", "Fall", "https://example.com/s.png"),
+        ]
+
+        # A code outside its dictionary decodes to NULL, which the staging table rejects
+        payload["brand"] = {"values": ["OPI"], "codes": [0, 5]}
+        with pytest.raises(sync.APIError) as exc:
+            client.rpc("merge_color_catalog", {"p_payload": payload}).execute()
+        assert exc.value.code == "23502"
@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import fake_postgrest  # noqa: E402
+from fake_postgrest import FakeSupabase, PostgrestError, run_resync_scenario  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def primaries(fake):
+    colors = fake.database.tables["colors"]
+    variants = fake.database.tables["color_variants"]
+    return {
+        color["hex_code"]: (variants[color["primary_variant_id"]]["shade_name"] if color["primary_variant_id"] else None)
+        for color in colors.values()
+    }
+
+
+@pytest.fixture(scope="module")
+def batched():
+    with FakeSupabase() as fake:
+        initial, resync, _, _ = run_resync_scenario(fake, [])
+        return initial, resync, primaries(fake)
+
+
+def test_primaries_are_sent_in_batches(batched):
+    initial, resync, stored = batched
+    assert all(stored.values())
+    phase = initial.phases["update_primary_variants"]
+    assert phase.operations == {"POST rpc/set_primary_variants": phase.requests}
+    # --batch-size 200 to start with, growing while requests stay fast
+    assert phase.requests <= -(-len(stored) // 200)
+    assert "update_primary_variants" not in resync.phases
+
+
+def test_without_set_primary_variants_each_colour_is_patched(monkeypatch, batched):
+    def missing(self, rows):
+        raise PostgrestError(404, "PGRST202", "Could not find the function public.set_primary_variants")
+
+    monkeypatch.setattr(fake_postgrest.FakeDatabase, "set_primary_variants", missing)
+    with FakeSupabase() as fake:
+        initial, _, _, _ = run_resync_scenario(fake, [])
+        assert primaries(fake) == batched[2]
+    operations = initial.phases["update_primary_variants"].operations
+    assert operations["POST rpc/set_primary_variants"] == 1
+    assert operations["PATCH colors"] == len(batched[2])
@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import run_metrics
+from run_metrics import JSON_ENV, TEXTFILE_ENV, count, phase, record_cache, record_retry, start_run, timed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def do_GET(self):  # noqa: N802
+        missing = self.path.startswith("/missing")
+        body = b"missing" if missing else b"x" * 100
+        self.send_response(404 if missing else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@timed
+def busy(seconds):
+    time.sleep(seconds)
+
+
+@timed
+def pages(count):
+    for page in range(count):
+        time.sleep(0.005)
+        yield page
+
+
+def test_phases_are_exclusive_and_counted_per_call():
+    with start_run("job") as metrics:
+        with phase("outer"):
+            time.sleep(0.02)
+            busy(0.05)
+            busy(0.01)
+        assert list(pages(3)) == [0, 1, 2]
+        # Worker threads are not charged to the main thread's phases
+        worker = threading.Thread(target=busy, args=(0.05,))
+        worker.start()
+        worker.join()
+    phases = metrics.as_dict()["phases"]
+    assert phases["busy"]["calls"] == 2 and phases["outer"]["calls"] == 1
+    assert phases["busy"]["seconds"] >= 0.06
+    assert 0.02 <= phases["outer"]["seconds"] < 0.06  # the nested calls are not counted again
+    assert phases["pages"]["calls"] == 4  # one per resume, including the final StopIteration
+    assert metrics.as_dict()["duration_seconds"] >= sum(stats["seconds"] for stats in phases.values())
+
+
+def test_requests_caches_retries_and_items(server):
+    requests = pytest.importorskip("requests")
+    with start_run("job") as metrics:
+        with phase("fetch"):
+            requests.get(f"http://{server}/ok")
+            requests.get(f"http://{server}/missing?q=1")
+        with pytest.raises(requests.ConnectionError):
+            requests.get("http://127.0.0.1:9/unreachable", timeout=1)
+        record_cache("swatch", hit=True)
+        record_cache("swatch", hit=False)
+        record_cache("swatch", hits=2)
+        record_retry("download")
+        count("rows", 5)
+        count("rows")
+    report = metrics.as_dict()
+    assert report["http"][server]["requests"] == 2
+    assert report["http"][server]["statuses"] == {"200": 1, "404": 1}
+    assert report["http"][server]["bytes_in"] == 107
+    assert report["http"][server]["bytes_out"] == len(f"http://{server}/ok") + len(f"http://{server}/missing?q=1")
+    assert report["http"]["127.0.0.1:9"]["statuses"] == {"error": 1}
+    assert report["phases"]["fetch"]["requests"] == 2
+    assert report["caches"]["swatch"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    assert report["retries"] == {"download": 1} and report["items"] == {"rows": 6}
+
+
+def test_helpers_outside_a_run_are_not_reported(tmp_path, monkeypatch):
+    monkeypatch.setenv(JSON_ENV, f"{tmp_path}/")
+    count("rows", 99)
+    with start_run("job") as metrics:
+        pass
+    assert metrics.items == {} and run_metrics.current() is not metrics
+    assert json.loads((tmp_path / "job.json").read_text())["items"] == {}
+
+
+def test_a_failed_run_still_writes_both_reports(tmp_path, monkeypatch):
+    monkeypatch.setenv(JSON_ENV, str(tmp_path))
+    monkeypatch.setenv(TEXTFILE_ENV, str(tmp_path / "node" / "sync.prom"))
+    with pytest.raises(RuntimeError):
+        with start_run("sync"):
+            with phase('load "csv"'):
+                count("rows", 3)
+                raise RuntimeError("boom")
+    report = json.loads((tmp_path / "sync.json").read_text())
+    assert (report["success"], report["error"]) == (False, "RuntimeError: boom")
+    prom = (tmp_path / "node" / "sync.prom").read_text()
+    assert 'nail_catalog_run_success{job="sync"} 0\n' in prom
+    assert 'nail_catalog_phase_calls{job="sync",phase="load \\"csv\\""} 1\n' in prom
+    assert 'nail_catalog_items{job="sync",item="rows"} 3\n' in prom
+    assert "# TYPE nail_catalog_items gauge" in prom and "nail_catalog_retries" not in prom
+    assert not list(tmp_path.rglob("*.tmp"))
+
+    with pytest.raises(SystemExit):
+        with start_run("sync"):
+            raise SystemExit(0)
+    assert json.loads((tmp_path / "sync.json").read_text())["success"] is True
@@ -0,0 +1,105 @@
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from run_metrics import TRACE_ENV, phase, start_run, timed
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def do_GET(self):  # noqa: N802
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@timed
+def fetch_pages(url, count):
+    import requests  # the url fixture skips without it
+
+    for page in range(count):
+        yield requests.get(f"{url}?page={page}").status_code
+
+
+@timed
+def download(seconds):
+    time.sleep(seconds)
+
+
+def spans(trace, name=None, category=None):
+    return [
+        event
+        for event in trace["traceEvents"]
+        if event["ph"] == "X" and name in (None, event["name"]) and category in (None, event["cat"])
+    ]
+
+
+def inside(child, parent):
+    return parent["ts"] <= child["ts"] and child["ts"] + child["dur"] <= parent["ts"] + parent["dur"] + 1
+
+
+@pytest.fixture(scope="module")
+def url():
+    pytest.importorskip("requests")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/products"
+    server.shutdown()
+    server.server_close()
+
+
+def test_trace_nests_requests_inside_the_stage_that_made_them(tmp_path, url):
+    path = tmp_path / "scrape.trace.json.gz"
+    with start_run("scrape", trace=path):
+        with phase("catalogue"):
+            assert list(fetch_pages(url, 3)) == [200] * 3
+        worker = threading.Thread(target=download, args=(0.01,), name="swatch-0")
+        worker.start()
+        worker.join()
+    trace = json.loads(gzip.decompress(path.read_bytes()))
+
+    assert trace["otherData"]["job"] == "scrape" and trace["otherData"]["success"] is True
+    assert [event["ts"] for event in trace["traceEvents"] if event["ph"] == "X"] == sorted(
+        event["ts"] for event in spans(trace)
+    )
+    [catalogue] = spans(trace, "catalogue")
+    pages = spans(trace, "fetch_pages")
+    requests = spans(trace, category="http")
+    # One span per generator resume (three pages and the final StopIteration), each holding its request
+    assert len(pages) == 4 and len(requests) == 3
+    assert all(inside(page, catalogue) for page in pages)
+    for request in requests:
+        assert request["name"] == f"GET {url.split('/')[2]}/products"
+        assert request["args"]["status"] == 200 and request["args"]["bytes_in"] == 2
+        assert any(inside(request, page) and request["tid"] == page["tid"] for page in pages)
+
+    # Work on other threads gets its own, named track
+    [worker_span] = spans(trace, "download")
+    assert worker_span["tid"] != catalogue["tid"]
+    names = {event["tid"]: event["args"]["name"] for event in trace["traceEvents"] if event["name"] == "thread_name"}
+    assert names[catalogue["tid"]] == "main"
+    assert worker_span["tid"] in names
+
+
+def test_tracing_is_off_unless_asked_for(tmp_path, monkeypatch):
+    with start_run("sync") as metrics:
+        with phase("load"):
+            pass
+    assert metrics.trace_events is None and not list(tmp_path.iterdir())
+
+    monkeypatch.setenv(TRACE_ENV, f"{tmp_path}/")
+    with start_run("sync"):
+        with phase("load"):
+            pass
+    trace = json.loads((tmp_path / "sync.trace.json").read_text())
+    assert [event["name"] for event in spans(trace)] == ["load"]
+    assert trace["traceEvents"][0] == {
+        "name": "process_name", "ph": "M", "pid": spans(trace)[0]["pid"], "tid": 0, "args": {"name": "sync"}
+    }
@@ -0,0 +1,92 @@
+import json
+import signal
+import time
+
+import pytest
+
+from run_metrics import JSON_ENV, phase, start_run, timed
+from sampling_profiler import SamplingProfiler
+
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(200))
+    return total
+
+
+@timed
+def normalise(seconds):
+    return spin(seconds)
+
+
+def test_wall_mode_samples_the_profiled_thread_by_phase():
+    current = ["load"]
+    with SamplingProfiler(0.002, "wall", tag=lambda: current[0]) as profiler:
+        spin(0.1)
+        current[0] = "sleep"
+        time.sleep(0.1)
+    assert profiler.mode == "wall" and profiler.seconds >= 0.2
+    phases = {row["phase"]: row for row in profiler.by_phase()}
+    # Wall mode also samples the thread while it waits
+    assert phases["load"]["samples"] > 0 and phases["sleep"]["samples"] > 0
+    assert sum(row["samples"] for row in phases.values()) == profiler.total
+
+    lines = profiler.collapsed().splitlines()
+    assert lines and all(line.startswith(("phase:load;", "phase:sleep;")) for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == profiler.total
+    assert any(line.split(";")[-1].startswith("spin (test_sampling_profiler.py:") for line in lines)
+    assert not any("(sampling_profiler.py:" in line or "(contextlib.py:" in line for line in lines)
+
+
+def test_hot_functions_rank_self_time_within_totals():
+    with SamplingProfiler(0.002, "wall") as profiler:
+        normalise(0.15)
+    hot = {row["function"].split(" ")[0]: row for row in profiler.hot_functions()}
+    assert hot["spin"]["self"] > 0 and hot["spin"]["self_pct"] > 50
+    # The caller is on every sample spin is, but spends none of it itself
+    caller = hot["test_hot_functions_rank_self_time_within_totals"]
+    assert caller["total"] >= hot["spin"]["total"] and caller["self"] <= hot["spin"]["self"]
+    assert all(row["self"] <= row["total"] <= profiler.total for row in hot.values())
+    assert "normalise" not in hot or hot["normalise"]["self"] <= hot["spin"]["self"]
+
+    report = profiler.report("sync", top=5)
+    assert report.startswith("Sampling profile: sync — wall mode, 2 ms interval")
+    assert "spin (test_sampling_profiler.py:" in report and len(profiler.hot_functions(top=1)) == 1
+    assert profiler.summary()["samples"] == profiler.total
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="cpu mode needs setitimer")
+def test_cpu_mode_skips_time_spent_waiting():
+    with SamplingProfiler(0.002, "cpu", tag=lambda: "cpu") as profiler:
+        spin(0.1)
+        time.sleep(0.1)
+    assert profiler.total > 0
+    assert not any("sleep" in row["function"] for row in profiler.hot_functions())
+    assert signal.getsignal(signal.SIGPROF) in (signal.SIG_DFL, None)
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError, match="Unknown profiler mode 'gpu'"):
+        SamplingProfiler(mode="gpu")
+
+
+def test_profiled_runs_write_collapsed_stacks_and_a_hot_list(tmp_path, monkeypatch):
+    monkeypatch.setenv(JSON_ENV, f"{tmp_path}/")
+    with start_run("sync", profile=f"{tmp_path}/"):
+        with phase("load"):
+            spin(0.05)
+        normalise(0.1)
+    collapsed = (tmp_path / "sync.collapsed").read_text().splitlines()
+    assert {line.split(";")[0] for line in collapsed} <= {"phase:load", "phase:normalise", "phase:-"}
+    assert any(line.startswith("phase:normalise;") for line in collapsed)
+    assert (tmp_path / "sync.hot.txt").read_text().startswith("Sampling profile: sync")
+
+    profile = json.loads((tmp_path / "sync.json").read_text())["profile"]
+    assert profile["samples"] == sum(int(line.rsplit(" ", 1)[1]) for line in collapsed)
+    assert {row["phase"] for row in profile["phases"]} >= {"normalise"}
+
+    with start_run("sync"):
+        pass
+    assert "profile" not in json.loads((tmp_path / "sync.json").read_text())
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+psycopg = pytest.importorskip("psycopg")
+
+DSN = os.environ.get("DATABASE_URL")
+
+# Everything runs in one transaction that is rolled back
+pytestmark = pytest.mark.skipif(not DSN, reason="needs DATABASE_URL with supabase/42 and 43 installed")
+
+SNAPSHOT_SQL = "SELECT hex_code, hue, saturation, lightness, category, display_order FROM colors"
+
+
+def snapshot(cur):
+    return {row[0]: row[1:] for row in cur.execute(SNAPSHOT_SQL)}
+
+
+@pytest.fixture
+def cur():
+    with psycopg.connect(DSN) as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT refresh_hex_categorization()")
+            yield cursor
+        conn.rollback()
+
+
+def test_scoped_refresh_only_renumbers_the_categories_it_touches(cur):
+    sizes = dict(cur.execute("SELECT category, count(*) FROM colors GROUP BY category").fetchall())
+    assert len(sizes) >= 4
+    source, wrong, bystander = sorted(sizes, key=sizes.get, reverse=True)[:3]
+    moved = [row[0] for row in cur.execute("SELECT hex_code FROM colors WHERE category = %s LIMIT 5", (source,))]
+    # A stale categorisation for a few rows, and a display_order nobody asked to fix
+    cur.execute(
+        "UPDATE colors SET category = %s, hue = -1, display_order = 0 WHERE hex_code = ANY(%s)", (wrong, moved)
+    )
+    cur.execute("UPDATE colors SET display_order = -display_order WHERE category = %s", (bystander,))
+    before = snapshot(cur)
+
+    cur.execute("SELECT refresh_hex_categorization(%s::text[])", (moved,))
+    scoped = snapshot(cur)
+    cur.execute("SELECT refresh_hex_categorization()")
+    full = snapshot(cur)
+
+    expected = {
+        row[0]: row[1:]
+        for row in cur.execute(
+            "SELECT h, k.hue, k.saturation, k.lightness, k.category FROM unnest(%s::text[]) h, categorize_hex(h) k",
+            (moved,),
+        )
+    }
+    assert {hex_code: scoped[hex_code][:4] for hex_code in moved} == expected
+    for hex_code, values in scoped.items():
+        if before[hex_code][3] == bystander:
+            assert values == before[hex_code]  # never renumbered
+        else:
+            assert values == full[hex_code]  # the touched categories end up as after a full refresh
+    assert any(full[hex_code] != before[hex_code] for hex_code in before if before[hex_code][3] == bystander)
+
+
+def test_scoped_refresh_of_unknown_hexes_writes_nothing(cur):
+    before = snapshot(cur)
+    cur.execute("SELECT refresh_hex_categorization(%s::text[])", (["#NOPE00"],))
+    assert snapshot(cur) == before
+    cur.execute("SELECT refresh_hex_categorization(%s::text[])", ([],))
+    assert snapshot(cur) == before
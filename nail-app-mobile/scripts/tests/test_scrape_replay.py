@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("PIL")
+
+from scrape_replay import (  # noqa: E402
+    ROOT,
+    SCRAPERS,
+    FixtureArchive,
+    ReplayServer,
+    StageClock,
+    intercept,
+    record_transport,
+    replay_transport,
+    request_key,
+    run_scraper,
+    synthesize_archive,
+)
+
+
+@pytest.fixture(scope="module")
+def archive():
+    return synthesize_archive(image_size=8)
+
+
+def test_request_keys_ignore_query_order_and_graphql_wording():
+    assert request_key("get", "https://x.test/p?b=2&a=1") == request_key("GET", "https://x.test/p?a=1&b=2")
+    first = json.dumps({"query": "query A { products }", "variables": {"first": 50, "after": None}})
+    reworded = json.dumps({"query": "query B {\n  products\n}", "variables": {"after": None, "first": 50}})
+    later = json.dumps({"query": "query A { products }", "variables": {"first": 50, "after": "c1"}})
+    url = "https://x.test/graphql"
+    assert request_key("POST", url, first) == request_key("POST", url, reworded.encode("utf-8"))
+    assert request_key("POST", url, first) != request_key("POST", url, later)
+
+
+def test_archives_round_trip_and_store_shared_bodies_once(archive, tmp_path):
+    path = tmp_path / "scrapers.zip"
+    archive.save(path)
+    loaded = FixtureArchive.load(path)
+    assert loaded.entries == archive.entries and loaded.blobs == archive.blobs
+    assert len(loaded.blobs) < len(loaded)  # swatches of the same hex share a PNG
+    # Saving again gives the same bytes, so committed fixtures only change with their content
+    loaded.save(tmp_path / "again.zip")
+    assert (tmp_path / "again.zip").read_bytes() == path.read_bytes()
+
+
+@pytest.mark.parametrize("name", sorted(SCRAPERS))
+def test_replaying_the_synthesized_archive_reproduces_the_bundled_csv(archive, tmp_path, name):
+    with ReplayServer(archive) as server:
+        run = run_scraper(name, replay_transport(server), tmp_path)
+    spec = SCRAPERS[name]
+    assert run.error == ""
+    assert (tmp_path / spec.out_csv).read_bytes() == (ROOT / spec.out_csv).read_bytes()
+    assert (run.rows, run.rows_without_hex) == (len((ROOT / spec.out_csv).read_text().splitlines()) - 1, 0)
+    assert server.stats.missed == 0 and server.stats.served == sum(s.requests for s in run.stages.values())
+    assert run.stages["swatches"].requests == run.rows and run.stages["catalogue"].requests > 0
+
+
+def test_injected_throttles_are_seeded_and_counted():
+    archive = FixtureArchive()
+    urls = [f"https://shop.test/page/{index}" for index in range(40)]
+    for url in urls:
+        archive.add_json("GET", url, None, {"url": url})
+
+    def statuses(seed):
+        with ReplayServer(archive, rate_limit=0.25, retry_after=3, seed=seed) as server:
+            clock = StageClock()
+            with intercept(replay_transport(server), clock), clock.stage("catalogue"):
+                responses = [requests.get(url) for url in urls + ["https://shop.test/missing"]]
+        return responses, clock, server.stats
+
+    responses, clock, stats = statuses(seed=1)
+    throttled = [response for response in responses if response.status_code == 429]
+    assert throttled and all(response.headers["Retry-After"] == "3" for response in throttled)
+    assert [response.status_code for response in responses] == [response.status_code for response in statuses(1)[0]]
+    assert stats.throttled == len(throttled) == clock.stages["catalogue"].rate_limited
+    assert stats.missed_urls == (["https://shop.test/missing"] if responses[-1].status_code == 404 else [])
+    assert all(response.json() == {"url": url} for response, url in zip(responses, urls) if response.ok)
+
+
+def test_recording_keeps_answers_but_not_throttles_or_server_errors():
+    recorded = FixtureArchive()
+
+    def answer(status):
+        def send(request):
+            response = requests.Response()
+            response.status_code, response._content = status, f"{status}".encode("ascii")
+            response.headers["Content-Type"] = "text/plain"
+            return response
+
+        return send
+
+    for status in (200, 404, 429, 503):
+        request = requests.Request("GET", f"https://shop.test/{status}").prepare()
+        assert record_transport(recorded)(answer(status), request).status_code == status
+    assert sorted(entry["status"] for entry in recorded.entries.values()) == [200, 404]
+    assert recorded.lookup(request_key("GET", "https://shop.test/404"))[1] == b"404"
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from color_science import delta_e_2000, hex_to_lab  # noqa: E402
+from shade_index import ShadeIndex, synthetic_records  # noqa: E402
+
+SHADES = 4000
+LEAF_SIZE = 8  # small leaves so the queries walk deep trees
+
+
+@pytest.fixture(scope="module")
+def index():
+    return ShadeIndex(synthetic_records(SHADES), leaf_size=LEAF_SIZE)
+
+
+def probes(count, seed=11):
+    rng = random.Random(seed)
+    return [f"#{rng.randrange(1 << 24):06X}" for _ in range(count)]
+
+
+def brute_force(index, hex_code, mask=None):
+    """(record id, CIEDE2000) for every shade passing `mask`, closest first."""
+    delta = delta_e_2000(hex_to_lab([hex_code])[0], index.lab)
+    ids = np.arange(len(index)) if mask is None else np.flatnonzero(mask)
+    order = np.lexsort((ids, delta[ids]))
+    return ids[order], delta[ids][order]
+
+
+def ids_of(index, matches):
+    positions = {id(record): position for position, record in enumerate(index.records)}
+    return [positions[id(match.record)] for match in matches]
+
+
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_nearest_matches_brute_force(index, k):
+    for probe in probes(150):
+        ids, delta = brute_force(index, probe)
+        matches = index.nearest(probe, k)
+        assert ids_of(index, matches) == list(ids[:k])
+        assert np.allclose([match.delta_e for match in matches], delta[:k])
+
+
+@pytest.mark.parametrize("radius", [1.0, 3.0, 12.0])
+def test_within_matches_brute_force(index, radius):
+    for probe in probes(150):
+        ids, delta = brute_force(index, probe)
+        assert ids_of(index, index.within(probe, radius)) == list(ids[delta <= radius])
+
+
+def test_filtered_queries_match_brute_force(index):
+    brands = np.array([record.brand for record in index.records])
+    finishes = np.array([record.finish for record in index.records])
+    mask = (brands == "CND") & np.isin(finishes, ["cream", "glossy"])
+    for probe in probes(100):
+        ids, delta = brute_force(index, probe, mask)
+        assert ids_of(index, index.nearest(probe, 5, brand="cnd", finish=["Cream", "glossy"])) == list(ids[:5])
+        assert ids_of(index, index.within(probe, 6.0, brand="CND", finish=["cream", "glossy"])) == list(
+            ids[delta <= 6.0]
+        )
+
+
+def test_exact_match_comes_first(index):
+    record = index.records[123]
+    best = index.nearest(record.hex_code, 1)[0]
+    assert best.delta_e == 0
+    assert best.record.hex_code == record.hex_code
+
+
+def test_small_and_empty_selections(index):
+    assert len(index.nearest("#C8102E", SHADES + 10)) == SHADES
+    assert index.nearest("#C8102E", 5, brand="No Such Brand") == []
+    assert index.within("#C8102E", 3.0, brand="No Such Brand") == []
+    with pytest.raises(ValueError):
+        index.nearest("not a colour")
@@ -0,0 +1,138 @@
+import io
+import random
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+import swatch_assets  # noqa: E402
+from catalog_export import synthetic_entries  # noqa: E402
+from swatch_assets import SwatchCache, build_swatch_assets, sheet_grid  # noqa: E402
+
+PAGE_SIZE = 10
+CELL = 16
+THUMB = 32
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def swatch(color, fmt="JPEG", size=200):
+    return encode(Image.new("RGB", (size, size), color), fmt)
+
+
+def transparent_swatch():
+    image = Image.new("RGBA", (100, 100), (0, 0, 0, 0))
+    image.paste((200, 0, 0, 255), (25, 25, 75, 75))
+    return encode(image, "PNG")
+
+
+def build(entries, cache, out_dir):
+    return build_swatch_assets(
+        entries, cache, out_dir, page_size=PAGE_SIZE, thumb_size=THUMB, cell_size=CELL, workers=1
+    )
+
+
+def pixel(path, xy):
+    with Image.open(path) as image:
+        return image.convert("RGB").getpixel(xy)
+
+
+def close(actual, expected, tolerance=12):
+    return all(abs(a - b) <= tolerance for a, b in zip(actual, expected))
+
+
+def mtimes(out_dir):
+    return {path: path.stat().st_mtime_ns for path in out_dir.rglob("*.webp")}
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    entries = synthetic_entries(40)
+    for entry in entries:
+        entry["category"] = "reds" if int(entry["color_variant_id"][0], 16) < 8 else "blues"
+    cache = SwatchCache(tmp_path / "cache")
+    rng = random.Random(2)
+    # Every other entry has a cached swatch; two URLs share the same bytes
+    for entry in entries[::2]:
+        cache.put(entry["swatch_url"], swatch(tuple(rng.randrange(256) for _ in range(3))))
+    cache.put(entries[2]["swatch_url"], cache.object_path(cache.source_hash(entries[0]["swatch_url"])).read_bytes())
+    cache.put(entries[4]["swatch_url"], transparent_swatch())
+    cache.put(entries[6]["swatch_url"], b"not an image")
+    return entries, cache
+
+
+def test_cache_stores_shared_bytes_once(tmp_path):
+    cache = SwatchCache(tmp_path)
+    first = cache.put("https://a.example/1.jpg", swatch((1, 2, 3)))
+    assert cache.put("https://b.example/2.jpg", swatch((1, 2, 3))) == first
+    assert len(list((tmp_path / "objects").rglob("*"))) == 2  # one fan-out directory, one object
+    assert cache.source_hash("https://b.example/2.jpg") == first
+    assert cache.source_hash("https://c.example/3.jpg") is None and cache.source_hash("") is None
+    cache.object_path(first).unlink()
+    assert cache.source_hash("https://a.example/1.jpg") is None
+
+
+def test_thumbnails_and_sheets_cover_every_entry(tmp_path, catalogue):
+    entries, cache = catalogue
+    out_dir = tmp_path / "out"
+    index = build(entries, cache, out_dir)
+
+    with_swatch = {entry["color_variant_id"] for entry in entries[::2]} - {entries[6]["color_variant_id"]}
+    assert set(index["thumbs"]) == with_swatch
+    assert index["thumbs"][entries[0]["color_variant_id"]] == index["thumbs"][entries[2]["color_variant_id"]]
+    thumbs = {out_dir / index["thumb_path"].format(hash=thumb) for thumb in index["thumbs"].values()}
+    assert thumbs == set((out_dir / "thumbs").rglob("*.webp")) and len(thumbs) == len(with_swatch) - 1
+    for path in thumbs:
+        with Image.open(path) as image:
+            assert image.size == (THUMB, THUMB)
+    # Transparent backgrounds are flattened onto white, not black
+    transparent = out_dir / index["thumb_path"].format(hash=index["thumbs"][entries[4]["color_variant_id"]])
+    assert close(pixel(transparent, (0, 0)), (255, 255, 255))
+
+    for category, info in index["categories"].items():
+        members = [entry for entry in entries if entry["category"] == category]
+        assert info["count"] == len(members)
+        assert [variant for sheet in info["sheets"] for variant in sheet["cells"]] == [
+            entry["color_variant_id"] for entry in members
+        ]
+        for sheet in info["sheets"]:
+            cols, rows = sheet_grid(len(sheet["cells"]))
+            with Image.open(out_dir / sheet["path"]) as image:
+                assert image.size == (sheet["width"], sheet["height"]) == (cols * CELL, rows * CELL)
+    # Entries without a usable swatch get a cell in their own colour
+    for entry in (entries[1], entries[6]):
+        sheet = next(
+            sheet
+            for sheet in index["categories"][entry["category"]]["sheets"]
+            if entry["color_variant_id"] in sheet["cells"]
+        )
+        x, y = sheet["cells"][entry["color_variant_id"]]
+        expected = tuple(int(entry["hex_code"][i : i + 2], 16) for i in (1, 3, 5))
+        assert close(pixel(out_dir / sheet["path"], (x + CELL // 2, y + CELL // 2)), expected)
+
+
+def test_reruns_only_render_what_changed(tmp_path, catalogue, monkeypatch):
+    entries, cache = catalogue
+    out_dir = tmp_path / "out"
+    first = build(entries, cache, out_dir)
+    before = mtimes(out_dir)
+    assert build(entries, cache, out_dir)["categories"] == first["categories"]
+    assert mtimes(out_dir) == before
+
+    # A new swatch for one entry: one new thumbnail, one new sheet; the rest untouched
+    cache.put(entries[1]["swatch_url"], swatch((0, 0, 255), "PNG"))
+    second = build(entries, cache, out_dir)
+    after = mtimes(out_dir)
+    assert set(before) < set(after) and len(set(after) - set(before)) == 2
+    assert all(after[path] == before[path] for path in before)
+
+    # A render-version bump moves every thumbnail; the previous generation is dropped on the next run
+    monkeypatch.setattr(swatch_assets, "RENDER_VERSION", swatch_assets.RENDER_VERSION + 1)
+    third = build(entries, cache, out_dir)
+    assert third["thumb_path"] != second["thumb_path"]
+    build(entries, cache, out_dir)
+    assert not list((out_dir / "thumbs" / str(THUMB) / "v1").rglob("*.webp"))
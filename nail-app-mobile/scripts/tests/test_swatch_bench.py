@@ -0,0 +1,73 @@
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("requests")  # the scrapers import it
+
+import swatch_bench  # noqa: E402
+from swatch_bench import (  # noqa: E402
+    CORPUS_FORMATS,
+    average_hex_reduced,
+    benchmark,
+    build_corpus,
+    load_corpus,
+    synthetic_sources,
+)
+
+SOURCES = 3
+EDGE = 300
+
+
+@pytest.fixture(scope="module")
+def images(tmp_path_factory):
+    corpus = tmp_path_factory.mktemp("corpus")
+    built = build_corpus(synthetic_sources(SOURCES, size=EDGE), corpus, sizes=(128,))
+    loaded = load_corpus(corpus)
+    assert [{k: v for k, v in image.items() if k != "data"} for image in loaded] == built
+    return loaded
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    return swatch_bench._scraper("scrape_opi_uk").average_hex_from_image
+
+
+def test_corpus_covers_every_format_and_size(images):
+    assert len(images) == SOURCES * 2 * len(CORPUS_FORMATS)
+    assert {(image["format"], image["edge"]) for image in images} == {
+        (name, edge) for name in CORPUS_FORMATS for edge in (EDGE, 128)
+    }
+    assert all(len(image["data"]) == image["bytes"] and image["reference"].startswith("#") for image in images)
+
+
+def test_report_checks_candidates_against_the_scraper(images, scraper):
+    def black(image_bytes):
+        return "#000000"
+
+    def broken(image_bytes):
+        return ""
+
+    report = benchmark(
+        images, {"scraper": scraper, "reduced": average_hex_reduced, "black": black, "broken": broken}, repeat=1
+    )
+    baseline, reduced, wrong, failing = report["extractors"]
+    # The timed stage copy of the scraper code returns the same hexes
+    assert report["staged_mismatches"] == 0
+    assert report["baseline"] == "scraper" and report["sources"] == SOURCES
+    assert set(report["stages"]) == {f"{name}@{edge}" for name in CORPUS_FORMATS for edge in (EDGE, 128)}
+    # The rendered blobs average close to their base colour
+    assert baseline["failed"] == 0 and baseline["delta_e_mean"] < 10
+    assert reduced["no_less_accurate"] and reduced["delta_e_vs_baseline_max"] < 2
+    assert not wrong["no_less_accurate"] and wrong["delta_e_mean"] > baseline["delta_e_mean"]
+    assert not failing["no_less_accurate"] and failing["failed"] == len(images)
+    assert all(len(result["outputs"]) == len(images) and result["seconds"] > 0 for result in report["extractors"])
+
+
+def test_reduced_extraction_matches_the_scraper_on_solid_swatches(scraper):
+    for fmt in ("PNG", "JPEG"):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 900), (200, 16, 46)).save(buffer, fmt)
+        assert average_hex_reduced(buffer.getvalue()) == scraper(buffer.getvalue())
+    assert average_hex_reduced(b"not an image") == ""
@@ -0,0 +1,83 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+import sync_plan  # noqa: E402
+from fake_postgrest import FakeSupabase, _environment  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+class SimulatedTimeout(Exception):
+    pass
+
+
+def fail_at(monkeypatch, kind, at):
+    """Make the `at`-th `kind` step raise after its write commits but before it is journalled."""
+    original = sync_plan.SyncPlan.mark_done
+    seen = []
+
+    def mark_done(self, step, result=None):
+        if step.kind == kind:
+            seen.append(step.index)
+            if len(seen) == at:
+                raise SimulatedTimeout(f"{kind} step {step.index}")
+        return original(self, step, result)
+
+    monkeypatch.setattr(sync_plan.SyncPlan, "mark_done", mark_done)
+
+
+def stored_state(fake):
+    colors = fake.database.tables["colors"]
+    variants = fake.database.tables["color_variants"]
+    return {
+        "hexes": sorted(color["hex_code"] for color in colors.values()),
+        "variants": sorted(
+            (variant["brand"], variant["product_line"], variant["shade_name"], variant.get("shade_code") or "")
+            for variant in variants.values()
+        ),
+        "dangling_primaries": sum(1 for color in colors.values() if color.get("primary_variant_id") not in variants),
+    }
+
+
+@pytest.fixture(scope="module")
+def expected():
+    with FakeSupabase() as fake, _environment(fake.env()):
+        assert sync.main([]) == 0
+        return stored_state(fake)
+
+
+@pytest.mark.parametrize(
+    "kind, at",
+    [("insert_colors", 2), ("upsert_variants", 1), ("update_primary", 3), ("refresh_categories", 1)],
+)
+def test_resume_after_failure_matches_an_uninterrupted_sync(tmp_path, monkeypatch, expected, kind, at):
+    plan_file = tmp_path / "plan.json"
+    argv = ["--plan-file", str(plan_file)]
+    with FakeSupabase() as fake, _environment(fake.env()):
+        with monkeypatch.context() as patch:
+            fail_at(patch, kind, at)
+            with pytest.raises(SimulatedTimeout):
+                sync.main(argv)
+        assert sync_plan.unfinished_plan(plan_file)
+
+        assert sync.main(argv + ["--resume"]) == 0
+        assert stored_state(fake) == expected
+        assert not plan_file.exists()
+        assert sync_plan.unfinished_plan(plan_file) is None
+
+
+def test_resume_is_refused_after_the_catalogue_changes(tmp_path, monkeypatch, expected):
+    plan_file = tmp_path / "plan.json"
+    argv = ["--plan-file", str(plan_file)]
+    with FakeSupabase() as fake, _environment(fake.env()):
+        with monkeypatch.context() as patch:
+            fail_at(patch, "upsert_variants", 1)
+            with pytest.raises(SimulatedTimeout):
+                sync.main(argv)
+        opi = tmp_path / "opi.csv"
+        source = sync.parse_args([]).opi
+        opi.write_text(source.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+        assert sync.main(argv + ["--resume", "--opi", str(opi)]) == 1
+        assert sync_plan.unfinished_plan(plan_file)
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("supabase")
+
+import sync_color_catalog as sync  # noqa: E402
+from fake_postgrest import FakeSupabase, _environment, run_churn_scenario, thin_catalogues  # noqa: E402
+
+pytestmark = pytest.mark.filterwarnings("ignore::DeprecationWarning")
+
+
+def inactive_variants(fake):
+    return [row for row in fake.database.tables["color_variants"].values() if not row["is_active"]]
+
+
+def colours_with_inactive_primary(fake):
+    variants = fake.database.tables["color_variants"]
+    return [
+        row
+        for row in fake.database.tables["colors"].values()
+        if row.get("primary_variant_id") and not variants[row["primary_variant_id"]]["is_active"]
+    ]
+
+
+def test_churn_deactivates_exactly_the_dropped_rows(tmp_path):
+    with FakeSupabase() as fake:
+        _, churn, _, _, dropped = run_churn_scenario(fake, [], tmp_path, drop_every=20)
+        assert dropped
+        assert len(inactive_variants(fake)) == dropped
+        assert not colours_with_inactive_primary(fake)
+    # One bulk RPC call, not one request per variant
+    assert churn.phases["deactivate_missing_variants"].requests == 1
+
+
+def test_returning_shades_are_reactivated(tmp_path):
+    thinned, _ = thin_catalogues([], tmp_path, drop_every=20)
+    with FakeSupabase() as fake, _environment(fake.env()):
+        assert sync.main(thinned) == 0
+        assert sync.main([]) == 0
+        assert not inactive_variants(fake)
+        assert not colours_with_inactive_primary(fake)
+
+
+def test_keep_missing_leaves_dropped_rows_active(tmp_path):
+    thinned, _ = thin_catalogues([], tmp_path, drop_every=20)
+    with FakeSupabase() as fake, _environment(fake.env()):
+        assert sync.main([]) == 0
+        assert sync.main(thinned + ["--keep-missing"]) == 0
+        assert not inactive_variants(fake)
+
+
+def test_truncated_catalogue_is_not_deactivated(tmp_path):
+    # Dropping every other row is far past the default --max-deactivate-fraction
+    thinned, dropped = thin_catalogues([], tmp_path, drop_every=2)
+    with FakeSupabase() as fake, _environment(fake.env()):
+        assert sync.main([]) == 0
+        assert sync.main(thinned) == 0
+        assert dropped
+        assert not inactive_variants(fake)
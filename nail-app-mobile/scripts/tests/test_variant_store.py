@@ -0,0 +1,100 @@
+import random
+from dataclasses import replace
+
+import pytest
+
+from catalog_model import VariantRecord, deduplicate, map_hex_to_variants
+from variant_store import TEXT_FIELDS, VariantStore, _Text
+
+TEMPLATES = [
+    VariantRecord(
+        "#C8102E", "OPI", "Nail Lacquer", "Big Apple Red", "NL N25", "New York", "cream",
+        "https://www.opi.com/products/big-apple-red", "https://cdn.opi.com/swatches/n25.png", "opi",
+    ),
+    VariantRecord("#00FF00", "CND", "Shellac", "Crème Brûlée ✨", None, None, "shimmer", None, None, "cnd"),
+    VariantRecord("#741E20", "The Gel Bottle", "Gel", "Bottled", "", "", "glossy", "", "/", "tgb"),
+]
+
+
+def records(count, seed=11):
+    rng = random.Random(seed)
+    for index in range(count):
+        base = rng.choice(TEMPLATES)
+        yield replace(
+            base,
+            hex_code=rng.choice(["#C8102E", "#00FF00", "#741E20", f"#{rng.randrange(1 << 24):06X}"]),
+            shade_name=rng.choice([base.shade_name, f"{base.shade_name} {index % 7}"]),
+            shade_code=rng.choice([base.shade_code, None, ""]),
+        )
+
+
+def test_rows_read_back_as_the_records_they_came_from():
+    source = list(records(3000))
+    store = VariantStore.from_records(source)
+    assert len(store) == len(source)
+    assert list(store) == source
+    assert [row.to_record() for row in store[-3:]] == source[-3:]
+    assert store.column("swatch_url") == [record.swatch_url for record in source]
+    assert store.column("hex_code") == [record.hex_code for record in source]
+    with pytest.raises(IndexError):
+        store[len(source)]
+
+
+def test_categories_are_interned_and_url_prefixes_shared():
+    store = VariantStore.from_records(records(3000))
+    assert sorted(store.columns["brand"].values) == ["CND", "OPI", "The Gel Bottle"]
+    assert len(store.columns["brand"].codes) == len(store)
+    product_urls = store.columns["product_url"]
+    # One shared directory per catalogue; only the last path segment is stored per row
+    assert set(product_urls.prefixes.values) == {"", "https://www.opi.com/products/"}
+    assert b"https://" not in product_urls.data
+    # A bare "/" is its own (unsplit) value, and "" is distinct from None
+    assert set(store.column("swatch_url")) == {"https://cdn.opi.com/swatches/n25.png", None, "/"}
+    assert set(store.column("collection")) == {"New York", None, ""}
+
+
+def test_prefix_dictionary_is_capped(monkeypatch):
+    monkeypatch.setattr(_Text, "MAX_PREFIXES", 3)
+    column = _Text(prefixes=True)
+    urls = [f"https://cdn.example.com/{index}/swatch.png" for index in range(5)] + [None]
+    column.extend(urls[:3])
+    for url in urls[3:]:
+        column.append(url)
+    assert [column[index] for index in range(len(urls))] == urls
+    assert len(column.prefixes.values) == 3
+
+
+@pytest.mark.parametrize("field", TEXT_FIELDS)
+def test_bulk_extend_matches_appending(field):
+    values = [getattr(record, field) for record in records(500)]
+    values += ["naïve/", "x/y/", "", None]
+    bulk, single = _Text(prefixes=field.endswith("url")), _Text(prefixes=field.endswith("url"))
+    bulk.extend(values)
+    for value in values:
+        single.append(value)
+    assert (bulk.data, bulk.ends, bulk.missing, bulk.prefix_codes) == (
+        single.data, single.ends, single.missing, single.prefix_codes,
+    )
+    assert [bulk[index] for index in range(len(values))] == values
+
+
+def test_deduplicate_and_grouping_match_the_record_helpers():
+    source = list(records(4000))
+    source += source[::5]  # exact repeats
+    expected = list(deduplicate(source))
+    assert len(expected) < len(source)
+
+    store = VariantStore.from_records(source).deduplicate()
+    assert list(store) == expected
+
+    groups = map_hex_to_variants(store)
+    reference = map_hex_to_variants(expected)
+    assert list(groups) == list(reference)
+    assert all(groups[hex_code] == rows for hex_code, rows in reference.items())
+    assert "#C8102E" in groups and "#GGGGGG" not in groups and "nope" not in groups
+
+
+def test_remap_hexes_rewrites_rows_in_place():
+    store = VariantStore.from_records(TEMPLATES)
+    assert store.remap_hexes({"#00FF00": "#C8102E", "#123456": "#000000"}) == 1
+    assert store.hex_counts() == {"#C8102E": 2, "#741E20": 1}
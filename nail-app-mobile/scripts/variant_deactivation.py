@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Soft-deactivation of variants that disappeared from their source catalogue.
+
+Upserts only ever set `is_active = TRUE`, so a shade OPI, CND or TGB drops
+from its range would stay live in `color_variants` forever. After each sync,
+`sync_color_catalog.py` works out the difference per `source_catalog`:
+- the stored active variants of every catalogue that contributed rows to
+  this run;
+- minus the ingested ones, matched on the `color_variants_unique` key
+  (colour hex, brand, product line, shade name, shade code).
+
+The rest are set inactive in bulk. A colour whose `primary_variant_id` pointed
+at one of them is cleared and repointed to its first ingested shade. How each
+backend does it:
+
+- postgres: one anti-join against the COPY staging table and one UPDATE,
+  inside the merge transaction (`catalog_postgres.py`).
+- rest / rpc: the stored keys are paged through `catalog_active_variant_keys()`.
+  The stale ids become planned, resumable `deactivate_variants` steps, each
+  a single `deactivate_color_variants()` call
+  (supabase/45_deactivate_missing_variants.sql).
+
+Two guards stop a broken scrape from emptying a brand:
+- A catalogue whose CSV produced no rows is left alone.
+- So is one whose stale variants exceed `--max-deactivate-fraction` of its
+  active ones (default 25%). That looks like a truncated export, not
+  discontinued shades.
+
+`--keep-missing` turns the whole step off. Nothing is deleted. A shade that
+returns is reactivated by the next upsert.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+DEFAULT_MAX_DEACTIVATE_FRACTION = 0.25
+
+VariantKey = Tuple[str, str, str, str, Optional[str]]
+
+
+def variant_key(
+    hex_code: str, brand: str, product_line: str, shade_name: str, shade_code: Optional[str]
+) -> VariantKey:
+    return (hex_code.upper(), brand, product_line, shade_name, shade_code or None)
+
+
+def ingested_keys(records: Iterable) -> Tuple[Set[VariantKey], Set[str]]:
+    """The unique keys of the ingested variant records, and the catalogues they came from."""
+    keys: Set[VariantKey] = set()
+    sources: Set[str] = set()
+    for record in records:
+        keys.add(variant_key(record.hex_code, record.brand, record.product_line, record.shade_name, record.shade_code))
+        sources.add(record.source_catalog)
+    return keys, sources
+
+
+def stale_variants(
+    stored: Iterable[Mapping[str, object]], keys: Set[VariantKey]
+) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+    """Active variants per catalogue, and the ids of those missing from `keys`.
+
+    `stored` rows carry id, source_catalog, hex_code, brand, product_line,
+    shade_name and shade_code, as `catalog_active_variant_keys()` returns them.
+    """
+    active: Dict[str, int] = {}
+    stale: Dict[str, List[str]] = {}
+    for row in stored:
+        source = str(row["source_catalog"])
+        active[source] = active.get(source, 0) + 1
+        key = variant_key(
+            str(row["hex_code"]),
+            str(row["brand"]),
+            str(row["product_line"]),
+            str(row["shade_name"]),
+            row.get("shade_code"),  # type: ignore[arg-type]
+        )
+        if key not in keys:
+            stale.setdefault(source, []).append(str(row["id"]))
+    return active, stale
+
+
+def allowed_sources(active: Mapping[str, int], stale: Mapping[str, int], max_fraction: float) -> List[str]:
+    """Catalogues whose stale variants may be deactivated; logs the ones held back."""
+    allowed = []
+    for source in sorted(stale):
+        missing = stale[source]
+        if not missing:
+            continue
+        share = missing / max(active.get(source, 0), 1)
+        if share > max_fraction:
+            logging.warning(
+                "%s: %d of %d active variants (%.0f%%) are missing from the catalogue, over the %.0f%% limit; "
+                "leaving them active (check the scrape, or raise --max-deactivate-fraction)",
+                source,
+                missing,
+                active.get(source, 0),
+                100 * share,
+                100 * max_fraction,
+            )
+            continue
+        logging.info("%s: deactivating %d of %d active variants no longer in the catalogue", source, missing, active[source])
+        allowed.append(source)
+    return allowed
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""Compact column store for catalogue variants.
+
+`VariantStore` keeps the sync's variant rows column by column instead of as one
+`VariantRecord` object (plus ten string objects) per row:
+
+- hex codes packed into a uint32 array
+- brand, product line, collection, finish and source catalogue dictionary
+  encoded (each distinct value stored once, rows hold a uint32 code)
+- shade name/code and the URLs as UTF-8 bytes in one buffer per column with
+  end offsets, so a row costs its encoded length rather than a Python object;
+  URL directory prefixes are dictionary encoded as well
+
+Rows come back as `VariantRow` views with the same attributes and `key()` as
+`VariantRecord` (and comparing equal to the matching record), so the sync
+functions take them unchanged. `deduplicate()` and `group_by_hex()` replace
+`deduplicate()` and `map_hex_to_variants()` without building a tuple per row.
+
+Run this file directly to compare memory against the record path:
+
+    python scripts/variant_store.py --bench 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import random
+import time
+import tracemalloc
+from array import array
+from bisect import bisect_left
+from dataclasses import astuple, fields
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from catalog_model import (
+    CATALOG_SOURCES,
+    VariantRecord,
+    deduplicate,
+    load_rows,
+    map_hex_to_variants,
+)
+
+RECORD_FIELDS = tuple(field.name for field in fields(VariantRecord))
+CATEGORICAL_FIELDS = ("brand", "product_line", "collection", "finish", "source_catalog")
+TEXT_FIELDS = ("shade_name", "shade_code", "product_url", "swatch_url")
+URL_FIELDS = ("product_url", "swatch_url")
+
+
+class _Categories:
+    """Dictionary-encoded column: distinct values once, a uint32 code per row."""
+
+    __slots__ = ("values", "lookup", "codes")
+
+    def __init__(self) -> None:
+        self.values: List[Optional[str]] = []
+        self.lookup: Dict[Optional[str], int] = {}
+        self.codes = array("I")
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value: Optional[str]) -> None:
+        self.codes.append(self.encode(value))
+
+    def extend_coded(self, values: Sequence[Optional[str]], codes) -> None:
+        """Append rows given as indexes into `values` (a native uint32 buffer, e.g. a NumPy array)."""
+        remap = array("I", [self.encode(value) for value in values])
+        if remap == array("I", range(len(values))):
+            self.codes.frombytes(memoryview(codes).cast("B"))
+        else:
+            self.codes.extend(map(remap.__getitem__, memoryview(codes).cast("B").cast("I")))
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.values[self.codes[index]]
+
+
+class _Text:
+    """Variable-length strings as one UTF-8 buffer plus end offsets; None is flagged.
+
+    With `prefixes`, everything up to the last '/' is dictionary encoded and
+    only the remainder goes into the buffer (catalogue URLs share a handful of
+    directory prefixes). The dictionary is capped so per-row prefixes (e.g.
+    CDN paths with image ids) fall back to storing the whole string.
+    """
+
+    __slots__ = ("data", "ends", "missing", "prefixes", "prefix_codes")
+
+    MAX_PREFIXES = 4096
+
+    def __init__(self, prefixes: bool = False) -> None:
+        self.data = bytearray()
+        self.ends = array("Q")
+        self.missing = bytearray()
+        self.prefixes: Optional[_Categories] = None
+        self.prefix_codes = array("H")
+        if prefixes:
+            self.prefixes = _Categories()
+            self.prefixes.encode("")  # code 0: no shared prefix
+
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.missing.append(1)
+            if self.prefixes is not None:
+                self.prefix_codes.append(0)
+        else:
+            if self.prefixes is not None:
+                cut = value.rfind("/", 0, len(value) - 1) + 1
+                code = self._prefix_code(value[:cut])
+                if code:
+                    value = value[cut:]
+                self.prefix_codes.append(code)
+            self.data += value.encode("utf-8")
+            self.missing.append(0)
+        self.ends.append(len(self.data))
+
+    def _prefix_code(self, prefix: str) -> int:
+        code = self.prefixes.lookup.get(prefix)
+        if code is None and len(self.prefixes.values) < self.MAX_PREFIXES:
+            code = self.prefixes.encode(prefix)
+        return code or 0
+
+    def extend(self, values: Union[Sequence[Optional[str]], "TextBuffer"]) -> None:
+        """Bulk `append`: a pass per step over the column instead of a call per row."""
+        if isinstance(values, TextBuffer):
+            self._extend_buffer(values)
+            return
+        self.missing += bytes(value is None for value in values)
+        present = [value or "" for value in values]
+        if self.prefixes is not None:
+            cuts = [value[: value.rfind("/", 0, len(value) - 1) + 1] for value in present]
+            codes = [self._prefix_code(prefix) for prefix in cuts]
+            self.prefix_codes.extend(codes)
+            present = [value[len(prefix) :] if code else value for value, prefix, code in zip(present, cuts, codes)]
+        text = "".join(present)
+        encoded = text.encode("utf-8")
+        # ASCII (the usual case): byte offsets are character offsets
+        lengths = map(len, present) if len(encoded) == len(text) else (len(value.encode("utf-8")) for value in present)
+        ends = accumulate(lengths, initial=len(self.data))
+        next(ends)  # the current end, already recorded
+        self.ends.extend(ends)
+        self.data += encoded
+
+    def _extend_buffer(self, buffer: "TextBuffer") -> None:
+        ends = memoryview(buffer.ends).cast("B").cast("Q")
+        if self.prefixes is not None:
+            distinct, index = buffer.prefixes
+            remap = array("H", [self._prefix_code(prefix) for prefix in distinct])
+            rows = memoryview(index).cast("B").cast("I")
+            if any(prefix and not code for prefix, code in zip(distinct, remap)):
+                # A prefix past the dictionary cap stays part of its strings; rare, so go row by row
+                self.extend(buffer.values())
+                return
+            self.prefix_codes.extend(map(remap.__getitem__, rows))
+        if self.data:
+            import numpy as np  # TextBuffers come from the columnar (pandas) ingest, so NumPy is there
+
+            ends = memoryview(np.frombuffer(ends, dtype=np.uint64) + np.uint64(len(self.data)))
+        self.ends.frombytes(ends.cast("B"))
+        self.data += buffer.data
+        self.missing += buffer.missing
+
+    def raw(self, index: int) -> Optional[bytes]:
+        if self.missing[index]:
+            return None
+        return bytes(self.data[self.ends[index - 1] if index else 0 : self.ends[index]])
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        raw = self.raw(index)
+        if raw is None:
+            return None
+        if self.prefixes is None:
+            return raw.decode("utf-8")
+        return self.prefixes.values[self.prefix_codes[index]] + raw.decode("utf-8")
+
+
+class TextBuffer(NamedTuple):
+    """A text column already in `_Text` layout, for `VariantStore.extend_columns`.
+
+    `data` is the rows' UTF-8 bytes back to back, `ends` each row's end offset
+    into it (native uint64 buffer) and `missing` a 0/1 byte per row. A URL
+    column also carries `prefixes`: (distinct directory prefixes, per-row index
+    as a native uint32 buffer), with `data` holding what follows each prefix.
+    """
+
+    data: bytes
+    ends: object
+    missing: bytes
+    prefixes: Optional[Tuple[Sequence[str], object]] = None
+
+    def values(self) -> List[Optional[str]]:
+        data = bytes(self.data)
+        ends = memoryview(self.ends).cast("B").cast("Q")
+        distinct, index = self.prefixes or ([""], bytes(4 * len(ends)))
+        rows = memoryview(index).cast("B").cast("I")
+        return [
+            None if self.missing[row] else distinct[rows[row]] + data[ends[row - 1] if row else 0 : ends[row]].decode("utf-8")
+            for row in range(len(ends))
+        ]
+
+
+def _field(name: str) -> property:
+    return property(lambda row: row._store.value(name, row._index), doc=f"VariantRecord.{name}")
+
+
+class VariantRow:
+    """Read-only view of one stored variant, shaped like `VariantRecord`."""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "VariantStore", index: int) -> None:
+        self._store = store
+        self._index = index
+
+    hex_code = property(lambda row: row._store.hex_code(row._index), doc="VariantRecord.hex_code")
+    brand = _field("brand")
+    product_line = _field("product_line")
+    shade_name = _field("shade_name")
+    shade_code = _field("shade_code")
+    collection = _field("collection")
+    finish = _field("finish")
+    product_url = _field("product_url")
+    swatch_url = _field("swatch_url")
+    source_catalog = _field("source_catalog")
+
+    key = VariantRecord.key
+
+    def values(self) -> Tuple[Optional[str], ...]:
+        return tuple(getattr(self, name) for name in RECORD_FIELDS)
+
+    def to_record(self) -> VariantRecord:
+        return VariantRecord(*self.values())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, VariantRow):
+            return self.values() == other.values()
+        if isinstance(other, VariantRecord):
+            return self.values() == astuple(other)
+        return NotImplemented
+
+    __hash__ = None  # mutable-record semantics, like the dataclass
+
+    def __repr__(self) -> str:
+        return f"VariantRow({', '.join(f'{name}={getattr(self, name)!r}' for name in RECORD_FIELDS)})"
+
+
+class VariantStore(Sequence[VariantRow]):
+    """Append-only column store of variant rows (see module docstring)."""
+
+    def __init__(self) -> None:
+        self.hexes = array("I")
+        self.columns: Dict[str, object] = {
+            **{name: _Categories() for name in CATEGORICAL_FIELDS},
+            **{name: _Text(prefixes=name in URL_FIELDS) for name in TEXT_FIELDS},
+        }
+
+    @classmethod
+    def from_records(cls, records: Iterable[VariantRecord]) -> "VariantStore":
+        store = cls()
+        store.extend(records)
+        return store
+
+    def append(self, record: VariantRecord) -> None:
+        self.extend((record,))
+
+    def extend_columns(
+        self,
+        hexes,
+        categories: Mapping[str, Tuple[Sequence[Optional[str]], object]],
+        texts: Mapping[str, Sequence[Optional[str]]],
+    ) -> None:
+        """Append rows that are already split into columns, without a record per row.
+
+        `hexes` is a native uint32 buffer (e.g. a NumPy array). A categorical
+        field is given as (distinct values, per-row index into them as a uint32
+        buffer), and a text field as its per-row values or a `TextBuffer`.
+        """
+        self.hexes.frombytes(memoryview(hexes).cast("B"))
+        for name in CATEGORICAL_FIELDS:
+            values, codes = categories[name]
+            self.columns[name].extend_coded(values, codes)
+        for name in TEXT_FIELDS:
+            self.columns[name].extend(texts[name])
+
+    def extend(self, records: Iterable[VariantRecord]) -> None:
+        hexes = self.hexes
+        columns = [(name, column.append) for name, column in self.columns.items()]
+        for record in records:
+            hexes.append(int(record.hex_code[1:], 16))
+            for name, append in columns:
+                append(getattr(record, name))
+
+    def __len__(self) -> int:
+        return len(self.hexes)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [VariantRow(self, position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("variant index out of range")
+        return VariantRow(self, index)
+
+    def __iter__(self) -> Iterator[VariantRow]:
+        return (VariantRow(self, index) for index in range(len(self)))
+
+    def hex_code(self, index: int) -> str:
+        return f"#{self.hexes[index]:06X}"
+
+    def value(self, name: str, index: int) -> Optional[str]:
+        return self.columns[name][index]
+
+    def column(self, name: str) -> List[Optional[str]]:
+        """Every row's value of one field (hex codes included), decoded in bulk."""
+        if name == "hex_code":
+            return [f"#{packed:06X}" for packed in self.hexes]
+        column = self.columns[name]
+        if isinstance(column, _Categories):
+            values = column.values
+            return [values[code] for code in column.codes]
+        return [column[index] for index in range(len(self))]
+
+    def hex_counts(self) -> Dict[str, int]:
+        counts: Dict[int, int] = {}
+        for packed in self.hexes:
+            counts[packed] = counts.get(packed, 0) + 1
+        return {f"#{packed:06X}": count for packed, count in counts.items()}
+
+    def remap_hexes(self, mapping: Mapping[str, str]) -> int:
+        """Rewrite hex codes in place (e.g. near-duplicate merges); returns rows changed."""
+        packed = {int(source[1:], 16): int(target[1:], 16) for source, target in mapping.items()}
+        changed = 0
+        hexes = self.hexes
+        for index, value in enumerate(hexes):
+            target = packed.get(value)
+            if target is not None:
+                hexes[index] = target
+                changed += 1
+        return changed
+
+    def _dedup_key(self, index: int) -> Tuple:
+        columns = self.columns
+        return (
+            columns["brand"].codes[index],
+            columns["product_line"].codes[index],
+            columns["shade_name"].raw(index),
+            columns["shade_code"].raw(index) or None,  # "" and None are the same key
+            self.hexes[index],
+        )
+
+    def deduplicate(self) -> "VariantStore":
+        """Drop repeated (brand, line, shade, code, hex) rows in place; first one wins.
+
+        Same result as `deduplicate()`, but only a hash per row is held while
+        scanning (full keys are compared on the rare hash collision), and the
+        columns are only rewritten when something was dropped.
+        """
+        first_by_hash: Dict[int, object] = {}
+        dropped = bytearray(len(self))
+        for index in range(len(self)):
+            key = self._dedup_key(index)
+            digest = hash(key)
+            previous = first_by_hash.get(digest)
+            if previous is None:
+                first_by_hash[digest] = index
+                continue
+            candidates = previous if isinstance(previous, list) else [previous]
+            if any(self._dedup_key(other) == key for other in candidates):
+                dropped[index] = 1
+            else:
+                first_by_hash[digest] = candidates + [index]
+        del first_by_hash
+        if any(dropped):
+            compacted = self.select(index for index in range(len(self)) if not dropped[index])
+            self.hexes, self.columns = compacted.hexes, compacted.columns
+        logging.info("Deduplicated to %d variant rows", len(self))
+        return self
+
+    def select(self, rows: Iterable[int]) -> "VariantStore":
+        """New store holding `rows` in the given order (categorical dictionaries are shared)."""
+        result = VariantStore()
+        for name, column in self.columns.items():
+            if isinstance(column, _Categories):
+                target = result.columns[name]
+                target.values, target.lookup = column.values, column.lookup
+        for index in rows:
+            result.hexes.append(self.hexes[index])
+            for name, column in self.columns.items():
+                target = result.columns[name]
+                if isinstance(column, _Categories):
+                    target.codes.append(column.codes[index])
+                else:
+                    target.append(column[index])
+        return result
+
+    def group_by_hex(self) -> "HexGroups":
+        return HexGroups(self)
+
+
+class HexGroups(Mapping[str, List[VariantRow]]):
+    """`map_hex_to_variants()` over a store: hex → its rows, in first-seen order.
+
+    Rows are bucketed once into a flat index array (counting sort by group) and
+    hexes are looked up by binary search over a sorted array, so nothing is
+    kept per hex beyond a few array slots; row views are built on access.
+    """
+
+    def __init__(self, store: VariantStore) -> None:
+        self.store = store
+        first_seen: Dict[int, int] = {}
+        group_of = array("I")
+        for packed in store.hexes:
+            group = first_seen.get(packed)
+            if group is None:
+                group = first_seen[packed] = len(first_seen)
+            group_of.append(group)
+        # Group g covers rows[starts[g]:starts[g + 1]], in row order
+        self.group_hexes = array("I", first_seen)
+        del first_seen
+        self.starts = array("Q", bytes(8 * (len(self.group_hexes) + 1)))
+        for group in group_of:
+            self.starts[group + 1] += 1
+        for group in range(len(self.group_hexes)):
+            self.starts[group + 1] += self.starts[group]
+        self.rows = array("I", bytes(4 * len(store)))
+        cursor = array("Q", self.starts[:-1])
+        for index, group in enumerate(group_of):
+            self.rows[cursor[group]] = index
+            cursor[group] += 1
+        by_hex = sorted(range(len(self.group_hexes)), key=self.group_hexes.__getitem__)
+        self.sorted_hexes = array("I", (self.group_hexes[group] for group in by_hex))
+        self.sorted_groups = array("I", by_hex)
+
+    def _group(self, hex_code: str) -> int:
+        try:
+            packed = int(hex_code[1:], 16)
+        except (ValueError, TypeError):
+            raise KeyError(hex_code) from None
+        position = bisect_left(self.sorted_hexes, packed)
+        if position == len(self.sorted_hexes) or self.sorted_hexes[position] != packed:
+            raise KeyError(hex_code)
+        return self.sorted_groups[position]
+
+    def __getitem__(self, hex_code: str) -> List[VariantRow]:
+        group = self._group(hex_code)
+        store, rows = self.store, self.rows
+        return [VariantRow(store, rows[position]) for position in range(self.starts[group], self.starts[group + 1])]
+
+    def __iter__(self) -> Iterator[str]:
+        return (f"#{packed:06X}" for packed in self.group_hexes)
+
+    def __len__(self) -> int:
+        return len(self.group_hexes)
+
+
+def synthetic_records(count: int, templates: Sequence[VariantRecord], seed: int = 7) -> Iterator[VariantRecord]:
+    """Records shaped like the scraped ones, with fresh string objects per row as csv yields."""
+    rng = random.Random(seed)
+    for index in range(count):
+        base = rng.choice(templates)
+        copy = lambda value: None if value is None else value.encode("utf-8").decode("utf-8")  # noqa: E731
+        yield VariantRecord(
+            hex_code=f"#{rng.randrange(1 << 24):06X}",
+            brand=copy(base.brand),
+            product_line=copy(base.product_line),
+            shade_name=f"{base.shade_name} {index}",
+            shade_code=None if base.shade_code is None else f"{base.shade_code}-{index}",
+            collection=copy(base.collection),
+            finish=copy(base.finish),
+            product_url=None if base.product_url is None else f"{base.product_url}?v={index}",
+            swatch_url=None if base.swatch_url is None else f"{base.swatch_url}?v={index}",
+            source_catalog=copy(base.source_catalog),
+        )
+
+
+def _measure(build) -> Tuple[float, int, int]:
+    """Seconds (untraced run), then retained and peak bytes (traced run)."""
+    gc.collect()
+    start = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return seconds, retained, peak
+
+
+def benchmark(count: int) -> None:
+    repo_root = Path(__file__).resolve().parents[1]
+    templates = [
+        record
+        for source in CATALOG_SOURCES.values()
+        for record in load_rows((repo_root / ".." / source.default_csv).resolve(), source)
+    ]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    def record_path():
+        return map_hex_to_variants(deduplicate(synthetic_records(count, templates)))
+
+    def store_path():
+        return VariantStore.from_records(synthetic_records(count, templates)).deduplicate().group_by_hex()
+
+    mapping, groups = record_path(), store_path()
+    identical = list(mapping) == list(groups) and all(mapping[hex_code] == groups[hex_code] for hex_code in mapping)
+    del mapping, groups
+
+    print(f"rows: {count:,}  (templates from the bundled CSVs: {len(templates)})")
+    for label, build in (("VariantRecord dict", record_path), ("VariantStore", store_path)):
+        seconds, retained, peak = _measure(build)
+        print(
+            f"  {label:<18} retained {retained / 2**20:7.1f} MiB ({retained / count:5.0f} B/row)  "
+            f"peak {peak / 2**20:7.1f} MiB  {seconds:6.2f}s"
+        )
+    print(f"  identical rows per hex: {identical}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare VariantStore memory with the record path")
+    parser.add_argument("--bench", type=int, default=1_000_000, help="Synthetic variant rows")
+    args = parser.parse_args(argv)
+    benchmark(args.bench)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Scrape CND Shellac and Vinylux shades from UK distributor storefronts."""
 
+import argparse
 import io
 import json
 import math
@@ -9,7 +10,7 @@ import sys
 import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import numpy as np
 import pandas as pd
@@ -17,11 +18,31 @@ import requests
 from PIL import Image
 from tenacity import retry, stop_after_attempt, wait_random
 
+# Run metrics, the swatch cache and the typed Parquet schema live with the sync
+sys.path.insert(0, str(Path(__file__).resolve().parent / "nail-app-mobile" / "scripts"))
+from run_metrics import phase, record_cache, record_retry, start_run, timed  # noqa: E402
+from swatch_assets import SwatchCache  # noqa: E402
+
 BASE_SHELLAC = "https://www.jklondon.com"
 BASE_VINYLUX = "https://lovecnd.com"
 SHELLAC_COLLECTION = "cnd-shellac"
 VINYLUX_COLLECTION = "colours"
 OUT_CSV = "cnd_full_uk_catalog.csv"
+OUT_PARQUET = "cnd_full_uk_catalog.parquet"
+CSV_FIELDS = ["Brand", "ProductType", "Collection", "ShadeName", "ShadeCode", "ProductURL", "SwatchImageURL", "ApproxHex"]
+# Downloaded swatches, reused for thumbnails and sprite sheets (nail-app-mobile/scripts/swatch_assets.py)
+SWATCH_CACHE = SwatchCache(Path(__file__).resolve().parent / "swatch_cache")
+# Catalogue schema field -> CSV header
+ARROW_COLUMNS = {
+    "hex": "ApproxHex",
+    "brand": "Brand",
+    "product_line": "ProductType",
+    "collection": "Collection",
+    "shade_name": "ShadeName",
+    "shade_code": "ShadeCode",
+    "product_url": "ProductURL",
+    "swatch_url": "SwatchImageURL",
+}
 ERROR_LOG = "errors.log"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_3) "
@@ -46,6 +67,7 @@ def log_error(message: str) -> None:
         fh.write(f"{message}\n")
 
 
+@timed
 def fetch_shopify_products(collection: str, base_url: str) -> List[dict]:
     products: List[dict] = []
     page = 1
@@ -114,14 +136,17 @@ def should_skip_vinylux(title: str, tags: Iterable[str]) -> bool:
     return False
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_random(min=1, max=4))
+@timed
+@retry(stop=stop_after_attempt(3), wait=wait_random(min=1, max=4), before_sleep=lambda _: record_retry("cnd_download"))
 def download_bytes(url: str) -> bytes:
     resp = requests.get(url, headers=HEADERS, timeout=60)
     resp.raise_for_status()
+    SWATCH_CACHE.put(url, resp.content)
     time.sleep(REQUEST_SLEEP)
     return resp.content
 
 
+@timed
 def average_hex(image_bytes: bytes) -> str:
     try:
         image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
@@ -194,14 +219,15 @@ def derive_category(tags: Iterable[str]) -> str:
     return ""
 
 
-def collect_rows(shades: Iterable[Shade]) -> List[Dict[str, str]]:
-    rows: List[Dict[str, str]] = []
+def iter_rows(shades: Iterable[Shade]) -> Iterator[Dict[str, str]]:
     cache: Dict[str, str] = {}
     for shade in shades:
         name = clean_shade_name(shade.title, shade.variant_title)
         collection = derive_collection(shade.tags)
         swatch_url = shade.image_url
         approx_hex = cache.get(swatch_url)
+        if swatch_url:
+            record_cache("swatch_hex", hit=approx_hex is not None)
         if swatch_url and approx_hex is None:
             try:
                 img_bytes = download_bytes(swatch_url)
@@ -210,19 +236,21 @@ def collect_rows(shades: Iterable[Shade]) -> List[Dict[str, str]]:
                 log_error(f"IMG_FAIL\t{swatch_url}\t{exc}")
                 approx_hex = ""
             cache[swatch_url] = approx_hex
-        rows.append(
-            {
-                "Brand": "CND",
-                "ProductType": shade.product_type,
-                "Collection": collection,
-                "ShadeName": name,
-                "ShadeCode": shade.sku,
-                "ProductURL": shade.product_url,
-                "SwatchImageURL": swatch_url,
-                "ApproxHex": approx_hex or "",
-            }
-        )
-    return rows
+        yield {
+            "Brand": "CND",
+            "ProductType": shade.product_type,
+            "Collection": collection,
+            "ShadeName": name,
+            "ShadeCode": shade.sku,
+            "ProductURL": shade.product_url,
+            "SwatchImageURL": swatch_url,
+            "ApproxHex": approx_hex or "",
+        }
+
+
+@timed
+def collect_rows(shades: Iterable[Shade]) -> List[Dict[str, str]]:
+    return list(iter_rows(shades))
 
 
 def derive_collection(tags: Iterable[str]) -> str:
@@ -235,42 +263,82 @@ def derive_collection(tags: Iterable[str]) -> str:
     return ""
 
 
-def deduplicate_rows(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def iter_unique(rows: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
     seen = set()
-    unique = []
     for row in rows:
         key = (row["Brand"], row["ProductType"], row["ShadeName"], row["ShadeCode"])
         if key in seen:
             continue
         seen.add(key)
-        unique.append(row)
-    return unique
+        yield row
+
+
+def deduplicate_rows(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return list(iter_unique(rows))
 
 
-def main() -> None:
+def fetch_shades() -> List[Shade]:
     shellac_products = fetch_shopify_products(SHELLAC_COLLECTION, BASE_SHELLAC)
     vinylux_products = fetch_shopify_products(VINYLUX_COLLECTION, BASE_VINYLUX)
 
     shellac_shades = build_shades_from_products(shellac_products, "Shellac", should_skip_shellac)
     vinylux_shades = build_shades_from_products(vinylux_products, "Vinylux", should_skip_vinylux)
+    return shellac_shades + vinylux_shades
+
+
+def stream_rows() -> Iterator[Dict[str, str]]:
+    """Unique catalogue rows, each yielded as soon as its swatch is averaged (`sync_color_catalog.py --stream`)."""
+    yield from iter_unique(iter_rows(fetch_shades()))
+
+
+def write_parquet(rows: List[Dict[str, str]]) -> int:
+    # Imported here so only --parquet needs pyarrow (nail-app-mobile/scripts/catalog_arrow.py)
+    from catalog_arrow import write_catalog
+
+    return write_catalog(rows, OUT_PARQUET, ARROW_COLUMNS, source_catalog="cnd_full_uk_catalog")
+
 
-    all_shades = shellac_shades + vinylux_shades
-    rows = collect_rows(all_shades)
-    # periodic save for resilience
-    for idx in range(100, len(rows) + 1, 100):
-        pd.DataFrame(rows[:idx]).to_csv(OUT_CSV, index=False)
+def main(trace: Optional[str] = None, profile: Optional[str] = None, parquet: bool = False) -> None:
+    with start_run("scrape_cnd_uk", trace=trace, profile=profile) as metrics:
+        rows = collect_rows(fetch_shades())
+        # periodic save for resilience
+        with phase("write_csv"):
+            for idx in range(100, len(rows) + 1, 100):
+                pd.DataFrame(rows[:idx]).to_csv(OUT_CSV, index=False)
 
-    final_rows = deduplicate_rows(rows)
-    df = pd.DataFrame(final_rows)
-    if df.empty:
-        print("No data collected; please verify sources.")
-        sys.exit(1)
-    df.to_csv(OUT_CSV, index=False)
-    print(f"DONE: {len(df)} rows → {OUT_CSV}")
+        final_rows = deduplicate_rows(rows)
+        df = pd.DataFrame(final_rows)
+        if df.empty:
+            print("No data collected; please verify sources.")
+            sys.exit(1)
+        with phase("write_csv"):
+            df.to_csv(OUT_CSV, index=False)
+        metrics.count("rows", len(final_rows))
+        outputs = f"{len(df)} rows → {OUT_CSV}"
+        if parquet:
+            outputs += f", {write_parquet(final_rows)} rows → {OUT_PARQUET}"
+        print(f"DONE: {outputs}")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write a Chrome trace of every request and stage to PATH (a directory gets <job>.trace.json)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="sample the run and write <job>.collapsed and <job>.hot.txt (PATH is a file or directory)",
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=f"also write typed Parquet to {OUT_PARQUET} (needs pyarrow)",
+    )
+    args = parser.parse_args()
     try:
-        main()
+        main(args.trace, args.profile, args.parquet)
     except KeyboardInterrupt:
         print("Interrupted")
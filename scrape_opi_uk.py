@@ -1,18 +1,26 @@
 #!/usr/bin/env python3
-"""Scrape OPI UK's catalogue and export CSV."""
+"""Scrape OPI UK's catalogue and export CSV (plus typed Parquet with --parquet)."""
 
+import argparse
 import csv
 import io
 import json
 import re
+import sys
 import time
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 import requests
 from PIL import Image
 
+# Run metrics, the swatch cache and the typed Parquet schema live with the sync
+sys.path.insert(0, str(Path(__file__).resolve().parent / "nail-app-mobile" / "scripts"))
+from run_metrics import record_retry, start_run, timed  # noqa: E402
+from swatch_assets import SwatchCache  # noqa: E402
+
 BASE_URL = "https://www.opi.com"
 GRAPHQL_URL = "https://opi-uki.myshopify.com/api/2025-01/graphql.json"
 STORE_TOKEN = "dbff532b0e769c89d13f6b2f626bc8cd"
@@ -23,6 +31,21 @@ HEADERS = {
     "X-Shopify-Storefront-Access-Token": STORE_TOKEN,
 }
 OUT_CSV = "opi_full_uk_catalog.csv"
+CSV_FIELDS = ["Brand", "ProductType", "ShadeCode", "ShadeName", "Collection", "ProductURL", "SwatchImageURL", "ApproxHex"]
+OUT_PARQUET = "opi_full_uk_catalog.parquet"
+# Downloaded swatches, reused for thumbnails and sprite sheets (nail-app-mobile/scripts/swatch_assets.py)
+SWATCH_CACHE = SwatchCache(Path(__file__).resolve().parent / "swatch_cache")
+# Catalogue schema field -> CSV header
+ARROW_COLUMNS = {
+    "hex": "ApproxHex",
+    "brand": "Brand",
+    "product_line": "ProductType",
+    "collection": "Collection",
+    "shade_name": "ShadeName",
+    "shade_code": "ShadeCode",
+    "product_url": "ProductURL",
+    "swatch_url": "SwatchImageURL",
+}
 PRODUCT_TYPES = {
     "Nail Lacquer": 'product_type:"Nail Lacquer"',
     "Infinite Shine": 'product_type:"Infinite Shine"',
@@ -50,6 +73,7 @@ class ShopifyClient:
         self.session = requests.Session()
         self.session.headers.update(HEADERS)
 
+    @timed
     def _post(self, query: str, variables: Dict) -> dict:
         for attempt in range(3):
             resp = self.session.post(GRAPHQL_URL, json={"query": query, "variables": variables}, timeout=60)
@@ -58,10 +82,13 @@ class ShopifyClient:
                 if "errors" in data:
                     raise RuntimeError(f"GraphQL error: {data['errors']}")
                 return data["data"]
+            if attempt < 2:
+                record_retry("opi_graphql")
             time.sleep(1 + attempt)
         resp.raise_for_status()
         raise RuntimeError("GraphQL request failed")
 
+    @timed
     def fetch_products(self, product_type: str, query_string: str) -> List[ProductRecord]:
         query = """
         query ProductsByType($first:Int!, $after:String, $query:String!) @inContext(country: GB, language: EN) {
@@ -158,11 +185,13 @@ def average_hex_from_url(url: str, session: requests.Session) -> str:
     try:
         resp = session.get(url, timeout=60)
         resp.raise_for_status()
+        SWATCH_CACHE.put(url, resp.content)
         return average_hex_from_image(resp.content)
     except Exception:
         return ""
 
 
+@timed
 def average_hex_from_image(image_bytes: bytes) -> str:
     try:
         image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
@@ -199,9 +228,7 @@ def clean_shade_name(title: str) -> str:
     return name.strip()
 
 
-def build_rows(records: Iterable[ProductRecord]) -> List[Dict[str, str]]:
-    session = requests.Session()
-    rows: List[Dict[str, str]] = []
+def iter_rows(records: Iterable[ProductRecord], session: requests.Session) -> Iterator[Dict[str, str]]:
     for record in records:
         shade_name = clean_shade_name(record.title)
         shade_code = record.sku or ""
@@ -212,53 +239,46 @@ def build_rows(records: Iterable[ProductRecord]) -> List[Dict[str, str]]:
             hex_hint = record.hex_hint.strip().lstrip("#")
             if re.fullmatch(r"[0-9A-Fa-f]{6}", hex_hint):
                 approx_hex = f"#{hex_hint.upper()}"
-        rows.append(
-            {
-                "Brand": "OPI",
-                "ProductType": record.product_type,
-                "ShadeCode": shade_code,
-                "ShadeName": shade_name,
-                "Collection": collection,
-                "ProductURL": product_url,
-                "SwatchImageURL": record.swatch_url,
-                "ApproxHex": approx_hex,
-            }
-        )
-    return rows
+        yield {
+            "Brand": "OPI",
+            "ProductType": record.product_type,
+            "ShadeCode": shade_code,
+            "ShadeName": shade_name,
+            "Collection": collection,
+            "ProductURL": product_url,
+            "SwatchImageURL": record.swatch_url,
+            "ApproxHex": approx_hex,
+        }
 
 
-def deduplicate(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+@timed
+def build_rows(records: Iterable[ProductRecord]) -> List[Dict[str, str]]:
+    return list(iter_rows(records, requests.Session()))
+
+
+def iter_unique(rows: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
     seen: set[Tuple[str, str, str]] = set()
-    unique_rows: List[Dict[str, str]] = []
     for row in rows:
         key = (row["ProductType"], row.get("ShadeCode", ""), row.get("ShadeName", ""))
         if key in seen:
             continue
         seen.add(key)
-        unique_rows.append(row)
-    return unique_rows
+        yield row
 
 
+def deduplicate(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return list(iter_unique(rows))
+
+
+@timed
 def write_csv(rows: List[Dict[str, str]]) -> None:
     with open(OUT_CSV, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(
-            fh,
-            fieldnames=[
-                "Brand",
-                "ProductType",
-                "ShadeCode",
-                "ShadeName",
-                "Collection",
-                "ProductURL",
-                "SwatchImageURL",
-                "ApproxHex",
-            ],
-        )
+        writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS)
         writer.writeheader()
         writer.writerows(rows)
 
 
-def main() -> None:
+def fetch_records() -> List[ProductRecord]:
     client = ShopifyClient()
     all_records: List[ProductRecord] = []
     for product_type, query_string in PRODUCT_TYPES.items():
@@ -269,11 +289,49 @@ def main() -> None:
         if not records and product_type == "GelColor":
             print("Warning: GelColor products not accessible via API; skipping.")
         all_records.extend(records)
-    rows = build_rows(all_records)
-    unique_rows = deduplicate(rows)
-    write_csv(unique_rows)
-    print(f"DONE: {len(unique_rows)} rows → {OUT_CSV}")
+    return all_records
+
+
+def stream_rows() -> Iterator[Dict[str, str]]:
+    """Unique catalogue rows, each yielded as soon as its swatch is averaged (`sync_color_catalog.py --stream`)."""
+    yield from iter_unique(iter_rows(fetch_records(), requests.Session()))
+
+
+def write_parquet(rows: List[Dict[str, str]]) -> int:
+    # Imported here so only --parquet needs pyarrow (nail-app-mobile/scripts/catalog_arrow.py)
+    from catalog_arrow import write_catalog
+
+    return write_catalog(rows, OUT_PARQUET, ARROW_COLUMNS, source_catalog="opi_full_uk_catalog")
+
+
+def main(trace: Optional[str] = None, profile: Optional[str] = None, parquet: bool = False) -> None:
+    with start_run("scrape_opi_uk", trace=trace, profile=profile) as metrics:
+        rows = build_rows(fetch_records())
+        unique_rows = deduplicate(rows)
+        write_csv(unique_rows)
+        metrics.count("rows", len(unique_rows))
+        outputs = f"{len(unique_rows)} rows → {OUT_CSV}"
+        if parquet:
+            outputs += f", {write_parquet(unique_rows)} rows → {OUT_PARQUET}"
+        print(f"DONE: {outputs}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write a Chrome trace of every request and stage to PATH (a directory gets <job>.trace.json)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="sample the run and write <job>.collapsed and <job>.hot.txt (PATH is a file or directory)",
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=f"also write typed Parquet to {OUT_PARQUET} (needs pyarrow)",
+    )
+    args = parser.parse_args()
+    main(args.trace, args.profile, args.parquet)
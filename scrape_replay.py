@@ -0,0 +1,727 @@
+#!/usr/bin/env python3
+"""Record scraper traffic into a fixture archive and replay it for offline benchmarks.
+
+The three scrapers reach the storefronts through `requests`. OPI sends Shopify
+Storefront GraphQL, CND pages Shopify `products.json`, and TGB pages Bloomreach.
+Each then downloads a swatch image per shade. This harness intercepts
+`HTTPAdapter.send`, so the scrapers run unmodified:
+
+- `--record ARCHIVE` runs the scrapers live (writing their usual outputs to the
+  current directory). It stores every successful API page and swatch image.
+- `--synthesize ARCHIVE` builds an archive from the bundled CSVs. It holds API
+  pages in each storefront's response shape, plus a solid-colour PNG per
+  swatch URL. Replaying it reproduces the bundled CSVs exactly, which
+  exercises the full pipeline when the storefronts are not reachable. The
+  images are smaller and cheaper to decode than the real ones.
+- `--serve ARCHIVE` starts the replay server on 127.0.0.1, and
+  `http://127.0.0.1:<port>/<scheme>/<host>/<path>` answers for the original URL.
+- `--bench ARCHIVE` runs the scrapers against the replay server, each in a
+  scratch directory. It reports wall time, CPU time (main thread), requests
+  and bytes per stage: `catalogue` (API pages), `swatches` (image download and
+  averaging), `write` (CSV/Parquet) and `other`.
+
+The archive is a zip of `index.jsonl` (one line per request) and
+content-addressed `blobs/<sha256>`. Requests are matched on method, URL with
+the query sorted, and body. GraphQL bodies are matched on their `variables`
+only, so rewording the query text keeps old recordings usable.
+
+The replay server adds `--latency-ms` per request, ±`--jitter-ms`, and answers
+a `--rate-limit` fraction of requests with 429 and `Retry-After`. It is seeded,
+so runs are reproducible and the scrapers' retry paths can be measured.
+Benchmarks zero the scrapers' politeness sleeps (`--polite` keeps them); retry
+back-off still applies.
+
+    python scrape_replay.py --synthesize fixtures/scrapers.zip
+    python scrape_replay.py --bench fixtures/scrapers.zip --latency-ms 80 --jitter-ms 40 --rate-limit 0.02
+"""
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import importlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    raise SystemExit("Missing dependency: pip install requests")
+
+ROOT = Path(__file__).resolve().parent
+INDEX_NAME = "index.jsonl"
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+@dataclass(frozen=True)
+class ScraperSpec:
+    module: str
+    out_csv: str
+    # Function (or Class.method) -> stage its time and requests are charged to
+    stages: Dict[str, str]
+    # Module-level politeness delays, zeroed unless --polite
+    politeness: Dict[str, float] = field(default_factory=dict)
+
+
+SCRAPERS: Dict[str, ScraperSpec] = {
+    "opi": ScraperSpec(
+        "scrape_opi_uk",
+        "opi_full_uk_catalog.csv",
+        {"ShopifyClient.fetch_products": "catalogue", "build_rows": "swatches", "write_csv": "write", "write_parquet": "write"},
+        {"SLEEP_SECONDS": 0.0},
+    ),
+    "cnd": ScraperSpec(
+        "scrape_cnd_uk",
+        "cnd_full_uk_catalog.csv",
+        {"fetch_shopify_products": "catalogue", "collect_rows": "swatches", "write_parquet": "write"},
+        {"REQUEST_SLEEP": 0.0},
+    ),
+    "tgb": ScraperSpec(
+        "scrape_tgb",
+        "tgb_full_catalog.csv",
+        {"collect_shades": "catalogue", "build_rows": "swatches", "write_parquet": "write"},
+    ),
+}
+STAGE_ORDER = ("catalogue", "swatches", "write", "other")
+
+
+def _as_bytes(body) -> bytes:
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+
+def request_key(method: str, url: str, body=None) -> str:
+    """Stable identity of a request: method, URL with sorted query, and a body digest."""
+    split = urlsplit(url)
+    key = f"{method.upper()} {split.scheme}://{split.netloc}{split.path}"
+    query = urlencode(sorted(parse_qsl(split.query, keep_blank_values=True)))
+    if query:
+        key += f"?{query}"
+    body = _as_bytes(body)
+    if body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and "variables" in payload:
+            payload = payload["variables"]
+        canonical = body if payload is None else json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        key += f" {hashlib.sha256(canonical).hexdigest()[:16]}"
+    return key
+
+
+class FixtureArchive:
+    """Recorded responses keyed by `request_key`; bodies are stored once per content hash."""
+
+    def __init__(self) -> None:
+        self.entries: Dict[str, dict] = {}
+        self.blobs: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, method: str, url: str, body, status: int, content_type: str, content: bytes) -> None:
+        digest = hashlib.sha256(content).hexdigest()
+        key = request_key(method, url, body)
+        with self._lock:
+            self.blobs.setdefault(digest, content)
+            self.entries[key] = {
+                "key": key,
+                "method": method.upper(),
+                "url": url,
+                "status": status,
+                "content_type": content_type,
+                "blob": digest,
+                "size": len(content),
+            }
+
+    def add_json(self, method: str, url: str, body, payload: object) -> None:
+        self.add(method, url, body, 200, "application/json; charset=utf-8", json.dumps(payload).encode("utf-8"))
+
+    def lookup(self, key: str) -> Optional[Tuple[dict, bytes]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry, self.blobs[entry["blob"]]
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        entries = sorted(self.entries.values(), key=lambda entry: entry["key"])
+        with zipfile.ZipFile(tmp, "w") as archive:
+            index = "".join(json.dumps(entry, sort_keys=True) + "\n" for entry in entries)
+            archive.writestr(zipfile.ZipInfo(INDEX_NAME, ZIP_EPOCH), index, compress_type=zipfile.ZIP_DEFLATED)
+            written = set()
+            for entry in entries:
+                digest = entry["blob"]
+                if digest in written:
+                    continue
+                written.add(digest)
+                # Images are already compressed
+                compression = zipfile.ZIP_STORED if entry["content_type"].startswith("image/") else zipfile.ZIP_DEFLATED
+                archive.writestr(zipfile.ZipInfo(f"blobs/{digest}", ZIP_EPOCH), self.blobs[digest], compress_type=compression)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FixtureArchive":
+        fixture = cls()
+        with zipfile.ZipFile(path) as archive:
+            for line in archive.read(INDEX_NAME).decode("utf-8").splitlines():
+                entry = json.loads(line)
+                fixture.entries[entry["key"]] = entry
+                if entry["blob"] not in fixture.blobs:
+                    fixture.blobs[entry["blob"]] = archive.read(f"blobs/{entry['blob']}")
+        return fixture
+
+
+@dataclass
+class ServerStats:
+    served: int = 0
+    throttled: int = 0
+    missed: int = 0
+    missed_urls: List[str] = field(default_factory=list)
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; Nagle + delayed ACK would add ~40ms to each
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        logging.debug("replay: " + format, *args)
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._handle()
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._handle()
+
+    def _handle(self) -> None:
+        replay = self.server.replay
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        url = replay.original_url(self.path)
+        delay, throttle = replay.plan()
+        if delay:
+            time.sleep(delay)
+        headers = {}
+        if throttle:
+            status, content_type, content = 429, "application/json", b'{"errors":"Throttled"}'
+            headers["Retry-After"] = str(replay.retry_after)
+        else:
+            found = replay.archive.lookup(request_key(self.command, url, body))
+            if found is None:
+                status, content_type = 404, "application/json"
+                content = json.dumps({"error": "not recorded", "url": url}).encode("utf-8")
+            else:
+                entry, content = found
+                status, content_type = entry["status"], entry["content_type"]
+        replay.count(url, throttle, status == 404 and not throttle)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    replay: "ReplayServer"
+
+
+class ReplayServer:
+    """Serves a `FixtureArchive` on 127.0.0.1 with latency, jitter and injected 429s."""
+
+    def __init__(self, archive: FixtureArchive, latency: float = 0.0, jitter: float = 0.0,
+                 rate_limit: float = 0.0, retry_after: int = 1, seed: int = 0, port: int = 0):
+        self.archive = archive
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.port = port
+        self.stats = ServerStats()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("ReplayServer is not running")
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def route(self, url: str) -> str:
+        """The replay URL answering for `url`."""
+        split = urlsplit(url)
+        routed = f"{self.url}/{split.scheme}/{split.netloc}{split.path or '/'}"
+        return f"{routed}?{split.query}" if split.query else routed
+
+    @staticmethod
+    def original_url(path: str) -> str:
+        scheme, _, rest = path.lstrip("/").partition("/")
+        return f"{scheme}://{rest}"
+
+    def plan(self) -> Tuple[float, bool]:
+        with self._lock:
+            delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            throttle = self.rate_limit > 0 and self._random.random() < self.rate_limit
+        return max(delay, 0.0), throttle
+
+    def count(self, url: str, throttled: bool, missed: bool) -> None:
+        with self._lock:
+            self.stats.served += 1
+            self.stats.throttled += throttled
+            if missed:
+                self.stats.missed += 1
+                self.stats.missed_urls.append(url)
+
+    def start(self) -> "ReplayServer":
+        self._server = _Server(("127.0.0.1", self.port), _ReplayHandler)
+        self._server.replay = self
+        threading.Thread(target=self._server.serve_forever, name="scrape-replay", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+@dataclass
+class StageStats:
+    seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    requests: int = 0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    rate_limited: int = 0
+    failed: int = 0
+
+
+class StageClock:
+    """Exclusive wall and CPU time per stage; requests are charged to the innermost stage."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self._stack: List[str] = []
+        self._mark = (time.perf_counter(), time.thread_time())
+
+    def _charge(self) -> None:
+        now = (time.perf_counter(), time.thread_time())
+        if self._stack:
+            stats = self.stages.setdefault(self._stack[-1], StageStats())
+            stats.seconds += now[0] - self._mark[0]
+            stats.cpu_seconds += now[1] - self._mark[1]
+        self._mark = now
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._charge()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._charge()
+            self._stack.pop()
+
+    def record_request(self, request_bytes: int, response_bytes: int, status: Optional[int]) -> None:
+        stats = self.stages.setdefault(self._stack[-1] if self._stack else "other", StageStats())
+        stats.requests += 1
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+        stats.rate_limited += status == 429
+        stats.failed += status is None or status >= 400
+
+    def total(self) -> StageStats:
+        return _sum_stages(self.stages.values())
+
+
+def _sum_stages(stages: Iterable[StageStats]) -> StageStats:
+    total = StageStats()
+    for stats in stages:
+        for name, value in asdict(stats).items():
+            setattr(total, name, getattr(total, name) + value)
+    return total
+
+
+# send(prepared_request, **adapter_overrides) -> Response
+Transport = Callable[[Callable[..., requests.Response], requests.PreparedRequest], requests.Response]
+
+
+def direct_transport(send, request):
+    return send(request)
+
+
+def record_transport(archive: FixtureArchive) -> Transport:
+    """Pass requests through to the network, keeping every answer that is not a throttle or server error."""
+
+    def transport(send, request):
+        response = send(request)
+        if response.status_code < 500 and response.status_code != 429:
+            archive.add(request.method, request.url, request.body, response.status_code,
+                        response.headers.get("Content-Type", ""), response.content)
+        return response
+
+    return transport
+
+
+def replay_transport(server: ReplayServer) -> Transport:
+    def transport(send, request):
+        request.url = server.route(request.url)
+        return send(request, proxies={})
+
+    return transport
+
+
+@contextlib.contextmanager
+def intercept(transport: Transport, clock: StageClock) -> Iterator[None]:
+    """Route every `requests` call through `transport` while the block runs."""
+    original = HTTPAdapter.send
+
+    def send(adapter, request, **kwargs):
+        request_bytes = len(request.url) + len(_as_bytes(request.body))
+
+        def forward(prepared, **overrides):
+            return original(adapter, prepared, **{**kwargs, **overrides})
+
+        try:
+            response = transport(forward, request)
+        except Exception:
+            clock.record_request(request_bytes, 0, None)
+            raise
+        clock.record_request(request_bytes, len(response.content), response.status_code)
+        return response
+
+    HTTPAdapter.send = send
+    try:
+        yield
+    finally:
+        HTTPAdapter.send = original
+
+
+@contextlib.contextmanager
+def instrument_scraper(module, spec: ScraperSpec, clock: StageClock, polite: bool = False) -> Iterator[None]:
+    patched = []
+
+    def wrap(stage: str, function: Callable) -> Callable:
+        def wrapper(*args, **kwargs):
+            with clock.stage(stage):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    for dotted, stage in spec.stages.items():
+        owner = module
+        *path, name = dotted.split(".")
+        for part in path:
+            owner = getattr(owner, part)
+        original = vars(owner)[name]
+        patched.append((owner, name, original))
+        setattr(owner, name, wrap(stage, original))
+    if not polite:
+        for name, value in spec.politeness.items():
+            patched.append((module, name, getattr(module, name)))
+            setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for owner, name, original in reversed(patched):
+            setattr(owner, name, original)
+
+
+@dataclass
+class ScraperRun:
+    name: str
+    seconds: float
+    rows: int
+    rows_without_hex: int
+    stages: Dict[str, StageStats]
+    error: str = ""
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "rows_without_hex": self.rows_without_hex,
+            "error": self.error,
+            "stages": {stage: asdict(stats) for stage, stats in self.stages.items()},
+        }
+
+
+def _count_rows(path: Path) -> Tuple[int, int]:
+    """Rows written, and how many of them lack a hex (a swatch that failed to download)."""
+    if not path.exists():
+        return 0, 0
+    rows = _read_csv(path)
+    return len(rows), sum(1 for row in rows if not row.get("ApproxHex"))
+
+
+def run_scraper(name: str, transport: Transport, workdir: Path, polite: bool = False,
+                trace: Optional[Path] = None, profile: Optional[Path] = None) -> ScraperRun:
+    """Run one scraper's `main()` in `workdir` with its traffic routed through `transport`.
+
+    With `trace` / `profile` (directories) the scraper also writes its Chrome
+    trace / sampling profile there.
+    """
+    spec = SCRAPERS[name]
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    module = importlib.import_module(spec.module)
+    clock = StageClock()
+    error = ""
+    previous = os.getcwd()
+    os.chdir(workdir)
+    start = time.perf_counter()
+    try:
+        with instrument_scraper(module, spec, clock, polite), intercept(transport, clock), \
+                contextlib.redirect_stdout(io.StringIO()) as output:
+            try:
+                with clock.stage("other"):
+                    module.main(*(f"{path.resolve()}/" if path else None for path in (trace, profile)))
+            except (Exception, SystemExit) as exc:
+                error = f"{type(exc).__name__}: {exc}"
+        logging.debug("%s output: %s", name, output.getvalue().strip())
+    finally:
+        seconds = time.perf_counter() - start
+        os.chdir(previous)
+    return ScraperRun(name, seconds, *_count_rows(Path(workdir) / spec.out_csv), clock.stages, error)
+
+
+def benchmark(archive: FixtureArchive, names: Sequence[str], *, latency: float = 0.0, jitter: float = 0.0,
+              rate_limit: float = 0.0, retry_after: int = 1, seed: int = 0,
+              polite: bool = False, trace: Optional[Path] = None,
+              profile: Optional[Path] = None) -> Tuple[List[ScraperRun], ServerStats]:
+    runs = []
+    with ReplayServer(archive, latency, jitter, rate_limit, retry_after, seed) as server:
+        for name in names:
+            with tempfile.TemporaryDirectory(prefix=f"replay-{name}-") as workdir:
+                runs.append(run_scraper(name, replay_transport(server), Path(workdir), polite, trace, profile))
+    return runs, server.stats
+
+
+def _read_csv(path: Path) -> List[Dict[str, str]]:
+    with path.open(newline="", encoding="utf-8") as fh:
+        return list(csv.DictReader(fh))
+
+
+def _prepared_url(url: str, params: Dict[str, object]) -> str:
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def _swatch_png(hex_code: str, size: int) -> bytes:
+    from PIL import Image
+
+    value = hex_code.lstrip("#")
+    rgb = tuple(int(value[i:i + 2], 16) for i in (0, 2, 4)) if len(value) == 6 else (128, 128, 128)
+    buffer = io.BytesIO()
+    # Lossless, so the scrapers' averaging gets the CSV hex back
+    Image.new("RGB", (size, size), rgb).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def synthesize_archive(root: Path = ROOT, image_size: int = 600) -> FixtureArchive:
+    """API pages and swatch images that reproduce the bundled CSVs through the scrapers."""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    opi = importlib.import_module("scrape_opi_uk")
+    cnd = importlib.import_module("scrape_cnd_uk")
+    tgb = importlib.import_module("scrape_tgb")
+    archive = FixtureArchive()
+    swatches: Dict[str, str] = {}
+
+    opi_rows = _read_csv(root / SCRAPERS["opi"].out_csv)
+    for product_type, query_string in opi.PRODUCT_TYPES.items():
+        nodes = [
+            {
+                "title": row["ShadeName"],
+                "handle": row["ProductURL"].rsplit("/", 1)[-1],
+                "productType": product_type,
+                "tags": [],
+                "availableForSale": True,
+                "sku": {"value": row["ShadeCode"]},
+                "colorCollection": {"value": row["Collection"]},
+                "hexCode": {"value": row["ApproxHex"].lstrip("#")},
+                "proOnly": None,
+                "media": {"edges": [{"node": {"image": {"url": row["SwatchImageURL"], "altText": row["ShadeName"]}}}]
+                          if row["SwatchImageURL"] else []},
+            }
+            for row in opi_rows
+            if row["ProductType"] == product_type
+        ]
+        after = None
+        for offset in range(0, max(len(nodes), 1), 50):
+            cursor = f"{product_type}:{offset + 50}"
+            has_next = offset + 50 < len(nodes)
+            body = json.dumps({"query": "", "variables": {"first": 50, "after": after, "query": query_string}})
+            page = {"products": {"pageInfo": {"hasNextPage": has_next, "endCursor": cursor if has_next else None},
+                                 "edges": [{"node": node} for node in nodes[offset:offset + 50]]}}
+            archive.add_json("POST", opi.GRAPHQL_URL, body, {"data": page})
+            after = cursor
+        swatches.update((row["SwatchImageURL"], row["ApproxHex"]) for row in opi_rows if row["SwatchImageURL"])
+
+    cnd_rows = _read_csv(root / SCRAPERS["cnd"].out_csv)
+    for product_type, base_url, collection in (
+        ("Shellac", cnd.BASE_SHELLAC, cnd.SHELLAC_COLLECTION),
+        ("Vinylux", cnd.BASE_VINYLUX, cnd.VINYLUX_COLLECTION),
+    ):
+        products = [
+            {
+                "title": row["ShadeName"],
+                "product_type": product_type,
+                "handle": row["ProductURL"].rsplit("/", 1)[-1],
+                "tags": [row["Collection"]] if row["Collection"] else [],
+                "variants": [{"sku": row["ShadeCode"], "title": "Default Title",
+                              "featured_image": {"src": row["SwatchImageURL"]} if row["SwatchImageURL"] else None}],
+                "images": [],
+            }
+            for row in cnd_rows
+            if row["ProductType"] == product_type
+        ]
+        url = f"{base_url}/collections/{collection}/products.json"
+        pages = [products[offset:offset + 250] for offset in range(0, len(products), 250)] + [[]]
+        for number, page in enumerate(pages, start=1):
+            archive.add_json("GET", _prepared_url(url, {"limit": 250, "page": number}), None, {"products": page})
+        swatches.update((row["SwatchImageURL"], row["ApproxHex"]) for row in cnd_rows if row["SwatchImageURL"])
+
+    tgb_rows = _read_csv(root / SCRAPERS["tgb"].out_csv)
+    for product_type, category_q in tgb.CATEGORY_QUERIES.items():
+        docs = [
+            {
+                "pid": str(index),
+                "title": row["Shade Name"],
+                "url": row["ProductURL"][len(tgb.BASE_URL):],
+                "price": 14.95,
+                "thumb_image": row["SwatchURL"],
+                "pro_only": False,
+                "sku": f"TGB-{index:05d}",
+                "texture": [] if row["Category"] == "Standard" else row["Category"].split(", "),
+            }
+            for index, row in enumerate(tgb_rows)
+            if row["Product Type"] == product_type
+        ]
+        for start in range(0, max(len(docs), 1), 200):
+            params = {**tgb.ACCOUNT_PARAMS, "rows": 200, "start": start, "q": category_q, "fl": tgb.FIELDS}
+            page = {"response": {"numFound": len(docs), "start": start, "docs": docs[start:start + 200]}}
+            archive.add_json("GET", _prepared_url(tgb.API_URL, params), None, page)
+        swatches.update((row["SwatchURL"], row["ApproxHex"]) for row in tgb_rows if row["SwatchURL"])
+
+    for url, hex_code in swatches.items():
+        archive.add("GET", url, None, 200, "image/png", _swatch_png(hex_code, image_size))
+    return archive
+
+
+def print_runs(runs: Sequence[ScraperRun], server: Optional[ServerStats] = None) -> None:
+    for run in runs:
+        status = f"FAILED ({run.error})" if run.error else "ok"
+        print(f"{run.name}: {run.rows:,} rows ({run.rows_without_hex:,} without hex) in {run.seconds:.2f}s, {status}")
+        print(f"  {'stage':<10} {'wall s':>8} {'cpu s':>8} {'requests':>9} {'sent KiB':>9} {'recv KiB':>10} {'429s':>5} {'failed':>6}")
+        ordered = [stage for stage in STAGE_ORDER if stage in run.stages] + sorted(set(run.stages) - set(STAGE_ORDER))
+        for stage, stats in [(stage, run.stages[stage]) for stage in ordered] + [("total", _sum_stages(run.stages.values()))]:
+            print(
+                f"  {stage:<10} {stats.seconds:>8.2f} {stats.cpu_seconds:>8.2f} {stats.requests:>9,} "
+                f"{stats.request_bytes / 1024:>9,.1f} {stats.response_bytes / 1024:>10,.1f} "
+                f"{stats.rate_limited:>5,} {stats.failed:>6,}"
+            )
+    if server is not None:
+        print(f"replay server: {server.served:,} responses, {server.throttled:,} throttled, {server.missed:,} not recorded")
+        for url in server.missed_urls[:10]:
+            print(f"  not recorded: {url}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Record, replay and benchmark the scrapers offline")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--record", type=Path, metavar="ARCHIVE", help="Scrape live and save the traffic")
+    action.add_argument("--synthesize", type=Path, metavar="ARCHIVE", help="Build an archive from the bundled CSVs")
+    action.add_argument("--serve", type=Path, metavar="ARCHIVE", help="Serve an archive until interrupted")
+    action.add_argument("--bench", type=Path, metavar="ARCHIVE", help="Benchmark the scrapers against an archive")
+    parser.add_argument("--scrapers", nargs="+", choices=sorted(SCRAPERS), default=list(SCRAPERS))
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every replayed response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform ± variation on the delay")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--polite", action="store_true", help="Keep the scrapers' politeness sleeps when benchmarking")
+    parser.add_argument("--image-size", type=int, default=600, help="Synthesized swatch edge in pixels")
+    parser.add_argument("--json", type=Path, help="Write the benchmark or recording stats as JSON")
+    parser.add_argument("--trace", type=Path, metavar="DIR", help="Write each scraper's Chrome trace into DIR")
+    parser.add_argument("--profile", type=Path, metavar="DIR", help="Write each scraper's sampling profile into DIR")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level), format="[%(levelname)s] %(message)s")
+
+    if args.synthesize:
+        archive = synthesize_archive(image_size=args.image_size)
+        archive.save(args.synthesize)
+        print(f"{len(archive):,} responses ({len(archive.blobs):,} distinct bodies) → {args.synthesize}")
+        return 0
+
+    if args.record:
+        archive = FixtureArchive()
+        runs = []
+        try:
+            for name in args.scrapers:
+                runs.append(run_scraper(name, record_transport(archive), Path.cwd(), polite=True, trace=args.trace,
+                                        profile=args.profile))
+        finally:
+            archive.save(args.record)
+        print_runs(runs)
+        print(f"{len(archive):,} responses ({len(archive.blobs):,} distinct bodies) → {args.record}")
+        if args.json:
+            args.json.write_text(json.dumps({"runs": [run.as_dict() for run in runs]}, indent=2), encoding="utf-8")
+        return 1 if any(run.error for run in runs) else 0
+
+    archive = FixtureArchive.load(args.serve or args.bench)
+    options = dict(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, rate_limit=args.rate_limit,
+                   retry_after=args.retry_after, seed=args.seed)
+    if args.serve:
+        with ReplayServer(archive, port=args.port, **options) as server:
+            print(f"Replaying {len(archive):,} responses at {server.url}/<scheme>/<host>/<path>")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+        return 0
+
+    runs, server = benchmark(archive, args.scrapers, polite=args.polite, trace=args.trace,
+                             profile=args.profile, **options)
+    print_runs(runs, server)
+    if args.json:
+        payload = {"options": {**options, "polite": args.polite}, "runs": [run.as_dict() for run in runs],
+                   "server": asdict(server)}
+        args.json.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return 1 if any(run.error for run in runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,26 @@
 #!/usr/bin/env python3
 """Scrape The GelBottle Inc. gel colours and BIAB shades."""
 
+import argparse
 import csv
 import html
 import io
 import math
+import sys
 from collections import Counter
 from dataclasses import dataclass
+from pathlib import Path
 from typing import Dict, Iterable, Iterator, List, Optional
 
 import numpy as np
 import requests
 from PIL import Image
 
+# Run metrics, the swatch cache and the typed Parquet schema live with the sync
+sys.path.insert(0, str(Path(__file__).resolve().parent / "nail-app-mobile" / "scripts"))
+from run_metrics import phase, record_cache, start_run, timed  # noqa: E402
+from swatch_assets import SwatchCache  # noqa: E402
+
 BASE_URL = "https://thegelbottle.com"
 API_URL = "https://core.dxpapi.com/api/v1/core/"
 ACCOUNT_PARAMS = {
@@ -28,6 +36,21 @@ ACCOUNT_PARAMS = {
 }
 FIELDS = "pid,title,url,price,thumb_image,pro_only,sku,texture"
 OUT_CSV = "tgb_full_catalog.csv"
+OUT_PARQUET = "tgb_full_catalog.parquet"
+CSV_FIELDS = ["Brand", "Product Type", "Collection", "Category", "Shade Name", "ApproxHex", "ProductURL", "SwatchURL"]
+# Downloaded swatches, reused for thumbnails and sprite sheets (nail-app-mobile/scripts/swatch_assets.py)
+SWATCH_CACHE = SwatchCache(Path(__file__).resolve().parent / "swatch_cache")
+# Catalogue schema field -> CSV header
+ARROW_COLUMNS = {
+    "hex": "ApproxHex",
+    "brand": "Brand",
+    "product_line": "Product Type",
+    "collection": "Collection",
+    "finish": "Category",
+    "shade_name": "Shade Name",
+    "product_url": "ProductURL",
+    "swatch_url": "SwatchURL",
+}
 
 CATEGORY_QUERIES = {
     "GelColor": "217",
@@ -49,6 +72,7 @@ class Shade:
     textures: List[str]
 
 
+@timed
 def fetch_docs(session: requests.Session, category_q: str) -> Iterator[dict]:
     start = 0
     rows = 200
@@ -121,11 +145,13 @@ def average_hex_from_image_url(url: str, session: requests.Session) -> str:
     try:
         resp = session.get(url, timeout=60)
         resp.raise_for_status()
+        SWATCH_CACHE.put(url, resp.content)
         return average_hex(resp.content)
     except Exception:
         return ""
 
 
+@timed
 def average_hex(image_bytes: bytes) -> str:
     try:
         image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
@@ -148,6 +174,7 @@ def average_hex(image_bytes: bytes) -> str:
         return ""
 
 
+@timed
 def collect_shades(product_type: str, category_q: str, session: requests.Session) -> List[Shade]:
     shades: List[Shade] = []
     for doc in fetch_docs(session, category_q):
@@ -177,70 +204,100 @@ def collect_shades(product_type: str, category_q: str, session: requests.Session
     return shades
 
 
-def build_rows(shades: Iterable[Shade], session: requests.Session) -> List[Dict[str, str]]:
+def iter_rows(shades: Iterable[Shade], session: requests.Session) -> Iterator[Dict[str, str]]:
     cache: Dict[str, str] = {}
-    rows: List[Dict[str, str]] = []
     for shade in shades:
         swatch_url = shade.image_url
         approx_hex = cache.get(swatch_url)
+        record_cache("swatch_hex", hit=approx_hex is not None)
         if approx_hex is None:
             approx_hex = average_hex_from_image_url(swatch_url, session)
             cache[swatch_url] = approx_hex
         categories = [t for t in shade.textures if t.lower() not in {"gelbottle", "colour", "color"}]
         if not categories:
             categories = ["Standard"]
-        rows.append(
-            {
-                "Brand": "The GelBottle Inc.",
-                "Product Type": shade.product_type,
-                "Collection": shade.collection,
-                "Category": ", ".join(categories),
-                "Shade Name": shade.title,
-                "ApproxHex": approx_hex,
-                "ProductURL": f"{BASE_URL}{shade.url_path}",
-                "SwatchURL": swatch_url,
-            }
-        )
-    return rows
+        yield {
+            "Brand": "The GelBottle Inc.",
+            "Product Type": shade.product_type,
+            "Collection": shade.collection,
+            "Category": ", ".join(categories),
+            "Shade Name": shade.title,
+            "ApproxHex": approx_hex,
+            "ProductURL": f"{BASE_URL}{shade.url_path}",
+            "SwatchURL": swatch_url,
+        }
 
 
-def deduplicate(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+@timed
+def build_rows(shades: Iterable[Shade], session: requests.Session) -> List[Dict[str, str]]:
+    return list(iter_rows(shades, session))
+
+
+def iter_unique(rows: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
     seen = set()
-    unique: List[Dict[str, str]] = []
     for row in rows:
         key = (row["Product Type"], row["Shade Name"], row["ProductURL"])
         if key in seen:
             continue
         seen.add(key)
-        unique.append(row)
-    return unique
+        yield row
 
 
-def main() -> None:
-    session = requests.Session()
+def deduplicate(rows: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return list(iter_unique(rows))
+
+
+def fetch_shades(session: requests.Session) -> List[Shade]:
     gel_shades = collect_shades("GelColor", CATEGORY_QUERIES["GelColor"], session)
     biab_shades = collect_shades("BIAB", CATEGORY_QUERIES["BIAB"], session)
-    all_shades = gel_shades + biab_shades
-    rows = build_rows(all_shades, session)
-    unique_rows = deduplicate(rows)
-    with open(OUT_CSV, "w", newline="", encoding="utf-8") as fh:
-        writer = csv.DictWriter(
-            fh,
-            fieldnames=[
-                "Brand",
-                "Product Type",
-                "Collection",
-                "Category",
-                "Shade Name",
-                "ApproxHex",
-                "ProductURL",
-                "SwatchURL",
-            ],
-        )
-        writer.writeheader()
-        writer.writerows(unique_rows)
-    print(f"DONE: {len(unique_rows)} rows → {OUT_CSV}")
+    return gel_shades + biab_shades
+
+
+def stream_rows() -> Iterator[Dict[str, str]]:
+    """Unique catalogue rows, each yielded as soon as its swatch is averaged (`sync_color_catalog.py --stream`)."""
+    session = requests.Session()
+    yield from iter_unique(iter_rows(fetch_shades(session), session))
+
+
+def write_parquet(rows: List[Dict[str, str]]) -> int:
+    # Imported here so only --parquet needs pyarrow (nail-app-mobile/scripts/catalog_arrow.py)
+    from catalog_arrow import write_catalog
+
+    return write_catalog(rows, OUT_PARQUET, ARROW_COLUMNS, source_catalog="tgb_full_catalog")
+
+
+def main(trace: Optional[str] = None, profile: Optional[str] = None, parquet: bool = False) -> None:
+    with start_run("scrape_tgb", trace=trace, profile=profile) as metrics:
+        session = requests.Session()
+        rows = build_rows(fetch_shades(session), session)
+        unique_rows = deduplicate(rows)
+        with phase("write_csv"), open(OUT_CSV, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(unique_rows)
+        metrics.count("rows", len(unique_rows))
+        outputs = f"{len(unique_rows)} rows → {OUT_CSV}"
+        if parquet:
+            outputs += f", {write_parquet(unique_rows)} rows → {OUT_PARQUET}"
+        print(f"DONE: {outputs}")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="write a Chrome trace of every request and stage to PATH (a directory gets <job>.trace.json)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="sample the run and write <job>.collapsed and <job>.hot.txt (PATH is a file or directory)",
+    )
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help=f"also write typed Parquet to {OUT_PARQUET} (needs pyarrow)",
+    )
+    args = parser.parse_args()
+    main(args.trace, args.profile, args.parquet)
@@ -0,0 +1,219 @@
+-- ============================================================================
+-- Server-side catalogue merge
+-- File: 41_merge_color_catalog.sql
+-- Purpose:
+--   - Merge a chunk of the deduplicated variant catalogue into `colors` and
+--     `color_variants` in a single RPC call (used by `--backend rpc` in
+--     nail-app-mobile/scripts/sync_color_catalog.py)
+--   - Return summary counts so the client can report the sync without
+--     re-reading the tables, plus the hexes it inserted or backfilled (for the
+--     scoped refresh_hex_categorization(TEXT[]) in 43)
+-- Prereq: 40_color_variants.sql
+--
+-- Payload layout (columnar; one array entry per variant, in ingest order):
+--   {
+--     "hex_code":     ["#AABBCC", ...],
+--     "shade_name":   [...],
+--     "shade_code":   [... or null],
+--     "product_url":  [... or null],
+--     "swatch_url":   [... or null],
+--     "brand":          {"values": ["OPI", ...], "codes": [0, 0, ...]},
+--     "product_line":   {"values": [...], "codes": [...]},
+--     "finish":         {"values": [...], "codes": [...]},
+--     "source_catalog": {"values": [...], "codes": [...]},
+--     "collection":     {"values": [...], "codes": [... or null]}
+--   }
+-- Low-cardinality columns are dictionary encoded to keep request bodies small.
+-- All variants of one hex must travel in the same chunk: the first variant of
+-- each hex becomes the colour's primary variant.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION merge_color_catalog(
+  p_payload JSONB,
+  p_overwrite_primary BOOLEAN DEFAULT FALSE
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_staged INT;
+  v_colors_inserted INT;
+  v_colors_updated INT;
+  v_variants_upserted INT;
+  v_variants_inserted INT;
+  v_primaries_updated INT;
+  v_inserted_hexes TEXT[];
+  v_updated_hexes TEXT[];
+BEGIN
+  CREATE TEMP TABLE IF NOT EXISTS merge_color_catalog_stage (
+    ord INT NOT NULL,
+    hex_code TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    product_line TEXT NOT NULL,
+    shade_name TEXT NOT NULL,
+    shade_code TEXT,
+    collection TEXT,
+    finish TEXT NOT NULL,
+    product_url TEXT,
+    swatch_url TEXT,
+    source_catalog TEXT NOT NULL
+  ) ON COMMIT DROP;
+  TRUNCATE merge_color_catalog_stage;
+
+  -- 1) Decode the columnar payload
+  INSERT INTO merge_color_catalog_stage (
+    ord, hex_code, brand, product_line, shade_name, shade_code, collection,
+    finish, product_url, swatch_url, source_catalog
+  )
+  SELECT
+    t.ord,
+    upper(t.hex_code),
+    p_payload -> 'brand' -> 'values' ->> t.brand_code,
+    p_payload -> 'product_line' -> 'values' ->> t.product_line_code,
+    t.shade_name,
+    NULLIF(t.shade_code, ''),
+    p_payload -> 'collection' -> 'values' ->> t.collection_code,
+    p_payload -> 'finish' -> 'values' ->> t.finish_code,
+    t.product_url,
+    t.swatch_url,
+    p_payload -> 'source_catalog' -> 'values' ->> t.source_catalog_code
+  FROM unnest(
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'hex_code')),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'shade_name')),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'shade_code')),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'product_url')),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'swatch_url')),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'brand' -> 'codes')::INT),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'product_line' -> 'codes')::INT),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'finish' -> 'codes')::INT),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'source_catalog' -> 'codes')::INT),
+    ARRAY(SELECT jsonb_array_elements_text(p_payload -> 'collection' -> 'codes')::INT)
+  ) WITH ORDINALITY AS t(
+    hex_code, shade_name, shade_code, product_url, swatch_url,
+    brand_code, product_line_code, finish_code, source_catalog_code, collection_code,
+    ord
+  );
+  GET DIAGNOSTICS v_staged = ROW_COUNT;
+
+  -- 2) New colours (first variant per hex provides name/brand/finish)
+  WITH inserted AS (
+    INSERT INTO colors (
+      hex_code, name, brand, category, finish, trending_score, season, mood_tags, source_priority
+    )
+    SELECT
+      p.hex_code,
+      p.shade_name,
+      p.brand,
+      'trending',  -- recategorised by refresh_hex_categorization after the sync
+      p.finish,
+      0,
+      '{}',
+      '{}',
+      p.source_catalog
+    FROM (
+      SELECT DISTINCT ON (hex_code) *
+      FROM merge_color_catalog_stage
+      ORDER BY hex_code, ord
+    ) p
+    ON CONFLICT (hex_code) DO NOTHING
+    RETURNING hex_code
+  )
+  SELECT count(*), array_agg(hex_code) INTO v_colors_inserted, v_inserted_hexes FROM inserted;
+
+  -- 3) Backfill blank metadata on existing colours
+  WITH updated AS (
+    UPDATE colors c
+    SET brand = COALESCE(NULLIF(c.brand, ''), p.brand),
+        finish = COALESCE(c.finish, p.finish),
+        source_priority = COALESCE(NULLIF(c.source_priority, ''), p.source_catalog)
+    FROM (
+      SELECT DISTINCT ON (hex_code) *
+      FROM merge_color_catalog_stage
+      ORDER BY hex_code, ord
+    ) p
+    WHERE c.hex_code = p.hex_code
+      AND (
+        c.brand IS NULL OR c.brand = '' OR
+        c.finish IS NULL OR
+        c.source_priority IS NULL OR c.source_priority = ''
+      )
+    RETURNING c.hex_code
+  )
+  SELECT count(*), array_agg(hex_code) INTO v_colors_updated, v_updated_hexes FROM updated;
+
+  -- 4) Upsert variants against the color_variants_unique constraint
+  WITH merged AS (
+    INSERT INTO color_variants (
+      color_id, brand, product_line, shade_name, shade_code, collection,
+      finish_override, product_url, swatch_url, source_catalog, is_active
+    )
+    SELECT DISTINCT ON (c.id, s.brand, s.product_line, s.shade_name, s.shade_code)
+      c.id,
+      s.brand,
+      s.product_line,
+      s.shade_name,
+      s.shade_code,
+      s.collection,
+      NULLIF(s.finish, c.finish),
+      s.product_url,
+      s.swatch_url,
+      s.source_catalog,
+      TRUE
+    FROM merge_color_catalog_stage s
+    JOIN colors c ON c.hex_code = s.hex_code
+    ORDER BY c.id, s.brand, s.product_line, s.shade_name, s.shade_code, s.ord
+    ON CONFLICT ON CONSTRAINT color_variants_unique DO UPDATE
+    SET collection = EXCLUDED.collection,
+        finish_override = EXCLUDED.finish_override,
+        product_url = EXCLUDED.product_url,
+        swatch_url = EXCLUDED.swatch_url,
+        source_catalog = EXCLUDED.source_catalog,
+        is_active = TRUE
+    RETURNING (xmax = 0) AS inserted
+  )
+  SELECT count(*), count(*) FILTER (WHERE inserted)
+  INTO v_variants_upserted, v_variants_inserted
+  FROM merged;
+
+  -- 5) Primary variant pointers
+  UPDATE colors c
+  SET primary_variant_id = v.variant_id
+  FROM (
+    SELECT DISTINCT ON (s.hex_code) s.hex_code, cv.id AS variant_id
+    FROM merge_color_catalog_stage s
+    JOIN colors base ON base.hex_code = s.hex_code
+    JOIN color_variants cv
+      ON cv.color_id = base.id
+     AND cv.brand = s.brand
+     AND cv.product_line = s.product_line
+     AND cv.shade_name = s.shade_name
+     AND cv.shade_code IS NOT DISTINCT FROM s.shade_code
+    ORDER BY s.hex_code, s.ord
+  ) v
+  WHERE c.hex_code = v.hex_code
+    AND (p_overwrite_primary OR c.primary_variant_id IS NULL)
+    AND c.primary_variant_id IS DISTINCT FROM v.variant_id;
+  GET DIAGNOSTICS v_primaries_updated = ROW_COUNT;
+
+  RETURN jsonb_build_object(
+    'staged', v_staged,
+    'colors_inserted', v_colors_inserted,
+    'colors_updated', v_colors_updated,
+    'variants_upserted', v_variants_upserted,
+    'variants_inserted', v_variants_inserted,
+    'primaries_updated', v_primaries_updated,
+    'hex_codes', to_jsonb(COALESCE(v_inserted_hexes, '{}') || COALESCE(v_updated_hexes, '{}'))
+  );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION merge_color_catalog(JSONB, BOOLEAN) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION merge_color_catalog(JSONB, BOOLEAN) TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'merge_color_catalog() installed.';
+END;
+$notice$;
@@ -0,0 +1,208 @@
+-- ============================================================================
+-- Deterministic hex categorisation (BEHAVIOUR CHANGE)
+-- File: 42_hex_categorization_rules.sql
+-- Purpose:
+--   - Redefine refresh_hex_categorization() so the refinements from
+--     33_refine_hex_rules.sql and 34_french_rgb_distance.sql actually apply.
+--     In 40 they are data-modifying CTEs that Postgres runs after the final
+--     display_order UPDATE has already touched every row, so they never land.
+--   - Evaluate the rules in one pass (base rules → 33 refinements → 34
+--     distance-to-white) and only write rows whose values change. The rules
+--     live in one IMMUTABLE function, categorize_hex(hex), which the scoped
+--     refresh in 43 calls too
+--   - Store hue/saturation/lightness rounded to 9 decimals and break
+--     display_order ties by hex_code so the ordering is reproducible
+--     (mirrored client-side by nail-app-mobile/scripts/hex_categorization.py)
+-- Prereq: 40_color_variants.sql
+--
+-- This changes live data. Running the file recategorises every colour under
+-- the refined rules (light, low-chroma shades move into french/pastels/nudes,
+-- vivid ones back into their hue family) and renumbers display_order in every
+-- category, including ties that used to come out in arbitrary order. Review
+-- the result before running it in production:
+--   SELECT category, count(*) FROM colors GROUP BY 1 ORDER BY 1;
+--
+-- Notes:
+--   - Metallic hexes stay 'metallics'; none of the refinements override them
+--   - Chroma is taken straight from the RGB bytes ((max - min) / 255), which is
+--     what 33 derived from saturation/lightness, minus the rounding
+--   - The client-side write path, apply_hex_categories(), is separate:
+--     46_apply_hex_categories.sql
+-- ============================================================================
+
+-- Chroma in [0, 1] from a '#RRGGBB' hex code
+CREATE OR REPLACE FUNCTION hex_chroma(p_hex TEXT)
+RETURNS NUMERIC
+LANGUAGE sql
+IMMUTABLE
+STRICT
+AS $$
+  SELECT (
+    GREATEST(
+      get_byte(decode(substr(p_hex, 2), 'hex'), 0),
+      get_byte(decode(substr(p_hex, 2), 'hex'), 1),
+      get_byte(decode(substr(p_hex, 2), 'hex'), 2)
+    ) - LEAST(
+      get_byte(decode(substr(p_hex, 2), 'hex'), 0),
+      get_byte(decode(substr(p_hex, 2), 'hex'), 1),
+      get_byte(decode(substr(p_hex, 2), 'hex'), 2)
+    )
+  ) / 255.0;
+$$;
+
+-- Normalised RGB distance from white (34_french_rgb_distance.sql)
+CREATE OR REPLACE FUNCTION hex_white_distance(p_hex TEXT)
+RETURNS DOUBLE PRECISION
+LANGUAGE sql
+IMMUTABLE
+STRICT
+AS $$
+  SELECT sqrt(
+    (255 - get_byte(decode(substr(p_hex, 2), 'hex'), 0))^2 +
+    (255 - get_byte(decode(substr(p_hex, 2), 'hex'), 1))^2 +
+    (255 - get_byte(decode(substr(p_hex, 2), 'hex'), 2))^2
+  ) / 441.67295593;
+$$;
+
+-- HSL (rounded to 9 decimals so equal colours compare equal; float noise
+-- otherwise splits e.g. (230 + 229) / 510 from (255 + 204) / 510) and category
+-- of one '#RRGGBB' hex code. The only copy of the rules: both the full and the
+-- scoped refresh_hex_categorization() (43) call it. plpgsql so each step is
+-- computed once per hex (an inlined SQL body repeats every expression).
+CREATE OR REPLACE FUNCTION categorize_hex(
+  p_hex TEXT,
+  OUT hue NUMERIC,
+  OUT saturation NUMERIC,
+  OUT lightness NUMERIC,
+  OUT category TEXT
+)
+LANGUAGE plpgsql
+IMMUTABLE
+STRICT
+AS $$
+DECLARE
+  v_rgb BYTEA := decode(substr(p_hex, 2), 'hex');
+  r DOUBLE PRECISION := get_byte(v_rgb, 0)::float / 255.0;
+  g DOUBLE PRECISION := get_byte(v_rgb, 1)::float / 255.0;
+  b DOUBLE PRECISION := get_byte(v_rgb, 2)::float / 255.0;
+  maxc DOUBLE PRECISION := GREATEST(r, g, b);
+  l DOUBLE PRECISION := (maxc + LEAST(r, g, b)) / 2.0;
+  d DOUBLE PRECISION := maxc - LEAST(r, g, b);
+  h_raw DOUBLE PRECISION;
+  s_raw DOUBLE PRECISION;
+  chroma NUMERIC := hex_chroma(p_hex);
+  d_white DOUBLE PRECISION := hex_white_distance(p_hex);
+  v_base TEXT;
+BEGIN
+  h_raw := CASE
+    WHEN d = 0 THEN 0
+    WHEN maxc = r THEN ((g - b) / NULLIF(d, 0)) * 60.0
+    WHEN maxc = g THEN ((b - r) / NULLIF(d, 0)) * 60.0 + 120.0
+    ELSE ((r - g) / NULLIF(d, 0)) * 60.0 + 240.0
+  END;
+  s_raw := CASE WHEN d = 0 THEN 0 ELSE d / NULLIF(1.0 - abs(2 * l - 1), 0) END;
+  hue := round((CASE WHEN h_raw < 0 THEN h_raw + 360 ELSE h_raw END)::numeric, 9);
+  saturation := round(GREATEST(0, LEAST(1, s_raw))::numeric, 9);
+  lightness := round(GREATEST(0, LEAST(1, l))::numeric, 9);
+
+  -- Base rules (32), then the refinements (33, 34) in order. Each refinement
+  -- only claims rows no earlier step pinned (metallics, french, pastels,
+  -- nudes), so the sequence collapses into a single CASE.
+  v_base := CASE
+    WHEN p_hex IN (
+      '#FFD700', '#D4AF37', '#DAA520', '#F0E130', '#B8860B', '#996515',
+      '#C0C0C0', '#A8A9AD', '#B2BEB5', '#E5E4E2',
+      '#B87333', '#CD7F32', '#CC7722'
+    ) THEN 'metallics'
+    WHEN lightness <= 0.25 THEN 'darks'
+    WHEN lightness >= 0.90 AND saturation <= 0.18 THEN 'french'
+    WHEN lightness >= 0.80 AND saturation <= 0.45 THEN 'pastels'
+    WHEN hue BETWEEN 15 AND 60 AND saturation <= 0.60 AND lightness BETWEEN 0.45 AND 0.88 THEN 'nudes'
+    WHEN saturation BETWEEN 0.05 AND 0.25 AND lightness BETWEEN 0.45 AND 0.75 THEN 'nudes'
+    WHEN hue BETWEEN 185 AND 255 THEN 'blues'
+    WHEN hue BETWEEN 60 AND 180 THEN 'greens'
+    WHEN hue BETWEEN 260 AND 330 THEN 'purples'
+    WHEN (hue >= 330 OR hue < 20) AND saturation >= 0.45 AND lightness >= 0.60 THEN 'pinks'
+    WHEN (hue >= 350 OR hue < 20) AND saturation >= 0.55 AND lightness BETWEEN 0.35 AND 0.65 THEN 'reds'
+    WHEN (hue >= 330 OR hue < 20 OR hue BETWEEN 320 AND 340) AND lightness < 0.35 THEN 'burgundy'
+    WHEN saturation >= 0.65 AND lightness BETWEEN 0.35 AND 0.75 AND (hue BETWEEN 185 AND 255) THEN 'blues'
+    WHEN saturation >= 0.65 AND lightness BETWEEN 0.35 AND 0.75 AND (hue BETWEEN 60 AND 180) THEN 'greens'
+    WHEN saturation >= 0.65 AND lightness BETWEEN 0.35 AND 0.75 AND (hue BETWEEN 260 AND 330) THEN 'purples'
+    WHEN saturation >= 0.65 AND lightness BETWEEN 0.35 AND 0.75 AND (hue >= 350 OR hue < 20) THEN 'reds'
+    ELSE 'nudes'
+  END;
+  category := CASE
+    WHEN v_base = 'metallics' THEN 'metallics'
+    -- 33: explicit near-white whitelist
+    WHEN p_hex IN (
+      '#FFFFFF', '#FFFAFA', '#F8F8FF', '#FFF8DC', '#FFFAF0', '#FFF5EE', '#FFF5F5',
+      '#FFFDFA', '#FFFDF5', '#F5F5F5', '#FAEBD7', '#F0F8FF', '#FFF0F5'
+    ) THEN 'french'
+    -- 33: very light, very low chroma
+    WHEN (lightness >= 0.94 AND chroma <= 0.12) OR (lightness >= 0.90 AND chroma <= 0.06) THEN 'french'
+    -- 34: close to white in RGB space
+    WHEN d_white <= 0.065 OR (d_white <= 0.10 AND lightness >= 0.88) THEN 'french'
+    WHEN v_base = 'french' THEN 'french'
+    -- 33: light, low chroma
+    WHEN lightness >= 0.80 AND chroma > 0.06 AND chroma <= 0.40 THEN 'pastels'
+    WHEN v_base = 'pastels' THEN 'pastels'
+    -- 33: warm/neutral low-chroma mid-lightness
+    WHEN (hue BETWEEN 15 AND 60 AND chroma <= 0.40 AND lightness BETWEEN 0.45 AND 0.88)
+      OR (chroma <= 0.18 AND lightness BETWEEN 0.45 AND 0.78) THEN 'nudes'
+    WHEN v_base = 'nudes' THEN 'nudes'
+    -- 33: vivid colours back into their hue family
+    WHEN hue BETWEEN 185 AND 255 AND chroma > 0.12 AND lightness < 0.92 THEN 'blues'
+    WHEN hue BETWEEN 60 AND 180 AND chroma > 0.12 AND lightness < 0.92 THEN 'greens'
+    WHEN hue BETWEEN 260 AND 330 AND chroma > 0.12 AND lightness < 0.92 THEN 'purples'
+    ELSE v_base
+  END;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION refresh_hex_categorization()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- 1) HSL and category from categorize_hex(), writing only rows that change
+  UPDATE colors c
+  SET hue = k.hue,
+      saturation = k.saturation,
+      lightness = k.lightness,
+      category = k.category
+  FROM colors src
+  CROSS JOIN LATERAL categorize_hex(src.hex_code) k
+  WHERE c.id = src.id
+    AND (c.hue, c.saturation, c.lightness, c.category)
+      IS DISTINCT FROM (k.hue, k.saturation, k.lightness, k.category);
+
+  -- 2) Display order (light → dark per family; hue, then hex, break ties)
+  UPDATE colors c
+  SET display_order = o.ord
+  FROM (
+    SELECT
+      hex_code,
+      row_number() OVER (
+        PARTITION BY category
+        ORDER BY lightness DESC, hue NULLS LAST, hex_code COLLATE "C"
+      ) AS ord
+    FROM colors
+  ) o
+  WHERE c.hex_code = o.hex_code
+    AND c.display_order IS DISTINCT FROM o.ord;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION refresh_hex_categorization() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_hex_categorization() TO service_role;
+
+-- Recategorise existing rows under the corrected rules
+SELECT refresh_hex_categorization();
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'refresh_hex_categorization() now applies the 33/34 refinements; every colour was recategorised and reordered.';
+END;
+$notice$;
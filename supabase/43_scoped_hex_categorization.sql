@@ -0,0 +1,96 @@
+-- ============================================================================
+-- Scoped hex categorisation
+-- File: 43_scoped_hex_categorization.sql
+-- Purpose:
+--   - Add refresh_hex_categorization(p_hex_codes TEXT[]): recompute HSL and
+--     category for just the given hexes and renumber display_order only in
+--     the categories those rows left or joined. The catalogue sync passes the
+--     hexes it inserted or backfilled, so the post-sync refresh scales with the
+--     size of the change instead of the size of `colors`.
+--   - A NULL array means "every row"; the parameterless
+--     refresh_hex_categorization() now delegates to it
+-- Prereq: 42_hex_categorization_rules.sql
+--
+-- The rules come from categorize_hex() in 42. Unchanged rows never move
+-- between categories, so renumbering the touched partitions gives the same
+-- display_order as a full refresh.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION refresh_hex_categorization(p_hex_codes TEXT[])
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_categories TEXT[];
+  v_category TEXT;
+BEGIN
+  -- Categories the scoped rows currently sit in; they may be about to leave them
+  SELECT array_agg(DISTINCT category) INTO v_categories
+  FROM colors
+  WHERE p_hex_codes IS NULL OR hex_code = ANY(p_hex_codes);
+
+  -- 1) HSL and category from categorize_hex() (42), writing only rows that change
+  UPDATE colors c
+  SET hue = k.hue,
+      saturation = k.saturation,
+      lightness = k.lightness,
+      category = k.category
+  FROM colors src
+  CROSS JOIN LATERAL categorize_hex(src.hex_code) k
+  WHERE c.id = src.id
+    AND (p_hex_codes IS NULL OR src.hex_code = ANY(p_hex_codes))
+    AND (c.hue, c.saturation, c.lightness, c.category)
+      IS DISTINCT FROM (k.hue, k.saturation, k.lightness, k.category);
+
+  -- 2) Display order (light → dark per family; hue, then hex, break ties),
+  --    renumbering only the categories the scoped rows left or joined
+  SELECT array_agg(DISTINCT category) INTO v_categories
+  FROM (
+    SELECT unnest(v_categories) AS category
+    UNION
+    SELECT category FROM colors WHERE p_hex_codes IS NULL OR hex_code = ANY(p_hex_codes)
+  ) touched;
+
+  -- One category at a time keeps each sort small; only rows whose position
+  -- actually moved are joined back and written
+  FOREACH v_category IN ARRAY COALESCE(v_categories, '{}') LOOP
+    UPDATE colors c
+    SET display_order = o.ord
+    FROM (
+      SELECT hex_code, ord
+      FROM (
+        SELECT
+          hex_code,
+          display_order,
+          row_number() OVER (ORDER BY lightness DESC, hue NULLS LAST, hex_code COLLATE "C") AS ord
+        FROM colors
+        WHERE category = v_category
+      ) ranked
+      WHERE display_order IS DISTINCT FROM ord
+    ) o
+    WHERE c.hex_code = o.hex_code;
+  END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION refresh_hex_categorization()
+RETURNS void
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT refresh_hex_categorization(NULL::TEXT[]);
+$$;
+
+REVOKE EXECUTE ON FUNCTION refresh_hex_categorization(TEXT[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_hex_categorization(TEXT[]) TO service_role;
+REVOKE EXECUTE ON FUNCTION refresh_hex_categorization() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_hex_categorization() TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'refresh_hex_categorization(TEXT[]) installed.';
+END;
+$notice$;
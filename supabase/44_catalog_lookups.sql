@@ -0,0 +1,87 @@
+-- ============================================================================
+-- Catalogue lookups with the keys in the request body
+-- File: 44_catalog_lookups.sql
+-- Purpose:
+--   - catalog_colors_by_hex(p_hex_codes TEXT[]) and
+--     catalog_variants_by_color(p_color_ids UUID[]): the two reads the REST
+--     catalogue sync makes before it writes
+--     (nail-app-mobile/scripts/sync_color_catalog.py)
+--   - Called as RPCs, so the keys travel in a POST body instead of a
+--     `?hex_code=in.(...)` query string. Without them the sync has to cut
+--     its lookups to fit a URL length limit (about 200 UUIDs per request);
+--     with them a request holds thousands of keys, sized by
+--     nail-app-mobile/scripts/batch_tuning.py
+--   - Keyset-paged on id (p_after / p_limit), so the sync can read past
+--     PostgREST's max-rows whatever it is set to, without re-running the
+--     whole lookup for every page
+-- Prereq: 40_color_variants.sql
+--
+-- Optional: the sync falls back to GET lookups when these are missing.
+-- Columns match the sync's REST `select=` lists.
+-- ============================================================================
+
+-- Earlier versions took only the keys; drop them so calls are not ambiguous
+DROP FUNCTION IF EXISTS catalog_colors_by_hex(TEXT[]);
+DROP FUNCTION IF EXISTS catalog_variants_by_color(UUID[]);
+
+CREATE OR REPLACE FUNCTION catalog_colors_by_hex(
+  p_hex_codes TEXT[],
+  p_after UUID DEFAULT NULL,
+  p_limit INT DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  hex_code TEXT,
+  name TEXT,
+  brand TEXT,
+  finish TEXT,
+  primary_variant_id UUID,
+  source_priority TEXT
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT c.id, c.hex_code, c.name, c.brand, c.finish, c.primary_variant_id, c.source_priority
+  FROM colors c
+  WHERE c.hex_code = ANY(p_hex_codes)
+    AND (p_after IS NULL OR c.id > p_after)
+  ORDER BY c.id
+  LIMIT p_limit;
+$$;
+
+CREATE OR REPLACE FUNCTION catalog_variants_by_color(
+  p_color_ids UUID[],
+  p_after UUID DEFAULT NULL,
+  p_limit INT DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  color_id UUID,
+  brand TEXT,
+  product_line TEXT,
+  shade_name TEXT,
+  shade_code TEXT
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT v.id, v.color_id, v.brand, v.product_line, v.shade_name, v.shade_code
+  FROM color_variants v
+  WHERE v.color_id = ANY(p_color_ids)
+    AND (p_after IS NULL OR v.id > p_after)
+  ORDER BY v.id
+  LIMIT p_limit;
+$$;
+
+REVOKE EXECUTE ON FUNCTION catalog_colors_by_hex(TEXT[], UUID, INT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION catalog_colors_by_hex(TEXT[], UUID, INT) TO service_role;
+REVOKE EXECUTE ON FUNCTION catalog_variants_by_color(UUID[], UUID, INT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION catalog_variants_by_color(UUID[], UUID, INT) TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'catalog_colors_by_hex(TEXT[], UUID, INT) and catalog_variants_by_color(UUID[], UUID, INT) installed.';
+END;
+$notice$;
@@ -0,0 +1,86 @@
+-- ============================================================================
+-- Soft-deactivation of variants that left their source catalogue
+-- File: 45_deactivate_missing_variants.sql
+-- Purpose:
+--   - catalog_active_variant_keys(p_source_catalogs, p_after, p_limit): the
+--     active variants of the given catalogues, with their colour hex, in id
+--     order and paged by keyset. The REST/RPC catalogue sync compares these
+--     with what it just ingested
+--     (nail-app-mobile/scripts/sync_color_catalog.py)
+--   - deactivate_color_variants(p_ids UUID[]): set is_active = FALSE on the
+--     stale ids in one statement and clear any colors.primary_variant_id
+--     pointing at them, so the sync repoints those colours to a live shade
+-- Prereq: 40_color_variants.sql
+--
+-- Rows are never deleted: a shade that comes back is reactivated by the next
+-- upsert. `--backend postgres` does the same anti-join against its staging
+-- table and does not need these functions.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION catalog_active_variant_keys(
+  p_source_catalogs TEXT[],
+  p_after UUID DEFAULT NULL,
+  p_limit INT DEFAULT 1000
+)
+RETURNS TABLE (
+  id UUID,
+  source_catalog TEXT,
+  hex_code TEXT,
+  brand TEXT,
+  product_line TEXT,
+  shade_name TEXT,
+  shade_code TEXT
+)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT v.id, v.source_catalog, c.hex_code, v.brand, v.product_line, v.shade_name, v.shade_code
+  FROM color_variants v
+  JOIN colors c ON c.id = v.color_id
+  WHERE v.is_active
+    AND v.source_catalog = ANY(p_source_catalogs)
+    AND (p_after IS NULL OR v.id > p_after)
+  ORDER BY v.id
+  LIMIT p_limit;
+$$;
+
+CREATE OR REPLACE FUNCTION deactivate_color_variants(p_ids UUID[])
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_deactivated INT;
+BEGIN
+  WITH gone AS (
+    UPDATE color_variants
+    SET is_active = FALSE
+    WHERE id = ANY(p_ids)
+      AND is_active
+    RETURNING id
+  ),
+  unpointed AS (
+    UPDATE colors c
+    SET primary_variant_id = NULL
+    FROM gone
+    WHERE c.primary_variant_id = gone.id
+    RETURNING c.id
+  )
+  SELECT count(*) INTO v_deactivated FROM gone;
+
+  RETURN v_deactivated;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION catalog_active_variant_keys(TEXT[], UUID, INT) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION catalog_active_variant_keys(TEXT[], UUID, INT) TO service_role;
+REVOKE EXECUTE ON FUNCTION deactivate_color_variants(UUID[]) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION deactivate_color_variants(UUID[]) TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'catalog_active_variant_keys() and deactivate_color_variants(UUID[]) installed.';
+END;
+$notice$;
@@ -0,0 +1,47 @@
+-- ============================================================================
+-- Batched writes of client-computed hex categories
+-- File: 46_apply_hex_categories.sql
+-- Purpose:
+--   - apply_hex_categories(JSONB): write the hue/saturation/lightness,
+--     category and display_order that `sync_color_catalog.py --categorize
+--     client` computed, for many colours per call, instead of one PATCH per
+--     colour
+-- Prereq: 40_color_variants.sql
+--
+-- Only writes what the caller sends; the rules themselves are in 42 and in
+-- nail-app-mobile/scripts/hex_categorization.py.
+-- ============================================================================
+
+-- [{"id", "hue", "saturation", "lightness", "category", "display_order"}, ...].
+-- Returns the number of rows updated.
+CREATE OR REPLACE FUNCTION apply_hex_categories(p_rows JSONB)
+RETURNS INT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH updated AS (
+    UPDATE colors c
+    SET
+      hue = r.hue,
+      saturation = r.saturation,
+      lightness = r.lightness,
+      category = r.category,
+      display_order = r.display_order
+    FROM jsonb_to_recordset(p_rows) AS r(
+      id UUID, hue NUMERIC, saturation NUMERIC, lightness NUMERIC, category TEXT, display_order INT
+    )
+    WHERE c.id = r.id
+    RETURNING 1
+  )
+  SELECT count(*)::INT FROM updated;
+$$;
+
+REVOKE EXECUTE ON FUNCTION apply_hex_categories(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION apply_hex_categories(JSONB) TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'apply_hex_categories(JSONB) installed.';
+END;
+$notice$;
@@ -0,0 +1,38 @@
+-- ============================================================================
+-- Batched primary variant writes
+-- File: 47_set_primary_variants.sql
+-- Purpose:
+--   - set_primary_variants(JSONB): point many colours at their primary
+--     variant per call, for the REST backend of `sync_color_catalog.py`,
+--     instead of one PATCH per colour
+-- Prereq: 40_color_variants.sql
+--
+-- The sync decides which colours get which primary (see primary_updates());
+-- this only writes what the caller sends.
+-- ============================================================================
+
+-- [{"id", "primary_variant_id"}, ...]. Returns the number of rows updated.
+CREATE OR REPLACE FUNCTION set_primary_variants(p_rows JSONB)
+RETURNS INT
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH updated AS (
+    UPDATE colors c
+    SET primary_variant_id = r.primary_variant_id
+    FROM jsonb_to_recordset(p_rows) AS r(id UUID, primary_variant_id UUID)
+    WHERE c.id = r.id
+    RETURNING 1
+  )
+  SELECT count(*)::INT FROM updated;
+$$;
+
+REVOKE EXECUTE ON FUNCTION set_primary_variants(JSONB) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION set_primary_variants(JSONB) TO service_role;
+
+DO $notice$
+BEGIN
+  RAISE NOTICE 'set_primary_variants(JSONB) installed.';
+END;
+$notice$;
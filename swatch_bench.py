@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""Timing and accuracy benchmark for the scrapers' swatch colour extraction.
+
+All three scrapers derive `ApproxHex` the same way (`average_hex_from_image` in
+`scrape_opi_uk.py`, `average_hex` in the CND and TGB scrapers). Each decodes
+the image, converts to RGBA, crops the centre (60%, then 80% and 100% if
+needed), masks out transparent and near-white pixels, and takes the mean.
+
+The benchmark runs over a fixed corpus directory: images plus a
+`manifest.json` giving each one's reference hex. Build the corpus once so
+every comparison sees the same bytes:
+
+    # Real swatches from a recording (scrape_replay.py --record). The reference
+    # is OPI's own `opi:hex_code` metafield from the same GraphQL pages.
+    python swatch_bench.py --build-corpus swatch_corpus --archive fixtures/scrapers.zip --limit 40
+
+    # Offline: rendered lacquer blobs (shading, a highlight, noise, white
+    # background). Base colours come from the bundled OPI CSV.
+    python swatch_bench.py --build-corpus swatch_corpus --synthetic 24
+
+Every source is written as JPEG, PNG and WebP, at its native size and at 1024,
+512 and 256 px (longest edge). Then:
+
+    python swatch_bench.py --corpus swatch_corpus --repeat 3 [--extractor module:function ...]
+
+The report has three parts:
+
+- Time per image for decode, convert, crop and mask+mean, by format and size.
+  This uses a staged copy of the scraper code that is checked to return the
+  same hex.
+- Per-extractor throughput and CIEDE2000 error against the references.
+- Whether each candidate is faster, and whether it is no less accurate than
+  the scraper's extraction (mean and p95 ΔE within `--tolerance`). The exit
+  status is 1 if a candidate is less accurate.
+
+`reduced` is a built-in candidate. It decodes JPEGs at reduced scale
+(`Image.draft`) and box-reduces everything to at most 256 px before
+averaging.
+"""
+
+import argparse
+import csv
+import hashlib
+import importlib
+import io
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    raise SystemExit("Missing dependencies: pip install numpy pillow")
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "nail-app-mobile" / "scripts"))
+from color_science import delta_e_2000, hex_to_lab  # noqa: E402
+
+MANIFEST_NAME = "manifest.json"
+CORPUS_SIZES = (1024, 512, 256)
+CORPUS_FORMATS = {
+    "jpeg": ("JPEG", "jpg", {"quality": 85}),
+    "png": ("PNG", "png", {}),
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+}
+STAGES = ("decode", "convert", "crop", "mask")
+REDUCED_EDGE = 256
+
+Extractor = Callable[[bytes], str]
+
+
+def _scraper(name: str):
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    return importlib.import_module(name)
+
+
+def _hex_rgb(hex_code: str) -> Tuple[int, int, int]:
+    value = hex_code.strip().lstrip("#")
+    return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+
+
+def archive_sources(archive_path: Path, limit: Optional[int] = None) -> Iterator[Tuple[str, Image.Image, str]]:
+    """(swatch URL, image, OPI hex_code) for every recorded OPI product with both."""
+    from scrape_replay import FixtureArchive, request_key
+
+    opi = _scraper("scrape_opi_uk")
+    archive = FixtureArchive.load(archive_path)
+    pairs: Dict[str, str] = {}
+    for entry in archive.entries.values():
+        if entry["url"] != opi.GRAPHQL_URL or entry["status"] != 200:
+            continue
+        page = json.loads(archive.blobs[entry["blob"]])
+        for edge in (((page.get("data") or {}).get("products") or {}).get("edges") or []):
+            node = edge.get("node") or {}
+            hex_hint = ((node.get("hexCode") or {}).get("value") or "").strip().lstrip("#")
+            url = opi.select_swatch_url(node.get("media") or {})
+            if url and len(hex_hint) == 6:
+                pairs.setdefault(url, f"#{hex_hint.upper()}")
+    # A stable, spread-out sample rather than the first page of one collection
+    selected = sorted(pairs, key=lambda url: hashlib.sha256(url.encode("utf-8")).hexdigest())[:limit]
+    for url in selected:
+        found = archive.lookup(request_key("GET", url))
+        if found is None or found[0]["status"] != 200:
+            continue
+        try:
+            image = Image.open(io.BytesIO(found[1]))
+            image.load()
+        except Exception as exc:
+            logging.warning("Skipping %s: %s", url, exc)
+            continue
+        yield url, image, pairs[url]
+
+
+def render_swatch(hex_code: str, size: int, rng: np.random.Generator) -> Image.Image:
+    """A lacquer blob on white: rim shading, a specular streak and sensor noise around `hex_code`."""
+    base = np.array(_hex_rgb(hex_code), dtype=np.float64)
+    yy, xx = (np.mgrid[0:size, 0:size] + 0.5) / size - 0.5
+    radius = np.sqrt((xx / 0.40) ** 2 + (yy / 0.32) ** 2)
+    inside = radius <= 1.0
+    shade = 1.0 - 0.18 * radius ** 2
+    streak = np.exp(-(((xx + 0.10 - 0.35 * yy) / 0.025) ** 2)) * (np.abs(yy) < 0.22) * 0.55
+    pixels = base * shade[..., None]
+    pixels += (255.0 - pixels) * streak[..., None]
+    pixels = np.where(inside[..., None], pixels, 255.0)
+    pixels += rng.normal(0.0, 2.0, pixels.shape)
+    return Image.fromarray(np.clip(np.rint(pixels), 0, 255).astype(np.uint8), "RGB")
+
+
+def synthetic_sources(count: int, size: int = 1200, seed: int = 7) -> Iterator[Tuple[str, Image.Image, str]]:
+    with (ROOT / "opi_full_uk_catalog.csv").open(newline="", encoding="utf-8") as fh:
+        hexes = sorted({row["ApproxHex"] for row in csv.DictReader(fh) if len(row["ApproxHex"]) == 7})
+    chosen = random.Random(seed).sample(hexes, min(count, len(hexes)))
+    rng = np.random.default_rng(seed)
+    for index, hex_code in enumerate(chosen):
+        yield f"synthetic:{index:03d}", render_swatch(hex_code, size, rng), hex_code
+
+
+def _encodable(image: Image.Image, fmt: str) -> Image.Image:
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if not has_alpha:
+        return image.convert("RGB")
+    rgba = image.convert("RGBA")
+    if fmt != "JPEG":
+        return rgba
+    background = Image.new("RGBA", rgba.size, (255, 255, 255, 255))
+    return Image.alpha_composite(background, rgba).convert("RGB")
+
+
+def build_corpus(sources: Iterator[Tuple[str, Image.Image, str]], out_dir: Path,
+                 sizes: Sequence[int] = CORPUS_SIZES) -> List[dict]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    images = []
+    for index, (source, image, reference) in enumerate(sources):
+        native = max(image.size)
+        for edge in [native] + [size for size in sizes if size < native]:
+            scaled = image
+            if edge != native:
+                scale = edge / native
+                scaled = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                                      Image.LANCZOS)
+            for name, (fmt, extension, options) in CORPUS_FORMATS.items():
+                file_name = f"{index:03d}-{edge}.{extension}"
+                buffer = io.BytesIO()
+                _encodable(scaled, fmt).save(buffer, fmt, **options)
+                (out_dir / file_name).write_bytes(buffer.getvalue())
+                images.append({
+                    "file": file_name,
+                    "source": source,
+                    "format": name,
+                    "edge": edge,
+                    "width": scaled.width,
+                    "height": scaled.height,
+                    "bytes": buffer.tell(),
+                    "reference": reference,
+                })
+    manifest = {"version": 1, "images": images}
+    (out_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return images
+
+
+def load_corpus(corpus_dir: Path) -> List[dict]:
+    manifest = json.loads((corpus_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    images = manifest["images"]
+    for image in images:
+        image["data"] = (corpus_dir / image["file"]).read_bytes()
+    return images
+
+
+def _masked_mean(image: Image.Image, timings: Optional[Dict[str, float]] = None) -> str:
+    """The scrapers' centre-crop, near-white mask and mean, optionally timing crop vs mask."""
+    width, height = image.size
+    for scale in (0.6, 0.8, 1.0):
+        start = time.perf_counter()
+        crop_w, crop_h = int(width * scale), int(height * scale)
+        x0 = (width - crop_w) // 2
+        y0 = (height - crop_h) // 2
+        array = np.array(image.crop((x0, y0, x0 + crop_w, y0 + crop_h)))
+        middle = time.perf_counter()
+        r, g, b, a = np.rollaxis(array, axis=-1)
+        mask = (a > 0) & ~((r > 248) & (g > 248) & (b > 248))
+        result = ""
+        if np.any(mask):
+            result = f"#{int(np.mean(r[mask])):02X}{int(np.mean(g[mask])):02X}{int(np.mean(b[mask])):02X}"
+        if timings is not None:
+            timings["crop"] += middle - start
+            timings["mask"] += time.perf_counter() - middle
+        if result:
+            return result
+    return ""
+
+
+def staged_average_hex(image_bytes: bytes, timings: Dict[str, float]) -> str:
+    """`average_hex_from_image` split into timed stages (decode, convert, crop, mask)."""
+    start = time.perf_counter()
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    decoded = time.perf_counter()
+    image = image.convert("RGBA")
+    converted = time.perf_counter()
+    timings["decode"] += decoded - start
+    timings["convert"] += converted - decoded
+    return _masked_mean(image, timings)
+
+
+def average_hex_reduced(image_bytes: bytes) -> str:
+    """Candidate: decode JPEGs at reduced scale, box-reduce to ≤256 px, then the same masked mean."""
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.draft("RGB", (REDUCED_EDGE, REDUCED_EDGE))
+        image = image.convert("RGBA")
+        factor = max(image.size) // REDUCED_EDGE
+        if factor > 1:
+            image = image.reduce(factor)
+        return _masked_mean(image)
+    except Exception:
+        return ""
+
+
+def load_extractor(spec: str) -> Tuple[str, Extractor]:
+    module_name, _, function_name = spec.partition(":")
+    if not function_name:
+        raise SystemExit(f"--extractor expects module:function, got {spec!r}")
+    return function_name, getattr(_scraper(module_name), function_name)
+
+
+def _percentile(values: np.ndarray, q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def measure(images: List[dict], name: str, extractor: Extractor, repeat: int) -> dict:
+    """Seconds per image (fastest of `repeat` passes), outputs and ΔE2000 against the references."""
+    best = [float("inf")] * len(images)
+    outputs: List[str] = [""] * len(images)
+    for _ in range(repeat):
+        for index, image in enumerate(images):
+            start = time.perf_counter()
+            outputs[index] = extractor(image["data"])
+            best[index] = min(best[index], time.perf_counter() - start)
+    valid = [index for index, output in enumerate(outputs) if output]
+    errors = np.zeros(0)
+    if valid:
+        errors = delta_e_2000(hex_to_lab([outputs[i] for i in valid]), hex_to_lab([images[i]["reference"] for i in valid]))
+    seconds = float(sum(best))
+    megapixels = sum(image["width"] * image["height"] for image in images) / 1e6
+    return {
+        "name": name,
+        "seconds": seconds,
+        "ms_per_image": seconds / len(images) * 1000,
+        "images_per_second": len(images) / seconds if seconds else 0.0,
+        "megapixels_per_second": megapixels / seconds if seconds else 0.0,
+        "failed": len(images) - len(valid),
+        "delta_e_mean": float(errors.mean()) if len(errors) else 0.0,
+        "delta_e_p95": _percentile(errors, 95),
+        "delta_e_max": float(errors.max()) if len(errors) else 0.0,
+        "outputs": outputs,
+        "per_image_seconds": best,
+    }
+
+
+def stage_breakdown(images: List[dict], repeat: int, baseline: Extractor) -> Tuple[Dict[Tuple[str, int], Dict[str, float]], int]:
+    """Mean seconds per image and stage, by (format, edge); also how many staged results differ from `baseline`."""
+    groups: Dict[Tuple[str, int], Dict[str, float]] = {}
+    counts: Dict[Tuple[str, int], int] = {}
+    mismatches = 0
+    for image in images:
+        key = (image["format"], image["edge"])
+        best: Optional[Dict[str, float]] = None
+        for _ in range(repeat):
+            timings = dict.fromkeys(STAGES, 0.0)
+            result = staged_average_hex(image["data"], timings)
+            if best is None or sum(timings.values()) < sum(best.values()):
+                best = timings
+        mismatches += result != baseline(image["data"])
+        group = groups.setdefault(key, dict.fromkeys(STAGES, 0.0))
+        for stage in STAGES:
+            group[stage] += best[stage]
+        counts[key] = counts.get(key, 0) + 1
+    for key, group in groups.items():
+        for stage in STAGES:
+            group[stage] /= counts[key]
+    return groups, mismatches
+
+
+def benchmark(images: List[dict], extractors: Dict[str, Extractor], repeat: int = 3, tolerance: float = 0.25) -> dict:
+    baseline_name = next(iter(extractors))
+    groups, mismatches = stage_breakdown(images, repeat, extractors[baseline_name])
+    results = [measure(images, name, extractor, repeat) for name, extractor in extractors.items()]
+    baseline = results[0]
+    for result in results[1:]:
+        result["speedup"] = baseline["seconds"] / result["seconds"] if result["seconds"] else 0.0
+        drift = [
+            float(delta_e_2000(hex_to_lab([ours]), hex_to_lab([theirs]))[0])
+            for ours, theirs in zip(result["outputs"], baseline["outputs"])
+            if ours and theirs
+        ]
+        result["delta_e_vs_baseline_max"] = max(drift, default=0.0)
+        result["no_less_accurate"] = (
+            result["failed"] <= baseline["failed"]
+            and result["delta_e_mean"] <= baseline["delta_e_mean"] + tolerance
+            and result["delta_e_p95"] <= baseline["delta_e_p95"] + tolerance
+        )
+    return {
+        "images": len(images),
+        "sources": len({image["source"] for image in images}),
+        "baseline": baseline_name,
+        "staged_mismatches": mismatches,
+        "stages": {f"{fmt}@{edge}": timings for (fmt, edge), timings in sorted(groups.items())},
+        "extractors": results,
+        "tolerance": tolerance,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"corpus: {report['images']:,} images from {report['sources']:,} swatches")
+    print(f"stage breakdown ({report['baseline']}), ms per image:")
+    if report["staged_mismatches"]:
+        print(f"  warning: the staged copy disagrees with {report['baseline']} on {report['staged_mismatches']} images")
+    print(f"  {'format@edge':<12}" + "".join(f"{stage:>9}" for stage in STAGES) + f"{'total':>9}")
+    for key, timings in report["stages"].items():
+        cells = "".join(f"{timings[stage] * 1000:>9.2f}" for stage in STAGES)
+        print(f"  {key:<12}{cells}{sum(timings.values()) * 1000:>9.2f}")
+    print(f"  {'extractor':<12}{'ms/img':>9}{'img/s':>9}{'MP/s':>9}{'failed':>7}{'ΔE mean':>9}{'ΔE p95':>9}{'ΔE max':>9}")
+    for result in report["extractors"]:
+        print(
+            f"  {result['name']:<12}{result['ms_per_image']:>9.2f}{result['images_per_second']:>9.1f}"
+            f"{result['megapixels_per_second']:>9.1f}{result['failed']:>7}{result['delta_e_mean']:>9.2f}"
+            f"{result['delta_e_p95']:>9.2f}{result['delta_e_max']:>9.2f}"
+        )
+    for result in report["extractors"][1:]:
+        verdict = "no less accurate" if result["no_less_accurate"] else "LESS ACCURATE"
+        print(
+            f"{result['name']}: {result['speedup']:.2f}× the speed of {report['baseline']}, {verdict} "
+            f"(tolerance ΔE {report['tolerance']}), at most ΔE {result['delta_e_vs_baseline_max']:.2f} from its output"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark swatch colour extraction speed and accuracy")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--build-corpus", type=Path, metavar="DIR", help="Write a corpus (with --archive or --synthetic)")
+    action.add_argument("--corpus", type=Path, metavar="DIR", help="Benchmark against a corpus")
+    parser.add_argument("--archive", type=Path, help="Fixture archive recorded by scrape_replay.py")
+    parser.add_argument("--limit", type=int, default=40, help="Swatches taken from --archive")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Render N swatches instead of using an archive")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes per extractor; the fastest counts")
+    parser.add_argument("--extractor", action="append", default=[], metavar="MODULE:FUNCTION",
+                        help="Another candidate taking image bytes and returning '#RRGGBB' (repeatable)")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed ΔE2000 increase (mean and p95)")
+    parser.add_argument("--json", type=Path, help="Write the report as JSON")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log_level), format="[%(levelname)s] %(message)s")
+
+    if args.build_corpus:
+        if args.archive:
+            sources = archive_sources(args.archive, args.limit)
+        elif args.synthetic:
+            sources = synthetic_sources(args.synthetic)
+        else:
+            parser.error("--build-corpus needs --archive or --synthetic")
+        images = build_corpus(sources, args.build_corpus)
+        if not images:
+            print("No swatches with a reference hex found.")
+            return 1
+        print(f"{len(images):,} images → {args.build_corpus}")
+        return 0
+
+    images = load_corpus(args.corpus)
+    extractors: Dict[str, Extractor] = {
+        "scraper": _scraper("scrape_opi_uk").average_hex_from_image,
+        "reduced": average_hex_reduced,
+    }
+    extractors.update(load_extractor(spec) for spec in args.extractor)
+    report = benchmark(images, extractors, args.repeat, args.tolerance)
+    print_report(report)
+    if args.json:
+        for result in report["extractors"]:
+            result["outputs"] = dict(zip((image["file"] for image in images), result["outputs"]))
+            result.pop("per_image_seconds")
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0 if all(result["no_less_accurate"] for result in report["extractors"][1:]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())